@@ -0,0 +1,317 @@
+"""Statistiques de ventes pré-agrégées pour le tableau de bord (/api/analytics/...).
+
+Deux tables de cumuls (sql/analytics.sql), par restaurant et par tranche d'une heure ou d'un
+jour (heure locale, ANALYTICS_UTC_OFFSET_HOURS) :
+- sales_rollups : commandes, chiffre d'affaires, annulations, livraisons ;
+- item_sales_rollups : quantité vendue et chiffre d'affaires par plat.
+
+Mise à jour incrémentale : la création d'une commande et chaque changement de statut ajoutent
+leur contribution (différence entre l'ancien et le nouveau statut) à des deltas en mémoire,
+envoyés toutes les ANALYTICS_FLUSH_SECONDS par la fonction SQL apply_sales_deltas qui les
+additionne : plusieurs workers peuvent envoyer les leurs sans se marcher dessus. Une commande
+annulée ou remboursée sort du chiffre d'affaires et des ventes par plat.
+
+Les lectures ne parcourent que les cumuls de la période demandée (au plus MAX_BUCKETS
+tranches par restaurant) : leur coût ne dépend pas du nombre de commandes.
+
+Reconstruction (`rebuild`, POST /api/analytics/rebuild) : commandes et articles lus par pages,
+rangés en colonnes numpy, agrégés par `aggregate_rollups` (np.unique + np.bincount), puis
+écrits par upsert ; les cumuls qui ne correspondent plus à aucune commande sont supprimés.
+Les deltas envoyés pendant la reconstruction peuvent être comptés deux fois ou écrasés : à
+lancer hors des heures de pointe, pour réparer les cumuls ou les initialiser.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ChopExpress.backend.eta import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {"hour": 3600, "day": 86400}  # durée d'une tranche en secondes
+MAX_BUCKETS = {"hour": 24 * 31, "day": 366}  # tranches maximum par lecture
+DEFAULT_ANALYTICS_FLUSH_SECONDS = 10.0
+DEFAULT_ANALYTICS_UTC_OFFSET_HOURS = 1.0  # Cameroun : UTC+1, sans heure d'été
+DEFAULT_TOP_ITEMS_LIMIT = 10
+MAX_TOP_ITEMS_LIMIT = 100
+REBUILD_CHUNK_SIZE = 1000  # lignes de cumuls par upsert
+INACTIVE_STATUSES = ("cancelled", "refunded")  # hors chiffre d'affaires
+ORDER_COLUMNS = "id, restaurant_id, status, total_amount, created_at"
+ORDER_ITEM_COLUMNS = "id, order_id, menu_item_id, quantity, price_at_order"
+SALES_FIELDS = ("order_count", "revenue", "cancelled_count", "delivered_count")
+ITEM_FIELDS = ("quantity", "revenue")
+
+
+def bucket_start(moment: datetime, granularity: str, utc_offset_hours: float = DEFAULT_ANALYTICS_UTC_OFFSET_HOURS) -> datetime:
+    """Début (UTC) de la tranche locale contenant `moment`."""
+    size, offset = GRANULARITIES[granularity], int(utc_offset_hours * 3600)
+    epoch = int(moment.timestamp())
+    return datetime.fromtimestamp((epoch + offset) // size * size - offset, tz=timezone.utc)
+
+
+def status_contribution(status: str) -> Tuple[int, int, int]:
+    """(comptée dans les ventes, annulée, livrée) pour une commande dans ce statut."""
+    active = int(status not in INACTIVE_STATUSES)
+    return active, 1 - active, int(status == "delivered")
+
+
+def aggregate_rollups(
+    orders: Dict[str, np.ndarray],
+    items: Dict[str, np.ndarray],
+    granularity: str,
+    utc_offset_hours: float = DEFAULT_ANALYTICS_UTC_OFFSET_HOURS,
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """Cumuls d'une granularité à partir des colonnes des commandes et des articles.
+
+    `orders` : id, restaurant_id, created_epoch (secondes), total_amount, active, cancelled,
+    delivered (booléens) ; `items` : order_id, menu_item_id, quantity, price_at_order.
+    Renvoie les colonnes des lignes de sales_rollups et de item_sales_rollups (bucket en secondes).
+    """
+    size, offset = GRANULARITIES[granularity], int(utc_offset_hours * 3600)
+    slot = (orders["created_epoch"] + offset) // size  # numéro de tranche locale, < 2^24 pour des heures
+    order_keys, order_group = np.unique(orders["restaurant_id"] * (1 << 24) + slot, return_inverse=True)
+    groups = len(order_keys)
+    active = orders["active"]
+    sales = {
+        "restaurant_id": order_keys >> 24,
+        "bucket": (order_keys & ((1 << 24) - 1)) * size - offset,
+        "order_count": np.bincount(order_group, weights=active, minlength=groups).astype(np.int64),
+        "revenue": np.bincount(order_group, weights=np.where(active, orders["total_amount"], 0.0), minlength=groups),
+        "cancelled_count": np.bincount(order_group, weights=orders["cancelled"], minlength=groups).astype(np.int64),
+        "delivered_count": np.bincount(order_group, weights=orders["delivered"], minlength=groups).astype(np.int64),
+    }
+
+    # Articles : rattachés à leur commande (recherche dichotomique sur les id triés), hors commandes annulées
+    by_id = np.argsort(orders["id"], kind="stable")
+    sorted_ids = orders["id"][by_id]
+    position = np.minimum(np.searchsorted(sorted_ids, items["order_id"]), max(0, len(sorted_ids) - 1))
+    found = (sorted_ids[position] == items["order_id"]) if len(sorted_ids) else np.zeros(len(items["order_id"]), bool)
+    order_index = by_id[position[found]]
+    kept = active[order_index]
+    order_index = order_index[kept]
+    menu_item_id = items["menu_item_id"][found][kept]
+    quantity = items["quantity"][found][kept]
+    line_revenue = quantity * items["price_at_order"][found][kept]
+    stride = int(menu_item_id.max(initial=0)) + 1
+    item_keys, item_group = np.unique(order_group[order_index] * stride + menu_item_id, return_inverse=True)
+    parent = item_keys // stride  # ligne de sales_rollups de la tranche
+    item_rows = {
+        "restaurant_id": sales["restaurant_id"][parent],
+        "bucket": sales["bucket"][parent],
+        "menu_item_id": item_keys % stride,
+        "quantity": np.bincount(item_group, weights=quantity, minlength=len(item_keys)).astype(np.int64),
+        "revenue": np.bincount(item_group, weights=line_revenue, minlength=len(item_keys)),
+    }
+    return sales, item_rows
+
+
+def _iso(epoch: int) -> str:
+    return datetime.fromtimestamp(int(epoch), tz=timezone.utc).isoformat()
+
+
+def _rows(columns: Dict[str, np.ndarray], granularity: str, updated_at: str) -> Iterable[Dict[str, Any]]:
+    names = list(columns)
+    for values in zip(*(columns[name].tolist() for name in names)):
+        row = dict(zip(names, values))
+        row["bucket"] = _iso(row["bucket"])
+        row["granularity"] = granularity
+        row["updated_at"] = updated_at
+        yield row
+
+
+def _concat_columns(pages: Dict[str, List[np.ndarray]], dtypes: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    # Pages d'une colonne mises bout à bout ; table vide : tableau vide du bon type (float64 par défaut)
+    return {
+        name: np.concatenate(arrays) if arrays else np.array([], dtypes.get(name, np.float64))
+        for name, arrays in pages.items()
+    }
+
+
+class AnalyticsService:
+    def __init__(self, repository=None, utc_offset_hours: float = DEFAULT_ANALYTICS_UTC_OFFSET_HOURS):
+        self.db = repository
+        self.utc_offset_hours = utc_offset_hours
+        # (restaurant_id, granularité, début de tranche ISO) -> deltas SALES_FIELDS
+        self._sales: Dict[Tuple[int, str, str], List[float]] = {}
+        # (restaurant_id, granularité, début de tranche ISO, menu_item_id) -> deltas ITEM_FIELDS
+        self._items: Dict[Tuple[int, str, str, int], List[float]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.last_flush_rows = 0
+        self.last_rebuild: Optional[Dict[str, Any]] = None
+
+    # --- Mise à jour incrémentale ---
+    def _add(self, order: Dict[str, Any], old_status: Optional[str]) -> None:
+        new = status_contribution(order["status"])
+        old = status_contribution(old_status) if old_status is not None else (0, 0, 0)
+        if new == old:
+            return
+        created_at = parse_timestamp(order["created_at"])
+        sign = new[0] - old[0]  # +1 : entre dans les ventes, -1 : en sort
+        delta = (sign, sign * (order.get("total_amount") or 0.0), new[1] - old[1], new[2] - old[2])
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(created_at, granularity, self.utc_offset_hours).isoformat()
+            pending = self._sales.setdefault((order["restaurant_id"], granularity, bucket), [0, 0.0, 0, 0])
+            for field, value in enumerate(delta):
+                pending[field] += value
+            if not sign:
+                continue
+            for item in order.get("items") or []:
+                key = (order["restaurant_id"], granularity, bucket, item["menu_item_id"])
+                pending_item = self._items.setdefault(key, [0, 0.0])
+                pending_item[0] += sign * item["quantity"]
+                pending_item[1] += sign * item["quantity"] * item["price_at_order"]
+
+    def record_order(self, order: Dict[str, Any]) -> None:
+        """Commande créée (avec ses articles)."""
+        self._add(order, None)
+
+    def record_status_change(self, order: Dict[str, Any], old_status: str) -> None:
+        """Commande (avec ses articles) passée de `old_status` à order["status"]."""
+        if old_status != order["status"]:
+            self._add(order, old_status)
+
+    async def flush(self) -> int:
+        if not self._sales and not self._items:
+            return 0
+        sales, self._sales = self._sales, {}
+        items, self._items = self._items, {}
+        # Clés triées : deux workers qui envoient les mêmes tranches les verrouillent dans le même ordre
+        params = {
+            "p_sales": [
+                {"restaurant_id": key[0], "granularity": key[1], "bucket": key[2], **dict(zip(SALES_FIELDS, values))}
+                for key, values in sorted(sales.items()) if any(values)
+            ],
+            "p_items": [
+                {"restaurant_id": key[0], "granularity": key[1], "bucket": key[2], "menu_item_id": key[3], **dict(zip(ITEM_FIELDS, values))}
+                for key, values in sorted(items.items()) if any(values)
+            ],
+        }
+        try:
+            await self.db.rpc("apply_sales_deltas", params)
+        except Exception:
+            # Réintégrés aux deltas arrivés entre-temps, renvoyés à la prochaine sauvegarde
+            for pending, failed in ((self._sales, sales), (self._items, items)):
+                for key, values in failed.items():
+                    current = pending.setdefault(key, [0] * len(values))
+                    for field, value in enumerate(values):
+                        current[field] += value
+            raise
+        self.flushes += 1
+        self.last_flush_rows = len(params["p_sales"]) + len(params["p_items"])
+        return self.last_flush_rows
+
+    def start(self, flush_interval: float = DEFAULT_ANALYTICS_FLUSH_SECONDS) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop(flush_interval))
+
+    async def _flush_loop(self, flush_interval: float) -> None:
+        while True:
+            await asyncio.sleep(flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Échec de l'envoi des cumuls de ventes: %s", e, exc_info=True)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.db:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Échec de l'envoi des cumuls de ventes à l'arrêt: %s", e, exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_sales_buckets": len(self._sales),
+            "pending_item_buckets": len(self._items),
+            "flushes": self.flushes,
+            "last_flush_rows": self.last_flush_rows,
+            "last_rebuild": self.last_rebuild,
+        }
+
+    # --- Lectures ---
+    async def sales(self, granularity: str, start: datetime, end: datetime, restaurant_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        return await self.db.rpc("analytics_sales", {
+            "p_restaurant_id": restaurant_id, "p_granularity": granularity,
+            "p_from": bucket_start(start, granularity, self.utc_offset_hours).isoformat(), "p_to": end.isoformat(),
+        }) or []
+
+    async def top_items(self, granularity: str, start: datetime, end: datetime, restaurant_id: Optional[int] = None, limit: int = DEFAULT_TOP_ITEMS_LIMIT) -> List[Dict[str, Any]]:
+        return await self.db.rpc("analytics_top_items", {
+            "p_restaurant_id": restaurant_id, "p_granularity": granularity,
+            "p_from": bucket_start(start, granularity, self.utc_offset_hours).isoformat(), "p_to": end.isoformat(), "p_limit": limit,
+        }) or []
+
+    # --- Reconstruction complète ---
+    async def _load_columns(self, page_size: int) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        # Une page convertie en tableaux numpy à la fois : pas de liste de dictionnaires pour toute la table
+        order_pages: Dict[str, List[np.ndarray]] = {name: [] for name in ("id", "restaurant_id", "created_epoch", "total_amount", "active", "cancelled", "delivered")}
+        async for page in self.db.iter_pages("orders", ORDER_COLUMNS, page_size):
+            statuses = np.array([row["status"] or "pending" for row in page])
+            inactive = np.isin(statuses, INACTIVE_STATUSES)
+            order_pages["id"].append(np.fromiter((row["id"] for row in page), np.int64, len(page)))
+            order_pages["restaurant_id"].append(np.fromiter((row["restaurant_id"] for row in page), np.int64, len(page)))
+            order_pages["created_epoch"].append(np.fromiter((parse_timestamp(row["created_at"]).timestamp() for row in page), np.float64, len(page)).astype(np.int64))
+            order_pages["total_amount"].append(np.fromiter((row["total_amount"] or 0.0 for row in page), np.float64, len(page)))
+            order_pages["active"].append(~inactive)
+            order_pages["cancelled"].append(inactive)
+            order_pages["delivered"].append(statuses == "delivered")
+        item_pages: Dict[str, List[np.ndarray]] = {name: [] for name in ("order_id", "menu_item_id", "quantity", "price_at_order")}
+        async for page in self.db.iter_pages("order_items", ORDER_ITEM_COLUMNS, page_size):
+            for name, dtype in (("order_id", np.int64), ("menu_item_id", np.int64), ("quantity", np.int64), ("price_at_order", np.float64)):
+                item_pages[name].append(np.fromiter((row[name] for row in page), dtype, len(page)))
+        empty = {
+            "id": np.int64,
+            "restaurant_id": np.int64,
+            "created_epoch": np.int64,
+            "order_id": np.int64,
+            "menu_item_id": np.int64,
+            "quantity": np.int64,
+            "active": bool,
+            "cancelled": bool,
+            "delivered": bool,
+        }
+        return _concat_columns(order_pages, empty), _concat_columns(item_pages, empty)
+
+    async def rebuild(self, page_size: int = 1000, chunk_size: int = REBUILD_CHUNK_SIZE) -> Dict[str, Any]:
+        started = time.perf_counter()
+        rebuild_started_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        orders, items = await self._load_columns(page_size)
+        loaded = time.perf_counter()
+        report: Dict[str, Any] = {"orders": len(orders["id"]), "order_items": len(items["order_id"]), "sales_rows": 0, "item_rows": 0}
+        aggregated = {granularity: aggregate_rollups(orders, items, granularity, self.utc_offset_hours) for granularity in GRANULARITIES}
+        computed = time.perf_counter()
+        updated_at = datetime.now(timezone.utc).isoformat()
+        for granularity, (sales, item_rows) in aggregated.items():
+            for table, columns, on_conflict, counter in (
+                ("sales_rollups", sales, "restaurant_id,granularity,bucket", "sales_rows"),
+                ("item_sales_rollups", item_rows, "restaurant_id,granularity,bucket,menu_item_id", "item_rows"),
+            ):
+                chunk: List[Dict[str, Any]] = []
+                for row in _rows(columns, granularity, updated_at):
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        await self.db.upsert(table, chunk, on_conflict=on_conflict)
+                        report[counter] += len(chunk)
+                        chunk = []
+                if chunk:
+                    await self.db.upsert(table, chunk, on_conflict=on_conflict)
+                    report[counter] += len(chunk)
+        # Tranches qui n'ont plus de commande (non réécrites par cette reconstruction)
+        report["pruned_rows"] = await self.db.rpc("prune_sales_rollups", {"p_before": rebuild_started_at.isoformat()}) or 0
+        report["timings_ms"] = {
+            "load": round((loaded - started) * 1000, 1),
+            "aggregate": round((computed - loaded) * 1000, 1),
+            "write": round((time.perf_counter() - computed) * 1000, 1),
+        }
+        self.last_rebuild = {**report, "finished_at": datetime.now(timezone.utc).isoformat()}
+        logger.info("Cumuls de ventes reconstruits: %s commandes, %s + %s lignes", report["orders"], report["sales_rows"], report["item_rows"])
+        return report
@@ -0,0 +1,174 @@
+"""Statistiques de ventes : cumuls pré-agrégés contre agrégation côté client des commandes.
+
+Remplit le faux Supabase avec N commandes réparties sur 60 jours (articles, annulations),
+puis compare, pour le chiffre d'affaires journalier et les plats les plus vendus d'un mois :
+- la méthode actuelle du tableau de bord : toutes les pages de GET /api/orders (avec articles),
+  agrégées côté client ;
+- GET /api/analytics/sales et /api/analytics/top-items sur les cumuls.
+Mesure aussi la reconstruction (POST /api/analytics/rebuild : chargement, agrégation numpy,
+écriture), vérifie qu'elle donne les mêmes totaux que l'agrégation naïve, puis que des
+commandes créées et annulées par l'API mettent les cumuls à jour à l'identique.
+
+    python -m ChopExpress.backend.benchmarks.bench_analytics --orders 20000 --latency-ms 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.analytics import INACTIVE_STATUSES, bucket_start  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.repository import MAX_PAGE_SIZE, create_repository  # noqa: E402
+
+RESTAURANTS = 20
+ITEMS_PER_RESTAURANT = 15
+DAYS = 60
+STATUSES = ["delivered"] * 8 + ["cancelled", "pending"]
+NEW_ORDERS = 200
+
+
+def _seed(fake: FakePostgrest, orders: int, seed: int) -> None:
+    rng = random.Random(seed)
+    fake.seed("users", [{"phone_number": f"+2376{i:08d}"} for i in range(100)])
+    fake.seed("restaurants", [{"name": f"Restaurant {i}", "is_active": True} for i in range(RESTAURANTS)])
+    fake.seed("menu_items", [
+        {"restaurant_id": r, "name": f"Plat {r}-{i}", "price": float(rng.randrange(500, 6000, 100))}
+        for r in range(1, RESTAURANTS + 1) for i in range(ITEMS_PER_RESTAURANT)
+    ])
+    prices = {item["id"]: item["price"] for item in fake.tables["menu_items"]}
+    start = datetime.now(timezone.utc) - timedelta(days=DAYS)
+    order_rows, item_rows = [], []
+    for order_id in range(1, orders + 1):
+        restaurant_id = rng.randint(1, RESTAURANTS)
+        lines = [((restaurant_id - 1) * ITEMS_PER_RESTAURANT + rng.randint(1, ITEMS_PER_RESTAURANT), rng.randint(1, 3)) for _ in range(rng.randint(1, 4))]
+        created_at = (start + timedelta(seconds=rng.uniform(0, DAYS * 86400))).isoformat()
+        order_rows.append({
+            "id": order_id, "customer_id": rng.randint(1, 100), "restaurant_id": restaurant_id, "status": rng.choice(STATUSES),
+            "total_amount": sum(prices[item_id] * quantity for item_id, quantity in lines), "created_at": created_at, "updated_at": created_at,
+        })
+        item_rows.extend({"order_id": order_id, "menu_item_id": item_id, "quantity": quantity, "price_at_order": prices[item_id]} for item_id, quantity in lines)
+    fake.seed("orders", order_rows)
+    fake.seed("order_items", item_rows)
+
+
+def _naive(orders, granularity: str, start: datetime, end: datetime):
+    # Agrégation côté client, comme le tableau de bord aujourd'hui
+    revenue, counts, quantities = defaultdict(float), defaultdict(int), defaultdict(int)
+    for order in orders:
+        created_at = datetime.fromisoformat(order["created_at"])
+        created_at = created_at if created_at.tzinfo else created_at.replace(tzinfo=timezone.utc)
+        if order["status"] in INACTIVE_STATUSES or not bucket_start(start, granularity) <= created_at < end:
+            continue
+        bucket = bucket_start(created_at, granularity).isoformat()
+        revenue[bucket] += order["total_amount"]
+        counts[bucket] += 1
+        for item in order["items"]:
+            quantities[item["menu_item_id"]] += item["quantity"]
+    return {"order_count": sum(counts.values()), "revenue": sum(revenue.values()), "buckets": len(counts),
+            "top": sorted(quantities.items(), key=lambda kv: (-kv[1], kv[0]))[:10]}
+
+
+async def _client_side(client: httpx.AsyncClient, start: datetime, end: datetime):
+    orders, cursor = [], None
+    while True:
+        params = {"limit": MAX_PAGE_SIZE, **({"cursor": cursor} if cursor else {})}
+        page = _json(await client.get("/api/orders", params=params))
+        orders.extend(page["orders"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return orders, _naive(orders, "day", start, end)
+
+
+async def _rollups(client: httpx.AsyncClient, start: datetime, end: datetime):
+    period = {"granularity": "day", "date_from": start.isoformat(), "date_to": end.isoformat()}
+    sales = _json(await client.get("/api/analytics/sales", params=period))
+    top = _json(await client.get("/api/analytics/top-items", params=period))
+    return {"order_count": sales["order_count"], "revenue": sales["revenue"], "buckets": len(sales["buckets"]),
+            "top": [(item["menu_item_id"], item["quantity"]) for item in top["items"]]}
+
+
+def _json(response: httpx.Response):
+    response.raise_for_status()
+    return response.json()
+
+
+def _same(a, b) -> bool:
+    return a["order_count"] == b["order_count"] and a["buckets"] == b["buckets"] and abs(a["revenue"] - b["revenue"]) < 1e-6 * max(1.0, a["revenue"]) \
+        and [q for _, q in a["top"]] == [q for _, q in b["top"]]
+
+
+async def run(orders: int, latency: float, seed: int) -> int:
+    fake = FakePostgrest(latency=latency)
+    _seed(fake, orders, seed)
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    main.analytics.db = main.db
+    end = datetime.now(timezone.utc) + timedelta(minutes=1)
+    start = end - timedelta(days=30)
+    ok = True
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench", timeout=None) as client:
+        fake.reset_counters()
+        started = time.perf_counter()
+        all_orders, expected = await _client_side(client, start, end)
+        print(f"agrégation côté client   {time.perf_counter() - started:8.3f} s   requêtes Supabase {fake.query_count:5d}   "
+              f"({len(all_orders)} commandes téléchargées)")
+
+        fake.reset_counters()
+        started = time.perf_counter()
+        report = _json(await client.post("/api/analytics/rebuild"))
+        print(f"reconstruction           {time.perf_counter() - started:8.3f} s   requêtes Supabase {fake.query_count:5d}   "
+              f"({report['sales_rows']} + {report['item_rows']} lignes ; chargement {report['timings_ms']['load']:.0f} ms, "
+              f"agrégation numpy {report['timings_ms']['aggregate']:.1f} ms, écriture {report['timings_ms']['write']:.0f} ms)")
+
+        fake.reset_counters()
+        started = time.perf_counter()
+        rolled = await _rollups(client, start, end)
+        print(f"cumuls (ventes + top)    {time.perf_counter() - started:8.3f} s   requêtes Supabase {fake.query_count:5d}")
+        if not _same(expected, rolled):
+            print(f"ÉCHEC : cumuls {rolled} différents de l'agrégation {expected}")
+            ok = False
+
+        # Incrémental : commandes créées puis en partie annulées par l'API
+        rng = random.Random(seed + 1)
+        for _ in range(NEW_ORDERS):
+            restaurant_id = rng.randint(1, RESTAURANTS)
+            item_id = (restaurant_id - 1) * ITEMS_PER_RESTAURANT + rng.randint(1, ITEMS_PER_RESTAURANT)
+            created = _json(await client.post("/api/orders", params={"current_user_id": rng.randint(1, 100)},
+                                         json={"restaurant_id": restaurant_id, "items": [{"menu_item_id": item_id, "quantity": rng.randint(1, 3)}]}))
+            if rng.random() < 0.2:
+                _json(await client.delete(f"/api/orders/{created['id']}"))
+            elif rng.random() < 0.5:
+                for status in ("confirmed", "ready_for_pickup", "out_for_delivery", "delivered"):
+                    _json(await client.put(f"/api/orders/{created['id']}", json={"status": status}))
+        await main.analytics.flush()
+        all_orders, expected = await _client_side(client, start, end)
+        incremental = await _rollups(client, start, end)
+        _json(await client.post("/api/analytics/rebuild"))
+        rebuilt = await _rollups(client, start, end)
+        consistent = _same(expected, incremental) and _same(incremental, rebuilt)
+        print(f"incrémental ({NEW_ORDERS} commandes créées / annulées / livrées) : {'identique' if consistent else 'DIFFÉRENT'} de la reconstruction")
+        ok &= consistent
+    await main.db.aclose()
+    return 0 if ok else 1
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    return asyncio.run(run(args.orders, args.latency_ms / 1000, args.seed))
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,78 @@
+"""Benchmark de concurrence : client Supabase synchrone vs Repository asynchrone.
+
+Simule `GET /api/restaurants` avec une latence réseau Supabase fixe et mesure
+le débit (requêtes/s) obtenu par une seule boucle d'événements.
+
+    python -m ChopExpress.backend.benchmarks.bench_async_repository --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient
+
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest
+from ChopExpress.backend.repository import create_repository
+
+BASE_URL = "http://fake-supabase.local"
+
+
+def _seed(fake: FakePostgrest) -> None:
+    fake.seed("restaurants", [{"name": f"Restaurant {i}", "cuisine_type": "camerounaise"} for i in range(50)])
+
+
+async def _run(handler, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request():
+        async with semaphore:
+            await handler()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(total)))
+    return total / (time.perf_counter() - started)
+
+
+async def bench_blocking(fake: FakePostgrest, total: int, concurrency: int) -> float:
+    # Avant : appel synchrone `.execute()` directement dans un handler async
+    client = SyncPostgrestClient(f"{BASE_URL}/rest/v1")
+    client.session = SyncClient(base_url=f"{BASE_URL}/rest/v1", headers=client.session.headers, transport=fake.sync_transport())
+
+    async def handler():
+        client.table("restaurants").select("*").eq("is_active", True).execute()
+
+    return await _run(handler, total, concurrency)
+
+
+async def bench_repository(fake: FakePostgrest, total: int, concurrency: int) -> float:
+    # Après : Repository asynchrone avec pool httpx partagé
+    db = create_repository(BASE_URL, "bench-key", max_connections=concurrency, transport=fake.async_transport())
+
+    async def handler():
+        await db.select_many("restaurants", is_active=True)
+
+    try:
+        return await _run(handler, total, concurrency)
+    finally:
+        await db.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    fake = FakePostgrest(latency=args.latency_ms / 1000)
+    _seed(fake)
+    before = asyncio.run(bench_blocking(fake, args.requests, args.concurrency))
+    after = asyncio.run(bench_repository(fake, args.requests, args.concurrency))
+    print(f"Latence Supabase simulée : {args.latency_ms:.0f} ms, concurrence : {args.concurrency}")
+    print(f"  client synchrone (avant) : {before:8.1f} req/s")
+    print(f"  Repository async (après) : {after:8.1f} req/s  (x{after / before:.1f})")
+
+
+if __name__ == "__main__":
+    main()
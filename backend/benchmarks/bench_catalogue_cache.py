@@ -0,0 +1,74 @@
+"""Lectures du catalogue avec et sans cache mémoire (TTL + LRU).
+
+Rejoue un trafic de lecture `GET /api/restaurants/{id}/menu-items` (quelques
+restaurants populaires, loi de puissance) entrecoupé de mises à jour de menu, puis
+affiche le nombre de requêtes Supabase, la latence moyenne et le taux de hits.
+
+    python -m ChopExpress.backend.benchmarks.bench_catalogue_cache --reads 2000 --write-every 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.cache import TTLCache  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+RESTAURANTS = 100
+ITEMS_PER_MENU = 20
+
+
+def _seed(fake: FakePostgrest) -> None:
+    fake.seed("restaurants", [{"name": f"Restaurant {i}", "is_active": True} for i in range(RESTAURANTS)])
+    fake.seed("menu_items", [
+        {"restaurant_id": r + 1, "name": f"Plat {i}", "price": 1500.0, "is_available": True}
+        for r in range(RESTAURANTS) for i in range(ITEMS_PER_MENU)
+    ])
+
+
+async def _run(cache_entries: int, reads: int, write_every: int, latency: float) -> dict:
+    fake = FakePostgrest(latency=latency)
+    _seed(fake)
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    # max_entries=0 : chaque entrée est évincée aussitôt stockée, donc aucune lecture ne touche le cache
+    main.catalogue_cache = TTLCache(max_entries=cache_entries, ttl=300)
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(RESTAURANTS)]
+    started = time.perf_counter()
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        for i in range(reads):
+            restaurant_id = rng.choices(range(1, RESTAURANTS + 1), weights)[0]
+            (await client.get(f"/api/restaurants/{restaurant_id}/menu-items")).raise_for_status()
+            if write_every and i % write_every == write_every - 1:
+                item_id = (restaurant_id - 1) * ITEMS_PER_MENU + 1
+                (await client.put(f"/api/menu-items/{item_id}", json={"price": 1500.0 + i})).raise_for_status()
+    elapsed = time.perf_counter() - started
+    await main.db.aclose()
+    return {"queries": fake.query_count, "avg_ms": elapsed / reads * 1000, **main.catalogue_cache.stats()}
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--write-every", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for label, entries in (("sans cache", 0), ("cache (1000 entrées)", 1000)):
+        result = asyncio.run(_run(entries, args.reads, args.write_every, args.latency_ms / 1000))
+        print(
+            f"{label:<22} requêtes Supabase {result['queries']:6d}   latence moy. {result['avg_ms']:6.2f} ms   "
+            f"hits {result['hits']:5d} / misses {result['misses']:5d} (ratio {result['hit_ratio']:.2f})"
+        )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,173 @@
+"""Précision et coût de l'heure de livraison estimée (eta.py) sur un historique synthétique.
+
+Génère des semaines de commandes à Douala : temps de préparation propre à chaque restaurant
+(loi log-normale, certains restaurants ralentissent au fil des semaines), attente du livreur
+et allure de trajet propres à chaque zone, plus lentes aux heures de pointe. Les événements
+(création, confirmation, prête, récupérée, livrée) sont rejoués dans l'ordre chronologique :
+chaque création reçoit une estimation, chaque changement de statut nourrit les statistiques,
+comme le font POST et PUT /api/orders. Compare l'erreur des estimations (sur la
+seconde moitié de l'historique) à un délai fixe de 45 min et à la moyenne globale des
+livraisons passées, et mesure le coût par appel.
+
+    python -m ChopExpress.backend.benchmarks.bench_eta --orders 50000 --restaurants 200
+"""
+import argparse
+import heapq
+import math
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from ChopExpress.backend.eta import STATUS_TIMESTAMP_COLUMNS, EtaService, zone_key
+from ChopExpress.backend.geo import METERS_PER_DEGREE, haversine_m
+
+CITY = (4.05, 9.70)  # Douala
+CITY_SPREAD_M = 4000
+FIXED_ETA_MINUTES = 45
+# Heures de commande (midi et soir plus chargés) et ralentissement des trajets aux heures de pointe
+HOUR_WEIGHTS = [0.2] * 7 + [0.5, 0.8, 0.8, 1.0, 2.0, 3.0, 2.5, 1.0, 0.8, 0.8, 1.2, 2.0, 3.0, 2.5, 1.5, 0.8, 0.4]
+RUSH_HOURS = {12, 13, 18, 19, 20}
+RUSH_FACTOR = 1.4
+
+
+def _offset(rng: random.Random, lat: float, lng: float, distance_m: float) -> Tuple[float, float]:
+    angle = rng.uniform(0, 2 * math.pi)
+    return (lat + distance_m * math.cos(angle) / METERS_PER_DEGREE,
+            lng + distance_m * math.sin(angle) / (METERS_PER_DEGREE * math.cos(math.radians(lat))))
+
+
+def generate_history(orders: int, restaurants: int, days: int, seed: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Restaurants et commandes avec leurs horodatages réels, triées par création."""
+    rng = random.Random(seed)
+    places = []
+    for restaurant_id in range(1, restaurants + 1):
+        lat, lng = _offset(rng, *CITY, abs(rng.gauss(0, CITY_SPREAD_M)))
+        places.append({
+            "id": restaurant_id, "latitude": lat, "longitude": lng,
+            "confirm_s": rng.uniform(60, 420),
+            "prep_s": rng.lognormvariate(math.log(1100), 0.4),
+            # Un restaurant sur cinq ralentit régulièrement (jusqu'à +50 % sur la période)
+            "drift": rng.uniform(0.2, 0.5) if rng.random() < 0.2 else 0.0,
+        })
+    zone_pace: Dict[str, float] = {}
+    zone_wait: Dict[str, float] = {}
+    popularity = [1 / rank for rank in range(1, restaurants + 1)]
+    start = datetime(2026, 9, 1, tzinfo=timezone.utc)
+    history = []
+    for order_id, place in enumerate(rng.choices(places, popularity, k=orders), start=1):
+        day = rng.randrange(days)
+        hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+        created = start + timedelta(days=day, hours=hour, seconds=rng.uniform(0, 3600))
+        lat, lng = _offset(rng, place["latitude"], place["longitude"], rng.uniform(500, 6000))
+        pickup_zone, delivery_zone = zone_key(place["latitude"], place["longitude"]), zone_key(lat, lng)
+        wait = zone_wait.setdefault(pickup_zone, rng.uniform(180, 900))
+        pace = zone_pace.setdefault(delivery_zone, rng.uniform(130, 320))
+        rush = RUSH_FACTOR if hour in RUSH_HOURS else 1.0
+        trip_km = max(0.5, haversine_m(place["latitude"], place["longitude"], lat, lng) / 1000)
+        durations = (
+            place["confirm_s"] * rng.lognormvariate(0, 0.5),
+            place["prep_s"] * (1 + place["drift"] * day / days) * rng.lognormvariate(0, 0.3),
+            wait * rush * rng.lognormvariate(0, 0.5),
+            pace * trip_km * rush * rng.lognormvariate(0, 0.2),
+        )
+        moments = [created]
+        for seconds in durations:
+            moments.append(moments[-1] + timedelta(seconds=seconds))
+        history.append({
+            "id": order_id, "restaurant_id": place["id"], "delivery_latitude": lat, "delivery_longitude": lng,
+            "moments": moments,
+        })
+    history.sort(key=lambda order: order["moments"][0])
+    return places, history
+
+
+def replay(places: List[Dict[str, Any]], history: List[Dict[str, Any]], alpha: float, prior_weight: float) -> Dict[str, Any]:
+    eta = EtaService(alpha=alpha, prior_weight=prior_weight)
+    for place in places:
+        eta.set_restaurant(place)
+    statuses = ("confirmed", "ready_for_pickup", "out_for_delivery", "delivered")
+    events: List[Tuple[datetime, int, int]] = []  # (instant, id, étape) ; étape 0 = création
+    by_id = {order["id"]: order for order in history}
+    for order in history:
+        for step, moment in enumerate(order["moments"]):
+            events.append((moment, order["id"], step))
+    heapq.heapify(events)
+
+    errors: Dict[str, List[float]] = {"eta": [], "fixe 45 min": [], "moyenne globale": []}
+    evaluated_from = history[len(history) // 2]["moments"][0]
+    total_sum, total_count = 0.0, 0
+    estimate_ns, transition_ns = 0, 0
+    rows: Dict[int, Dict[str, Any]] = {}
+    while events:
+        moment, order_id, step = heapq.heappop(events)
+        order = by_id[order_id]
+        if step == 0:
+            started = time.perf_counter_ns()
+            predicted = eta.estimate(order["restaurant_id"], order["delivery_latitude"], order["delivery_longitude"], now=moment)
+            estimate_ns += time.perf_counter_ns() - started
+            rows[order_id] = {
+                "id": order_id, "status": "pending", "restaurant_id": order["restaurant_id"],
+                "delivery_latitude": order["delivery_latitude"], "delivery_longitude": order["delivery_longitude"],
+                "created_at": moment.isoformat(),
+            }
+            if moment >= evaluated_from:
+                actual = (order["moments"][-1] - moment).total_seconds()
+                errors["eta"].append((predicted - moment).total_seconds() - actual)
+                errors["fixe 45 min"].append(FIXED_ETA_MINUTES * 60 - actual)
+                errors["moyenne globale"].append((total_sum / total_count if total_count else FIXED_ETA_MINUTES * 60) - actual)
+            continue
+        row, status = rows[order_id], statuses[step - 1]
+        # Ce qu'écrit update_order : le statut et son horodatage
+        row.update({STATUS_TIMESTAMP_COLUMNS[status]: moment.isoformat()}, status=status)
+        started = time.perf_counter_ns()
+        eta.record_transition(row)
+        transition_ns += time.perf_counter_ns() - started
+        if status == "delivered":
+            total_sum += (moment - order["moments"][0]).total_seconds()
+            total_count += 1
+            del rows[order_id]
+    return {
+        "errors": errors,
+        "estimate_us": estimate_ns / len(history) / 1000,
+        "transition_us": transition_ns / (len(history) * len(statuses)) / 1000,
+        "stats": eta.stats(),
+    }
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--restaurants", type=int, default=200)
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--prior-weight", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    places, history = generate_history(args.orders, args.restaurants, args.days, args.seed)
+    result = replay(places, history, args.alpha, args.prior_weight)
+    evaluated = len(result["errors"]["eta"])
+    print(f"historique : {args.orders} commandes, {args.restaurants} restaurants, {args.days} jours ; évaluation sur les {evaluated} dernières")
+    print(f"{'méthode':<17} {'erreur moy.':>11} {'biais':>8} {'P90':>8} {'à ±10 min':>10}")
+    summary = {}
+    for method, errors in result["errors"].items():
+        absolute = sorted(abs(error) / 60 for error in errors)
+        summary[method] = statistics.fmean(absolute)
+        print(
+            f"{method:<17} {summary[method]:8.1f} min {statistics.fmean(errors) / 60:+5.1f} min "
+            f"{absolute[int(len(absolute) * 0.9)]:5.1f} min {sum(e <= 10 for e in absolute) / len(absolute):9.0%}"
+        )
+    print(f"coût : estimate() {result['estimate_us']:.1f} µs, record_transition() {result['transition_us']:.1f} µs par appel")
+    phases = result["stats"]["phases"]
+    print("statistiques :", ", ".join(f"{phase} {entry['keys']} clés" for phase, entry in sorted(phases.items())))
+    if summary["eta"] >= min(summary["fixe 45 min"], summary["moyenne globale"]):
+        print("ÉCHEC : l'estimation n'est pas meilleure que les références")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
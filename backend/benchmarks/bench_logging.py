@@ -0,0 +1,102 @@
+"""Logs du webhook : f-strings + StreamHandler synchrone (avant) vs logging_config (file, paresseux, échantillonné).
+
+Rejoue N webhooks WhatsApp avec les appels de log du chemin webhook -> bot, vers une
+sortie lente (chaque écriture prend `--write-delay` secondes, comme un stdout redirigé
+vers un disque ou un pipe saturé). Mesure le temps passé dans la boucle d'événements
+par webhook, le volume écrit et les numéros de téléphone restés en clair.
+
+    python -m ChopExpress.backend.benchmarks.bench_logging --webhooks 5000 --write-delay 0.0002
+"""
+import argparse
+import io
+import logging
+import re
+import sys
+import time
+
+from ChopExpress.backend.logging_config import configure_logging
+
+PHONE = "237690001234"
+PLAIN_PHONE_RE = re.compile(r"\b237\d{9}\b")
+
+
+class SlowStream(io.StringIO):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return super().write(text)
+
+
+def _webhook(i: int) -> dict:
+    return {"object": "whatsapp_business_account", "entry": [{"id": "1", "changes": [{"field": "messages", "value": {
+        "messaging_product": "whatsapp",
+        "metadata": {"display_phone_number": "237600000000", "phone_number_id": "1234567890"},
+        "contacts": [{"profile": {"name": "Awa"}, "wa_id": PHONE}],
+        "messages": [{"from": PHONE, "id": f"wamid.{i}", "timestamp": "1718000000", "type": "text", "text": {"body": "ndole x2 svp"}}],
+    }}]}]}
+
+
+def run_eager(logger: logging.Logger, webhooks: int) -> float:
+    # Avant : corps complet en INFO et f-strings formatées même quand le niveau les écarte
+    started = time.perf_counter()
+    for i in range(webhooks):
+        body = _webhook(i)
+        logger.info(f"Message WhatsApp reçu: {body}")
+        logger.info(f"Message de {PHONE}, type: text")
+        logger.info(f"Utilisateur trouvé: {i} pour le numéro {PHONE}")
+        logger.info(f"Utilisateur {i} (tél: {PHONE}) traité/créé.")
+        logger.info(f"Contenu du message: {body['entry'][0]['changes'][0]['value']['messages'][0]['text']['body']}")
+        logger.info(f"Gestion du message texte de l'utilisateur {i} ({PHONE}): 'ndole x2 svp'")
+        logger.debug(f"Détails: {body}")
+    return (time.perf_counter() - started) / webhooks * 1e6
+
+
+def run_lazy(logger: logging.Logger, webhooks: int) -> float:
+    # Après : mêmes points de log qu'aujourd'hui dans main.py
+    started = time.perf_counter()
+    for i in range(webhooks):
+        body = _webhook(i)
+        logger.debug("Webhook WhatsApp reçu: %s", body)
+        logger.info("Webhook WhatsApp reçu: %d message(s)", 1, extra={"event": "webhook.received"})
+        logger.info("Message de %s, type: %s", PHONE, "text", extra={"event": "webhook.message"})
+        logger.debug("Utilisateur trouvé: %s pour le numéro %s", i, PHONE)
+        logger.debug("Utilisateur %s (tél: %s) traité/créé.", i, PHONE)
+        logger.debug("Contenu du message: %s", "ndole x2 svp")
+        logger.debug("Gestion du message texte de l'utilisateur %s (%s): '%s'", i, PHONE, "ndole x2 svp")
+    return (time.perf_counter() - started) / webhooks * 1e6
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--webhooks", type=int, default=5000)
+    parser.add_argument("--write-delay", type=float, default=0.0002, help="durée d'une écriture sur la sortie (s)")
+    parser.add_argument("--format", choices=("text", "json"), default="json")
+    args = parser.parse_args()
+    logger = logging.getLogger("bench.webhook")
+    root = logging.getLogger()
+
+    eager_stream = SlowStream(args.write_delay)
+    handler = logging.StreamHandler(eager_stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    eager_us = run_eager(logger, args.webhooks)
+    eager_output = eager_stream.getvalue()
+
+    lazy_stream = SlowStream(args.write_delay)
+    listener = configure_logging("INFO", args.format, {"webhook.received": 10, "webhook.message": 10}, stream=lazy_stream)
+    lazy_us = run_lazy(logger, args.webhooks)
+    listener.stop()
+    lazy_output = lazy_stream.getvalue()
+
+    for label, micros, output in (("avant", eager_us, eager_output), ("après", lazy_us, lazy_output)):
+        print(f"{label} : {micros:.1f} µs par webhook dans la boucle, {len(output) / args.webhooks:.0f} octets écrits par webhook, "
+              f"{len(PLAIN_PHONE_RE.findall(output))} numéros en clair")
+    return 0 if lazy_us < eager_us and not PLAIN_PHONE_RE.findall(lazy_output) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
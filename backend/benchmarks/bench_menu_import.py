@@ -0,0 +1,147 @@
+"""Import de menu en masse contre création plat par plat, et mémoire de l'export en flux.
+
+Crée un menu de N plats par `POST /api/restaurants/{id}/menu-items` (un aller-retour
+Supabase par plat), puis par un seul `POST .../menu-items/import` CSV envoyé par morceaux
+(quelques lignes invalides glissées dans le fichier), le réimporte (mises à jour), puis
+exporte le menu en CSV et NDJSON en mesurant le pic mémoire (tracemalloc) de l'export en flux.
+
+    python -m ChopExpress.backend.benchmarks.bench_menu_import --items 5000 --latency-ms 5
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.menu_import import export_menu_items  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+BODY_CHUNK_SIZE = 64 * 1024
+INVALID_EVERY = 1000
+
+
+def _menu(items: int, price_offset: float = 0.0):
+    for i in range(items):
+        yield {
+            "name": f"Plat {i}", "description": f"Description du plat {i}, avec virgule\net retour à la ligne",
+            "price": 1500.0 + i % 50 * 100 + price_offset, "category": "Plat principal", "is_available": i % 10 != 0,
+        }
+
+
+def _csv_body(items: int, price_offset: float = 0.0) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["name", "description", "price", "category", "is_available"])
+    for i, item in enumerate(_menu(items, price_offset)):
+        # Prix illisible une ligne sur INVALID_EVERY : rapportée, sans bloquer le reste
+        price = "gratuit" if i % INVALID_EVERY == INVALID_EVERY - 1 else item["price"]
+        writer.writerow([item["name"], item["description"], price, item["category"], "oui" if item["is_available"] else "non"])
+    return buffer.getvalue().encode()
+
+
+async def _chunks(body: bytes):
+    for start in range(0, len(body), BODY_CHUNK_SIZE):
+        yield body[start:start + BODY_CHUNK_SIZE]
+
+
+def _setup(latency: float) -> FakePostgrest:
+    fake = FakePostgrest(latency=latency)
+    fake.seed("restaurants", [{"name": f"Restaurant {i}", "is_active": True} for i in range(2)])
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    return fake
+
+
+async def _one_by_one(items: int, latency: float) -> dict:
+    fake = _setup(latency)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        for item in _menu(items):
+            (await client.post("/api/restaurants/1/menu-items", json=item)).raise_for_status()
+    elapsed = time.perf_counter() - started
+    await main.db.aclose()
+    return {"seconds": elapsed, "queries": fake.query_count, "rows": len(fake.tables["menu_items"])}
+
+
+async def _bulk(items: int, latency: float) -> dict:
+    fake = _setup(latency)
+    main.MENU_IMPORT_MAX_ROWS = max(main.MENU_IMPORT_MAX_ROWS, items)
+    results = {}
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench", timeout=None) as client:
+        for label, offset in (("import", 0.0), ("réimport", 50.0)):
+            body = _csv_body(items, offset)
+            queries = fake.query_count
+            started = time.perf_counter()
+            response = await client.post("/api/restaurants/1/menu-items/import", content=_chunks(body), headers={"Content-Type": "text/csv"})
+            response.raise_for_status()
+            results[label] = {"seconds": time.perf_counter() - started, "queries": fake.query_count - queries, "report": response.json()}
+        results["rows"] = len(fake.tables["menu_items"])
+
+        for export_format in ("csv", "ndjson"):
+            tracemalloc.start()
+            started = time.perf_counter()
+            size, lines = 0, 0
+            # Générateur de l'endpoint consommé directement : le transport ASGI de httpx garderait
+            # toute la réponse en mémoire et fausserait la mesure
+            async for chunk in export_menu_items(main.db, 1, export_format):
+                size += len(chunk)
+                lines += chunk.count(b"\n")
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[export_format] = {"seconds": time.perf_counter() - started, "bytes": size, "lines": lines, "peak": peak}
+
+        # Référence : le menu entier chargé puis sérialisé d'un bloc
+        tracemalloc.start()
+        rows = await main.db.select_all("menu_items", restaurant_id=1)
+        "".join(json.dumps(row) + "\n" for row in rows).encode()
+        _, results["full_load_peak"] = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    await main.db.aclose()
+    return results
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+    expected_failures = args.items // INVALID_EVERY
+
+    single = asyncio.run(_one_by_one(args.items, latency))
+    print(f"plat par plat       {args.items:6d} plats   {single['seconds']:7.2f} s   requêtes Supabase {single['queries']:6d}")
+    bulk = asyncio.run(_bulk(args.items, latency))
+    ok = True
+    for label in ("import", "réimport"):
+        result, report = bulk[label], bulk[label]["report"]
+        print(
+            f"{label:<19} {report['rows']:6d} lignes   {result['seconds']:7.2f} s   requêtes Supabase {result['queries']:6d}   "
+            f"importées {report['imported']:6d}   en erreur {report['failed']:4d}"
+        )
+        ok &= report["imported"] == args.items - expected_failures and report["failed"] == expected_failures
+    ok &= bulk["rows"] == args.items - expected_failures  # le réimport met à jour, ne duplique pas
+    for export_format in ("csv", "ndjson"):
+        result = bulk[export_format]
+        print(
+            f"export {export_format:<12} {result['bytes'] / 1024:8.0f} Ko   {result['seconds']:7.2f} s   "
+            f"pic mémoire {result['peak'] / 1024:8.0f} Ko"
+        )
+    print(f"menu chargé entier  pic mémoire {bulk['full_load_peak'] / 1024:8.0f} Ko (référence)")
+    if not ok:
+        print(f"ÉCHEC : {args.items - expected_failures} plats et {expected_failures} erreurs attendus, {bulk['rows']} plats en base")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
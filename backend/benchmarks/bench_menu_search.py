@@ -0,0 +1,138 @@
+"""Recherche dans les menus : index inversé + trigrammes vs parcours naïf, sur un catalogue synthétique.
+
+Génère N articles (plats camerounais, variantes d'orthographe, descriptions), mesure
+la construction de l'index, la latence des requêtes tapées par les utilisateurs
+(avec accents manquants et fautes) et le rappel du plat attendu dans le top 5. Le
+parcours naïf est une référence de comparaison : il n'existait pas de recherche dans
+les menus avant l'index. Mesure enfin le plus long blocage de la boucle d'événements
+pendant une reconstruction, dans la boucle ou dans un thread (asyncio.to_thread).
+
+    python -m ChopExpress.backend.benchmarks.bench_menu_search --items 100000 --queries 500
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+from ChopExpress.backend.search import MenuSearchIndex, normalize
+
+DISHES = [
+    ("Ndolé", "Plat principal", "feuilles amères, arachides et crevettes"),
+    ("Poulet DG", "Plat principal", "poulet sauté aux plantains mûrs"),
+    ("Eru", "Plat principal", "légumes eru et waterleaf, viande fumée"),
+    ("Poisson braisé", "Grillades", "bar braisé, sauce pimentée"),
+    ("Koki", "Entrée", "gâteau de haricots à l'huile de palme"),
+    ("Achu", "Plat principal", "taro pilé, sauce jaune"),
+    ("Mbongo Tchobi", "Plat principal", "sauce noire épicée au poisson"),
+    ("Okok", "Plat principal", "feuilles d'okok aux arachides"),
+    ("Soya", "Grillades", "brochettes de boeuf épicées"),
+    ("Beignets haricots", "Petit-déjeuner", "beignets, haricots et bouillie"),
+    ("Koki corn", "Entrée", "maïs et huile de palme"),
+    ("Jus de foléré", "Boisson", "hibiscus sucré, gingembre"),
+    ("Plantains frits", "Accompagnement", "plantains mûrs frits"),
+    ("Sanga", "Plat principal", "maïs frais et feuilles de manioc"),
+    ("Kondre", "Plat principal", "plantains et viande de chèvre"),
+]
+CUISINES = ["camerounaise", "africaine", "grillades", "fast-food", "pidgin chop"]
+# (requête tapée, plat attendu)
+QUERIES = [
+    ("ndole", "Ndolé"), ("ndolle", "Ndolé"), ("poulet dg", "Poulet DG"), ("poule DG", "Poulet DG"), ("eru", "Eru"),
+    ("poisson braise", "Poisson braisé"), ("mbongo", "Mbongo Tchobi"), ("tchobi", "Mbongo Tchobi"), ("okok", "Okok"),
+    ("soja", "Soya"), ("beignet haricot", "Beignets haricots"), ("folere", "Jus de foléré"), ("plantin frit", "Plantains frits"),
+    ("kondré", "Kondre"), ("achu", "Achu"),
+]
+
+
+def _catalogue(items: int, rng: random.Random) -> tuple:
+    restaurants = [{"id": r, "name": f"Restaurant {r}", "cuisine_type": rng.choice(CUISINES)} for r in range(1, items // 30 + 2)]
+    menu_items = []
+    for item_id in range(1, items + 1):
+        name, category, description = rng.choice(DISHES)
+        suffix = rng.choice(["", " maison", " spécial", " de Mama", " grand format", " complet"])
+        menu_items.append({
+            "id": item_id, "restaurant_id": rng.randrange(1, len(restaurants) + 1), "name": name + suffix,
+            "category": category, "description": description, "price": 1500.0, "is_available": True,
+        })
+    return restaurants, menu_items
+
+
+def naive_search(menu_items: list, query: str, limit: int) -> list:
+    # Référence : sous-chaîne sur le texte normalisé de chaque article
+    needle = normalize(query)
+    return [item for item in menu_items if needle in normalize(f"{item['name']} {item['category']} {item['description']}")][:limit]
+
+
+async def _max_loop_stall(rebuild) -> float:
+    # Plus long intervalle entre deux réveils d'une tâche qui dort 1 ms pendant la reconstruction
+    stall, done = 0.0, asyncio.Event()
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stall, last = max(stall, now - last), now
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    await rebuild()
+    done.set()
+    await ticking
+    return stall * 1000
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    restaurants, menu_items = _catalogue(args.items, rng)
+    index = MenuSearchIndex()
+    started = time.perf_counter()
+    index.rebuild(restaurants, menu_items)
+    build_s = time.perf_counter() - started
+
+    queries = [rng.choice(QUERIES) for _ in range(args.queries)]
+    samples, hits = [], 0
+    for query, expected in queries:
+        started = time.perf_counter()
+        results = index.search(query, limit=5)
+        samples.append((time.perf_counter() - started) * 1000)
+        hits += any(item["name"].startswith(expected) for _, item in results)
+
+    naive_samples, naive_hits = [], 0
+    for query, expected in queries[:50]:
+        started = time.perf_counter()
+        results = naive_search(menu_items, query, 5)
+        naive_samples.append((time.perf_counter() - started) * 1000)
+        naive_hits += any(item["name"].startswith(expected) for item in results)
+
+    updated_items = menu_items[:1000]
+    started = time.perf_counter()
+    for item in updated_items:
+        index.upsert_item({**item, "description": item["description"] + " nouvelle recette"})
+    update_ms = (time.perf_counter() - started) * 1000 / len(updated_items)
+
+    print(f"{args.items} articles indexés en {build_s:.1f} s, mise à jour incrémentale {update_ms:.3f} ms par article")
+    p99 = statistics.quantiles(samples, n=100)[98]
+    print(f"  index   p50 {statistics.median(samples):7.2f} ms   p99 {p99:7.2f} ms   plat attendu dans le top 5 : {hits / len(queries):.0%}")
+    print(f"  naïf    p50 {statistics.median(naive_samples):7.2f} ms   (50 requêtes)       plat attendu dans le top 5 : {naive_hits / 50:.0%}")
+
+    async def inline():
+        MenuSearchIndex().rebuild(restaurants, menu_items)
+
+    async def threaded():
+        await asyncio.to_thread(MenuSearchIndex().rebuild, restaurants, menu_items)
+
+    print(f"  reconstruction, plus long blocage de la boucle : dans la boucle {asyncio.run(_max_loop_stall(inline)):7.1f} ms   "
+          f"asyncio.to_thread {asyncio.run(_max_loop_stall(threaded)):7.1f} ms")
+    return 0 if hits == len(queries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
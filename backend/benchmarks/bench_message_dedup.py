@@ -0,0 +1,94 @@
+"""Déduplication des messages WhatsApp : requêtes évitées et mémoire par identifiant.
+
+Rejoue un flux de messages dont une partie est relivrée (même wamid) dans
+`process_whatsapp_message`, sans puis avec déduplication, et compte les requêtes
+Supabase ; mesure ensuite la mémoire occupée par `InMemoryDedupStore`.
+
+    python -m ChopExpress.backend.benchmarks.bench_message_dedup --messages 2000 --redelivery-rate 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tracemalloc
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.message_dedup import DedupStore, InMemoryDedupStore, SupabaseDedupStore  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+
+class _NoDedup(DedupStore):
+    # Comportement avant déduplication : chaque livraison est traitée
+    async def _register(self, message_id: str) -> bool:
+        return True
+
+    async def _unregister(self, message_id: str) -> None:
+        pass
+
+
+def _deliveries(messages: int, redelivery_rate: float) -> list:
+    rng = random.Random(7)
+    stream = []
+    for n in range(messages):
+        message = {"id": f"wamid.HBgMMjM3NjkwMDAwMDAwFQIAEhggQjU{n:012d}", "from": f"2376900{n % 200:05d}", "type": "text", "text": {"body": "menu"}}
+        stream.append(message)
+        if rng.random() < redelivery_rate:
+            stream.append(message)
+    return stream
+
+
+async def _replay(store: DedupStore, stream: list) -> tuple:
+    fake = FakePostgrest()
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    if isinstance(store, SupabaseDedupStore):
+        store.db = main.db
+    main.message_dedup = store
+    for message in stream:
+        await main.process_whatsapp_message({"messages": [message]})
+    await main.db.aclose()
+    return fake.query_count, store.duplicates_dropped
+
+
+def _memory_per_entry(entries: int) -> float:
+    store = InMemoryDedupStore(max_entries=entries)
+    ids = [f"wamid.HBgMMjM3NjkwMDAwMDAwFQIAEhggQjU{n:012d}" for n in range(entries)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    async def fill():
+        for message_id in ids:
+            await store.is_duplicate(message_id)
+
+    asyncio.run(fill())
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / entries
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--redelivery-rate", type=float, default=0.3)
+    parser.add_argument("--memory-entries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    stream = _deliveries(args.messages, args.redelivery_rate)
+    redelivered = len(stream) - args.messages
+    print(f"{len(stream)} livraisons pour {args.messages} messages ({redelivered} doublons)")
+    ok = True
+    for label, store in (("sans déduplication", _NoDedup(0)), ("mémoire (LRU + TTL)", InMemoryDedupStore()), ("table Supabase", SupabaseDedupStore(None))):
+        queries, dropped = asyncio.run(_replay(store, stream))
+        print(f"  {label:<22} requêtes Supabase {queries:6d}   doublons ignorés {dropped:5d}")
+        if not isinstance(store, _NoDedup):
+            ok = ok and dropped == redelivered
+    print(f"InMemoryDedupStore : {_memory_per_entry(args.memory_entries):.0f} octets par identifiant ({args.memory_entries} entrées)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
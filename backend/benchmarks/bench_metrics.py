@@ -0,0 +1,128 @@
+"""Coût de l'instrumentation Prometheus : middleware HTTP, appels Supabase, validations Pydantic.
+
+Mesure le surcoût par requête de `PrometheusMiddleware` sur une application ASGI vide,
+le coût d'une observation Supabase et de `validate_model` face à `model_validate`, puis
+la latence de `GET /api/orders/{id}` (Supabase simulé) avec et sans le middleware.
+
+    python -m ChopExpress.backend.benchmarks.bench_metrics --iterations 100000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+import ChopExpress.backend.schemas as schemas  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.metrics import PrometheusMiddleware, observe_supabase_query, render_metrics, validate_model  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+ORDER_ROW = {
+    "id": 1, "customer_id": 1, "restaurant_id": 1, "status": "pending", "payment_status": "pending", "total_amount": 7500.0,
+    "delivery_address": "Akwa", "created_at": "2024-05-01T12:00:00+00:00", "updated_at": "2024-05-01T12:00:00+00:00",
+    "items": [{"id": i, "order_id": 1, "menu_item_id": i, "quantity": 1, "price_at_order": 2500.0} for i in range(3)],
+}
+
+
+class _Route:
+    path = "/bench/{item_id}"
+
+
+async def _empty_app(scope, receive, send) -> None:
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def bench_middleware(iterations: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def run(app) -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await app({"type": "http", "method": "GET", "path": "/bench/1"}, receive, send)
+        return (time.perf_counter() - started) / iterations * 1e6
+
+    bare = await run(_empty_app)
+    instrumented = await run(PrometheusMiddleware(_empty_app))
+    return instrumented - bare
+
+
+def bench_observation(iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        observe_supabase_query("orders", "select", "ok", 0.004)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def bench_validation(iterations: int) -> tuple:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        schemas.Order.model_validate(ORDER_ROW)
+    plain = (time.perf_counter() - started) / iterations * 1e6
+    started = time.perf_counter()
+    for _ in range(iterations):
+        validate_model(schemas.Order, ORDER_ROW)
+    timed = (time.perf_counter() - started) / iterations * 1e6
+    return plain, timed
+
+
+async def bench_endpoint(requests: int, latency: float) -> tuple:
+    fake = FakePostgrest(latency=latency)
+    fake.seed("orders", [{k: v for k, v in ORDER_ROW.items() if k != "items"}])
+    fake.seed("order_items", ORDER_ROW["items"])
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+
+    async def latencies(count: int) -> list:
+        main.app.middleware_stack = None  # reconstruit au premier appel avec user_middleware
+        durations = []
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+            for _ in range(count):
+                started = time.perf_counter()
+                (await client.get("/api/orders/1")).raise_for_status()
+                durations.append((time.perf_counter() - started) * 1000)
+        return durations
+
+    await latencies(requests // 10)  # chauffe (connexions, caches de FastAPI)
+    with_metrics = await latencies(requests)
+    instrumented = [entry for entry in main.app.user_middleware if entry.cls is PrometheusMiddleware]
+    main.app.user_middleware = [entry for entry in main.app.user_middleware if entry.cls is not PrometheusMiddleware]
+    without_metrics = await latencies(requests)
+    main.app.user_middleware = instrumented + main.app.user_middleware
+    main.app.middleware_stack = None
+    await main.db.aclose()
+    return statistics.median(with_metrics), statistics.median(without_metrics)
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0, help="latence simulée d'un aller-retour Supabase (s)")
+    args = parser.parse_args()
+
+    middleware_us = asyncio.run(bench_middleware(args.iterations))
+    print(f"PrometheusMiddleware : +{middleware_us:.1f} µs par requête")
+    print(f"observation Supabase (table, opération, résultat) : {bench_observation(args.iterations):.2f} µs")
+    plain, timed = bench_validation(args.iterations // 10)
+    print(f"validation Order (3 articles) : model_validate {plain:.1f} µs, validate_model {timed:.1f} µs")
+    with_metrics, without_metrics = asyncio.run(bench_endpoint(args.requests, args.latency))
+    print(f"GET /api/orders/{{id}} p50 : {with_metrics:.3f} ms avec le middleware, {without_metrics:.3f} ms sans")
+    body, _ = render_metrics()
+    print(f"/metrics : {len(body) / 1024:.0f} Ko")
+    return 0 if middleware_us < 50 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,74 @@
+"""Restaurants les plus proches : index en grille (GeoIndex) vs parcours complet du catalogue.
+
+Génère un catalogue synthétique concentré autour des grandes villes du Cameroun,
+compare les k plus proches renvoyés par les deux méthodes et mesure leur latence.
+
+    python -m ChopExpress.backend.benchmarks.bench_nearby --restaurants 50000 --queries 500
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from ChopExpress.backend.geo import GeoIndex, haversine_m
+
+# (latitude, longitude, poids) : Douala, Yaoundé, Bafoussam, Garoua, Bamenda
+CITIES = [(4.05, 9.70, 0.35), (3.87, 11.52, 0.35), (5.48, 10.42, 0.1), (9.30, 13.40, 0.1), (5.96, 10.15, 0.1)]
+
+
+def _catalogue(count: int, rng: random.Random) -> list:
+    points = []
+    for restaurant_id in range(1, count + 1):
+        lat, lng, _ = rng.choices(CITIES, [city[2] for city in CITIES])[0]
+        points.append((rng.gauss(lat, 0.06), rng.gauss(lng, 0.06), restaurant_id))
+    return points
+
+
+def naive_nearest(points: list, lat: float, lng: float, radius_m: float, limit: int) -> list:
+    # Avant : distance à chaque restaurant puis tri (ce que fait un client qui télécharge /api/restaurants)
+    distances = [(haversine_m(lat, lng, p_lat, p_lng), value) for p_lat, p_lng, value in points]
+    return sorted(d for d in distances if d[0] <= radius_m)[:limit]
+
+
+def _timed(fn, queries: list) -> tuple:
+    samples, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(fn(*query))
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, results
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--restaurants", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--radius-m", type=float, default=5000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    points = _catalogue(args.restaurants, rng)
+    started = time.perf_counter()
+    index = GeoIndex(points)
+    build_ms = (time.perf_counter() - started) * 1000
+    queries = []
+    for _ in range(args.queries):
+        lat, lng, _ = rng.choice(CITIES)
+        queries.append((rng.gauss(lat, 0.05), rng.gauss(lng, 0.05), args.radius_m, args.limit))
+
+    naive_samples, naive_results = _timed(lambda *q: naive_nearest(points, *q), queries)
+    index_samples, index_results = _timed(index.nearest, queries)
+    same = all([v for _, v in a] == [v for _, v in b] for a, b in zip(naive_results, index_results))
+
+    print(f"{args.restaurants} restaurants, {args.queries} requêtes (k={args.limit}, rayon {args.radius_m:.0f} m), index construit en {build_ms:.0f} ms")
+    for label, samples in (("parcours complet", naive_samples), ("GeoIndex (grille)", index_samples)):
+        p99 = statistics.quantiles(samples, n=100)[98]
+        print(f"  {label:<18} p50 {statistics.median(samples):8.3f} ms   p99 {p99:8.3f} ms")
+    print(f"  résultats identiques : {'oui' if same else 'NON'}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,80 @@
+"""Nombre de requêtes Supabase par endpoint de commandes, selon le volume.
+
+Vérifie que `GET /api/orders` (et la lecture d'une commande) font un nombre
+constant de requêtes, quel que soit le nombre de commandes en base.
+
+    python -m ChopExpress.backend.benchmarks.bench_order_loading --sizes 10 100 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+ITEMS_PER_ORDER = 3
+
+
+def _seed(fake: FakePostgrest, order_count: int) -> None:
+    fake.seed("users", [{"phone_number": "237690000000"}])
+    fake.seed("restaurants", [{"name": "Chez Mama"}])
+    fake.seed("menu_items", [{"restaurant_id": 1, "name": f"Plat {i}", "price": 1500.0} for i in range(ITEMS_PER_ORDER)])
+    orders = fake.seed("orders", [{"customer_id": 1, "restaurant_id": 1, "total_amount": 4500.0} for _ in range(order_count)])
+    fake.seed("order_items", [
+        {"order_id": order["id"], "menu_item_id": i + 1, "quantity": 1, "price_at_order": 1500.0}
+        for order in orders for i in range(ITEMS_PER_ORDER)
+    ])
+
+
+async def _measure(order_count: int) -> dict:
+    fake = FakePostgrest()
+    _seed(fake, order_count)
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    results = {}
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        for label, method, url in (
+            ("GET /api/orders", "GET", "/api/orders"),
+            ("GET /api/orders/{id}", "GET", "/api/orders/1"),
+            ("PUT /api/orders/{id}", "PUT", "/api/orders/1"),
+            ("DELETE /api/orders/{id}", "DELETE", "/api/orders/2"),
+        ):
+            fake.reset_counters()
+            started = time.perf_counter()
+            response = await client.request(method, url, json={"status": "confirmed"} if method == "PUT" else None)
+            response.raise_for_status()
+            results[label] = (fake.query_count, (time.perf_counter() - started) * 1000)
+    await main.db.aclose()
+    return results
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    query_counts = {}
+    for size in args.sizes:
+        results = asyncio.run(_measure(size))
+        print(f"{size:>6} commandes")
+        for label, (queries, elapsed_ms) in results.items():
+            print(f"    {label:<26} {queries:>3} requêtes  {elapsed_ms:8.1f} ms")
+            query_counts.setdefault(label, set()).add(queries)
+
+    growing = [label for label, counts in query_counts.items() if len(counts) > 1]
+    if growing:
+        print(f"ÉCHEC : le nombre de requêtes dépend du volume pour {', '.join(growing)}")
+        return 1
+    print("OK : nombre de requêtes constant pour tous les endpoints de commandes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
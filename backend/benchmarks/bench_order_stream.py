@@ -0,0 +1,128 @@
+"""Nouvelles commandes vers les tableaux de bord : polling de GET /api/orders vs flux SSE /api/orders/stream.
+
+Lance l'application sous uvicorn (Supabase simulé), ouvre un flux SSE par tableau de
+bord (plusieurs par restaurant), puis passe des commandes via POST /api/orders. Mesure
+le délai entre l'envoi de la commande et sa réception en cuisine, la charge Supabase
+ajoutée par les tableaux de bord, et vérifie qu'un abonné qui ne lit jamais est
+déconnecté (resync) sans ralentir les autres.
+
+    python -m ChopExpress.backend.benchmarks.bench_order_stream --restaurants 20 --dashboards 3 --orders 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+
+import httpx
+import uvicorn
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _seed(fake: FakePostgrest, restaurants: int) -> None:
+    fake.seed("users", [{"phone_number": "237690000001", "name": "Awa"}])
+    fake.seed("restaurants", [{"name": f"Restaurant {i}", "is_active": True} for i in range(restaurants)])
+    fake.seed("menu_items", [{"restaurant_id": r + 1, "name": "Ndolé", "price": 2500.0, "is_available": True} for r in range(restaurants)])
+
+
+async def _dashboard(client: httpx.AsyncClient, restaurant_id: int, received: dict, connected: asyncio.Event) -> None:
+    async with client.stream("GET", f"/api/orders/stream?restaurant_id={restaurant_id}") as response:
+        connected.set()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event == "order_created":
+                order = json.loads(line[6:])
+                assert order["restaurant_id"] == restaurant_id
+                received.setdefault(order["id"], []).append(time.perf_counter())
+
+
+async def _run(args) -> int:
+    fake = FakePostgrest()
+    _seed(fake, args.restaurants)
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    base_url = f"http://127.0.0.1:{port}"
+    dashboards = args.restaurants * args.dashboards
+    limits = httpx.Limits(max_connections=dashboards + 20)
+    received: dict = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        connected = [asyncio.Event() for _ in range(dashboards)]
+        listeners = [
+            asyncio.create_task(_dashboard(client, i % args.restaurants + 1, received, connected[i]))
+            for i in range(dashboards)
+        ]
+        await asyncio.gather(*(event.wait() for event in connected))
+        # Abonné qui ne lit jamais : sa file déborde, il est coupé sans bloquer les autres
+        stuck, _ = main.order_events.subscribe(None)
+
+        rng = random.Random(3)
+        fake.reset_counters()
+        sent = {}
+        async with httpx.AsyncClient(base_url=base_url) as orders_client:
+            for _ in range(args.orders):
+                restaurant_id = rng.randrange(1, args.restaurants + 1)
+                started = time.perf_counter()
+                response = await orders_client.post("/api/orders?current_user_id=1", json={"restaurant_id": restaurant_id, "items": [{"menu_item_id": restaurant_id, "quantity": 1}]})
+                response.raise_for_status()
+                sent[response.json()["id"]] = started
+                await asyncio.sleep(1 / args.rate)
+        await asyncio.sleep(0.2)
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        queries = fake.query_count
+        # Polling : ce que coûte une relecture de la liste par un tableau de bord (première page)
+        page = await client.get("/api/orders?restaurant_id=1")
+        page.raise_for_status()
+
+    delays = sorted((at - sent[order_id]) * 1000 for order_id, arrivals in received.items() for at in arrivals)
+    expected = args.orders * args.dashboards
+    stats = main.order_events.stats()
+    polls_per_minute = dashboards * 60 / args.poll_interval
+    print(f"polling toutes les {args.poll_interval:.0f} s : {polls_per_minute:.0f} requêtes Supabase/min, {len(page.content) * polls_per_minute / 2**20:.1f} Mo/min "
+          f"pour {dashboards} tableaux de bord, nouvelle commande vue en {args.poll_interval / 2:.1f} s en moyenne")
+    print(f"flux SSE : {len(delays)}/{expected} réceptions, délai commande -> cuisine p50 {statistics.median(delays):.1f} ms, "
+          f"p99 {delays[int(len(delays) * 0.99) - 1]:.1f} ms, max {delays[-1]:.1f} ms")
+    print(f"requêtes Supabase pendant le test : {queries} ({args.orders} commandes, aucune pour les tableaux de bord)")
+    print(f"abonné bloqué : coupé={stuck.lagged}, abonnés coupés={stats['dropped_subscribers']}, abonnés restants après déconnexion={stats['subscribers']}")
+    server.should_exit = True
+    await server_task
+    await main.db.aclose()
+    return 0 if len(delays) == expected and stuck.lagged and delays[-1] < 1000 else 1
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--restaurants", type=int, default=20)
+    parser.add_argument("--dashboards", type=int, default=3, help="tableaux de bord ouverts par restaurant")
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=50.0, help="commandes par seconde")
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    return asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,87 @@
+"""Pagination OFFSET vs curseur (keyset) sur une table synthétique d'un million de commandes.
+
+Utilise SQLite en mémoire avec le même index `(created_at, id)` que `models.Order`
+pour montrer que le coût d'une page par curseur ne dépend pas de sa profondeur.
+
+    python -m ChopExpress.backend.benchmarks.bench_pagination --rows 1000000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+PAGE_SIZE = 50
+STATUSES = ["pending", "confirmed", "preparing", "ready_for_pickup", "out_for_delivery", "delivered", "cancelled"]
+
+
+def build_table(rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, restaurant_id INTEGER, "
+        "status TEXT, total_amount REAL, created_at TEXT)"
+    )
+    start = datetime(2024, 1, 1)
+    rng = random.Random(42)
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (i, rng.randint(1, 50_000), rng.randint(1, 500), rng.choice(STATUSES), rng.uniform(1000, 20000),
+             (start + timedelta(seconds=i * 30 + rng.randint(0, 5))).isoformat())
+            for i in range(1, rows + 1)
+        ),
+    )
+    conn.execute("CREATE INDEX ix_orders_created_at_id ON orders (created_at, id)")
+    conn.commit()
+    return conn
+
+
+def offset_page(conn: sqlite3.Connection, page: int) -> list:
+    return conn.execute(
+        "SELECT * FROM orders ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", (PAGE_SIZE, page * PAGE_SIZE)
+    ).fetchall()
+
+
+def keyset_page(conn: sqlite3.Connection, cursor) -> list:
+    if cursor is None:
+        return conn.execute("SELECT * FROM orders ORDER BY created_at DESC, id DESC LIMIT ?", (PAGE_SIZE,)).fetchall()
+    # Même prédicat que les filtres PostgREST du Repository : `created_at=lte.X&or=(created_at.lt.X,id.lt.Y)`
+    return conn.execute(
+        "SELECT * FROM orders WHERE created_at <= ? AND (created_at < ? OR id < ?) "
+        "ORDER BY created_at DESC, id DESC LIMIT ?",
+        (cursor[0], cursor[0], cursor[1], PAGE_SIZE),
+    ).fetchall()
+
+
+def _timed(fn, *args, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    conn = build_table(args.rows)
+    print(f"Table de {args.rows:,} commandes générée en {time.perf_counter() - started:.1f} s")
+
+    last_page = args.rows // PAGE_SIZE - 1
+    print(f"{'page':>8} {'OFFSET (ms)':>12} {'curseur (ms)':>13}")
+    for page in (0, 100, 1_000, last_page // 2, last_page):
+        # Le curseur d'une page = (created_at, id) de la dernière ligne de la page précédente
+        cursor = None
+        if page:
+            previous = offset_page(conn, page - 1)[-1]
+            cursor = (previous[5], previous[0])
+        assert offset_page(conn, page) == keyset_page(conn, cursor)
+        print(f"{page:>8} {_timed(offset_page, conn, page):>12.3f} {_timed(keyset_page, conn, cursor):>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Sessions de conversation du bot : mémoire par session et coût d'une lecture/écriture.
+
+Remplit `InMemorySessionStore` avec N sessions réalistes (recherche affichée, panier
+de 1 à 3 plats, adresse en attente) et mesure la mémoire par session avec
+tracemalloc, comparée à des sessions stockées en dicts imbriqués. Vérifie ensuite
+que `max_entries` borne la mémoire quand le nombre de numéros le dépasse.
+
+    python -m ChopExpress.backend.benchmarks.bench_sessions --sessions 300000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+
+from ChopExpress.backend.sessions import STEP_AWAITING_ADDRESS, STEP_CHOOSING_ITEM, ConversationSession, InMemorySessionStore
+
+
+def _phone(i: int) -> str:
+    return f"2376{i:08d}"
+
+
+def _fill_session(session: ConversationSession, rng: random.Random) -> None:
+    kind = rng.random()
+    session.show_results(rng.randrange(1, 100_000) for _ in range(5))
+    if kind < 0.6:
+        return
+    restaurant_id = rng.randrange(1, 3000)
+    for _ in range(rng.randint(1, 3)):
+        session.add_item(rng.randrange(1, 100_000), restaurant_id, rng.randint(1, 3))
+    if kind > 0.9:
+        session.step = STEP_AWAITING_ADDRESS
+
+
+def _naive_session(session: ConversationSession) -> dict:
+    # Avant : état de conversation en dicts / listes JSON, comme on le stockerait naïvement
+    return {
+        "phone_number": session.phone_number,
+        "step": session.step,
+        "restaurant_id": session.restaurant_id,
+        "cart": [{"menu_item_id": item_id, "quantity": quantity} for item_id, quantity in (session.cart or {}).items()],
+        "last_results": list(session.choices or ()),
+        "updated_at": time.time(),
+    }
+
+
+async def _fill(store: InMemorySessionStore, count: int, rng: random.Random) -> list:
+    sessions = []
+    for i in range(count):
+        session = ConversationSession(_phone(i))
+        _fill_session(session, rng)
+        await store.save(session)
+        sessions.append(session)
+    return sessions
+
+
+def measure(count: int) -> tuple:
+    rng = random.Random(7)
+    tracemalloc.start()
+    store = InMemorySessionStore(max_entries=count)
+    sessions = asyncio.run(_fill(store, count, rng))
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    naive = {session.phone_number: _naive_session(session) for session in sessions}
+    naive_bytes = tracemalloc.get_traced_memory()[0] - store_bytes
+    tracemalloc.stop()
+    del naive
+    # Les numéros (clés) sont partagés entre les deux structures : comptés une seule fois, côté store
+    return store, store_bytes / count, naive_bytes / count
+
+
+async def bench_operations(store: InMemorySessionStore, count: int, operations: int) -> float:
+    rng = random.Random(11)
+    started = time.perf_counter()
+    for _ in range(operations):
+        session = await store.get(_phone(rng.randrange(count)))
+        session.step = STEP_CHOOSING_ITEM
+        await store.save(session)
+    return (time.perf_counter() - started) / operations * 1e6
+
+
+def measure_bounded(max_entries: int, phones: int) -> tuple:
+    rng = random.Random(13)
+    tracemalloc.start()
+    store = InMemorySessionStore(max_entries=max_entries)
+    asyncio.run(_fill(store, phones, rng))
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return len(store), store.evicted, retained
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300_000)
+    parser.add_argument("--operations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    store, per_session, naive_per_session = measure(args.sessions)
+    print(f"{args.sessions} sessions : {per_session:.0f} octets par session ({per_session * args.sessions / 2**20:.0f} Mo), dicts imbriqués : {naive_per_session:.0f} octets par session sans compter le numéro")
+    micros = asyncio.run(bench_operations(store, args.sessions, args.operations))
+    print(f"lecture + écriture d'une session : {micros:.2f} µs")
+    max_entries = args.sessions // 3
+    entries, evicted, retained = measure_bounded(max_entries, args.sessions)
+    print(f"max_entries={max_entries}, {args.sessions} numéros : {entries} sessions gardées, {evicted} évincées, {retained / 2**20:.0f} Mo")
+    return 0 if entries == max_entries and per_session < naive_per_session else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
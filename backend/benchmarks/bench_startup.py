@@ -0,0 +1,110 @@
+"""Démarrage à froid : import de l'application, délai avant /readyz et latence des premières requêtes.
+
+Chaque démarrage tourne dans un processus neuf (caches d'import vides) : import de `main`
+et de `models`, puis lifespan de l'application contre le faux Supabase rempli avec un jeu
+de données (datasets.py) et une latence réseau simulée. Mesure le délai avant que /readyz
+réponde 200 (ou, sans /readyz, avant la fin du démarrage) puis la latence et le nombre de
+requêtes Supabase des premiers appels, comme le premier client après un passage à l'échelle.
+
+    python -m ChopExpress.backend.benchmarks.bench_startup --runs 5 --scale 10k --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+FIRST_REQUESTS = (
+    ("GET /api/search", "/api/search?q=poulet"),
+    ("GET /api/restaurants", "/api/restaurants"),
+    ("GET /api/restaurants/{id}/menu-items", "/api/restaurants/1/menu-items"),
+)
+RESULT_PREFIX = "RESULTAT "
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _cold_start(main, fake) -> dict:
+    import httpx
+
+    results = {}
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            results["lifespan"] = _ms(started)
+            # Comme un load balancer : sonde /readyz jusqu'à 200 (404 : application sans sonde)
+            while (await client.get("/readyz")).status_code == 503:
+                await asyncio.sleep(0.005)
+            results["prêt (/readyz)"] = _ms(started)
+            for label, url in FIRST_REQUESTS:
+                fake.reset_counters()
+                request_started = time.perf_counter()
+                (await client.get(url)).raise_for_status()
+                results[f"1re {label}"] = _ms(request_started)
+                results[f"1re {label} requêtes"] = fake.query_count
+    return results
+
+
+def _child(scale: str, latency: float, seed: int) -> dict:
+    started = time.perf_counter()
+    import ChopExpress.backend.main as main
+    results = {"import main": _ms(started)}
+    started = time.perf_counter()
+    import ChopExpress.backend.models  # noqa: F401
+    results["import models"] = _ms(started)
+
+    from ChopExpress.backend.benchmarks.datasets import SCALES, DatasetShape, seed_fake
+    from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest
+    from ChopExpress.backend.repository import create_repository
+
+    fake = FakePostgrest(latency=0.0, jitter=0.0, seed=seed)
+    seed_fake(fake, DatasetShape(SCALES[scale]), seed)
+    fake.latency = latency
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    main.translations.db = main.eta.db = main.analytics.db = main.dispatch.db = main.db
+    results.update(asyncio.run(_cold_start(main, fake)))
+    return results
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", default="10k")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(RESULT_PREFIX + json.dumps(_child(args.scale, args.latency_ms / 1000, args.seed)))
+        return 0
+
+    runs = []
+    for _ in range(args.runs):
+        completed = subprocess.run(
+            [sys.executable, "-m", __spec__.name, "--child", "--scale", args.scale, "--latency-ms", str(args.latency_ms), "--seed", str(args.seed)],
+            capture_output=True, text=True, env={**os.environ, "LOG_LEVEL": "WARNING"},
+        )
+        lines = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if completed.returncode != 0 or not lines:
+            print(f"ÉCHEC du démarrage :\n{completed.stdout[-2000:]}{completed.stderr[-2000:]}")
+            return 1
+        runs.append(json.loads(lines[-1][len(RESULT_PREFIX):]))
+
+    print(f"{args.runs} démarrages à froid, jeu {args.scale}, latence Supabase {args.latency_ms:g} ms (médianes)")
+    for metric in runs[0]:
+        value = statistics.median(run[metric] for run in runs)
+        print(f"    {metric:<48} {value:8.0f}" if metric.endswith("requêtes") else f"    {metric:<48} {value:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
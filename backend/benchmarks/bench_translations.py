@@ -0,0 +1,116 @@
+"""Traductions du bot : catalogue en mémoire vs une requête Supabase par texte envoyé.
+
+Remplit une table `translations` synthétique (N clés en fr_CM, en_CM et fr), puis mesure :
+- le coût d'un texte du bot lu en base à chaque message (avant) et via `TranslationService` ;
+- un rafraîchissement incrémental (quelques lignes modifiées) comparé à un rechargement complet ;
+- `GET /api/translations/{locale}` : premier chargement, puis revalidation ETag (304).
+
+    python -m ChopExpress.backend.benchmarks.bench_translations --keys 2000 --messages 500 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+from ChopExpress.backend.translations import TranslationService  # noqa: E402
+
+TEXTS_PER_MESSAGE = 2  # réponse + rappel du panier, en moyenne
+
+
+def _seed(fake: FakePostgrest, keys: int) -> None:
+    rows = []
+    for i in range(keys):
+        key = f"section{i % 40}.text{i}"
+        rows.append({"lang_code": "fr_CM", "key": key, "value": f"Texte {i} pour {{name}}", "updated_at": "2024-01-01T00:00:00+00:00"})
+        rows.append({"lang_code": "en_CM", "key": key, "value": f"Text {i} for {{name}}", "updated_at": "2024-01-01T00:00:00+00:00"})
+        if i % 10 == 0:
+            rows.append({"lang_code": "fr", "key": key, "value": f"Texte générique {i}", "updated_at": "2024-01-01T00:00:00+00:00"})
+    fake.seed("translations", rows)
+
+
+async def bench_messages(service: TranslationService, keys: int, messages: int) -> tuple:
+    rng = random.Random(5)
+    lookups = [(f"section{i % 40}.text{i}", rng.choice(("fr_CM", "en_CM"))) for i in (rng.randrange(keys) for _ in range(messages * TEXTS_PER_MESSAGE))]
+    db = service.db
+    started = time.perf_counter()
+    for key, locale in lookups:
+        # Avant : une requête par texte, sans repli entre locales
+        row = await db.select_one("translations", "value", lang_code=locale, key=key)
+        row["value"].format(name="Awa")
+    db_ms = (time.perf_counter() - started) / messages * 1000
+    started = time.perf_counter()
+    for key, locale in lookups:
+        service.translate(key, locale, name="Awa")
+    memory_us = (time.perf_counter() - started) / messages * 1e6
+    return db_ms, memory_us
+
+
+async def bench_refresh(service: TranslationService, fake: FakePostgrest, changes: int) -> tuple:
+    rows = fake.tables["translations"]
+    for row in random.Random(9).sample(rows, changes):
+        await service.db.update("translations", {"value": row["value"] + " (modifié)"}, id=row["id"])
+    version = service.version
+    started = time.perf_counter()
+    incremental_rows = await service.refresh()
+    incremental_ms = (time.perf_counter() - started) * 1000
+    changed = service.version != version
+    started = time.perf_counter()
+    full_rows = await service.load()
+    full_ms = (time.perf_counter() - started) * 1000
+    return incremental_rows, incremental_ms, full_rows, full_ms, changed
+
+
+async def bench_bundle() -> tuple:
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        first = await client.get("/api/translations/en-CM")
+        first.raise_for_status()
+        started = time.perf_counter()
+        revalidated = await client.get("/api/translations/en_CM", headers={"If-None-Match": first.headers["etag"]})
+        revalidate_ms = (time.perf_counter() - started) * 1000
+    return len(first.content), revalidated.status_code, revalidate_ms
+
+
+async def _run(args) -> int:
+    fake = FakePostgrest()
+    _seed(fake, args.keys)
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    service = main.translations = TranslationService(main.db)
+    started = time.perf_counter()
+    await service.load()
+    print(f"chargement initial : {len(fake.tables['translations'])} lignes en {(time.perf_counter() - started) * 1000:.0f} ms, {fake.query_count} requête(s)")
+
+    fake.latency = args.latency
+    db_ms, memory_us = await bench_messages(service, args.keys, args.messages)
+    print(f"textes d'un message ({TEXTS_PER_MESSAGE}) : base {db_ms:.1f} ms, catalogue en mémoire {memory_us:.1f} µs")
+
+    incremental_rows, incremental_ms, full_rows, full_ms, changed = await bench_refresh(service, fake, args.changes)
+    print(f"rafraîchissement après {args.changes} modifications : incrémental {incremental_rows} lignes en {incremental_ms:.0f} ms, complet {full_rows} lignes en {full_ms:.0f} ms")
+
+    fake.latency = 0.0
+    size, status, revalidate_ms = await bench_bundle()
+    print(f"/api/translations/en_CM : {size / 1024:.0f} Ko, revalidation ETag -> {status} en {revalidate_ms:.1f} ms")
+    await main.db.aclose()
+    return 0 if changed and status == 304 and incremental_rows < full_rows else 1
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--changes", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="latence simulée d'un aller-retour Supabase (s)")
+    return asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,72 @@
+"""Résolution numéro -> utilisateur du webhook : requêtes Supabase par message.
+
+Rejoue des messages d'utilisateurs connus dans `process_whatsapp_message` et compte
+les requêtes (objectif : 0 pour un utilisateur déjà vu), puis envoie en même temps
+les premiers messages d'un nouveau numéro pour vérifier qu'un seul utilisateur est créé.
+
+    python -m ChopExpress.backend.benchmarks.bench_user_cache --users 200 --messages-per-user 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.cache import TTLCache  # noqa: E402
+from ChopExpress.backend.message_dedup import InMemoryDedupStore  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+
+def _message(phone: str, n: int) -> dict:
+    return {"messages": [{"id": f"wamid.{phone}.{n}", "from": phone, "type": "text", "text": {"body": "menu"}}]}
+
+
+async def bench_hot_path(users: int, per_user: int) -> tuple:
+    fake = FakePostgrest(latency=0.001)
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    main.message_dedup = InMemoryDedupStore()
+    main.user_cache = TTLCache(max_entries=users, ttl=3600)
+    phones = [f"2376900{i:05d}" for i in range(users)]
+    fake.seed("users", [{"phone_number": phone} for phone in phones])
+    # Premier message de chaque utilisateur : remplit le cache
+    for phone in phones:
+        await main.process_whatsapp_message(_message(phone, 0))
+    fake.reset_counters()
+    for n in range(1, per_user):
+        for phone in phones:
+            await main.process_whatsapp_message(_message(phone, n))
+    await main.db.aclose()
+    return fake.query_count, users * (per_user - 1)
+
+
+async def bench_concurrent_first_messages(concurrency: int) -> tuple:
+    fake = FakePostgrest(latency=0.005)
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    main.user_cache = TTLCache()
+    results = await asyncio.gather(*(main.get_or_create_user("237677777777") for _ in range(concurrency)), return_exceptions=True)
+    await main.db.aclose()
+    errors = [r for r in results if isinstance(r, Exception)]
+    user_ids = {r.id for r in results if not isinstance(r, Exception)}
+    return errors, user_ids, len(fake.tables.get("users", []))
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages-per-user", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    queries, messages = asyncio.run(bench_hot_path(args.users, args.messages_per_user))
+    print(f"Utilisateurs connus : {queries} requêtes Supabase pour {messages} messages ({queries / messages:.2f} par message)")
+    errors, user_ids, rows = asyncio.run(bench_concurrent_first_messages(args.concurrency))
+    print(f"{args.concurrency} premiers messages simultanés du même numéro : {len(errors)} erreur(s), {rows} ligne(s) users, ids renvoyés {sorted(user_ids)}")
+    return 0 if queries == 0 and not errors and rows == 1 and len(user_ids) == 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
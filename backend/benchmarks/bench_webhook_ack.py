@@ -0,0 +1,123 @@
+"""Temps de réponse du webhook WhatsApp : traitement en ligne vs file de travail.
+
+Avec un Supabase lent, mesure la latence de `POST /webhook` quand le message est
+traité dans la requête (ancien comportement) puis quand il est mis en file, le temps
+pour vider la file, et vérifie que les messages d'un même numéro sont traités dans l'ordre.
+
+    python -m ChopExpress.backend.benchmarks.bench_webhook_ack --phones 50 --messages-per-phone 5 --backend supabase
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+from ChopExpress.backend.webhook_queue import InMemoryQueueBackend, SupabaseQueueBackend, WebhookWorkerPool  # noqa: E402
+
+
+def _webhook(phone: str, n: int, run: str) -> dict:
+    message = {"id": f"wamid.{run}.{phone}.{n}", "from": phone, "type": "text", "text": {"body": f"message {n}"}}
+    return {"entry": [{"changes": [{"field": "messages", "value": {"messages": [message]}}]}]}
+
+
+async def _post_all(client: httpx.AsyncClient, phones: list, per_phone: int, run: str) -> list:
+    latencies = []
+
+    async def post(body: dict):
+        started = time.perf_counter()
+        (await client.post("/webhook", json=body)).raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # Les messages d'un numéro arrivent l'un après l'autre, les numéros en parallèle
+    async def one_phone(phone: str):
+        for n in range(per_phone):
+            await post(_webhook(phone, n, run))
+
+    await asyncio.gather(*(one_phone(phone) for phone in phones))
+    return latencies
+
+
+async def bench_inline(fake: FakePostgrest, phones: list, per_phone: int) -> list:
+    # Avant : le webhook attend la fin du traitement (équivalent de l'ancien receive_webhook)
+    async def inline_webhook(request: httpx.Request) -> httpx.Response:
+        for entry in json.loads(request.content)["entry"]:
+            for change in entry["changes"]:
+                await main.process_whatsapp_message(change["value"])
+        return httpx.Response(200, json={"status": "success"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(inline_webhook), base_url="http://bench") as client:
+        return await _post_all(client, phones, per_phone, "inline")
+
+
+async def bench_queued(fake: FakePostgrest, phones: list, per_phone: int, backend_name: str, workers: int):
+    processed = []
+    original_handler = main.handle_text_message
+
+    async def recording_handler(user, phone_number: str, text: str):
+        processed.append((phone_number, text))
+        await original_handler(user, phone_number, text)
+
+    main.handle_text_message = recording_handler
+    backend = SupabaseQueueBackend(main.db, poll_interval=0.01) if backend_name == "supabase" else InMemoryQueueBackend(maxsize=0)
+    main.webhook_workers = WebhookWorkerPool(backend, main.process_whatsapp_message, concurrency=workers)
+    main.webhook_workers.start()
+    try:
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+            started = time.perf_counter()
+            # Identifiants distincts de la première passe, sinon la déduplication les ignorerait
+            latencies = await _post_all(client, phones, per_phone, "queued")
+            total = len(phones) * per_phone
+            while len(processed) < total:
+                await asyncio.sleep(0.01)
+            drain_seconds = time.perf_counter() - started
+    finally:
+        await main.webhook_workers.stop()
+        main.handle_text_message = original_handler
+    ordered = all([text for p, text in processed if p == phone] == [f"message {n}" for n in range(per_phone)] for phone in phones)
+    return latencies, drain_seconds, ordered
+
+
+def _summary(latencies: list) -> str:
+    p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+    return f"p50 {statistics.median(latencies):7.1f} ms   p99 {p99:7.1f} ms"
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--phones", type=int, default=50)
+    parser.add_argument("--messages-per-phone", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--backend", choices=["memory", "supabase"], default="memory")
+    args = parser.parse_args()
+
+    phones = [f"2376900{i:05d}" for i in range(args.phones)]
+
+    async def run():
+        fake = FakePostgrest(latency=args.latency_ms / 1000)
+        main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+        inline = await bench_inline(fake, phones, args.messages_per_phone)
+        queued = await bench_queued(fake, phones, args.messages_per_phone, args.backend, args.workers)
+        await main.db.aclose()
+        return inline, queued
+
+    inline, (queued, drain_seconds, ordered) = asyncio.run(run())
+    print(f"Latence Supabase simulée : {args.latency_ms:.0f} ms, {len(inline)} messages, backend {args.backend}")
+    print(f"  traitement en ligne (avant) : {_summary(inline)}")
+    print(f"  mise en file (après)        : {_summary(queued)}   file vidée en {drain_seconds:.2f} s")
+    print(f"  ordre par numéro respecté   : {'oui' if ordered else 'NON'}")
+    return 0 if ordered else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
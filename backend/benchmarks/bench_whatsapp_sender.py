@@ -0,0 +1,107 @@
+"""Envoi WhatsApp : appels directs à la Graph API vs `WhatsAppSender`, sur le faux serveur Graph API.
+
+Une campagne marketing est mise en file, puis des notifications de statut de commande
+arrivent pendant qu'elle part. Mesure les messages perdus (429 de Meta), la durée
+totale et le délai des notifications de commande.
+
+    python -m ChopExpress.backend.benchmarks.bench_whatsapp_sender --marketing 600 --orders 60 --rate 100
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+from ChopExpress.backend.benchmarks.mock_graph_api import MockGraphAPI
+from ChopExpress.backend.whatsapp_sender import PRIORITY_MARKETING, PRIORITY_TRANSACTIONAL, create_whatsapp_sender, text_message
+
+BASE_URL = "http://mock-graph.local/v18.0/1234567890"
+
+
+def _recipients(prefix: str, count: int) -> list:
+    return [f"2376{prefix}{i:06d}" for i in range(count)]
+
+
+async def bench_direct(marketing: int, orders: int, rate: float, latency: float, concurrency: int) -> dict:
+    # Avant : un client HTTP par appel, sans limite de débit ni réessai, dans l'ordre d'arrivée
+    mock = MockGraphAPI(latency=latency, messages_per_second=rate)
+    transport = mock.async_transport()
+    slots = asyncio.Semaphore(concurrency)
+    order_delays = []
+
+    async def post(to: str, body: str) -> bool:
+        async with slots:
+            async with httpx.AsyncClient(base_url=BASE_URL, headers={"Authorization": "Bearer bench"}, transport=transport) as client:
+                response = await client.post("/messages", json=text_message(to, body))
+                return response.status_code == 200
+
+    async def order(to: str) -> bool:
+        queued = time.perf_counter()
+        ok = await post(to, "Votre commande est en route.")
+        order_delays.append(time.perf_counter() - queued)
+        return ok
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(post(to, "Promo ndolé -20 %")) for to in _recipients("50", marketing)]
+    await asyncio.sleep(0.5)
+    tasks += [asyncio.create_task(order(to)) for to in _recipients("60", orders)]
+    results = await asyncio.gather(*tasks)
+    lost = results.count(False)
+    return {"duration": time.perf_counter() - started, "lost": lost, "order_delays": order_delays, "responses": mock.responses}
+
+
+async def bench_sender(marketing: int, orders: int, rate: float, latency: float, concurrency: int) -> dict:
+    mock = MockGraphAPI(latency=latency, messages_per_second=rate)
+    sender = create_whatsapp_sender(
+        "bench", "1234567890", api_url="http://mock-graph.local", transport=mock.async_transport(),
+        concurrency=concurrency, messages_per_second=rate, backoff_base=0.05,
+    )
+    sender.start()
+    started = time.perf_counter()
+    messages = [sender.enqueue(to, text_message(to, "Promo ndolé -20 %"), PRIORITY_MARKETING) for to in _recipients("50", marketing)]
+    await asyncio.sleep(0.5)
+    order_messages = [sender.enqueue(to, text_message(to, "Votre commande est en route."), PRIORITY_TRANSACTIONAL) for to in _recipients("60", orders)]
+    order_delays = []
+    for message in order_messages:
+        message.result.add_done_callback(lambda _, m=message: order_delays.append(time.monotonic() - m.enqueued_at))
+    await sender.join()
+    duration = time.perf_counter() - started
+    lost = sum(1 for message in messages + order_messages if message.result.exception() is not None)
+    stats = sender.stats()
+    await sender.stop()
+    return {"duration": duration, "lost": lost, "order_delays": order_delays, "responses": mock.responses, "stats": stats}
+
+
+def _report(label: str, result: dict, total: int) -> None:
+    delays = sorted(result["order_delays"])
+    p95 = delays[int(len(delays) * 0.95) - 1] if delays else 0.0
+    print(
+        f"  {label:<8} {result['duration']:6.2f} s   perdus {result['lost']:4d}/{total}   429 reçus {result['responses'].get(429, 0):4d}"
+        f"   notification de commande p50 {statistics.median(delays) * 1000:7.0f} ms  p95 {p95 * 1000:7.0f} ms"
+    )
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--marketing", type=int, default=600)
+    parser.add_argument("--orders", type=int, default=60)
+    parser.add_argument("--rate", type=float, default=100.0, help="messages par seconde acceptés par Meta")
+    parser.add_argument("--latency", type=float, default=0.05, help="latence de la Graph API (secondes)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    total = args.marketing + args.orders
+    print(f"{args.marketing} messages marketing puis {args.orders} notifications de commande, limite Meta {args.rate:g} messages/s")
+    direct = asyncio.run(bench_direct(args.marketing, args.orders, args.rate, args.latency, args.concurrency))
+    _report("direct", direct, total)
+    sender = asyncio.run(bench_sender(args.marketing, args.orders, args.rate, args.latency, args.concurrency))
+    _report("file", sender, total)
+    print(f"  file : {sender['stats']}")
+    marketing_time = args.marketing / args.rate
+    return 0 if sender["lost"] == 0 and max(sender["order_delays"]) < marketing_time / 2 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,135 @@
+"""Écritures (PUT / DELETE) : latence et requêtes Supabase par appel, et annulations concurrentes.
+
+Remplit le faux Supabase (latence simulée par requête), crée des commandes par l'API puis
+mesure chaque endpoint d'écriture : mise à jour d'un restaurant et d'un article, cycle de vie
+complet d'une commande (confirmed -> ... -> delivered), annulation, suppressions logiques.
+Vérifie ensuite les préconditions : deux annulations simultanées de la même commande ne
+doivent donner qu'un seul succès, et une transition interdite (delivered -> pending) doit
+être refusée sans modifier la commande.
+
+    python -m ChopExpress.backend.benchmarks.bench_writes --orders 300 --latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+RESTAURANTS = 20
+ITEMS_PER_RESTAURANT = 10
+LIFECYCLE = ("confirmed", "preparing", "ready_for_pickup", "out_for_delivery", "delivered")
+
+
+def _seed(fake: FakePostgrest) -> None:
+    fake.seed("users", [{"phone_number": f"+2376{i:08d}"} for i in range(50)])
+    fake.seed("restaurants", [{"name": f"Restaurant {i}", "is_active": True, "latitude": 4.05 + i / 1000, "longitude": 9.7} for i in range(RESTAURANTS)])
+    fake.seed("menu_items", [
+        {"restaurant_id": r, "name": f"Plat {r}-{i}", "price": 2500.0, "category": "Plats"}
+        for r in range(1, RESTAURANTS + 1) for i in range(ITEMS_PER_RESTAURANT)
+    ])
+
+
+def _json(response: httpx.Response):
+    response.raise_for_status()
+    return response.json()
+
+
+class _Recorder:
+    def __init__(self, fake: FakePostgrest):
+        self.fake = fake
+        self.samples = {}
+
+    async def call(self, label: str, request):
+        self.fake.reset_counters()
+        started = time.perf_counter()
+        response = await request
+        elapsed = (time.perf_counter() - started) * 1000
+        self.samples.setdefault(label, []).append((elapsed, self.fake.query_count))
+        return response
+
+    def report(self) -> None:
+        for label, samples in self.samples.items():
+            latencies = [elapsed for elapsed, _ in samples]
+            queries = sum(count for _, count in samples) / len(samples)
+            p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+            print(f"{label:<34} p50 {statistics.median(latencies):7.2f} ms   p99 {p99:7.2f} ms   "
+                  f"requêtes Supabase {queries:4.1f}   ({len(samples)} appels)")
+
+
+async def run(orders: int, latency: float, seed: int) -> int:
+    rng = random.Random(seed)
+    fake = FakePostgrest(latency=latency)
+    _seed(fake)
+    main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+    main.analytics.db = main.db
+    main.eta.db = main.db
+    recorder = _Recorder(fake)
+    ok = True
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench", timeout=None) as client:
+        async def create_order() -> int:
+            restaurant_id = rng.randint(1, RESTAURANTS)
+            item_id = (restaurant_id - 1) * ITEMS_PER_RESTAURANT + rng.randint(1, ITEMS_PER_RESTAURANT)
+            created = _json(await client.post("/api/orders", params={"current_user_id": rng.randint(1, 50)},
+                                              json={"restaurant_id": restaurant_id, "items": [{"menu_item_id": item_id, "quantity": 1}]}))
+            return created["id"]
+
+        order_ids = [await create_order() for _ in range(orders)]
+        raced = [await create_order() for _ in range(50)]
+
+        for i in range(orders):
+            restaurant_id = rng.randint(1, RESTAURANTS)
+            _json(await recorder.call("PUT /api/restaurants/{id}", client.put(f"/api/restaurants/{restaurant_id}", json={"description": f"Maj {i}"})))
+            item_id = rng.randint(1, RESTAURANTS * ITEMS_PER_RESTAURANT)
+            _json(await recorder.call("PUT /api/menu-items/{id}", client.put(f"/api/menu-items/{item_id}", json={"price": 2000.0 + i})))
+
+        delivered, cancelled = order_ids[: orders // 2], order_ids[orders // 2:]
+        for order_id in delivered:
+            for status in LIFECYCLE:
+                _json(await recorder.call("PUT /api/orders/{id} (statut)", client.put(f"/api/orders/{order_id}", json={"status": status})))
+        for order_id in cancelled:
+            _json(await recorder.call("DELETE /api/orders/{id}", client.delete(f"/api/orders/{order_id}")))
+
+        for item_id in range(1, RESTAURANTS * ITEMS_PER_RESTAURANT + 1, 2):
+            (await recorder.call("DELETE /api/menu-items/{id}", client.delete(f"/api/menu-items/{item_id}"))).raise_for_status()
+        for restaurant_id in range(RESTAURANTS // 2 + 1, RESTAURANTS + 1):
+            (await recorder.call("DELETE /api/restaurants/{id}", client.delete(f"/api/restaurants/{restaurant_id}"))).raise_for_status()
+        recorder.report()
+
+        # Préconditions : la vérification et l'écriture doivent être une seule opération
+        double_cancels = 0
+        for order_id in raced:
+            responses = await asyncio.gather(client.delete(f"/api/orders/{order_id}"), client.delete(f"/api/orders/{order_id}"))
+            double_cancels += sum(response.status_code == 200 for response in responses) > 1
+        print(f"annulations simultanées de la même commande : {double_cancels}/{len(raced)} acceptées deux fois")
+        ok &= double_cancels == 0
+
+        response = await client.put(f"/api/orders/{delivered[0]}", json={"status": "pending"})
+        still_delivered = _json(await client.get(f"/api/orders/{delivered[0]}"))["status"] == "delivered"
+        print(f"transition interdite delivered -> pending : HTTP {response.status_code}, commande {'inchangée' if still_delivered else 'MODIFIÉE'}")
+        ok &= response.status_code == 409 and still_delivered
+    await main.db.aclose()
+    return 0 if ok else 1
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    return asyncio.run(run(args.orders, args.latency_ms / 1000, args.seed))
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
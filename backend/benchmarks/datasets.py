@@ -0,0 +1,155 @@
+"""Jeux de données synthétiques reproductibles : restaurants, menus, clients, commandes.
+
+La taille est le nombre de commandes ; les autres tables suivent des proportions fixes
+(1 restaurant pour 100 commandes, 20 plats par restaurant, 1 client pour 5 commandes,
+1 à 3 articles par commande). Identifiants, restaurants inactifs, plats indisponibles,
+numéros de téléphone et dates sont donnés par des formules (`DatasetShape`), communes à
+`seed_fake` (FakePostgrest en mémoire) et à seed_dataset.sql (vraie base, via psql) :
+les scénarios de run_load_test.py savent quels identifiants viser sans relire la base.
+Seules les coordonnées et les noms sont tirés au hasard, avec une graine fixe.
+
+    python -m ChopExpress.backend.benchmarks.datasets --scale 10k
+    psql "$DATABASE_URL" -q -v orders=1000000 -f ChopExpress/backend/benchmarks/seed_dataset.sql
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+# Au-delà, la mémoire du faux serveur (dicts Python) dépasse quelques Go : utiliser seed_dataset.sql
+MAX_FAKE_ORDERS = 200_000
+
+ITEMS_PER_RESTAURANT = 20
+CUISINE_TYPES = ["camerounaise", "grillades", "fast-food", "africaine", "libanaise", "pâtisserie"]
+DISHES = ["Ndolé", "Poulet DG", "Eru", "Koki", "Achu", "Poisson braisé", "Soya", "Okok", "Mbongo tchobi", "Beignets haricots",
+          "Sanga", "Kondre", "Taro sauce jaune", "Folong", "Pepper soup", "Bobolo", "Plantain frit", "Jus de foléré", "Pain chargé", "Brochettes"]
+STATUSES = ["pending", "confirmed", "preparing", "ready_for_pickup", "out_for_delivery", "delivered", "delivered", "delivered", "cancelled"]
+# (latitude, longitude) : Douala, Yaoundé, Bafoussam, Garoua, Bamenda
+CITIES = [(4.05, 9.70), (3.87, 11.52), (5.48, 10.42), (9.30, 13.40), (5.96, 10.15)]
+FIRST_ORDER_AT = datetime(2025, 1, 1, tzinfo=timezone.utc)
+ORDERS_PERIOD = timedelta(days=90)
+
+
+class DatasetShape:
+    """Tailles des tables et formules partagées avec seed_dataset.sql (à garder identiques)."""
+
+    def __init__(self, orders: int):
+        self.orders = orders
+        self.restaurants = max(20, orders // 100)
+        self.menu_items = self.restaurants * ITEMS_PER_RESTAURANT
+        self.users = max(50, orders // 5)
+
+    @staticmethod
+    def restaurant_is_active(restaurant_id: int) -> bool:
+        return restaurant_id % 50 != 0
+
+    @staticmethod
+    def menu_item_ids(restaurant_id: int) -> range:
+        first = (restaurant_id - 1) * ITEMS_PER_RESTAURANT + 1
+        return range(first, first + ITEMS_PER_RESTAURANT)
+
+    @staticmethod
+    def menu_item_is_available(item_id: int) -> bool:
+        return item_id % 20 != 7
+
+    @staticmethod
+    def menu_item_price(item_id: int) -> float:
+        return 500.0 + (item_id * 37 % 60) * 100
+
+    @staticmethod
+    def phone_number(user_id: int) -> str:
+        return f"2376{user_id:08d}"
+
+    def order_restaurant(self, order_id: int) -> int:
+        return 1 + order_id * 104729 % self.restaurants
+
+    def order_customer(self, order_id: int) -> int:
+        return 1 + order_id * 7919 % self.users
+
+    def order_created_at(self, order_id: int) -> datetime:
+        return FIRST_ORDER_AT + ORDERS_PERIOD * (order_id / self.orders)
+
+    @staticmethod
+    def order_lines(order_id: int, restaurant_id: int) -> List[tuple]:
+        # (menu_item_id, quantité) ; un plat indisponible aujourd'hui ne l'était pas forcément à la commande
+        first = (restaurant_id - 1) * ITEMS_PER_RESTAURANT + 1
+        return [(first + (order_id + line * 7) % ITEMS_PER_RESTAURANT, 1 + (order_id + line) % 3) for line in range(1 + order_id % 3)]
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+def generate(shape: DatasetShape, seed: int = 42) -> Dict[str, List[Dict[str, Any]]]:
+    rng = random.Random(seed)
+    catalogue_at = _iso(FIRST_ORDER_AT - timedelta(days=30))
+    restaurants = []
+    for restaurant_id in range(1, shape.restaurants + 1):
+        lat, lng = CITIES[restaurant_id % len(CITIES)]
+        restaurants.append({
+            "id": restaurant_id, "name": f"Chez {rng.choice(DISHES)} {restaurant_id}", "address": f"Quartier {rng.randrange(1, 60)}",
+            "phone_number": f"2332{restaurant_id:08d}", "whatsapp_number": f"2376{90000000 + restaurant_id:08d}",
+            "description": None, "cuisine_type": CUISINE_TYPES[restaurant_id % len(CUISINE_TYPES)],
+            "latitude": round(rng.gauss(lat, 0.06), 6), "longitude": round(rng.gauss(lng, 0.06), 6),
+            "is_active": shape.restaurant_is_active(restaurant_id), "created_at": catalogue_at, "updated_at": catalogue_at,
+        })
+    menu_items = [
+        {
+            "id": item_id, "restaurant_id": restaurant_id, "name": DISHES[(item_id - 1) % len(DISHES)], "description": None,
+            "price": shape.menu_item_price(item_id), "category": "Plat principal", "image_url": None,
+            "is_available": shape.menu_item_is_available(item_id), "created_at": catalogue_at, "updated_at": catalogue_at,
+        }
+        for restaurant_id in range(1, shape.restaurants + 1) for item_id in shape.menu_item_ids(restaurant_id)
+    ]
+    users = [
+        {"id": user_id, "phone_number": shape.phone_number(user_id), "name": f"Client {user_id}", "created_at": catalogue_at, "updated_at": catalogue_at}
+        for user_id in range(1, shape.users + 1)
+    ]
+    orders, order_items = [], []
+    for order_id in range(1, shape.orders + 1):
+        restaurant_id = shape.order_restaurant(order_id)
+        lines = shape.order_lines(order_id, restaurant_id)
+        created_at = _iso(shape.order_created_at(order_id))
+        total = 0.0
+        for menu_item_id, quantity in lines:
+            price = shape.menu_item_price(menu_item_id)
+            total += price * quantity
+            order_items.append({"order_id": order_id, "menu_item_id": menu_item_id, "quantity": quantity, "price_at_order": price, "notes": None})
+        orders.append({
+            "id": order_id, "customer_id": shape.order_customer(order_id), "restaurant_id": restaurant_id,
+            "status": STATUSES[order_id % len(STATUSES)], "payment_status": "paid" if order_id % 4 else "pending",
+            "total_amount": total, "delivery_address": f"Quartier {rng.randrange(1, 60)}", "notes": None,
+            "created_at": created_at, "updated_at": created_at,
+        })
+    return {"restaurants": restaurants, "menu_items": menu_items, "users": users, "orders": orders, "order_items": order_items}
+
+
+def seed_fake(fake: FakePostgrest, shape: DatasetShape, seed: int = 42) -> Dict[str, int]:
+    if shape.orders > MAX_FAKE_ORDERS:
+        raise ValueError(f"{shape.orders} commandes : trop pour le faux serveur en mémoire (max {MAX_FAKE_ORDERS}), utiliser seed_dataset.sql")
+    counts = {}
+    for table, rows in generate(shape, seed).items():
+        counts[table] = len(fake.seed(table, rows))
+    return counts
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    shape = DatasetShape(SCALES[args.scale])
+    started = time.perf_counter()
+    counts = seed_fake(FakePostgrest(), shape, args.seed)
+    print(f"jeu {args.scale} (graine {args.seed}) généré en {time.perf_counter() - started:.1f} s : "
+          + ", ".join(f"{table} {count}" for table, count in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
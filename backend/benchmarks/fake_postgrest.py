@@ -0,0 +1,540 @@
+"""Faux serveur PostgREST en mémoire pour les benchmarks.
+
+S'utilise comme transport httpx (`FakePostgrest().async_transport()`) : les
+requêtes construites par postgrest-py sont interprétées sur des tables en
+mémoire, avec une latence réseau simulée (fixe + gigue aléatoire) et un compteur
+de requêtes. Les filtres `eq` sur les clés (id, clés étrangères, téléphone) passent
+par des index de hachage construits à la demande, comme les index de la vraie base,
+pour que le faux serveur tienne des jeux de données de plusieurs dizaines de milliers
+de lignes sans fausser les mesures (voir datasets.py).
+"""
+import asyncio
+import heapq
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from operator import ge, gt, le, lt
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "restaurants": {"is_active": True, "owner_id": None},
+    "menu_items": {"is_available": True},
+    "orders": {"status": "pending", "payment_status": "pending", "payment_method": None, "transaction_id": None, "estimated_delivery_time": None},
+    "order_items": {"notes": None},
+    "users": {"name": None},
+    "webhook_jobs": {"status": "pending", "attempts": 0, "last_error": None, "claimed_at": None},
+}
+# Copie de order_status_transitions (sql/update_order.sql)
+ORDER_STATUS_TRANSITIONS = {
+    "pending": ("confirmed", "preparing", "cancelled"),
+    "confirmed": ("preparing", "ready_for_pickup", "cancelled"),
+    "preparing": ("ready_for_pickup", "cancelled"),
+    "ready_for_pickup": ("out_for_delivery", "cancelled"),
+    "out_for_delivery": ("delivered", "cancelled"),
+    "delivered": ("refunded",),
+    "cancelled": ("refunded",),
+    "refunded": (),
+}
+# Colonnes horodatées à l'entrée dans un statut (eta.STATUS_TIMESTAMP_COLUMNS)
+STATUS_TIMESTAMP_COLUMNS = {"confirmed": "confirmed_at", "ready_for_pickup": "ready_at", "out_for_delivery": "picked_up_at", "delivered": "delivered_at"}
+TIMESTAMPED_TABLES = {"restaurants", "menu_items", "orders", "users", "translations"}
+COMPARISONS = {"gt": gt, "gte": ge, "lt": lt, "lte": le}
+# Colonnes indexées (filtre `eq`) : clés primaires, clés étrangères, clés d'unicité
+INDEXED_COLUMNS = {"id", "restaurant_id", "customer_id", "order_id", "phone_number", "message_id"}
+
+
+def _index_key(row: Dict[str, Any], column: str) -> Any:
+    # Index composite ("restaurant_id,name", clés on_conflict) : tuple des valeurs
+    if "," in column:
+        return tuple(_as_text(row.get(part)).lower() for part in column.split(","))
+    return _as_text(row.get(column)).lower()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    return str(value)
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _coerce(value: str, sample: Any) -> Any:
+    # Les paramètres PostgREST sont du texte : on les convertit vers le type de la colonne
+    value = _unquote(value)
+    if isinstance(sample, bool):
+        return value.lower() == "true"
+    if isinstance(sample, int):
+        return int(value)
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+def _predicate(column: str, expression: str) -> Callable[[Dict[str, Any]], bool]:
+    # Filtre PostgREST `colonne=opérateur.valeur` compilé une fois par requête, appliqué à chaque ligne
+    operator, _, raw = expression.partition(".")
+    if operator == "is":
+        expected = raw.lower()
+        return lambda row: _as_text(row.get(column)) == expected
+    if operator == "in":
+        candidates = {_unquote(v) for v in raw.strip("()").split(",") if v}
+        return lambda row: _as_text(row.get(column)) in candidates
+    if operator == "eq":
+        expected = _unquote(raw).lower()
+        return lambda row: _as_text(row.get(column)).lower() == expected
+    if operator == "neq":
+        expected = _unquote(raw).lower()
+        return lambda row: _as_text(row.get(column)).lower() != expected
+    compare = COMPARISONS.get(operator)
+    if compare is None:
+        raise ValueError(f"Opérateur PostgREST non supporté par le faux serveur: {operator}")
+    targets: Dict[type, Any] = {}  # valeur convertie selon le type de la colonne
+
+    def matches(row: Dict[str, Any]) -> bool:
+        value = row.get(column)
+        if value is None:
+            return False
+        kind = type(value)
+        if kind not in targets:
+            targets[kind] = _coerce(raw, value)
+        return compare(value, targets[kind])
+    return matches
+
+
+def _sort_key(columns: List[str]) -> Callable[[Dict[str, Any]], tuple]:
+    # NULL en dernier (en premier en ordre décroissant), comme PostgreSQL
+    if len(columns) == 2:
+        first, second = columns  # cas courant : (created_at, id)
+        return lambda r: (r.get(first) is None, r.get(first), r.get(second) is None, r.get(second))
+    return lambda r: tuple(part for column in columns for part in (r.get(column) is None, r.get(column)))
+
+
+def _split_top_level(expression: str) -> List[str]:
+    # Découpe sur les virgules hors parenthèses et hors guillemets
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _logical_predicate(operator: str, group: str) -> Callable[[Dict[str, Any]], bool]:
+    # Filtres `or=(...)` / `and(...)` de PostgREST
+    terms = []
+    for term in _split_top_level(group.strip()[1:-1]):
+        if term.startswith(("and(", "or(")):
+            nested, _, inner = term.partition("(")
+            terms.append(_logical_predicate(nested, "(" + inner))
+        else:
+            column, _, expression = term.partition(".")
+            terms.append(_predicate(column, expression))
+    if operator == "or":
+        return lambda row: any(term(row) for term in terms)
+    return lambda row: all(term(row) for term in terms)
+
+
+class FakeFunctionError(Exception):
+    # Équivalent d'un `raise exception using errcode = 'PTxxx'` dans une fonction SQL
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakePostgrest:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter  # latence supplémentaire tirée uniformément dans [0, jitter]
+        self._random = random.Random(seed)
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        # table -> colonne -> valeur (texte, minuscules, comme le filtre `eq`) -> lignes
+        self._indexes: Dict[str, Dict[str, Dict[str, List[Dict[str, Any]]]]] = {}
+        self._next_ids: Counter = Counter()
+        self.query_count = 0
+        self.queries_by_table: Counter = Counter()
+        self.functions = {
+            "place_order": self._place_order,
+            "claim_webhook_jobs": self._claim_webhook_jobs,
+            "register_message": self._register_message,
+            "purge_conversation_sessions": self._purge_conversation_sessions,
+            "apply_sales_deltas": self._apply_sales_deltas,
+            "analytics_sales": self._analytics_sales,
+            "analytics_top_items": self._analytics_top_items,
+            "prune_sales_rollups": self._prune_sales_rollups,
+            "update_order": self._update_order,
+            "update_menu_item": self._update_menu_item,
+        }
+
+    # --- Données ---
+    def seed(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self._insert_row(table, dict(row)) for row in rows]
+
+    def reset_counters(self) -> None:
+        self.query_count = 0
+        self.queries_by_table.clear()
+
+    def _insert_row(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        rows = self.tables.setdefault(table, [])
+        if "id" not in row:
+            self._next_ids[table] += 1
+            row["id"] = self._next_ids[table]
+        else:
+            self._next_ids[table] = max(self._next_ids[table], row["id"])
+        for column, default in TABLE_DEFAULTS.get(table, {}).items():
+            row.setdefault(column, default)
+        if table in TIMESTAMPED_TABLES:
+            row.setdefault("created_at", _now())
+            row.setdefault("updated_at", row["created_at"])
+        rows.append(row)
+        for column, index in self._indexes.get(table, {}).items():
+            index[_index_key(row, column)].append(row)
+        return row
+
+    def _index(self, table: str, column: str) -> Dict[Any, List[Dict[str, Any]]]:
+        indexes = self._indexes.setdefault(table, {})
+        if column not in indexes:
+            index: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+            for row in self.tables.get(table, []):
+                index[_index_key(row, column)].append(row)
+            indexes[column] = index
+        return indexes[column]
+
+    def _lookup(self, table: str, column: str, value: Any) -> List[Dict[str, Any]]:
+        return self._index(table, column).get(_as_text(value).lower(), [])
+
+    def _invalidate_indexes(self, table: str, columns: Optional[Any] = None) -> None:
+        # Reconstruits à la prochaine lecture : après un DELETE ou la mise à jour d'une colonne indexée
+        indexes = self._indexes.get(table, {})
+        for column in list(indexes):
+            if columns is None or any(part in columns for part in column.split(",")):
+                del indexes[column]
+
+    def _latency(self) -> float:
+        return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    # --- Interprétation des requêtes ---
+    def _embed(self, table: str, row: Dict[str, Any], embed: str) -> Any:
+        name, _, inner = embed.partition("(")
+        inner_columns = _split_top_level(inner.rstrip(")"))
+        foreign_key = f"{name[:-1]}_id"
+        if foreign_key in row:
+            # Relation plusieurs-vers-un (ex: menu_items -> restaurants)
+            parent = self._get(name, row[foreign_key])
+            return self._project(name, parent, inner_columns) if parent else None
+        back_key = f"{table[:-1]}_id"
+        return [self._project(name, child, inner_columns) for child in self._lookup(name, back_key, row["id"]) if child.get(back_key) == row["id"]]
+
+    def _project(self, table: str, row: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+        projected: Dict[str, Any] = {}
+        for column in columns:
+            if column == "*":
+                projected.update(row)
+            elif "(" in column:
+                projected[column.split("(")[0]] = self._embed(table, row, column)
+            else:
+                projected[column] = row.get(column)
+        return projected
+
+    def _filtered(self, table: str, params: httpx.QueryParams) -> List[Dict[str, Any]]:
+        rows = self.tables.get(table, [])
+        filters = [(column, expression) for column, expression in params.multi_items() if column not in ("select", "order", "limit", "offset", "on_conflict")]
+        for position, (column, expression) in enumerate(filters):
+            if column in INDEXED_COLUMNS and expression.startswith("eq."):
+                # Point d'entrée par l'index, les autres filtres s'appliquent au résultat
+                rows = self._index(table, column).get(_unquote(expression[3:]).lower(), [])
+                del filters[position]
+                break
+        for column, expression in filters:
+            predicate = _logical_predicate(column, expression) if column in ("or", "and") else _predicate(column, expression)
+            rows = [row for row in rows if predicate(row)]
+        return rows
+
+    def _ordered(self, rows: List[Dict[str, Any]], params: httpx.QueryParams) -> List[Dict[str, Any]]:
+        order = params.get("order")
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        if order:
+            clauses = [clause.partition(".") for clause in order.split(",")]
+            descending = {direction.startswith("desc") for _, _, direction in clauses}
+            if len(descending) == 1:
+                # Un seul sens (cas de la pagination par curseur) : une clé composite, et avec
+                # `limit` une sélection partielle en O(n log k) plutôt qu'un tri complet
+                key = _sort_key([column for column, _, _ in clauses])
+                reverse = descending.pop()
+                if limit:
+                    rows = (heapq.nlargest if reverse else heapq.nsmallest)(offset + int(limit), rows, key=key)
+                else:
+                    rows = sorted(rows, key=key, reverse=reverse)
+            else:
+                for column, _, direction in reversed(clauses):
+                    rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column)), reverse=direction.startswith("desc"))
+        return rows[offset:offset + int(limit)] if limit else rows[offset:]
+
+    def _conflicting(self, table: str, payload: Dict[str, Any], keys: List[str]) -> Optional[Dict[str, Any]]:
+        if len(keys) > 1:
+            candidates = self._index(table, ",".join(keys)).get(_index_key(payload, ",".join(keys)), [])
+        else:
+            indexed = next((key for key in keys if key in INDEXED_COLUMNS), None)
+            candidates = self._lookup(table, indexed, payload.get(indexed)) if indexed else self.tables.get(table, [])
+        return next((row for row in candidates if all(row.get(key) == payload.get(key) for key in keys)), None)
+
+    def _upsert(self, table: str, payload: Dict[str, Any], on_conflict: str) -> Dict[str, Any]:
+        keys = [key for key in on_conflict.split(",") if key] or ["id"]
+        row = self._conflicting(table, payload, keys)
+        if row is None:
+            return self._insert_row(table, payload)
+        row.update(payload)
+        self._invalidate_indexes(table, payload.keys() - set(keys))
+        return row
+
+    def _insert_ignore(self, table: str, payload: Dict[str, Any], on_conflict: str) -> Optional[Dict[str, Any]]:
+        keys = [key for key in on_conflict.split(",") if key] or ["id"]
+        if self._conflicting(table, payload, keys) is not None:
+            return None
+        return self._insert_row(table, payload)
+
+    # --- Fonctions SQL (backend/sql/) ---
+    def _get(self, table: str, row_id: Any) -> Any:
+        return next((row for row in self._lookup(table, "id", row_id) if row["id"] == row_id), None)
+
+    def _place_order(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        restaurant_id = params["p_restaurant_id"]
+        if not self._get("users", params["p_customer_id"]):
+            raise FakeFunctionError("PT404", f"Client avec ID {params['p_customer_id']} non trouvé.")
+        restaurant = self._get("restaurants", restaurant_id)
+        if not restaurant:
+            raise FakeFunctionError("PT404", f"Restaurant ID {restaurant_id} non trouvé.")
+        if not restaurant["is_active"]:
+            raise FakeFunctionError("PT400", f"Le restaurant ID {restaurant_id} est actuellement inactif.")
+        if not params.get("p_items"):
+            raise FakeFunctionError("PT400", "Une commande doit contenir au moins un article.")
+
+        total, lines = 0.0, []
+        for item in params["p_items"]:
+            menu_item = self._get("menu_items", item["menu_item_id"])
+            if not menu_item:
+                raise FakeFunctionError("PT404", f"Article de menu ID {item['menu_item_id']} non trouvé.")
+            if not menu_item["is_available"]:
+                raise FakeFunctionError("PT400", f"L'article '{menu_item['name']}' (ID: {menu_item['id']}) n'est plus disponible.")
+            if menu_item["restaurant_id"] != restaurant_id:
+                raise FakeFunctionError("PT400", f"L'article '{menu_item['name']}' (ID: {menu_item['id']}) n'appartient pas au restaurant ID {restaurant_id}.")
+            total += menu_item["price"] * item["quantity"]
+            lines.append({"menu_item_id": menu_item["id"], "quantity": item["quantity"], "price_at_order": menu_item["price"], "notes": item.get("notes")})
+
+        order = self._insert_row("orders", {
+            "customer_id": params["p_customer_id"],
+            "restaurant_id": restaurant_id,
+            "total_amount": total,
+            "delivery_address": params.get("p_delivery_address"),
+            "delivery_latitude": params.get("p_delivery_latitude"),
+            "delivery_longitude": params.get("p_delivery_longitude"),
+            "notes": params.get("p_notes"),
+            "estimated_delivery_time": params.get("p_estimated_delivery_time"),
+            "eta_plan": params.get("p_eta_plan"),
+        })
+        items = [self._insert_row("order_items", {**line, "order_id": order["id"]}) for line in lines]
+        return {**order, "items": items}
+
+    def _update_order(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        order_id, changes = params["p_order_id"], params["p_changes"]
+        status = changes.get("status")
+        if status is not None and status not in ORDER_STATUS_TRANSITIONS:
+            raise FakeFunctionError("PT400", f"Statut de commande inconnu: {status}.")
+        order = self._get("orders", order_id)
+        if not order:
+            raise FakeFunctionError("PT404", f"Commande avec ID {order_id} non trouvée.")
+        previous = order["status"]
+        if status not in (None, previous) and status not in ORDER_STATUS_TRANSITIONS[previous]:
+            allowed = ", ".join(ORDER_STATUS_TRANSITIONS[previous]) or "aucun"
+            raise FakeFunctionError("PT409", f"Transition de statut interdite pour la commande ID {order_id} : {previous} -> {status} (autorisés : {allowed}).")
+        changed = status not in (None, previous) or "estimated_delivery_time" in changes
+        if changed:
+            # Statut déjà atteint sans autre changement : rien n'est écrit
+            now = datetime.now(timezone.utc)
+            if status not in (None, previous):
+                order["status"] = status
+                if status in STATUS_TIMESTAMP_COLUMNS:
+                    order[STATUS_TIMESTAMP_COLUMNS[status]] = now.isoformat()
+                if (order.get("eta_plan") or {}).get(status) is not None:
+                    order["estimated_delivery_time"] = (now + timedelta(seconds=order["eta_plan"][status])).isoformat()
+            if "estimated_delivery_time" in changes:
+                order["estimated_delivery_time"] = changes["estimated_delivery_time"]
+            order["updated_at"] = now.isoformat()
+        items = sorted(self._lookup("order_items", "order_id", order_id), key=lambda item: item["id"])
+        return {**order, "previous_status": previous, "changed": changed, "items": items}
+
+    def _update_menu_item(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        item = self._get("menu_items", params["p_item_id"])
+        if not item:
+            raise FakeFunctionError("PT404", f"Article de menu ID {params['p_item_id']} non trouvé.")
+        if not (self._get("restaurants", item["restaurant_id"]) or {}).get("is_active"):
+            raise FakeFunctionError("PT403", f"Impossible de mettre à jour l'article car son restaurant (ID: {item['restaurant_id']}) est inactif.")
+        columns = ("name", "description", "price", "category", "image_url", "is_available")
+        item.update({column: value for column, value in params["p_values"].items() if column in columns}, updated_at=_now())
+        self._invalidate_indexes("menu_items", params["p_values"].keys())
+        return item
+
+    def _claim_webhook_jobs(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # Version simplifiée : pas de reprise des jobs « processing » expirés
+        busy_keys, claimed = set(), []
+        for job in sorted(self.tables.get("webhook_jobs", []), key=lambda row: row["id"]):
+            if job["status"] not in ("pending", "processing") or job["partition_key"] in busy_keys:
+                continue
+            busy_keys.add(job["partition_key"])
+            if job["status"] == "pending" and len(claimed) < params.get("p_limit", 20):
+                job.update(status="processing", claimed_at=_now(), attempts=job["attempts"] + 1)
+                claimed.append(job)
+        return claimed
+
+    def _register_message(self, params: Dict[str, Any]) -> bool:
+        # Version simplifiée : pas d'expiration des identifiants
+        if self._lookup("processed_messages", "message_id", params["p_message_id"]):
+            return False
+        self._insert_row("processed_messages", {"message_id": params["p_message_id"]})
+        return True
+
+    def _purge_conversation_sessions(self, params: Dict[str, Any]) -> int:
+        sessions = self.tables.get("conversation_sessions", [])
+        kept = [row for row in sessions if datetime.fromisoformat(row["expires_at"]) > datetime.now(timezone.utc)]
+        self.tables["conversation_sessions"] = kept
+        self._invalidate_indexes("conversation_sessions")
+        return len(sessions) - len(kept)
+
+    def _apply_sales_deltas(self, params: Dict[str, Any]) -> None:
+        for table, keys, fields, deltas in (
+            ("sales_rollups", ["restaurant_id", "granularity", "bucket"], ("order_count", "revenue", "cancelled_count", "delivered_count"), params.get("p_sales") or []),
+            ("item_sales_rollups", ["restaurant_id", "granularity", "bucket", "menu_item_id"], ("quantity", "revenue"), params.get("p_items") or []),
+        ):
+            for delta in deltas:
+                row = self._conflicting(table, delta, keys)
+                if row is None:
+                    self._insert_row(table, {**delta, "updated_at": _now()})
+                else:
+                    row.update({field: row[field] + delta[field] for field in fields}, updated_at=_now())
+
+    def _rollups_in_range(self, table: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        start, end = datetime.fromisoformat(params["p_from"]), datetime.fromisoformat(params["p_to"])
+        return [
+            row for row in self.tables.get(table, [])
+            if row["granularity"] == params["p_granularity"] and start <= datetime.fromisoformat(row["bucket"]) < end
+            and params.get("p_restaurant_id") in (None, row["restaurant_id"])
+        ]
+
+    def _analytics_sales(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        buckets: Dict[str, Dict[str, Any]] = {}
+        for row in self._rollups_in_range("sales_rollups", params):
+            total = buckets.setdefault(row["bucket"], {"bucket": row["bucket"], "order_count": 0, "revenue": 0.0, "cancelled_count": 0, "delivered_count": 0})
+            for field in ("order_count", "revenue", "cancelled_count", "delivered_count"):
+                total[field] += row[field]
+        return sorted(buckets.values(), key=lambda bucket: datetime.fromisoformat(bucket["bucket"]))
+
+    def _analytics_top_items(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        items: Dict[int, Dict[str, Any]] = {}
+        for row in self._rollups_in_range("item_sales_rollups", params):
+            total = items.setdefault(row["menu_item_id"], {"menu_item_id": row["menu_item_id"], "restaurant_id": row["restaurant_id"], "quantity": 0, "revenue": 0.0})
+            total["quantity"] += row["quantity"]
+            total["revenue"] += row["revenue"]
+        ranked = sorted((item for item in items.values() if item["quantity"] > 0), key=lambda item: (-item["quantity"], -item["revenue"], item["menu_item_id"]))
+        return [{**item, "name": (self._get("menu_items", item["menu_item_id"]) or {}).get("name")} for item in ranked[:params.get("p_limit", 10)]]
+
+    def _prune_sales_rollups(self, params: Dict[str, Any]) -> int:
+        before, pruned = datetime.fromisoformat(params["p_before"]), 0
+        for table in ("sales_rollups", "item_sales_rollups"):
+            rows = self.tables.get(table, [])
+            kept = [row for row in rows if datetime.fromisoformat(row["updated_at"]) >= before]
+            pruned += len(rows) - len(kept)
+            self.tables[table] = kept
+            self._invalidate_indexes(table)
+        return pruned
+
+    def _call_function(self, name: str, params: Dict[str, Any]) -> httpx.Response:
+        if name not in self.functions:
+            return httpx.Response(404, json={"code": "PGRST202", "message": f"Could not find the function public.{name}", "details": None, "hint": None})
+        try:
+            return httpx.Response(200, json=self.functions[name](params))
+        except FakeFunctionError as e:
+            return httpx.Response(int(e.code[2:]), json={"code": e.code, "message": e.message, "details": None, "hint": None})
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.query_count += 1
+        table = request.url.path.split("/rest/v1/")[-1].strip("/")
+        params = request.url.params
+        self.queries_by_table[table] += 1
+        body = json.loads(request.content) if request.content else None
+
+        if table.startswith("rpc/"):
+            return self._call_function(table[len("rpc/"):], body or {})
+        if request.method == "GET":
+            rows = self._ordered(self._filtered(table, params), params)
+            columns = _split_top_level(params.get("select", "*"))
+            data: Any = [self._project(table, row, columns) for row in rows]
+        elif request.method == "POST":
+            payloads = body if isinstance(body, list) else [body]
+            if "merge-duplicates" in request.headers.get("prefer", ""):
+                data = [self._upsert(table, dict(p), params.get("on_conflict", "")) for p in payloads]
+            elif "ignore-duplicates" in request.headers.get("prefer", ""):
+                data = [row for row in (self._insert_ignore(table, dict(p), params.get("on_conflict", "")) for p in payloads) if row]
+            else:
+                data = [self._insert_row(table, dict(p)) for p in payloads]
+        elif request.method == "PATCH":
+            data = self._filtered(table, params)
+            for row in data:
+                row.update(body)
+                if table in TIMESTAMPED_TABLES:
+                    row["updated_at"] = _now()
+            self._invalidate_indexes(table, body.keys())
+        elif request.method == "DELETE":
+            data = self._filtered(table, params)
+            deleted = {id(row) for row in data}
+            self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in deleted]
+            self._invalidate_indexes(table)
+        else:
+            return httpx.Response(405)
+
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(data) != 1:
+                return httpx.Response(406, json={"message": "JSON object requested, multiple (or no) rows returned", "code": "PGRST116", "details": f"The result contains {len(data)} rows", "hint": None})
+            data = data[0]
+        return httpx.Response(201 if request.method == "POST" else 200, json=data)
+
+    # --- Transports httpx ---
+    def async_transport(self) -> httpx.MockTransport:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            latency = self._latency()
+            if latency:
+                await asyncio.sleep(latency)
+            return self.handle(request)
+        return httpx.MockTransport(handler)
+
+    def sync_transport(self) -> httpx.MockTransport:
+        def handler(request: httpx.Request) -> httpx.Response:
+            latency = self._latency()
+            if latency:
+                time.sleep(latency)
+            return self.handle(request)
+        return httpx.MockTransport(handler)
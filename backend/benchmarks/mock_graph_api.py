@@ -0,0 +1,127 @@
+"""Faux serveur Graph API (WhatsApp Cloud) pour les tests de charge de l'envoi WhatsApp.
+
+Répond à `POST /{version}/{phone_number_id}/messages` comme Meta, en appliquant ses
+limites : débit du numéro d'envoi (erreur 130429) et limite par destinataire
+(erreur 131056), avec une latence et un taux d'erreurs 5xx simulés. S'utilise comme
+transport httpx (`MockGraphAPI().async_transport()`) ou comme vrai serveur HTTP :
+
+    python -m ChopExpress.backend.benchmarks.mock_graph_api --port 8081 --rate 80
+    WHATSAPP_GRAPH_API_URL=http://localhost:8081 uvicorn ChopExpress.backend.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from ChopExpress.backend.whatsapp_sender import PAIR_RATE_LIMIT_ERROR_CODE, TokenBucket
+
+THROUGHPUT_ERROR_CODE = 130429
+
+
+class MockGraphAPI:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        messages_per_second: float = 80.0,
+        pair_burst: int = 45,
+        pair_interval: float = 6.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.pair_burst = pair_burst
+        self.pair_interval = pair_interval
+        self._rng = random.Random(seed)
+        self._throughput = TokenBucket(messages_per_second, messages_per_second)
+        self._pairs: Dict[str, TokenBucket] = {}
+        self._ids = 0
+        self.delivered: List[Tuple[float, str, Dict[str, Any]]] = []  # (instant, destinataire, message)
+        self.responses: Counter = Counter()
+
+    def _error(self, status_code: int, code: int, message: str) -> httpx.Response:
+        self.responses[status_code] += 1
+        return httpx.Response(status_code, json={"error": {"message": message, "type": "OAuthException", "code": code}})
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST" or not request.url.path.endswith("/messages"):
+            return self._error(404, 100, f"Unknown path {request.url.path}")
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return self._error(401, 190, "Invalid OAuth access token")
+        payload = json.loads(request.content)
+        to = payload.get("to")
+        if not to or payload.get("messaging_product") != "whatsapp":
+            return self._error(400, 100, "Invalid parameter")
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return self._error(503, 2, "Service temporarily unavailable")
+        # Les limites ne consomment un jeton que si l'envoi est accepté
+        if not self._throughput.try_acquire():
+            return self._error(429, THROUGHPUT_ERROR_CODE, "Rate limit hit")
+        pair = self._pairs.get(to)
+        if pair is None:
+            pair = self._pairs[to] = TokenBucket(1 / self.pair_interval, self.pair_burst)
+        if not pair.try_acquire():
+            return self._error(429, PAIR_RATE_LIMIT_ERROR_CODE, "Pair rate limit hit")
+        self._ids += 1
+        self.delivered.append((time.monotonic(), to, payload))
+        self.responses[200] += 1
+        return httpx.Response(200, json={
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": to, "wa_id": to}],
+            "messages": [{"id": f"wamid.mock.{self._ids}"}],
+        })
+
+    def async_transport(self) -> httpx.MockTransport:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return self.handle(request)
+
+        return httpx.MockTransport(handler)
+
+    def asgi_app(self):
+        async def app(scope, receive, send):
+            if scope["type"] != "http":
+                return
+            body = b""
+            while True:
+                event = await receive()
+                body += event.get("body", b"")
+                if not event.get("more_body"):
+                    break
+            request = httpx.Request(
+                scope["method"],
+                f"http://mock-graph{scope['path']}",
+                headers=[(k.decode(), v.decode()) for k, v in scope["headers"]],
+                content=body,
+            )
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            response = self.handle(request)
+            await send({"type": "http.response.start", "status": response.status_code, "headers": [(k.encode(), v.encode()) for k, v in response.headers.items()]})
+            await send({"type": "http.response.body", "body": response.content})
+
+        return app
+
+
+def main_cli() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--rate", type=float, default=80.0, help="messages par seconde acceptés")
+    parser.add_argument("--latency", type=float, default=0.05, help="latence simulée (secondes)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proportion de réponses 503")
+    args = parser.parse_args()
+    mock = MockGraphAPI(latency=args.latency, messages_per_second=args.rate, error_rate=args.error_rate)
+    uvicorn.run(mock.asgi_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,360 @@
+"""Test de charge reproductible de l'API : catalogue, commandes, rafales de webhooks, listes admin.
+
+Rejoue des scénarios pondérés contre l'application FastAPI complète, avec N clients
+simultanés (boucle fermée : chaque client envoie sa requête suivante dès la réponse).
+Le jeu de données vient de datasets.py (même graine -> mêmes requêtes), servi par :
+
+- `--target fake` (défaut) : FakePostgrest en mémoire, latence Supabase simulée
+  (`--latency` fixe + `--jitter` aléatoire). Jusqu'à l'échelle 100k. Les listes de
+  commandes y parcourent toute la table (pas de B-tree) dans le même processus : les
+  latences du scénario admin sont pessimistes, comparer plutôt d'une version à l'autre.
+- `--target postgrest` : un vrai PostgREST local (SUPABASE_URL / SUPABASE_ANON_KEY)
+  sur une base remplie par seed_dataset.sql, pour l'échelle 1m.
+
+Rapport par scénario : débit, p50/p95/p99, erreurs, délestage (503) et requêtes Supabase
+par requête HTTP (faux serveur seulement). `--save-baseline` enregistre le rapport dans
+baselines/ ; `--compare` le compare à la référence et sort en erreur au-delà de
+`--tolerance` (les requêtes Supabase par requête, indépendantes de la machine, ne doivent
+jamais augmenter).
+
+    python -m ChopExpress.backend.benchmarks.run_load_test --scale 10k --compare
+    python -m ChopExpress.backend.benchmarks.run_load_test --scenario webhook --concurrency 50 --requests 5000
+    SUPABASE_URL=http://localhost:3000 SUPABASE_ANON_KEY=... python -m ChopExpress.backend.benchmarks.run_load_test --target postgrest --scale 1m
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench-key")
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # un log par requête Supabase fausserait la mesure
+
+import ChopExpress.backend.main as main  # noqa: E402
+from ChopExpress.backend.benchmarks.datasets import CITIES, DISHES, MAX_FAKE_ORDERS, SCALES, STATUSES, DatasetShape, seed_fake  # noqa: E402
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from ChopExpress.backend.repository import create_repository  # noqa: E402
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+SEARCH_TERMS = [dish.split()[0].lower() for dish in DISHES]
+
+# (méthode, point d'accès pour le rapport, URL, corps JSON, clé du curseur à suivre)
+Step = Tuple[str, str, str, Optional[Dict[str, Any]], Optional[str]]
+
+
+class ClientState:
+    """Tirages d'un client simulé (graine propre) et curseurs de pagination en cours."""
+
+    def __init__(self, shape: DatasetShape, seed: int):
+        self.shape = shape
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.cursors: Dict[str, str] = {}
+        self.sequence = 0
+
+    def active_restaurant(self) -> int:
+        while True:
+            restaurant_id = self.rng.randint(1, self.shape.restaurants)
+            if self.shape.restaurant_is_active(restaurant_id):
+                return restaurant_id
+
+    def user(self) -> int:
+        return self.rng.randint(1, self.shape.users)
+
+
+def _browse(state: ClientState) -> Step:
+    rng = state.rng
+    choice = rng.random()
+    if choice < 0.4:
+        restaurant_id = state.active_restaurant()
+        return "GET", "/api/restaurants/{id}/menu-items", f"/api/restaurants/{restaurant_id}/menu-items", None, None
+    if choice < 0.6:
+        return "GET", "/api/restaurants/{id}", f"/api/restaurants/{state.active_restaurant()}", None, None
+    if choice < 0.75:
+        lat, lng = rng.choice(CITIES)
+        return "GET", "/api/restaurants/nearby", f"/api/restaurants/nearby?lat={lat + rng.uniform(-0.05, 0.05):.5f}&lng={lng + rng.uniform(-0.05, 0.05):.5f}", None, None
+    if choice < 0.9:
+        return "GET", "/api/search", f"/api/search?q={rng.choice(SEARCH_TERMS)}", None, None
+    return "GET", "/api/restaurants", "/api/restaurants", None, None
+
+
+def _order(state: ClientState) -> Step:
+    rng = state.rng
+    user_id = state.user()
+    if rng.random() < 0.2:
+        return "GET", "/api/orders?customer_id", f"/api/orders?customer_id={user_id}&limit=20", None, None
+    restaurant_id = state.active_restaurant()
+    available = [item for item in state.shape.menu_item_ids(restaurant_id) if state.shape.menu_item_is_available(item)]
+    items = [{"menu_item_id": item, "quantity": rng.randint(1, 3)} for item in rng.sample(available, rng.randint(1, 3))]
+    body = {"restaurant_id": restaurant_id, "items": items, "delivery_address": "Akwa, Douala"}
+    return "POST", "/api/orders", f"/api/orders?current_user_id={user_id}", body, None
+
+
+def _webhook(state: ClientState) -> Step:
+    rng = state.rng
+    phone = state.shape.phone_number(state.user())
+    state.sequence += 1
+    message = {"from": phone, "id": f"wamid.load.{state.seed}.{state.sequence}", "timestamp": str(int(time.time())), "type": "text",
+               "text": {"body": rng.choice(["menu", "bonjour", "commande", rng.choice(SEARCH_TERMS)])}}
+    body = {"object": "whatsapp_business_account", "entry": [{"id": "1", "changes": [{"field": "messages", "value": {
+        "messaging_product": "whatsapp",
+        "metadata": {"display_phone_number": "237600000000", "phone_number_id": "1234567890"},
+        "contacts": [{"profile": {"name": "Client"}, "wa_id": phone}],
+        "messages": [message],
+    }}]}]}
+    return "POST", "/webhook", "/webhook", body, None
+
+
+def _admin(state: ClientState) -> Step:
+    rng = state.rng
+    choice = rng.random()
+    if choice < 0.15:
+        return "GET", "/api/users", "/api/users?limit=50", None, "users"
+    if choice < 0.5:
+        query = f"status={rng.choice(STATUSES)}"
+    elif choice < 0.8:
+        query = f"restaurant_id={state.active_restaurant()}"
+    else:
+        query = "all"
+    # Le tableau de bord suit la page suivante une fois sur deux
+    cursor = state.cursors.get(query) if rng.random() < 0.5 else None
+    url = "/api/orders?limit=50" + ("" if query == "all" else f"&{query}") + (f"&cursor={cursor}" if cursor else "")
+    endpoint = "/api/orders" if query == "all" else "/api/orders?" + query.split("=")[0]
+    return "GET", endpoint, url, None, query
+
+
+SCENARIOS: Dict[str, Callable[[ClientState], Step]] = {
+    "browse": _browse,
+    "order": _order,
+    "webhook": _webhook,
+    "admin": _admin,
+}
+
+
+def _percentile(samples: List[float], percent: int) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {"p50_ms": round(_percentile(samples, 50), 3), "p95_ms": round(_percentile(samples, 95), 3), "p99_ms": round(_percentile(samples, 99), 3)}
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, shape: DatasetShape, requests: int, concurrency: int, seed: int) -> Dict[str, Any]:
+    build = SCENARIOS[name]
+    remaining = requests
+    latencies: List[float] = []
+    by_endpoint: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    rejected = 0
+
+    async def client_loop(state: ClientState) -> None:
+        nonlocal remaining, rejected
+        while remaining > 0:
+            remaining -= 1
+            method, endpoint, url, body, cursor_key = build(state)
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            elapsed = (time.perf_counter() - started) * 1000
+            latencies.append(elapsed)
+            by_endpoint.setdefault(endpoint, []).append(elapsed)
+            if response.status_code == 503:
+                # Délestage volontaire (file du webhook pleine) : Meta renverra le message
+                rejected += 1
+            elif response.status_code >= 400:
+                errors[f"{endpoint} {response.status_code}"] = errors.get(f"{endpoint} {response.status_code}", 0) + 1
+            elif cursor_key:
+                next_cursor = response.json().get("next_cursor")
+                if next_cursor:
+                    state.cursors[cursor_key] = next_cursor
+                else:
+                    state.cursors.pop(cursor_key, None)
+            # En ASGI, une réponse servie du cache ne rend jamais la main : sans ce point de
+            # suspension, un client enchaînerait ses requêtes pendant que les autres attendent
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(ClientState(shape, seed * 1000 + index)) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_details": errors,
+        "rejected": rejected,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **_summary(latencies),
+        "endpoints": {endpoint: {"requests": len(samples), **_summary(samples)} for endpoint, samples in sorted(by_endpoint.items())},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _with_client(server: str, concurrency: int, run: Callable[[httpx.AsyncClient], Awaitable[Any]]) -> Any:
+    if server == "asgi":
+        async with httpx.AsyncClient(app=main.app, base_url="http://load", timeout=60) as client:
+            return await run(client)
+    # Sous uvicorn : analyse HTTP, connexions keep-alive et sérialisation comprises dans la mesure
+    port = _free_port()
+    uvicorn_server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    server_task = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.01)
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+            return await run(client)
+    finally:
+        uvicorn_server.should_exit = True
+        await server_task
+
+
+async def run_load_test(args) -> Dict[str, Any]:
+    shape = DatasetShape(SCALES[args.scale])
+    fake = None
+    if args.target == "fake":
+        fake = FakePostgrest(latency=0.0, jitter=0.0, seed=args.seed)
+        started = time.perf_counter()
+        counts = seed_fake(fake, shape, args.seed)
+        print(f"jeu {args.scale} chargé en {time.perf_counter() - started:.1f} s : " + ", ".join(f"{table} {count}" for table, count in counts.items()))
+        main.db = create_repository("http://fake-supabase.local", "bench-key", transport=fake.async_transport())
+        main.translations.db = main.eta.db = main.analytics.db = main.dispatch.db = main.db
+    # Démarrage complet de l'application (lifespan), préchauffage terminé avant la mesure
+    lifespan = main.app.router.lifespan_context(main.app)
+    await lifespan.__aenter__()
+    await main.warmup_task
+    if fake:
+        fake.latency, fake.jitter = args.latency, args.jitter
+
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results: Dict[str, Any] = {}
+
+    async def run(client: httpx.AsyncClient) -> None:
+        for index, name in enumerate(scenarios):
+            # Chauffe : caches, index de recherche, connexions (non mesurée)
+            await run_scenario(client, name, shape, max(args.concurrency, args.requests // 10), args.concurrency, args.seed + 100 + index)
+            await main.webhook_workers.join()
+            if fake:
+                fake.reset_counters()
+            result = await run_scenario(client, name, shape, args.requests, args.concurrency, args.seed + index)
+            if name == "webhook":
+                # L'accusé de réception est immédiat : on mesure aussi le temps de vidage de la file
+                started = time.perf_counter()
+                await main.webhook_workers.join()
+                result["drain_seconds"] = round(time.perf_counter() - started, 3)
+            if fake:
+                result["supabase_queries_per_request"] = round(fake.query_count / result["requests"], 3)
+            results[name] = result
+            _print_result(name, result)
+
+    try:
+        await _with_client(args.server, args.concurrency, run)
+    finally:
+        await lifespan.__aexit__(None, None, None)
+    return {
+        "meta": {
+            "target": args.target, "server": args.server, "scale": args.scale, "seed": args.seed,
+            "latency": args.latency if fake else None, "jitter": args.jitter if fake else None,
+            "requests": args.requests, "concurrency": args.concurrency,
+            "python": platform.python_version(), "machine": platform.machine(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "scenarios": results,
+    }
+
+
+def _print_result(name: str, result: Dict[str, Any]) -> None:
+    queries = result.get("supabase_queries_per_request")
+    print(f"{name:8} {result['requests']:6} requêtes  {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+          f"p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  erreurs {result['errors']}"
+          + (f"  rejetées (503) {result['rejected']}" if result["rejected"] else "")
+          + (f"  Supabase {queries:.2f}/req" if queries is not None else "")
+          + (f"  vidage {result['drain_seconds']:.2f} s" if "drain_seconds" in result else ""))
+    for endpoint, stats in result["endpoints"].items():
+        print(f"    {endpoint:34} {stats['requests']:6}  p50 {stats['p50_ms']:7.2f}  p95 {stats['p95_ms']:7.2f}  p99 {stats['p99_ms']:7.2f}")
+    for error, count in result["error_details"].items():
+        print(f"    erreur {error} : {count}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Régressions de `report` par rapport à `baseline` (liste vide si aucune)."""
+    regressions = []
+    for key in ("target", "server", "scale", "latency", "jitter", "concurrency"):
+        if report["meta"].get(key) != baseline["meta"].get(key):
+            print(f"attention : {key} = {report['meta'].get(key)} ici, {baseline['meta'].get(key)} dans la référence")
+    for name, result in report["scenarios"].items():
+        reference = baseline["scenarios"].get(name)
+        if not reference:
+            continue
+        if result["errors"] > reference["errors"]:
+            regressions.append(f"{name} : {result['errors']} erreurs (référence {reference['errors']})")
+        if result["rejected"] > max(reference["rejected"] * (1 + tolerance), reference["rejected"] + result["requests"] * 0.01):
+            regressions.append(f"{name} : {result['rejected']} requêtes rejetées (référence {reference['rejected']})")
+        if result["throughput_rps"] < reference["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name} : débit {result['throughput_rps']} req/s (référence {reference['throughput_rps']})")
+        for percentile in ("p95_ms", "p99_ms"):
+            if result[percentile] > reference[percentile] * (1 + tolerance):
+                regressions.append(f"{name} : {percentile} {result[percentile]} ms (référence {reference[percentile]})")
+        queries, reference_queries = result.get("supabase_queries_per_request"), reference.get("supabase_queries_per_request")
+        if queries is not None and reference_queries is not None and queries > reference_queries * 1.01:
+            regressions.append(f"{name} : {queries} requêtes Supabase par requête (référence {reference_queries})")
+    return regressions
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--target", choices=("fake", "postgrest"), default="fake")
+    parser.add_argument("--server", choices=("asgi", "uvicorn"), default="asgi", help="asgi : en processus, uvicorn : vraie pile HTTP")
+    parser.add_argument("--requests", type=int, default=2000, help="requêtes mesurées par scénario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005, help="latence Supabase simulée (s)")
+    parser.add_argument("--jitter", type=float, default=0.005, help="latence supplémentaire aléatoire, uniforme dans [0, jitter] (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save-baseline", nargs="?", const="", metavar="FICHIER", help="défaut : baselines/<target>-<scale>.json")
+    parser.add_argument("--compare", nargs="?", const="", metavar="FICHIER", help="défaut : baselines/<target>-<scale>.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="écart admis sur débit et p95/p99 (0.25 = 25 %%)")
+    args = parser.parse_args()
+    if args.target == "fake" and SCALES[args.scale] > MAX_FAKE_ORDERS:
+        parser.error(f"--scale {args.scale} : trop grand pour le faux serveur, utiliser --target postgrest et seed_dataset.sql")
+    if args.target == "postgrest" and os.environ["SUPABASE_URL"] == "http://fake-supabase.local":
+        parser.error("--target postgrest : définir SUPABASE_URL et SUPABASE_ANON_KEY (PostgREST local)")
+
+    report = asyncio.run(run_load_test(args))
+    default_path = os.path.join(BASELINES_DIR, f"{args.target}-{args.scale}.json")
+    status = 0 if all(result["errors"] == 0 for result in report["scenarios"].values()) else 1
+    if args.compare is not None:
+        with open(args.compare or default_path, encoding="utf-8") as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}")
+        print("aucune régression par rapport à la référence" if not regressions else f"{len(regressions)} régression(s)")
+        status = status or (1 if regressions else 0)
+    if args.save_baseline is not None:
+        path = args.save_baseline or default_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as baseline_file:
+            json.dump(report, baseline_file, ensure_ascii=False, indent=2)
+            baseline_file.write("\n")
+        print(f"référence enregistrée : {path}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,95 @@
+-- Jeu de données de charge ChopExpress dans une vraie base (Postgres local derrière PostgREST)
+--
+-- Mêmes identifiants et mêmes formules que DatasetShape (benchmarks/datasets.py), générés
+-- côté serveur avec generate_series : 1 million de commandes (2 millions d'articles) en moins d'une minute.
+-- Les tables doivent exister (models.create_db_tables) ; leur contenu est remplacé.
+--
+--     psql "$DATABASE_URL" -q -v orders=1000000 -f ChopExpress/backend/benchmarks/seed_dataset.sql
+
+\set ON_ERROR_STOP on
+\if :{?orders}
+\else
+\set orders 10000
+\endif
+
+select greatest(20, :orders / 100) as restaurants, greatest(50, :orders / 5) as users \gset
+
+begin;
+
+truncate order_items, orders, menu_items, restaurants, users restart identity cascade;
+
+select setseed(0.42);
+
+insert into restaurants (id, name, address, phone_number, whatsapp_number, description, cuisine_type, latitude, longitude, is_active, created_at, updated_at)
+select g,
+       'Chez ' || g,
+       'Quartier ' || (1 + (random() * 58)::int),
+       '2332' || lpad(g::text, 8, '0'),
+       '2376' || lpad((90000000 + g)::text, 8, '0'),
+       null,
+       (array['camerounaise', 'grillades', 'fast-food', 'africaine', 'libanaise', 'pâtisserie'])[1 + g % 6],
+       -- Douala, Yaoundé, Bafoussam, Garoua, Bamenda ; ±0,1° autour du centre (gaussienne dans datasets.py)
+       (array[4.05, 3.87, 5.48, 9.30, 5.96])[1 + g % 5] + (random() - 0.5) * 0.2,
+       (array[9.70, 11.52, 10.42, 13.40, 10.15])[1 + g % 5] + (random() - 0.5) * 0.2,
+       g % 50 <> 0,
+       timestamp '2024-12-02 00:00:00',
+       timestamp '2024-12-02 00:00:00'
+from generate_series(1, :restaurants) as g;
+
+insert into menu_items (id, restaurant_id, name, description, price, category, image_url, is_available, created_at, updated_at)
+select g,
+       (g - 1) / 20 + 1,
+       (array['Ndolé', 'Poulet DG', 'Eru', 'Koki', 'Achu', 'Poisson braisé', 'Soya', 'Okok', 'Mbongo tchobi', 'Beignets haricots',
+              'Sanga', 'Kondre', 'Taro sauce jaune', 'Folong', 'Pepper soup', 'Bobolo', 'Plantain frit', 'Jus de foléré', 'Pain chargé', 'Brochettes'])[1 + (g - 1) % 20],
+       null,
+       500 + (g * 37 % 60) * 100,
+       'Plat principal',
+       null,
+       g % 20 <> 7,
+       timestamp '2024-12-02 00:00:00',
+       timestamp '2024-12-02 00:00:00'
+from generate_series(1, :restaurants * 20) as g;
+
+insert into users (id, phone_number, name, created_at, updated_at)
+select g, '2376' || lpad(g::text, 8, '0'), 'Client ' || g, timestamp '2024-12-02 00:00:00', timestamp '2024-12-02 00:00:00'
+from generate_series(1, :users) as g;
+
+create temporary table seed_order_lines on commit drop as
+select o.g as order_id,
+       (1 + o.g::bigint * 104729 % :restaurants - 1) * 20 + 1 + (o.g + line * 7) % 20 as menu_item_id,
+       1 + (o.g + line) % 3 as quantity
+from generate_series(1, :orders) as o(g)
+cross join lateral generate_series(0, o.g % 3) as line;
+
+insert into orders (id, customer_id, restaurant_id, status, payment_status, total_amount, delivery_address, notes, created_at, updated_at)
+select o.g,
+       1 + o.g::bigint * 7919 % :users,
+       1 + o.g::bigint * 104729 % :restaurants,
+       (array['pending', 'confirmed', 'preparing', 'ready_for_pickup', 'out_for_delivery', 'delivered', 'delivered', 'delivered', 'cancelled'])[1 + o.g % 9],
+       case when o.g % 4 = 0 then 'pending' else 'paid' end,
+       totals.total,
+       'Quartier ' || (1 + (random() * 58)::int),
+       null,
+       timestamp '2025-01-01 00:00:00' + interval '90 days' * (o.g::float8 / :orders),
+       timestamp '2025-01-01 00:00:00' + interval '90 days' * (o.g::float8 / :orders)
+from generate_series(1, :orders) as o(g)
+join (
+    select l.order_id, sum((500 + (l.menu_item_id * 37 % 60) * 100) * l.quantity) as total
+    from seed_order_lines l
+    group by l.order_id
+) as totals on totals.order_id = o.g;
+
+insert into order_items (order_id, menu_item_id, quantity, price_at_order, notes)
+select order_id, menu_item_id, quantity, 500 + (menu_item_id * 37 % 60) * 100, null
+from seed_order_lines
+order by order_id, menu_item_id;
+
+-- Les prochaines insertions (POST /api/orders du test de charge) continuent après le jeu
+select setval(pg_get_serial_sequence('restaurants', 'id'), :restaurants),
+       setval(pg_get_serial_sequence('menu_items', 'id'), :restaurants * 20),
+       setval(pg_get_serial_sequence('users', 'id'), :users),
+       setval(pg_get_serial_sequence('orders', 'id'), :orders);
+
+commit;
+
+analyze restaurants, menu_items, users, orders, order_items;
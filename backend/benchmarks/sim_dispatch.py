@@ -0,0 +1,122 @@
+"""Simulateur de répartition : des milliers de commandes prêtes et de livreurs à Douala et Yaoundé.
+
+Génère un pool (restaurants plus ou moins populaires, clients à 0,5-6 km du restaurant,
+livreurs dispersés autour du centre-ville), calcule le plan avec `plan_deliveries`, puis
+le compare à l'affectation commande par commande au livreur libre le plus proche (parcours
+linéaire des livreurs, une commande par livreur). Affiche le temps de calcul par étape,
+le nombre de commandes servies et la distance moyenne parcourue par commande livrée.
+
+    python -m ChopExpress.backend.benchmarks.sim_dispatch --orders 5000 --riders 2000
+"""
+import argparse
+import math
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+from ChopExpress.backend.dispatch import (
+    DEFAULT_BATCH_CAPACITY,
+    DEFAULT_MAX_DETOUR_M,
+    DEFAULT_MAX_PICKUP_M,
+    plan_deliveries,
+)
+from ChopExpress.backend.geo import METERS_PER_DEGREE, haversine_m
+
+# (latitude, longitude, part des commandes) : Douala, Yaoundé
+CITIES = [(4.05, 9.70, 0.55), (3.87, 11.52, 0.45)]
+ORDERS_PER_RESTAURANT = 8
+CITY_SPREAD_M = 4000
+
+
+def _offset(rng: random.Random, lat: float, lng: float, distance_m: float) -> Tuple[float, float]:
+    angle = rng.uniform(0, 2 * math.pi)
+    d_lat = distance_m * math.cos(angle) / METERS_PER_DEGREE
+    d_lng = distance_m * math.sin(angle) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+    return lat + d_lat, lng + d_lng
+
+
+def generate_pool(orders: int, riders: int, seed: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    rng = random.Random(seed)
+    restaurants = []
+    for restaurant_id in range(1, max(1, orders // ORDERS_PER_RESTAURANT) + 1):
+        lat, lng, _ = rng.choices(CITIES, [city[2] for city in CITIES])[0]
+        restaurants.append((restaurant_id, *_offset(rng, lat, lng, abs(rng.gauss(0, CITY_SPREAD_M)))))
+    popularity = [1 / rank for rank in range(1, len(restaurants) + 1)]  # loi de Zipf
+    pool_orders = []
+    for order_id, (restaurant_id, r_lat, r_lng) in enumerate(rng.choices(restaurants, popularity, k=orders), start=1):
+        lat, lng = _offset(rng, r_lat, r_lng, rng.uniform(500, 6000))
+        pool_orders.append({
+            "id": order_id, "restaurant_id": restaurant_id, "pickup_latitude": r_lat, "pickup_longitude": r_lng,
+            "latitude": lat, "longitude": lng,
+        })
+    pool_riders = []
+    for rider_id in range(1, riders + 1):
+        lat, lng, _ = rng.choices(CITIES, [city[2] for city in CITIES])[0]
+        lat, lng = _offset(rng, lat, lng, abs(rng.gauss(0, CITY_SPREAD_M * 1.5)))
+        pool_riders.append({"id": rider_id, "latitude": lat, "longitude": lng})
+    return pool_orders, pool_riders
+
+
+def nearest_rider_baseline(orders: List[Dict[str, Any]], riders: List[Dict[str, Any]], max_pickup_m: float) -> Dict[str, Any]:
+    # Une commande à la fois, au livreur libre le plus proche : ce que fait un opérateur à la main
+    started = time.perf_counter()
+    free = list(riders)
+    served, distance = 0, 0.0
+    for order in orders:
+        best, best_m = None, max_pickup_m
+        for index, rider in enumerate(free):
+            pickup_m = haversine_m(rider["latitude"], rider["longitude"], order["pickup_latitude"], order["pickup_longitude"])
+            if pickup_m <= best_m:
+                best, best_m = index, pickup_m
+        if best is None:
+            continue
+        free.pop(best)
+        served += 1
+        distance += best_m + haversine_m(order["pickup_latitude"], order["pickup_longitude"], order["latitude"], order["longitude"])
+    return {"seconds": time.perf_counter() - started, "served": served, "riders_used": served, "distance_m": distance}
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--riders", type=int, default=2000)
+    parser.add_argument("--capacity", type=int, default=DEFAULT_BATCH_CAPACITY)
+    parser.add_argument("--max-detour-m", type=float, default=DEFAULT_MAX_DETOUR_M)
+    parser.add_argument("--max-pickup-m", type=float, default=DEFAULT_MAX_PICKUP_M)
+    parser.add_argument("--repeat", type=int, default=3, help="calculs du plan, temps médian affiché")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    orders, riders = generate_pool(args.orders, args.riders, args.seed)
+    durations, plan = [], None
+    for _ in range(max(1, args.repeat)):
+        started = time.perf_counter()
+        plan = plan_deliveries(orders, riders, args.capacity, args.max_detour_m, args.max_pickup_m)
+        durations.append(time.perf_counter() - started)
+    summary = plan.summary()
+    steps = ", ".join(f"{step} {ms:.1f} ms" for step, ms in summary["timings_ms"].items())
+    print(f"pool : {args.orders} commandes, {args.riders} livreurs, {len({o['restaurant_id'] for o in orders})} restaurants")
+    print(
+        f"tournées (capacité {args.capacity})  calcul {statistics.median(durations) * 1000:8.1f} ms ({steps})\n"
+        f"    {summary['assigned_orders']:6d} commandes servies par {summary['batches']:5d} livreurs   "
+        f"{summary['distance_per_order_m'] / 1000:5.2f} km par commande"
+    )
+    if any(len(set(batch.order_ids)) != len(batch.order_ids) for batch in plan.batches) or \
+            len({batch.rider_id for batch in plan.batches}) != len(plan.batches):
+        print("ÉCHEC : commande ou livreur affecté deux fois")
+        return 1
+    if not args.skip_baseline:
+        baseline = nearest_rider_baseline(orders, riders, args.max_pickup_m)
+        print(
+            f"plus proche livreur, commande par commande  calcul {baseline['seconds'] * 1000:8.1f} ms\n"
+            f"    {baseline['served']:6d} commandes servies par {baseline['riders_used']:5d} livreurs   "
+            f"{baseline['distance_m'] / max(1, baseline['served']) / 1000:5.2f} km par commande"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
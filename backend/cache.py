@@ -0,0 +1,85 @@
+"""Cache mémoire (TTL + LRU) pour les lectures du catalogue : restaurants et menus.
+
+Le catalogue change quelques fois par jour alors que le bot et `MenuPage` le lisent
+en continu : les lectures passent par `get_or_load`, les endpoints d'écriture
+invalident les clés concernées. Le cache est propre à chaque processus uvicorn ;
+le TTL borne la durée pendant laquelle un autre worker peut servir une donnée périmée.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+DEFAULT_CACHE_TTL_SECONDS = 300.0
+DEFAULT_CACHE_MAX_ENTRIES = 1000
+
+
+class TTLCache:
+    def __init__(self, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES, ttl: float = DEFAULT_CACHE_TTL_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clé -> (expiration, valeur)
+        # Incrémenté à chaque invalidation : un chargement commencé avant ne doit pas être stocké
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # Lecture traversante ; un résultat None (ex: restaurant introuvable) n'est pas mis en cache
+        value = self.get(key)
+        if value is not None:
+            return value
+        generation = self._generation
+        value = await loader()
+        if value is not None and generation == self._generation:
+            self.set(key, value)
+        return value
+
+    def invalidate(self, *keys: Hashable) -> None:
+        self._generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def invalidate_namespace(self, namespace: str) -> None:
+        # Les clés sont des tuples (espace de noms, ...) : ex. toutes les pages de la liste des restaurants
+        self._generation += 1
+        for key in [k for k in self._entries if isinstance(k, tuple) and k and k[0] == namespace]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,371 @@
+"""Répartition des commandes prêtes entre les livreurs disponibles, par tournées multi-dépôts.
+
+Un tour de répartition (toutes les DISPATCH_INTERVAL_SECONDS, ou POST /api/dispatch/run)
+lit en une requête les commandes `ready_for_pickup` sans livreur et les livreurs libres
+(fonction SQL dispatch_pool, sql/dispatch.sql), calcule le plan en mémoire puis l'applique
+en une requête (assign_deliveries, qui ignore un lot devenu invalide entre-temps).
+
+Calcul du plan (`plan_deliveries`) :
+1. Positions projetées en mètres autour du centre du pool (équirectangulaire, erreur < 2 %
+   entre Douala et Garoua) : toutes les distances sont euclidiennes et calculées par
+   matrices numpy, à vol d'oiseau.
+2. Tournées : par restaurant, chaque commande (les plus anciennes d'abord) est insérée dans
+   la tournée et à la position où elle coûte le moins (insertion gloutonne), si la tournée
+   a de la place et si le détour reste sous `max_detour_m` ; sinon elle ouvre une tournée.
+3. Chaque tournée (restaurant puis dépôts, fin libre) est améliorée par 2-opt.
+4. Affectation gloutonne des tournées aux livreurs par distance livreur -> restaurant,
+   parmi les `candidates` livreurs les plus proches de chaque restaurant (argpartition sur
+   la matrice restaurants x livreurs, calculée par blocs pour borner la mémoire). Une
+   tournée sans livreur à moins de `max_pickup_m` attend le tour suivant.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ChopExpress.backend.geo import EARTH_RADIUS_M
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISPATCH_INTERVAL_SECONDS = 30.0
+DEFAULT_BATCH_CAPACITY = 3  # commandes par tournée
+DEFAULT_MAX_DETOUR_M = 1500.0
+DEFAULT_MAX_PICKUP_M = 8000.0
+DEFAULT_RIDER_CANDIDATES = 8
+NEIGHBOURS = 8
+DEFAULT_DISPATCH_MAX_ORDERS = 5000
+DISTANCE_BLOCK_ROWS = 1024  # lignes par bloc de matrice de distances (1024 x 10 000 livreurs en float32 = 40 Mo)
+
+
+class DeliveryBatch:
+    __slots__ = ("restaurant_id", "order_ids", "route_m", "rider_id", "pickup_m")
+
+    def __init__(self, restaurant_id: int, order_ids: List[int], route_m: float):
+        self.restaurant_id = restaurant_id
+        self.order_ids = order_ids  # ordre de dépôt
+        self.route_m = route_m  # restaurant -> dernier dépôt
+        self.rider_id: Optional[int] = None
+        self.pickup_m = 0.0  # livreur -> restaurant
+
+
+class DispatchPlan:
+    def __init__(self, batches: List[DeliveryBatch], orders: int, riders: int, timings: Dict[str, float]):
+        self.batches = batches  # tournées avec livreur
+        self.orders = orders
+        self.riders = riders
+        self.timings = timings
+
+    @property
+    def assigned_orders(self) -> int:
+        return sum(len(batch.order_ids) for batch in self.batches)
+
+    @property
+    def distance_m(self) -> float:
+        return sum(batch.pickup_m + batch.route_m for batch in self.batches)
+
+    def summary(self) -> Dict[str, Any]:
+        assigned = self.assigned_orders
+        return {
+            "orders": self.orders,
+            "riders": self.riders,
+            "batches": len(self.batches),
+            "assigned_orders": assigned,
+            "unassigned_orders": self.orders - assigned,
+            "distance_m": round(self.distance_m, 1),
+            "distance_per_order_m": round(self.distance_m / assigned, 1) if assigned else None,
+            "timings_ms": {step: round(seconds * 1000, 2) for step, seconds in self.timings.items()},
+        }
+
+
+def project(latitudes: np.ndarray, longitudes: np.ndarray, ref_lat: float, ref_lng: float) -> np.ndarray:
+    # (n, 2) en mètres autour de (ref_lat, ref_lng) ; float32 suffit une fois centré (précision < 0,1 m)
+    x = np.radians(longitudes - ref_lng) * (EARTH_RADIUS_M * math.cos(math.radians(ref_lat)))
+    y = np.radians(latitudes - ref_lat) * EARTH_RADIUS_M
+    return np.column_stack((x, y)).astype(np.float32)
+
+
+def _squared_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Carrés suffisants pour comparer (pas de racine sur toute la matrice)
+    dx = a[:, None, 0] - b[None, :, 0]
+    dy = a[:, None, 1] - b[None, :, 1]
+    dx *= dx
+    dy *= dy
+    dx += dy
+    return dx
+
+
+def _nearest_neighbours(points: np.ndarray, k: int) -> np.ndarray:
+    # (n, k) indices des k plus proches autres points, matrice calculée par blocs de lignes
+    k = min(k, len(points) - 1)
+    result = np.empty((len(points), max(k, 0)), dtype=np.intp)
+    if k <= 0:
+        return result
+    for start in range(0, len(points), DISTANCE_BLOCK_ROWS):
+        block = _squared_distances(points[start:start + DISTANCE_BLOCK_ROWS], points)
+        block[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf  # le point lui-même
+        result[start:start + len(block)] = np.argpartition(block, k - 1, axis=1)[:, :k]
+    return result
+
+
+def route_length(route: List[int], from_pickup: List[float], between: Callable[[int, int], float]) -> float:
+    if not route:
+        return 0.0
+    return from_pickup[route[0]] + sum(between(a, b) for a, b in zip(route, route[1:]))
+
+
+def two_opt(route: List[int], from_pickup: List[float], between: Callable[[int, int], float]) -> List[int]:
+    """Chemin ouvert au départ fixé (le restaurant) : inverse route[i..j] tant que cela raccourcit."""
+    route = list(route)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(route) - 1):
+            before_i = from_pickup[route[i]] if i == 0 else between(route[i - 1], route[i])
+            for j in range(i + 1, len(route)):
+                to_j = from_pickup[route[j]] if i == 0 else between(route[i - 1], route[j])
+                if j + 1 < len(route):
+                    old = before_i + between(route[j], route[j + 1])
+                    new = to_j + between(route[i], route[j + 1])
+                else:
+                    old, new = before_i, to_j  # fin libre : pas d'arête après j
+                if new < old - 1e-3:
+                    route[i:j + 1] = route[i:j + 1][::-1]
+                    improved = True
+                    break
+            if improved:
+                break
+    return route
+
+
+def build_routes(pickup: np.ndarray, drops: np.ndarray, capacity: int, max_detour_m: float) -> Tuple[List[List[int]], List[float]]:
+    """Tournées d'un restaurant (indices dans `drops`, commandes de la plus ancienne à la plus récente) et leurs longueurs.
+
+    Une commande n'est essayée que dans les tournées de ses NEIGHBOURS plus proches voisines
+    déjà placées, pas dans toutes les tournées du restaurant (des centaines aux heures de pointe).
+    Les distances ponctuelles sont calculées à la demande sur des listes Python, plus rapides
+    que l'accès élément par élément à un tableau numpy.
+    """
+    xs, ys = drops[:, 0].tolist(), drops[:, 1].tolist()
+
+    def between(a: int, b: int) -> float:
+        return math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+    from_pickup = np.hypot(drops[:, 0] - pickup[0], drops[:, 1] - pickup[1]).tolist()
+    neighbours = _nearest_neighbours(drops, NEIGHBOURS).tolist()
+    routes: List[List[int]] = []
+    route_of = [-1] * len(drops)
+    for order in range(len(drops)):
+        direct = from_pickup[order]
+        best: Optional[Tuple[float, int, int]] = None  # (surcoût face à une livraison seule, tournée, position)
+        for index in sorted({route_of[neighbour] for neighbour in neighbours[order]} - {-1}):
+            route = routes[index]
+            if len(route) >= capacity:
+                continue
+            for position in range(len(route) + 1):
+                reach = direct if position == 0 else between(route[position - 1], order)
+                if position < len(route):
+                    following = route[position]
+                    replaced = from_pickup[following] if position == 0 else between(route[position - 1], following)
+                    added = reach + between(order, following) - replaced
+                    if added > max_detour_m:  # retard imposé aux clients suivants
+                        continue
+                else:
+                    added = reach
+                extra = added - direct
+                if extra <= max_detour_m and (best is None or extra < best[0]):
+                    best = (extra, index, position)
+        if best is None:
+            route_of[order] = len(routes)
+            routes.append([order])
+        else:
+            routes[best[1]].insert(best[2], order)
+            route_of[order] = best[1]
+    routes = [two_opt(route, from_pickup, between) for route in routes]
+    return routes, [route_length(route, from_pickup, between) for route in routes]
+
+
+def assign_riders(pickups: np.ndarray, riders: np.ndarray, max_pickup_m: float, candidates: int = DEFAULT_RIDER_CANDIDATES) -> List[Tuple[int, int, float]]:
+    """(tournée, livreur, distance) : appariement glouton par distance croissante, un livreur par tournée.
+
+    La matrice est calculée par restaurant (ses tournées partagent les mêmes candidats), pas par
+    tournée. Les tournées dont tous les candidats ont été pris repassent avec deux fois plus de
+    candidats, parmi les livreurs restants.
+    """
+    matches: List[Tuple[int, int, float]] = []
+    sites, site_of = np.unique(pickups, axis=0, return_inverse=True)
+    site_of = site_of.ravel()
+    free_batches = np.arange(len(pickups))
+    free_riders = np.arange(len(riders))
+    max_squared = max_pickup_m ** 2
+    while free_batches.size and free_riders.size:
+        k = min(candidates, free_riders.size)
+        candidates *= 2
+        active = np.unique(site_of[free_batches])
+        nearest = np.empty((len(active), k), dtype=np.intp)
+        nearest_squared = np.empty((len(active), k), dtype=np.float32)
+        rider_positions = riders[free_riders]
+        for start in range(0, len(active), DISTANCE_BLOCK_ROWS):
+            block = _squared_distances(sites[active[start:start + DISTANCE_BLOCK_ROWS]], rider_positions)
+            columns = np.argpartition(block, k - 1, axis=1)[:, :k] if k < free_riders.size else np.broadcast_to(np.arange(k), block.shape)
+            nearest[start:start + len(block)] = columns
+            nearest_squared[start:start + len(block)] = np.take_along_axis(block, columns, axis=1)
+        row_of_site = np.empty(len(sites), dtype=np.intp)
+        row_of_site[active] = np.arange(len(active))
+        rows = row_of_site[site_of[free_batches]]
+        batch_ids = np.repeat(free_batches, k)
+        rider_ids = free_riders[nearest[rows]].ravel()
+        squared = nearest_squared[rows].ravel()
+        within = squared <= max_squared
+        # Tournée dont le livreur libre le plus proche est trop loin : aucun autre ne fera mieux
+        reachable = np.zeros(len(pickups), dtype=bool)
+        reachable[batch_ids[within]] = True
+        # Tri stable : à distance égale (même restaurant), la tournée la plus ancienne d'abord
+        order = np.argsort(squared[within], kind="stable")
+        taken_batches, taken_riders = set(), set()
+        for batch, rider, distance in zip(batch_ids[within][order].tolist(), rider_ids[within][order].tolist(), np.sqrt(squared[within][order]).tolist()):
+            if batch in taken_batches or rider in taken_riders:
+                continue
+            taken_batches.add(batch)
+            taken_riders.add(rider)
+            matches.append((batch, rider, distance))
+        if not taken_batches:
+            break
+        free_batches = free_batches[reachable[free_batches] & ~np.isin(free_batches, list(taken_batches))]
+        free_riders = free_riders[~np.isin(free_riders, list(taken_riders))]
+    return matches
+
+
+def plan_deliveries(
+    orders: List[Dict[str, Any]],
+    riders: List[Dict[str, Any]],
+    capacity: int = DEFAULT_BATCH_CAPACITY,
+    max_detour_m: float = DEFAULT_MAX_DETOUR_M,
+    max_pickup_m: float = DEFAULT_MAX_PICKUP_M,
+    candidates: int = DEFAULT_RIDER_CANDIDATES,
+) -> DispatchPlan:
+    """Plan d'un tour de répartition.
+
+    `orders` : id, restaurant_id, pickup_latitude/pickup_longitude (restaurant),
+    latitude/longitude (livraison), dans l'ordre d'ancienneté ; `riders` : id, latitude, longitude.
+    """
+    timings: Dict[str, float] = {}
+    if not orders or not riders:
+        return DispatchPlan([], len(orders), len(riders), timings)
+    started = time.perf_counter()
+    coordinates = np.array(
+        [(o["pickup_latitude"], o["pickup_longitude"], o["latitude"], o["longitude"]) for o in orders], dtype=np.float64
+    )
+    rider_coordinates = np.array([(r["latitude"], r["longitude"]) for r in riders], dtype=np.float64)
+    ref_lat, ref_lng = float(coordinates[:, 2].mean()), float(coordinates[:, 3].mean())
+    pickups = project(coordinates[:, 0], coordinates[:, 1], ref_lat, ref_lng)
+    drops = project(coordinates[:, 2], coordinates[:, 3], ref_lat, ref_lng)
+    rider_positions = project(rider_coordinates[:, 0], rider_coordinates[:, 1], ref_lat, ref_lng)
+    timings["projection"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    by_restaurant: Dict[int, List[int]] = {}
+    for index, order in enumerate(orders):
+        by_restaurant.setdefault(order["restaurant_id"], []).append(index)
+    batches: List[DeliveryBatch] = []
+    batch_pickups: List[np.ndarray] = []
+    for restaurant_id, indices in by_restaurant.items():
+        pickup = pickups[indices[0]]
+        routes, lengths = build_routes(pickup, drops[indices], capacity, max_detour_m)
+        for route, length in zip(routes, lengths):
+            batches.append(DeliveryBatch(restaurant_id, [orders[indices[i]]["id"] for i in route], length))
+            batch_pickups.append(pickup)
+    timings["batching"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matches = assign_riders(np.array(batch_pickups, dtype=np.float32), rider_positions, max_pickup_m, candidates)
+    assigned = []
+    for batch_index, rider_index, distance in matches:
+        batch = batches[batch_index]
+        batch.rider_id = riders[rider_index]["id"]
+        batch.pickup_m = distance
+        assigned.append(batch)
+    timings["assignment"] = time.perf_counter() - started
+    return DispatchPlan(assigned, len(orders), len(riders), timings)
+
+
+class DispatchService:
+    """Tours de répartition en tâche de fond ; le calcul du plan tourne hors de la boucle d'événements."""
+
+    def __init__(
+        self,
+        repository,
+        capacity: int = DEFAULT_BATCH_CAPACITY,
+        max_detour_m: float = DEFAULT_MAX_DETOUR_M,
+        max_pickup_m: float = DEFAULT_MAX_PICKUP_M,
+        max_orders: int = DEFAULT_DISPATCH_MAX_ORDERS,
+    ):
+        self.db = repository
+        self.capacity = capacity
+        self.max_detour_m = max_detour_m
+        self.max_pickup_m = max_pickup_m
+        self.max_orders = max_orders
+        self._lock = asyncio.Lock()  # un seul tour à la fois (boucle et déclenchement manuel)
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+        self.assigned_orders = 0
+        self.rejected_batches = 0
+        self.last_round: Optional[Dict[str, Any]] = None
+
+    async def run_once(self) -> Dict[str, Any]:
+        async with self._lock:
+            pool = await self.db.rpc("dispatch_pool", {"p_max_orders": self.max_orders})
+            plan = await asyncio.to_thread(
+                plan_deliveries, pool["orders"], pool["riders"], self.capacity, self.max_detour_m, self.max_pickup_m
+            )
+            applied: List[Dict[str, Any]] = []
+            if plan.batches:
+                started = time.perf_counter()
+                applied = await self.db.rpc("assign_deliveries", {
+                    "p_assignments": [{"rider_id": batch.rider_id, "order_ids": batch.order_ids} for batch in plan.batches],
+                })
+                plan.timings["apply"] = time.perf_counter() - started
+            summary = plan.summary()
+            # Lots refusés par assign_deliveries : livreur ou commande pris entre la lecture et l'écriture
+            summary["applied_orders"] = sum(len(assignment["order_ids"]) for assignment in applied)
+            summary["unassigned_orders"] = plan.orders - summary["applied_orders"]
+            summary["rejected_batches"] = len(plan.batches) - len(applied)
+            self.rounds += 1
+            self.assigned_orders += summary["applied_orders"]
+            self.rejected_batches += summary["rejected_batches"]
+            self.last_round = summary
+            if plan.orders:
+                logger.info(
+                    "Répartition: %s/%s commandes affectées en %s tournées (%s livreurs libres), %.0f m par commande",
+                    summary["applied_orders"], plan.orders, len(applied), plan.riders, summary["distance_per_order_m"] or 0,
+                )
+            return summary
+
+    def start(self, interval: float = DEFAULT_DISPATCH_INTERVAL_SECONDS) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Échec du tour de répartition des livraisons: %s", e, exc_info=True)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "rounds": self.rounds,
+            "assigned_orders": self.assigned_orders,
+            "rejected_batches": self.rejected_batches,
+            "last_round": self.last_round,
+        }
@@ -0,0 +1,264 @@
+"""Heure de livraison estimée (`estimated_delivery_time`) à partir de statistiques tenues au fil de l'eau.
+
+Une livraison est découpée en quatre phases, mesurées à chaque changement de statut dans
+PUT /api/orders/{id} (horodatages confirmed_at, ready_at, picked_up_at, delivered_at, écrits
+par la fonction SQL update_order, voir sql/eta.sql) :
+- acceptation (created_at -> confirmed_at) et préparation (confirmed_at -> ready_at), par restaurant ;
+- attente du livreur (ready_at -> picked_up_at), par zone du restaurant ;
+- trajet (picked_up_at -> delivered_at), en secondes par km à vol d'oiseau, par zone de livraison.
+
+Chaque statistique est une moyenne et une variance à pondération exponentielle, mises à jour
+en O(1) par observation : pas de relecture de l'historique, et les dernières semaines
+comptent plus que les anciennes. Une estimation combine la statistique la plus précise
+(restaurant, zone) et la statistique globale de la phase, au prorata du nombre
+d'observations (une clé peu observée reste proche de la moyenne globale).
+
+À la création, `plan` calcule la durée restante à l'entrée dans chaque statut ; la commande
+garde ce plan (colonne eta_plan) et update_order en tire la nouvelle heure estimée dans la
+même requête que le changement de statut.
+
+Les statistiques sont sauvegardées dans la table eta_statistics (lignes modifiées, toutes les
+ETA_FLUSH_SECONDS) et relues au démarrage. Avec plusieurs workers uvicorn, chacun apprend des
+commandes qu'il traite et la dernière sauvegarde l'emporte.
+"""
+import asyncio
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ChopExpress.backend.geo import haversine_m
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ETA_ALPHA = 0.05  # poids d'une nouvelle observation (~ les 20 dernières comptent pour 64 %)
+DEFAULT_ETA_PRIOR_WEIGHT = 5.0  # observations d'une clé pour peser autant que la moyenne globale
+DEFAULT_ETA_FLUSH_SECONDS = 60.0
+ZONE_DEGREES = 0.02  # ~2,2 km
+MIN_TRIP_KM = 0.5  # en dessous, le temps de trajet est surtout fixe (stationnement, remise)
+# Hors de ces bornes : statuts saisis d'affilée ou oubliés puis rattrapés, pas une durée réelle
+MIN_PHASE_SECONDS = 10
+MAX_PHASE_SECONDS = 4 * 3600
+
+PHASE_CONFIRM = "confirm"
+PHASE_PREP = "prep"
+PHASE_PICKUP = "pickup"
+PHASE_TRAVEL = "travel"  # secondes par km
+# Valeurs de départ tant qu'aucune commande n'a été observée
+DEFAULT_PHASE_SECONDS = {PHASE_CONFIRM: 180.0, PHASE_PREP: 1200.0, PHASE_PICKUP: 480.0, PHASE_TRAVEL: 240.0}
+DEFAULT_TRIP_KM = 3.0  # distance supposée quand une position manque
+
+# Statut -> colonne horodatée à l'entrée dans ce statut
+STATUS_TIMESTAMP_COLUMNS = {
+    "confirmed": "confirmed_at",
+    "ready_for_pickup": "ready_at",
+    "out_for_delivery": "picked_up_at",
+    "delivered": "delivered_at",
+}
+# Statuts dont la durée restante est calculée à la création (eta_plan)
+PLAN_STATUSES = ("pending", "confirmed", "preparing", "ready_for_pickup", "out_for_delivery")
+GLOBAL_KEY = "*"
+
+
+def zone_key(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return f"{math.floor(latitude / ZONE_DEGREES)}:{math.floor(longitude / ZONE_DEGREES)}"
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    # Horodatages PostgREST (ISO 8601) ; sans fuseau (colonnes `timestamp`) = UTC
+    if value is None:
+        return None
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class RunningStat:
+    """Moyenne et variance à pondération exponentielle, exactes (arithmétiques) sur les 1/alpha premières valeurs."""
+
+    __slots__ = ("count", "mean", "variance")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, variance: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.variance = variance
+
+    def add(self, value: float, alpha: float) -> None:
+        self.count += 1
+        weight = max(alpha, 1.0 / self.count)
+        delta = value - self.mean
+        increment = weight * delta
+        self.mean += increment
+        self.variance = (1 - weight) * (self.variance + delta * increment)
+
+
+class EtaService:
+    def __init__(self, repository=None, alpha: float = DEFAULT_ETA_ALPHA, prior_weight: float = DEFAULT_ETA_PRIOR_WEIGHT):
+        self.db = repository
+        self.alpha = alpha
+        self.prior_weight = prior_weight
+        self._stats: Dict[Tuple[str, str], RunningStat] = {}
+        self._dirty: set = set()
+        self._restaurants: Dict[int, Tuple[float, float]] = {}  # id -> (latitude, longitude)
+        self._task: Optional[asyncio.Task] = None
+        self.observations = 0
+        self.rejected_observations = 0
+
+    # --- Positions des restaurants (distance du trajet) ---
+    def set_restaurant(self, restaurant_data: Dict[str, Any]) -> None:
+        latitude, longitude = restaurant_data.get("latitude"), restaurant_data.get("longitude")
+        if latitude is not None and longitude is not None:
+            self._restaurants[restaurant_data["id"]] = (latitude, longitude)
+
+    # --- Estimation ---
+    def _phase(self, phase: str, key: Optional[str]) -> float:
+        overall = self._stats.get((phase, GLOBAL_KEY))
+        estimate = overall.mean if overall else DEFAULT_PHASE_SECONDS[phase]
+        specific = self._stats.get((phase, key)) if key is not None else None
+        if specific:
+            # Moyenne de la clé tirée vers la moyenne globale tant qu'elle a peu d'observations
+            estimate = (specific.count * specific.mean + self.prior_weight * estimate) / (specific.count + self.prior_weight)
+        return estimate
+
+    def _trip_km(self, restaurant: Optional[Tuple[float, float]], latitude: Optional[float], longitude: Optional[float]) -> float:
+        if restaurant is None or latitude is None or longitude is None:
+            return DEFAULT_TRIP_KM
+        return max(MIN_TRIP_KM, haversine_m(restaurant[0], restaurant[1], latitude, longitude) / 1000)
+
+    def plan(self, restaurant_id: int, latitude: Optional[float], longitude: Optional[float]) -> Dict[str, int]:
+        """Durée restante estimée (secondes) à l'entrée dans chaque statut de PLAN_STATUSES."""
+        restaurant = self._restaurants.get(restaurant_id)
+        restaurant_key = str(restaurant_id)
+        remaining = self._phase(PHASE_TRAVEL, zone_key(latitude, longitude)) * self._trip_km(restaurant, latitude, longitude)
+        plan = {"out_for_delivery": remaining}
+        remaining += self._phase(PHASE_PICKUP, zone_key(*restaurant) if restaurant else None)
+        plan["ready_for_pickup"] = remaining
+        # « preparing » sans horodatage propre : la préparation est comptée depuis confirmed_at
+        remaining += self._phase(PHASE_PREP, restaurant_key)
+        plan["preparing"] = plan["confirmed"] = remaining
+        plan["pending"] = remaining + self._phase(PHASE_CONFIRM, restaurant_key)
+        return {status: round(plan[status]) for status in PLAN_STATUSES}
+
+    def estimate(self, restaurant_id: int, latitude: Optional[float], longitude: Optional[float], now: Optional[datetime] = None) -> datetime:
+        now = now or datetime.now(timezone.utc)
+        return now + timedelta(seconds=self.plan(restaurant_id, latitude, longitude)["pending"])
+
+    # --- Apprentissage ---
+    def observe(self, phase: str, key: Optional[str], seconds: float, divisor: float = 1.0) -> bool:
+        # divisor : distance en km pour le trajet (la statistique est une allure en s/km)
+        if not MIN_PHASE_SECONDS <= seconds <= MAX_PHASE_SECONDS:
+            self.rejected_observations += 1
+            return False
+        seconds /= divisor
+        for stat_key in ((phase, GLOBAL_KEY), (phase, key)) if key is not None else ((phase, GLOBAL_KEY),):
+            stat = self._stats.get(stat_key)
+            if stat is None:
+                stat = self._stats[stat_key] = RunningStat()
+            stat.add(seconds, self.alpha)
+            self._dirty.add(stat_key)
+        self.observations += 1
+        return True
+
+    def record_transition(self, order: Dict[str, Any]) -> bool:
+        """Apprend la durée de la phase terminée par le statut que `order` vient d'atteindre.
+
+        `order` : la commande après la mise à jour, horodatage du nouveau statut compris.
+        """
+        status = order["status"]
+        column = STATUS_TIMESTAMP_COLUMNS.get(status)
+        reached_at = parse_timestamp(order.get(column)) if column else None
+        if reached_at is None:
+            return False
+        restaurant_id = order["restaurant_id"]
+        latitude, longitude = order.get("delivery_latitude"), order.get("delivery_longitude")
+        started_at = {
+            "confirmed": order.get("created_at"),
+            "ready_for_pickup": order.get("confirmed_at") or order.get("created_at"),
+            "out_for_delivery": order.get("ready_at"),
+            "delivered": order.get("picked_up_at"),
+        }[status]
+        if started_at is None:
+            return False
+        seconds = (reached_at - parse_timestamp(started_at)).total_seconds()
+        if status == "confirmed":
+            return self.observe(PHASE_CONFIRM, str(restaurant_id), seconds)
+        if status == "ready_for_pickup":
+            return self.observe(PHASE_PREP, str(restaurant_id), seconds)
+        if status == "out_for_delivery":
+            restaurant = self._restaurants.get(restaurant_id)
+            return self.observe(PHASE_PICKUP, zone_key(*restaurant) if restaurant else None, seconds)
+        trip_km = self._trip_km(self._restaurants.get(restaurant_id), latitude, longitude)
+        return self.observe(PHASE_TRAVEL, zone_key(latitude, longitude), seconds, trip_km)
+
+    # --- Sauvegarde (table eta_statistics) ---
+    def _load_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._stats[(row["phase"], row["key"])] = RunningStat(row["count"], row["mean"], row["variance"])
+
+    async def load(self) -> int:
+        rows = await self.db.select_all("eta_statistics", "id, phase, key, count, mean, variance")
+        self._load_rows(rows)
+        restaurants = await self.db.select_all("restaurants", "id, latitude, longitude")
+        for restaurant in restaurants:
+            self.set_restaurant(restaurant)
+        logger.info("Statistiques ETA chargées: %s clés, %s restaurants positionnés", len(rows), len(self._restaurants))
+        return len(rows)
+
+    async def flush(self) -> int:
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, set()
+        rows = [
+            {"phase": phase, "key": key, "count": stat.count, "mean": stat.mean, "variance": stat.variance,
+             "updated_at": datetime.now(timezone.utc).isoformat()}
+            for phase, key in dirty for stat in (self._stats[(phase, key)],)
+        ]
+        try:
+            await self.db.upsert("eta_statistics", rows, on_conflict="phase,key")
+        except Exception:
+            self._dirty |= dirty  # réessayé à la prochaine sauvegarde
+            raise
+        return len(rows)
+
+    def start(self, flush_interval: float = DEFAULT_ETA_FLUSH_SECONDS) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop(flush_interval))
+
+    async def _flush_loop(self, flush_interval: float) -> None:
+        while True:
+            await asyncio.sleep(flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Échec de la sauvegarde des statistiques ETA: %s", e, exc_info=True)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.db:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Échec de la sauvegarde des statistiques ETA à l'arrêt: %s", e, exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        phases: Dict[str, Dict[str, Any]] = {}
+        for (phase, key), stat in self._stats.items():
+            entry = phases.setdefault(phase, {"keys": 0})
+            if key == GLOBAL_KEY:
+                entry.update(count=stat.count, mean_seconds=round(stat.mean, 1), stddev_seconds=round(math.sqrt(stat.variance), 1))
+            else:
+                entry["keys"] += 1
+        return {
+            "observations": self.observations,
+            "rejected_observations": self.rejected_observations,
+            "restaurants": len(self._restaurants),
+            "pending_flush": len(self._dirty),
+            "phases": phases,
+        }
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"phase": phase, "key": key, "count": s.count, "mean": s.mean, "variance": s.variance} for (phase, key), s in self._stats.items()]
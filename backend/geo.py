@@ -0,0 +1,83 @@
+"""Index spatial en mémoire pour les restaurants proches (repli de la fonction SQL nearby_restaurants).
+
+Grille régulière en degrés, à la manière d'un geohash : chaque restaurant est rangé
+dans sa cellule, une recherche parcourt les anneaux de cellules autour du point
+jusqu'à ce qu'aucune cellule plus lointaine ne puisse contenir un meilleur résultat.
+Seules quelques cellules sont visitées au lieu de calculer la distance à tout le catalogue.
+La coupure de l'antiméridien (±180°) n'est pas gérée : inutile pour le Cameroun.
+"""
+import heapq
+import math
+from typing import Any, Dict, Iterable, List, Tuple
+
+EARTH_RADIUS_M = 6_371_008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+DEFAULT_CELL_DEGREES = 0.01  # ~1,1 km
+
+DEFAULT_NEARBY_RADIUS_M = 5000
+MAX_NEARBY_RADIUS_M = 50_000
+DEFAULT_NEARBY_LIMIT = 20
+MAX_NEARBY_LIMIT = 100
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    def __init__(self, points: Iterable[Tuple[float, float, Any]], cell_degrees: float = DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, Any]]] = {}
+        for lat, lng, value in points:
+            self._cells.setdefault(self._cell(lat, lng), []).append((lat, lng, value))
+        self.size = sum(len(cell) for cell in self._cells.values())
+        rows = [i for i, _ in self._cells] or [0]
+        cols = [j for _, j in self._cells] or [0]
+        self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees)
+
+    def _ring(self, ci: int, cj: int, ring: int) -> Iterable[Tuple[int, int]]:
+        if ring == 0:
+            yield ci, cj
+            return
+        for j in range(cj - ring, cj + ring + 1):
+            yield ci - ring, j
+            yield ci + ring, j
+        for i in range(ci - ring + 1, ci + ring):
+            yield i, cj - ring
+            yield i, cj + ring
+
+    def nearest(self, lat: float, lng: float, radius_m: float, limit: int) -> List[Tuple[float, Any]]:
+        """Au plus `limit` couples (distance en mètres, valeur) dans `radius_m`, du plus proche au plus loin."""
+        ci, cj = self._cell(lat, lng)
+        # Mètres par cellule dans le sens le plus étroit (longitude, à la latitude la plus haute atteignable)
+        max_lat = min(89.9, abs(lat) + radius_m / METERS_PER_DEGREE)
+        cell_m = self.cell_degrees * METERS_PER_DEGREE * math.cos(math.radians(max_lat))
+        min_i, max_i, min_j, max_j = self._bounds
+        last_ring = min(
+            int(radius_m / cell_m) + 1,
+            max(abs(ci - min_i), abs(ci - max_i), abs(cj - min_j), abs(cj - max_j)),
+        )
+        best: List[Tuple[float, int, Any]] = []  # tas max via distances négatives
+        counter = 0
+        for ring in range(last_ring + 1):
+            # Tout point de l'anneau `ring` est à au moins (ring - 1) cellules du point de recherche
+            if len(best) == limit and (ring - 1) * cell_m > -best[0][0]:
+                break
+            for cell in self._ring(ci, cj, ring):
+                for p_lat, p_lng, value in self._cells.get(cell, ()):
+                    distance = haversine_m(lat, lng, p_lat, p_lng)
+                    if distance > radius_m:
+                        continue
+                    counter += 1
+                    if len(best) < limit:
+                        heapq.heappush(best, (-distance, counter, value))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, counter, value))
+        return [(-neg_distance, value) for neg_distance, _, value in sorted(best, reverse=True)]
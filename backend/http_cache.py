@@ -0,0 +1,58 @@
+"""Réponses JSON conditionnelles (ETag / If-None-Match) pour les endpoints du catalogue.
+
+Le corps JSON est sérialisé une seule fois, au remplissage du cache catalogue, avec
+son ETag (empreinte du contenu). Une requête dont `If-None-Match` correspond
+reçoit un 304 sans corps : rien n'est resérialisé ni retéléchargé par le client.
+
+L'ETag est faible (W/"...") : GZipMiddleware sert le même contenu compressé ou non, et
+un validateur fort doit différer d'une représentation à l'autre. `Vary: Accept-Encoding`
+empêche les caches intermédiaires de servir une version gzip à un client qui ne l'accepte pas.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional, Union
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+# Le client garde sa copie mais doit la revalider à chaque fois (304 si inchangée)
+CATALOGUE_CACHE_CONTROL = "no-cache"
+# URL versionnée (?v=...) : le contenu ne change jamais pour cette URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class CachedJSON:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+def build_cached_json(model: Union[BaseModel, Dict[str, Any]]) -> CachedJSON:
+    if isinstance(model, BaseModel):
+        body = model.model_dump_json().encode()
+    else:
+        body = json.dumps(model, ensure_ascii=False, separators=(",", ":")).encode()
+    return CachedJSON(body, f'W/"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match utilise la comparaison faible : W/"x" correspond à "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_opaque_tag(tag) == _opaque_tag(etag) for tag in if_none_match.split(","))
+
+
+def conditional_json_response(request: Request, cached: CachedJSON, status_code: int = 200, cache_control: str = CATALOGUE_CACHE_CONTROL) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,149 @@
+"""Configuration des logs : écriture hors de la boucle d'événements, JSON, échantillonnage, masquage.
+
+- `logger.info("... %s", valeur)` plutôt qu'une f-string : le message n'est formaté que
+  si le niveau le laisse passer.
+- Le handler racine est un `QueueHandler` : l'appelant ne fait que mettre l'enregistrement
+  dans une file, un `QueueListener` (thread) formate et écrit sur stdout. Une écriture
+  lente (disque, pipe de journald plein) ne bloque jamais la boucle d'événements.
+- `LOG_FORMAT=json` : un objet JSON par ligne (champs `extra=` inclus), pour Loki/ELK.
+- Échantillonnage : un enregistrement DEBUG/INFO portant `extra={"event": nom}` n'est gardé
+  qu'une fois sur N si `nom` figure dans LOG_SAMPLE_RATES (« webhook.message=100,... »).
+  Les WARNING et au-dessus ne sont jamais échantillonnés.
+- Les numéros de téléphone sont masqués (« 237******01 ») dans les messages, les
+  tracebacks et les champs `extra`.
+"""
+import atexit
+import itertools
+import json
+import logging
+import queue
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+DEFAULT_LOG_FORMAT = "text"
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+DEFAULT_LOG_QUEUE_SIZE = 10000
+
+# 9 à 15 chiffres consécutifs (E.164, avec ou sans « + ») : on garde l'indicatif et les 2 derniers
+PHONE_RE = re.compile(r"(?<!\d)(?<!\d\.)(\+?\d{3})(\d{4,10})(\d{2})(?!\d)(?!\.\d)")  # pas les décimales
+
+# Attributs standard d'un LogRecord : tout le reste vient de `extra=`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def redact_phone_numbers(text: str) -> str:
+    return PHONE_RE.sub(lambda match: match.group(1) + "*" * len(match.group(2)) + match.group(3), text)
+
+
+def parse_sample_rates(spec: Optional[str]) -> Dict[str, int]:
+    # « webhook.received=100, webhook.message=10 » -> {"webhook.received": 100, ...}
+    rates = {}
+    for entry in (spec or "").split(","):
+        name, _, rate = entry.strip().partition("=")
+        if name and rate.strip().isdigit() and int(rate) > 1:
+            rates[name] = int(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Garde 1 enregistrement sur N par événement (`extra={"event": ...}`), avant tout formatage."""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counters: Dict[str, Any] = {name: itertools.count() for name in rates}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None or record.levelno >= logging.WARNING or event not in self.rates:
+            return True
+        return next(self._counters[event]) % self.rates[event] == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    # Formate le message dans le thread appelant (les arguments peuvent changer ensuite) mais
+    # laisse la mise en forme finale (texte ou JSON) et le masquage au thread d'écriture.
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Mieux vaut perdre un log que bloquer la boucle d'événements
+            self.dropped += 1
+
+
+class _QueueListener(QueueListener):
+    def stop(self) -> None:
+        # Arrêt idempotent : appelé explicitement et/ou à la sortie du processus
+        if self._thread is not None:
+            super().stop()
+
+
+class RedactingTextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return redact_phone_numbers(super().format(record))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact_phone_numbers(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = redact_phone_numbers(value) if isinstance(value, str) else value
+        if record.exc_text:
+            entry["exception"] = redact_phone_numbers(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = DEFAULT_LOG_FORMAT,
+    sample_rates: Optional[Dict[str, int]] = None,
+    queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+    stream=None,
+) -> QueueListener:
+    """Remplace les handlers du logger racine par une file vidée par un thread d'écriture.
+
+    Le thread est arrêté à la sortie du processus, après les derniers logs d'uvicorn.
+    """
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == "json" else RedactingTextFormatter(TEXT_FORMAT))
+
+    handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    # Logs d'uvicorn (accès compris) par la même file, au lieu de ses handlers synchrones
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+
+    listener = _QueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # vide la file avant de quitter
+    return listener
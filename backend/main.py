@@ -1,26 +1,362 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import uvicorn
+import asyncio
 import os
-from datetime import datetime
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 import logging
 from typing import Dict, Any, List, Optional
-from supabase import create_client, Client
 # import ChopExpress.backend.models as models # Commenté car nous utilisons principalement l'API Supabase
 import ChopExpress.backend.schemas as schemas
+from ChopExpress.backend.analytics import (
+    DEFAULT_ANALYTICS_FLUSH_SECONDS,
+    DEFAULT_ANALYTICS_UTC_OFFSET_HOURS,
+    DEFAULT_TOP_ITEMS_LIMIT,
+    GRANULARITIES,
+    MAX_BUCKETS,
+    MAX_TOP_ITEMS_LIMIT,
+    AnalyticsService,
+)
+from ChopExpress.backend.cache import DEFAULT_CACHE_MAX_ENTRIES, DEFAULT_CACHE_TTL_SECONDS, TTLCache
+from ChopExpress.backend.message_dedup import (
+    DEFAULT_DEDUP_MAX_ENTRIES,
+    DEFAULT_DEDUP_TTL_SECONDS,
+    InMemoryDedupStore,
+    SupabaseDedupStore,
+)
+from ChopExpress.backend.dispatch import (
+    DEFAULT_BATCH_CAPACITY,
+    DEFAULT_DISPATCH_MAX_ORDERS,
+    DEFAULT_MAX_DETOUR_M,
+    DEFAULT_MAX_PICKUP_M,
+    DispatchService,
+)
+from ChopExpress.backend.eta import (
+    DEFAULT_ETA_ALPHA,
+    DEFAULT_ETA_FLUSH_SECONDS,
+    DEFAULT_ETA_PRIOR_WEIGHT,
+    EtaService,
+)
+from ChopExpress.backend.geo import (
+    DEFAULT_NEARBY_LIMIT,
+    DEFAULT_NEARBY_RADIUS_M,
+    MAX_NEARBY_LIMIT,
+    MAX_NEARBY_RADIUS_M,
+    GeoIndex,
+)
+from ChopExpress.backend.http_cache import IMMUTABLE_CACHE_CONTROL, build_cached_json, conditional_json_response
+from ChopExpress.backend.logging_config import DEFAULT_LOG_FORMAT, configure_logging, parse_sample_rates
+from ChopExpress.backend.menu_import import (
+    CONTENT_TYPES,
+    DEFAULT_MENU_IMPORT_CHUNK_SIZE,
+    DEFAULT_MENU_IMPORT_MAX_ROWS,
+    MenuImporter,
+    MenuImportFormatError,
+    UnsupportedFormatError,
+    detect_format,
+    export_menu_items,
+    iter_records,
+)
+from ChopExpress.backend.metrics import (
+    DEFAULT_EVENT_LOOP_LAG_INTERVAL_SECONDS,
+    EventLoopLagMonitor,
+    PrometheusMiddleware,
+    gauge_callback,
+    render_metrics,
+    validate_model,
+    validate_models,
+)
+from ChopExpress.backend.order_events import (
+    DEFAULT_ORDER_STREAM_HEARTBEAT_SECONDS,
+    DEFAULT_ORDER_STREAM_HISTORY,
+    DEFAULT_ORDER_STREAM_MAX_SUBSCRIBERS,
+    DEFAULT_ORDER_STREAM_QUEUE_SIZE,
+    EVENT_ORDER_CREATED,
+    EVENT_ORDER_UPDATED,
+    HEARTBEAT_FRAME,
+    RESYNC_FRAME,
+    RETRY_FRAME,
+    OrderEventBroker,
+    OrderSubscription,
+    TooManySubscribersError,
+)
+from ChopExpress.backend.repository import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    DatabaseFunctionError,
+    InvalidCursorError,
+    Repository,
+    create_repository,
+)
+from ChopExpress.backend.search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, MenuSearchIndex
+from ChopExpress.backend.sessions import (
+    DEFAULT_SESSION_MAX_ENTRIES,
+    DEFAULT_SESSION_TTL_SECONDS,
+    STEP_AWAITING_ADDRESS,
+    STEP_CART,
+    ConversationSession,
+    InMemorySessionStore,
+    SupabaseSessionStore,
+)
+from ChopExpress.backend.translations import (
+    DEFAULT_LOCALE,
+    DEFAULT_TRANSLATIONS_FULL_RELOAD_SECONDS,
+    DEFAULT_TRANSLATIONS_REFRESH_SECONDS,
+    TranslationService,
+)
+from ChopExpress.backend.webhook_queue import (
+    DEFAULT_WEBHOOK_QUEUE_MAXSIZE,
+    DEFAULT_WEBHOOK_WORKERS,
+    InMemoryQueueBackend,
+    QueueFullError,
+    SupabaseQueueBackend,
+    WebhookWorkerPool,
+    jobs_from_webhook,
+)
+from ChopExpress.backend.whatsapp_sender import (
+    DEFAULT_GRAPH_API_URL,
+    DEFAULT_GRAPH_API_VERSION,
+    DEFAULT_MESSAGES_PER_SECOND,
+    DEFAULT_SENDER_WORKERS,
+    PRIORITY_CONVERSATION,
+    PRIORITY_TRANSACTIONAL,
+    OutboundQueueFullError,
+    create_whatsapp_sender,
+    text_message,
+)
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO)
+# Configuration du logging (file + thread d'écriture, voir logging_config.py)
+log_listener = configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    log_format=os.getenv("LOG_FORMAT", DEFAULT_LOG_FORMAT),
+    sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "webhook.received=10,webhook.message=10")),
+)
 logger = logging.getLogger(__name__)
 
+# Variables d'environnement
+WHATSAPP_VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN", "chopexpress_verify_token")
+WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
+WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
+WHATSAPP_GRAPH_API_URL = os.getenv("WHATSAPP_GRAPH_API_URL", DEFAULT_GRAPH_API_URL)
+WHATSAPP_API_VERSION = os.getenv("WHATSAPP_API_VERSION", DEFAULT_GRAPH_API_VERSION)
+WHATSAPP_SENDER_WORKERS = int(os.getenv("WHATSAPP_SENDER_WORKERS", str(DEFAULT_SENDER_WORKERS)))
+WHATSAPP_MESSAGES_PER_SECOND = float(os.getenv("WHATSAPP_MESSAGES_PER_SECOND", str(DEFAULT_MESSAGES_PER_SECOND)))
+WHATSAPP_HTTP2 = os.getenv("WHATSAPP_HTTP2", "true").lower() == "true"
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
+CINETPAY_API_KEY = os.getenv("CINETPAY_API_KEY")
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+WEBHOOK_DEDUP_BACKEND = os.getenv("WEBHOOK_DEDUP_BACKEND", "memory") # memory | supabase
+WEBHOOK_DEDUP_TTL = float(os.getenv("WEBHOOK_DEDUP_TTL", str(DEFAULT_DEDUP_TTL_SECONDS)))
+WEBHOOK_DEDUP_MAX_ENTRIES = int(os.getenv("WEBHOOK_DEDUP_MAX_ENTRIES", str(DEFAULT_DEDUP_MAX_ENTRIES)))
+NEARBY_SEARCH_BACKEND = os.getenv("NEARBY_SEARCH_BACKEND", "database") # database (sql/nearby_restaurants.sql) | memory
+CONVERSATION_SESSION_BACKEND = os.getenv("CONVERSATION_SESSION_BACKEND", "memory") # memory | supabase
+CONVERSATION_SESSION_TTL = float(os.getenv("CONVERSATION_SESSION_TTL", str(DEFAULT_SESSION_TTL_SECONDS)))
+CONVERSATION_SESSION_MAX_ENTRIES = int(os.getenv("CONVERSATION_SESSION_MAX_ENTRIES", str(DEFAULT_SESSION_MAX_ENTRIES)))
+TRANSLATIONS_DEFAULT_LOCALE = os.getenv("TRANSLATIONS_DEFAULT_LOCALE", DEFAULT_LOCALE)
+TRANSLATIONS_REFRESH_SECONDS = float(os.getenv("TRANSLATIONS_REFRESH_SECONDS", str(DEFAULT_TRANSLATIONS_REFRESH_SECONDS)))
+TRANSLATIONS_FULL_RELOAD_SECONDS = float(os.getenv("TRANSLATIONS_FULL_RELOAD_SECONDS", str(DEFAULT_TRANSLATIONS_FULL_RELOAD_SECONDS)))
+ORDER_STREAM_QUEUE_SIZE = int(os.getenv("ORDER_STREAM_QUEUE_SIZE", str(DEFAULT_ORDER_STREAM_QUEUE_SIZE)))
+ORDER_STREAM_HISTORY = int(os.getenv("ORDER_STREAM_HISTORY", str(DEFAULT_ORDER_STREAM_HISTORY)))
+ORDER_STREAM_MAX_SUBSCRIBERS = int(os.getenv("ORDER_STREAM_MAX_SUBSCRIBERS", str(DEFAULT_ORDER_STREAM_MAX_SUBSCRIBERS)))
+ORDER_STREAM_HEARTBEAT_SECONDS = float(os.getenv("ORDER_STREAM_HEARTBEAT_SECONDS", str(DEFAULT_ORDER_STREAM_HEARTBEAT_SECONDS)))
+METRICS_EVENT_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_EVENT_LOOP_LAG_INTERVAL", str(DEFAULT_EVENT_LOOP_LAG_INTERVAL_SECONDS)))
+MENU_SEARCH_REBUILD_SECONDS = float(os.getenv("MENU_SEARCH_REBUILD_SECONDS", "600"))
+MENU_IMPORT_CHUNK_SIZE = int(os.getenv("MENU_IMPORT_CHUNK_SIZE", str(DEFAULT_MENU_IMPORT_CHUNK_SIZE)))
+MENU_IMPORT_MAX_ROWS = int(os.getenv("MENU_IMPORT_MAX_ROWS", str(DEFAULT_MENU_IMPORT_MAX_ROWS)))
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("DISPATCH_INTERVAL_SECONDS", "0")) # 0 : pas de répartition automatique
+DISPATCH_BATCH_CAPACITY = int(os.getenv("DISPATCH_BATCH_CAPACITY", str(DEFAULT_BATCH_CAPACITY)))
+DISPATCH_MAX_DETOUR_M = float(os.getenv("DISPATCH_MAX_DETOUR_M", str(DEFAULT_MAX_DETOUR_M)))
+DISPATCH_MAX_PICKUP_M = float(os.getenv("DISPATCH_MAX_PICKUP_M", str(DEFAULT_MAX_PICKUP_M)))
+DISPATCH_MAX_ORDERS = int(os.getenv("DISPATCH_MAX_ORDERS", str(DEFAULT_DISPATCH_MAX_ORDERS)))
+ETA_ALPHA = float(os.getenv("ETA_ALPHA", str(DEFAULT_ETA_ALPHA)))
+ETA_PRIOR_WEIGHT = float(os.getenv("ETA_PRIOR_WEIGHT", str(DEFAULT_ETA_PRIOR_WEIGHT)))
+ETA_FLUSH_SECONDS = float(os.getenv("ETA_FLUSH_SECONDS", str(DEFAULT_ETA_FLUSH_SECONDS)))
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", str(DEFAULT_ANALYTICS_FLUSH_SECONDS)))
+ANALYTICS_UTC_OFFSET_HOURS = float(os.getenv("ANALYTICS_UTC_OFFSET_HOURS", str(DEFAULT_ANALYTICS_UTC_OFFSET_HOURS)))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "3600"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "50000"))
+USER_CACHE_NEGATIVE_TTL = float(os.getenv("USER_CACHE_NEGATIVE_TTL", "10"))
+CATALOGUE_CACHE_TTL = float(os.getenv("CATALOGUE_CACHE_TTL", str(DEFAULT_CACHE_TTL_SECONDS)))
+WEBHOOK_QUEUE_BACKEND = os.getenv("WEBHOOK_QUEUE_BACKEND", "memory") # memory | supabase
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", str(DEFAULT_WEBHOOK_WORKERS)))
+WEBHOOK_QUEUE_MAXSIZE = int(os.getenv("WEBHOOK_QUEUE_MAXSIZE", str(DEFAULT_WEBHOOK_QUEUE_MAXSIZE)))
+CATALOGUE_CACHE_MAX_ENTRIES = int(os.getenv("CATALOGUE_CACHE_MAX_ENTRIES", str(DEFAULT_CACHE_MAX_ENTRIES)))
+STARTUP_WARM_CONNECTIONS = int(os.getenv("STARTUP_WARM_CONNECTIONS", "10"))
+STARTUP_WARM_MENU_SEARCH = os.getenv("STARTUP_WARM_MENU_SEARCH", "true").lower() == "true"
+READYZ_TIMEOUT_SECONDS = float(os.getenv("READYZ_TIMEOUT_SECONDS", "2"))
+
+# Initialisation de la couche d'accès aux données (client PostgREST asynchrone, pool partagé).
+# Le client HTTP n'est créé qu'au premier usage, puis son pool est préchauffé au démarrage.
+db: Optional[Repository] = None
+if SUPABASE_URL and SUPABASE_KEY:
+    db = create_repository(SUPABASE_URL, SUPABASE_KEY, max_connections=SUPABASE_MAX_CONNECTIONS, timeout=SUPABASE_TIMEOUT)
+else:
+    logger.error("SUPABASE_URL et/ou SUPABASE_KEY ne sont pas configurés. Le client Supabase ne sera pas initialisé.")
+
+# Cache des lectures du catalogue (restaurants, menus), invalidé par les endpoints d'écriture
+catalogue_cache = TTLCache(max_entries=CATALOGUE_CACHE_MAX_ENTRIES, ttl=CATALOGUE_CACHE_TTL)
+
+def invalidate_restaurant_cache(restaurant_id: int):
+    # Un restaurant modifié ou désactivé change sa fiche, son menu (404 si inactif) et les pages de la liste
+    catalogue_cache.invalidate(("restaurant", restaurant_id), ("menu", restaurant_id))
+    catalogue_cache.invalidate_namespace("restaurants")
+
+def invalidate_menu_cache(restaurant_id: int):
+    catalogue_cache.invalidate(("menu", restaurant_id))
+
+# Identifiants de messages WhatsApp déjà traités (livraison « au moins une fois »)
+if WEBHOOK_DEDUP_BACKEND == "supabase" and db:
+    message_dedup = SupabaseDedupStore(db, ttl=WEBHOOK_DEDUP_TTL)
+else:
+    if WEBHOOK_DEDUP_BACKEND == "supabase":
+        logger.error("WEBHOOK_DEDUP_BACKEND=supabase sans client Supabase : déduplication en mémoire.")
+    message_dedup = InMemoryDedupStore(ttl=WEBHOOK_DEDUP_TTL, max_entries=WEBHOOK_DEDUP_MAX_ENTRIES)
+
+# Sessions de conversation du bot (étape en cours, panier avant création de la commande)
+if CONVERSATION_SESSION_BACKEND == "supabase" and db:
+    conversation_sessions = SupabaseSessionStore(db, ttl=CONVERSATION_SESSION_TTL)
+else:
+    if CONVERSATION_SESSION_BACKEND == "supabase":
+        logger.error("CONVERSATION_SESSION_BACKEND=supabase sans client Supabase : sessions en mémoire.")
+    conversation_sessions = InMemorySessionStore(ttl=CONVERSATION_SESSION_TTL, max_entries=CONVERSATION_SESSION_MAX_ENTRIES)
+
+# Numéro de téléphone -> utilisateur, pour le webhook (la correspondance ne change quasiment jamais).
+# Les résolutions en échec sont mémorisées brièvement : un numéro qui échoue ne martèle pas la base.
+user_cache = TTLCache(max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL)
+failed_user_cache = TTLCache(max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_NEGATIVE_TTL)
+
+# Catalogue des traductions (bot et frontend) : chargé au démarrage puis rafraîchi par filigrane updated_at
+translations = TranslationService(db, default_locale=TRANSLATIONS_DEFAULT_LOCALE)
+
+# Flux temps réel des commandes pour les tableaux de bord (/api/orders/stream)
+order_events = OrderEventBroker(queue_size=ORDER_STREAM_QUEUE_SIZE, history_size=ORDER_STREAM_HISTORY, max_subscribers=ORDER_STREAM_MAX_SUBSCRIBERS)
+
+# Index de recherche des menus (/api/search et bot), construit au premier usage puis mis à jour par les écritures.
+# Les reconstructions se font sur un nouvel index, remplacé d'un bloc une fois prêt.
+menu_search_index = MenuSearchIndex()
+menu_search_built_at: Optional[float] = None
+menu_search_rebuild: Optional[asyncio.Task] = None
+menu_search_pending_writes: Optional[List[tuple]] = None  # écritures reçues pendant une reconstruction
+
+# Envoi des messages WhatsApp (client HTTP partagé, file de priorité, limites de débit de Meta)
+if WHATSAPP_ACCESS_TOKEN and WHATSAPP_PHONE_NUMBER_ID:
+    whatsapp_sender = create_whatsapp_sender(
+        WHATSAPP_ACCESS_TOKEN,
+        WHATSAPP_PHONE_NUMBER_ID,
+        api_url=WHATSAPP_GRAPH_API_URL,
+        api_version=WHATSAPP_API_VERSION,
+        http2=WHATSAPP_HTTP2,
+        concurrency=WHATSAPP_SENDER_WORKERS,
+        messages_per_second=WHATSAPP_MESSAGES_PER_SECOND,
+    )
+else:
+    whatsapp_sender = None
+    logger.warning("WHATSAPP_ACCESS_TOKEN et/ou WHATSAPP_PHONE_NUMBER_ID non configurés : les messages WhatsApp ne seront pas envoyés.")
+
+# Répartition des commandes prêtes entre les livreurs (sql/dispatch.sql)
+dispatch = DispatchService(
+    db,
+    capacity=DISPATCH_BATCH_CAPACITY,
+    max_detour_m=DISPATCH_MAX_DETOUR_M,
+    max_pickup_m=DISPATCH_MAX_PICKUP_M,
+    max_orders=DISPATCH_MAX_ORDERS,
+)
+
+# Heure de livraison estimée, apprise des changements de statut des commandes (sql/eta.sql)
+eta = EtaService(db, alpha=ETA_ALPHA, prior_weight=ETA_PRIOR_WEIGHT)
+
+# Ventes pré-agrégées par restaurant et par heure / jour pour le tableau de bord (sql/analytics.sql)
+analytics = AnalyticsService(db, utc_offset_hours=ANALYTICS_UTC_OFFSET_HOURS)
+
+# Retard de la boucle d'événements (chopexpress_event_loop_lag_seconds)
+event_loop_lag = EventLoopLagMonitor(METRICS_EVENT_LOOP_LAG_INTERVAL)
+
+# --- Démarrage et arrêt ---
+# Prêt (/readyz) seulement une fois le préchauffage terminé : pool Supabase, traductions,
+# statistiques ETA et index de recherche des menus, chargés en parallèle
+startup_report: Dict[str, Any] = {"ready": False, "warmup_ms": {}}
+warmup_task: Optional[asyncio.Task] = None
+
+async def _warm(name: str, step) -> None:
+    started = time.perf_counter()
+    try:
+        await step
+    except Exception as e:
+        logger.error("Préchauffage '%s' impossible au démarrage: %s", name, e, exc_info=True)
+    finally:
+        startup_report["warmup_ms"][name] = round((time.perf_counter() - started) * 1000, 1)
+
+async def _load_translations():
+    try:
+        await translations.load()
+    finally:
+        # En cas d'échec, le bot répond avec ses textes français par défaut ; le rafraîchissement réessaiera
+        translations.start(TRANSLATIONS_REFRESH_SECONDS, TRANSLATIONS_FULL_RELOAD_SECONDS)
+
+async def _load_eta():
+    try:
+        await eta.load()
+    finally:
+        # Estimations par défaut en attendant que les nouvelles commandes les affinent
+        eta.start(ETA_FLUSH_SECONDS)
+
+async def warm_up():
+    started = time.perf_counter()
+    if db:
+        steps = [_warm("supabase_pool", db.warm_up(STARTUP_WARM_CONNECTIONS)), _warm("translations", _load_translations()), _warm("eta", _load_eta())]
+        if STARTUP_WARM_MENU_SEARCH:
+            steps.append(_warm("menu_search", get_menu_search_index()))
+        await asyncio.gather(*steps)
+    startup_report["warmup_ms"]["total"] = round((time.perf_counter() - started) * 1000, 1)
+    startup_report["ready"] = True
+    logger.info("Préchauffage terminé en %.0f ms", startup_report["warmup_ms"]["total"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global warmup_task
+    event_loop_lag.start()
+    if db:
+        analytics.start(ANALYTICS_FLUSH_SECONDS)
+        if DISPATCH_INTERVAL_SECONDS > 0:
+            dispatch.start(DISPATCH_INTERVAL_SECONDS)
+    webhook_workers.start()
+    if whatsapp_sender:
+        whatsapp_sender.start()
+    # Préchauffage en tâche de fond : uvicorn accepte les connexions tout de suite (/livez),
+    # le load balancer attend /readyz
+    warmup_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        await asyncio.gather(warmup_task, return_exceptions=True)
+        await event_loop_lag.stop()
+        order_events.close()
+        await webhook_workers.stop()
+        await translations.stop()
+        await dispatch.stop()
+        await eta.stop()
+        await analytics.stop()
+        if whatsapp_sender:
+            await whatsapp_sender.stop()
+        if db:
+            await db.aclose()
+
 # Initialisation de l'application FastAPI
 app = FastAPI(
     title="ChopExpress API",
     description="Bot de Commande & Livraison via WhatsApp pour le Cameroun",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Configuration CORS
@@ -30,45 +366,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
-
-# Variables d'environnement
-WHATSAPP_VERIFY_TOKEN = os.getenv("WHATSAPP_VERIFY_TOKEN", "chopexpress_verify_token")
-WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
-CINETPAY_API_KEY = os.getenv("CINETPAY_API_KEY")
-
-# Initialisation du client Supabase
-supabase: Optional[Client] = None
-if SUPABASE_URL and SUPABASE_KEY:
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-else:
-    logger.error("SUPABASE_URL et/ou SUPABASE_KEY ne sont pas configurés. Le client Supabase ne sera pas initialisé.")
+# Compression des réponses volumineuses (listes de restaurants / menus) pour les clients en 3G
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Latence par route pour /metrics (le flux SSE reste ouvert : sa durée n'est pas une latence)
+app.add_middleware(PrometheusMiddleware, excluded_routes=("/api/orders/stream",))
 
 @app.get("/")
 async def root():
     return {
         "message": "ChopExpress API - Bot WhatsApp pour commandes et livraisons",
         "version": "1.0.0",
-        "status": "active" if supabase else "degraded (Supabase non configuré)",
+        "status": "active" if db else "degraded (Supabase non configuré)",
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, headers={"Content-Type": content_type})
+
+@app.get("/livez", include_in_schema=False)
+async def liveness_probe():
+    # Processus et boucle d'événements vivants ; aucune dépendance consultée, pour qu'une panne
+    # de Supabase ne fasse pas redémarrer les conteneurs
+    return {"status": "alive"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness_probe():
+    if not startup_report["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", "warmup_ms": startup_report["warmup_ms"]})
+    if not db:
+        return JSONResponse(status_code=503, content={"status": "degraded", "supabase_database": "non configuré"})
+    try:
+        await asyncio.wait_for(db.select_one("users", "id"), READYZ_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("Readiness : Supabase injoignable (%s): %s", type(e).__name__, e)
+        return JSONResponse(status_code=503, content={"status": "degraded", "supabase_database": "erreur de connexion"})
+    return {"status": "ready", "warmup_ms": startup_report["warmup_ms"]}
+
 @app.get("/health")
 async def health_check():
     db_status = "non configuré"
-    if supabase:
+    if db:
         try:
             # Pour un vrai test de santé, vous pourriez vouloir faire une petite requête.
             # Par exemple, essayer de lister les tables ou une vérification similaire.
             # Pour l'instant, si le client est là, on suppose une configuration basique.
             # Note: ceci ne vérifie pas la validité des identifiants ou la connectivité réseau.
-            test_query = supabase.table("users").select("id").limit(1).execute()
+            await db.select_one("users", "id")
             # Si la requête ci-dessus ne lève pas d'exception, on considère que c'est bon.
             db_status = "connecté"
         except Exception as e:
-            logger.error(f"Erreur de connexion à Supabase lors du health check: {e}")
+            logger.error("Erreur de connexion à Supabase lors du health check: %s", e)
             db_status = "erreur de connexion"
             
     return {
@@ -88,367 +439,805 @@ async def verify_webhook(request: Request):
     token = request.query_params.get("hub.verify_token")
     challenge = request.query_params.get("hub.challenge")
     
-    logger.info(f"Vérification du Webhook - Mode: {mode}, Token reçu: {token}")
+    logger.info("Vérification du Webhook - Mode: %s", mode)
     
     if mode == "subscribe" and token == WHATSAPP_VERIFY_TOKEN:
         logger.info("Webhook vérifié avec succès.")
         return challenge
     else:
-        logger.error(f"Échec de la vérification du Webhook. Mode: {mode}, Token Attendu: {WHATSAPP_VERIFY_TOKEN}, Token Reçu: {token}")
+        # Les jetons (attendu et reçu) ne sont jamais écrits dans les logs
+        logger.error("Échec de la vérification du Webhook. Mode: %s", mode)
         raise HTTPException(status_code=403, detail="Forbidden")
 
 @app.post("/webhook")
 async def receive_webhook(request: Request):
     try:
         body = await request.json()
-        logger.info(f"Message WhatsApp reçu: {body}")
-        
-        if "entry" in body:
-            for entry in body["entry"]:
-                if "changes" in entry:
-                    for change in entry["changes"]:
-                        if change.get("field") == "messages":
-                            await process_whatsapp_message(change["value"])
+        # Corps complet (textes des clients) en DEBUG seulement ; un résumé échantillonné en INFO
+        logger.debug("Webhook WhatsApp reçu: %s", body)
+
+        # Accusé de réception immédiat : les messages sont traités par les workers webhook
+        jobs = jobs_from_webhook(body)
+        logger.info("Webhook WhatsApp reçu: %d message(s)", len(jobs), extra={"event": "webhook.received"})
+        if jobs:
+            await webhook_workers.enqueue(jobs)
         
         return JSONResponse(content={"status": "success"}, status_code=200)
     
+    except QueueFullError as e:
+        # Meta réessaiera plus tard
+        logger.warning("Webhook refusé: %s", e)
+        return JSONResponse(content={"status": "error", "message": "Service Unavailable"}, status_code=503)
     except Exception as e:
-        logger.error(f"Erreur lors du traitement du webhook: {str(e)}", exc_info=True)
+        logger.error("Erreur lors du traitement du webhook: %s", e, exc_info=True)
         return JSONResponse(content={"status": "error", "message": "Internal Server Error"}, status_code=500)
 
 async def get_or_create_user(phone_number: str, name: Optional[str] = None) -> schemas.User:
-    if not supabase:
+    if not db:
         logger.error("Supabase client non initialisé dans get_or_create_user.")
         raise Exception("Supabase client non initialisé.")
+
+    cached_user = user_cache.get(phone_number)
+    if cached_user:
+        return cached_user
+    if failed_user_cache.get(phone_number):
+        raise Exception(f"Résolution de l'utilisateur {phone_number} en échec récemment, nouvel essai dans quelques secondes.")
+
     try:
-        response = supabase.table("users").select("*").eq("phone_number", phone_number).maybe_single().execute()
+        user_db = await db.select_one("users", phone_number=phone_number)
         
-        if response.data:
-            logger.info(f"Utilisateur trouvé: {response.data['id']} pour le numéro {phone_number}")
-            return schemas.User.model_validate(response.data)
+        if user_db:
+            logger.debug("Utilisateur trouvé: %s pour le numéro %s", user_db['id'], phone_number)
         else:
-            logger.info(f"Utilisateur non trouvé pour le numéro {phone_number}. Création...")
+            logger.info("Utilisateur non trouvé pour le numéro %s. Création...", phone_number)
             user_data_to_create = {"phone_number": phone_number}
             if name:
                 user_data_to_create["name"] = name
             
-            insert_response = supabase.table("users").insert(user_data_to_create).execute()
+            # ON CONFLICT (phone_number) DO NOTHING : deux premiers messages simultanés du même numéro
+            # ne se heurtent plus à la contrainte unique ; le perdant relit la ligne créée par l'autre.
+            inserted_users = await db.upsert("users", user_data_to_create, on_conflict="phone_number", ignore_duplicates=True)
+            user_db = inserted_users[0] if inserted_users else await db.select_one("users", phone_number=phone_number)
             
-            if insert_response.data:
-                created_user_data = insert_response.data[0]
-                logger.info(f"Utilisateur créé: {created_user_data['id']} pour le numéro {phone_number}")
-                return schemas.User.model_validate(created_user_data)
+            if user_db:
+                logger.info("Utilisateur créé: %s pour le numéro %s", user_db['id'], phone_number)
             else:
                 error_msg = f"Échec de la création de l'utilisateur pour {phone_number}. Aucune donnée retournée par Supabase."
                 logger.error(error_msg)
+                # Seul échec mis en cache : une erreur réseau ou Supabase ne doit pas bloquer les nouvelles tentatives
+                failed_user_cache.set(phone_number, True)
                 raise Exception(error_msg) 
+
+        user = validate_model(schemas.User, user_db)
+        user_cache.set(phone_number, user)
+        return user
                 
     except Exception as e:
-        logger.error(f"Erreur dans get_or_create_user pour {phone_number}: {str(e)}", exc_info=True)
+        logger.error("Erreur dans get_or_create_user pour %s: %s", phone_number, e, exc_info=True)
         raise
 
 async def process_whatsapp_message(message_data: Dict[str, Any]):
-    if not supabase:
+    if not db:
         logger.error("Supabase client non initialisé. Impossible de traiter le message WhatsApp.")
         return
 
+    user_failure: Optional[Exception] = None
     try:
         if "messages" in message_data:
             for message in message_data["messages"]:
                 phone_number = message["from"]
                 message_type = message["type"]
                 
-                logger.info(f"Message de {phone_number}, type: {message_type}")
+                # Message déjà reçu (nouvelle livraison de WhatsApp) : aucun appel à la base
+                if await message_dedup.is_duplicate(message.get("id")):
+                    logger.info("Message %s de %s déjà traité, ignoré.", message.get('id'), phone_number)
+                    continue
+
+                logger.info("Message de %s, type: %s", phone_number, message_type, extra={"event": "webhook.message"})
                 
                 current_user: Optional[schemas.User] = None
                 try:
                     current_user = await get_or_create_user(phone_number)
-                    logger.info(f"Utilisateur {current_user.id} (tél: {phone_number}) traité/créé.")
+                    logger.debug("Utilisateur %s (tél: %s) traité/créé.", current_user.id, phone_number)
                 except Exception as user_exc:
-                    logger.error(f"Échec de get_or_create_user pour {phone_number}: {str(user_exc)}. Le message ne sera pas traité.", exc_info=True)
-                    return # Arrêter si l'utilisateur ne peut être identifié
+                    logger.error("Échec de get_or_create_user pour %s: %s. Le message ne sera pas traité.", phone_number, user_exc, exc_info=True)
+                    await message_dedup.release(message.get("id"))  # la nouvelle livraison de WhatsApp sera traitée
+                    user_failure = user_failure or user_exc
+                    continue # Les autres messages du lot sont traités quand même
 
-                if message_type == "text":
-                    text_content = message["text"]["body"]
-                    logger.info(f"Contenu du message: {text_content}")
-                    await handle_text_message(current_user, phone_number, text_content)
-                
-                elif message_type == "interactive":
-                    # TODO: Implémenter la gestion des messages interactifs
-                    await handle_interactive_message(current_user, phone_number, message["interactive"])
+                try:
+                    if message_type == "text":
+                        text_content = message["text"]["body"]
+                        logger.debug("Contenu du message: %s", text_content)
+                        await handle_text_message(current_user, phone_number, text_content)
+
+                    elif message_type == "interactive":
+                        await handle_interactive_message(current_user, phone_number, message["interactive"])
+                except Exception:
+                    await message_dedup.release(message.get("id"))
+                    raise
     
     except Exception as e:
-        logger.error(f"Erreur majeure lors du traitement du message WhatsApp: {str(e)}", exc_info=True)
+        logger.error("Erreur majeure lors du traitement du message WhatsApp: %s", e, exc_info=True)
+        raise  # le worker marque le job en échec (backend.fail) au lieu de l'acquitter
+    if user_failure:
+        raise user_failure
+
+CHOICE_RE = re.compile(r"(\d+)(?:\s*[x×*]\s*(\d+))?")
+MAX_ITEM_QUANTITY = 50
 
 async def handle_text_message(user: schemas.User, phone_number: str, text: str):
     text_lower = text.lower().strip()
-    logger.info(f"Gestion du message texte de l'utilisateur {user.id} ({phone_number}): '{text_lower}'")
-    
-    # TODO: Implémenter la logique de conversation du bot (menu, commande, etc.)
-    if text_lower in ["commander", "menu", "bonjour", "salut", "hi", "hello"]:
-        await send_welcome_message(phone_number)
-    elif text_lower in ["aide", "help"]:
+    logger.debug("Gestion du message texte de l'utilisateur %s (%s): '%s'", user.id, phone_number, text_lower)
+
+    # Étape de la conversation et panier en cours : aucune requête à la base avec le backend mémoire
+    session = await conversation_sessions.get(phone_number) or ConversationSession(phone_number)
+    choice = CHOICE_RE.fullmatch(text_lower)
+
+    if text_lower in ["aide", "help"]:
         await send_help_message(phone_number)
+    elif text_lower in ["annuler", "vider"]:
+        await conversation_sessions.delete(phone_number)
+        await send_whatsapp_text(phone_number, bot_text("bot.cart.cleared", "Votre panier a été vidé."))
+    elif session.step == STEP_AWAITING_ADDRESS:
+        await place_session_order(user, session, text.strip())
+    elif session.cart and text_lower in ["valider", "commander"]:
+        session.step = STEP_AWAITING_ADDRESS
+        await conversation_sessions.save(session)
+        await send_whatsapp_text(phone_number, bot_text("bot.checkout.ask_address", "À quelle adresse devons-nous livrer ? (quartier, rue, point de repère)"))
+    elif text_lower == "panier":
+        if session.cart:
+            await send_cart_summary(session)
+        else:
+            await send_whatsapp_text(phone_number, bot_text("bot.cart.empty", "Votre panier est vide. Écrivez le nom d'un plat pour commencer."))
+    elif text_lower in ["commander", "menu", "bonjour", "salut", "hi", "hello"]:
+        await send_welcome_message(phone_number)
+    elif choice and session.choices:
+        await add_choice_to_cart(session, int(choice.group(1)), int(choice.group(2) or 1))
     else:
-        await send_default_response(phone_number, text)
+        # Texte libre (« ndole », « poulet DG »...) : recherche dans les menus, limitée au restaurant du panier
+        results = await search_menu(text, limit=5, restaurant_id=session.restaurant_id if session.cart else None)
+        if results:
+            session.show_results(item.id for item in results)
+            await conversation_sessions.save(session)
+            await send_search_results(phone_number, results)
+        else:
+            await send_default_response(phone_number, text)
 
 async def handle_interactive_message(user: schemas.User, phone_number: str, interactive_data: Dict[str, Any]):
-    logger.info(f"Gestion du message interactif de l'utilisateur {user.id} ({phone_number}): {interactive_data}")
-    # TODO: Implémenter la logique des interactions (boutons, listes)
+    logger.debug("Gestion du message interactif de l'utilisateur %s (%s): %s", user.id, phone_number, interactive_data)
+    # Réponse à une liste ou à un bouton : même traitement que le texte équivalent (numéro, « valider »...)
+    reply = interactive_data.get("list_reply") or interactive_data.get("button_reply") or {}
+    reply_text = reply.get("id") or reply.get("title")
+    if reply_text:
+        await handle_text_message(user, phone_number, reply_text)
+
+async def add_choice_to_cart(session: ConversationSession, number: int, quantity: int):
+    if not 1 <= number <= len(session.choices) or not 1 <= quantity <= MAX_ITEM_QUANTITY:
+        await send_whatsapp_text(session.phone_number, bot_text("bot.choice.invalid", "Choisissez un numéro entre 1 et {count} (par exemple « 2 » ou « 2 x3 »).", count=len(session.choices)))
+        return
+    item = menu_search_index.documents.get(session.choices[number - 1])
+    if not item:
+        await send_whatsapp_text(session.phone_number, bot_text("bot.choice.unavailable", "Ce plat n'est plus disponible. Écrivez le nom d'un autre plat."))
+        return
+    if session.cart and item["restaurant_id"] != session.restaurant_id:
+        await send_whatsapp_text(session.phone_number, bot_text("bot.cart.other_restaurant", "Votre panier contient déjà des plats d'un autre restaurant. Tapez « valider » pour le commander ou « annuler » pour le vider."))
+        return
+    session.add_item(item["id"], item["restaurant_id"], quantity)
+    await conversation_sessions.save(session)
+    await send_cart_summary(session)
+
+async def send_cart_summary(session: ConversationSession):
+    lines, total = [], 0.0
+    for item_id, quantity in session.cart.items():
+        item = menu_search_index.documents.get(item_id)
+        if item:
+            lines.append(bot_text("bot.cart.line", "{quantity} x {name} - {amount} FCFA", quantity=quantity, name=item["name"], amount=f"{item['price'] * quantity:.0f}"))
+            total += item["price"] * quantity
+    await send_whatsapp_text(session.phone_number, "\n".join([
+        bot_text("bot.cart.title", "Votre panier :"),
+        *lines,
+        bot_text("bot.cart.total", "Total : {total} FCFA", total=f"{total:.0f}"),
+        bot_text("bot.cart.actions", "Écrivez un autre plat pour compléter, « valider » pour commander ou « annuler » pour vider le panier."),
+    ]))
+
+async def place_session_order(user: schemas.User, session: ConversationSession, delivery_address: str):
+    order_data = schemas.OrderCreate(
+        restaurant_id=session.restaurant_id,
+        delivery_address=delivery_address,
+        items=[schemas.OrderItemCreate(menu_item_id=item_id, quantity=quantity) for item_id, quantity in session.cart.items()],
+    )
+    try:
+        order = await create_order_api(order_data, user.id)
+    except HTTPException as e:
+        # Article devenu indisponible, restaurant fermé... : le panier est conservé
+        session.step = STEP_CART
+        await conversation_sessions.save(session)
+        await send_whatsapp_text(session.phone_number, bot_text("bot.order.failed", "Impossible de passer la commande : {reason}", reason=e.detail))
+        return
+    await conversation_sessions.delete(session.phone_number)
+    await send_whatsapp_text(session.phone_number, bot_text(
+        "bot.order.placed",
+        "Commande n°{id} enregistrée ({total} FCFA), livraison : {address}. Nous vous tiendrons informé ici.",
+        id=order.id, total=f"{order.total_amount:.0f}", address=delivery_address,
+    ))
+
+def bot_text(key: str, default: str, **params: Any) -> str:
+    # Texte du bot depuis le catalogue `translations` en mémoire (locale par défaut), le texte français sert de repli
+    return translations.translate(key, default=default, **params)
+
+async def send_whatsapp_text(phone_number: str, body: str, priority: int = PRIORITY_CONVERSATION):
+    # Mise en file seulement : l'envoi (et ses réessais) se fait dans les workers de whatsapp_sender
+    if not whatsapp_sender:
+        logger.info("Envoi WhatsApp désactivé, message non envoyé à %s", phone_number)
+        return
+    try:
+        whatsapp_sender.enqueue(phone_number, text_message(phone_number, body), priority)
+    except OutboundQueueFullError as e:
+        logger.error("Message pour %s abandonné: %s", phone_number, e)
 
 async def send_welcome_message(phone_number: str):
-    logger.info(f"Envoi du message de bienvenue à {phone_number}")
-    # TODO: Implémenter l'envoi via l'API WhatsApp Business
+    logger.debug("Envoi du message de bienvenue à %s", phone_number)
+    await send_whatsapp_text(phone_number, bot_text("bot.welcome", (
+        "Bienvenue sur ChopExpress ! 🍲\n"
+        "Écrivez le nom d'un plat (par exemple « ndolé » ou « poulet DG ») pour le trouver dans nos restaurants.\n"
+        "Tapez « aide » pour plus d'informations."
+    )))
 
 async def send_help_message(phone_number: str):
-    logger.info(f"Envoi du message d'aide à {phone_number}")
-    # TODO: Implémenter l'envoi via l'API WhatsApp Business
+    logger.debug("Envoi du message d'aide à %s", phone_number)
+    await send_whatsapp_text(phone_number, bot_text("bot.help", (
+        "Comment commander avec ChopExpress :\n"
+        "1. Écrivez le nom d'un plat pour voir les restaurants qui le proposent.\n"
+        "2. Répondez avec le numéro du plat (« 2 », ou « 2 x3 » pour 3 portions).\n"
+        "3. Tapez « valider » puis votre adresse de livraison.\n"
+        "« panier » affiche votre panier, « annuler » le vide. Suivez ici l'état de votre commande jusqu'à la livraison."
+    )))
+
+async def send_search_results(phone_number: str, results: List[schemas.MenuItemSearchResult]):
+    logger.debug("Envoi de %s résultat(s) de recherche à %s", len(results), phone_number)
+    lines = [
+        bot_text("bot.search.line", "{number}. {name} - {price} FCFA ({restaurant})", number=i, name=item.name, price=f"{item.price:.0f}", restaurant=item.restaurant_name)
+        for i, item in enumerate(results, 1)
+    ]
+    await send_whatsapp_text(phone_number, "\n".join([
+        bot_text("bot.search.title", "Voici ce que nous avons trouvé :"),
+        *lines,
+        bot_text("bot.search.actions", "Répondez avec le numéro du plat pour l'ajouter au panier."),
+    ]))
 
 async def send_default_response(phone_number: str, original_message: str):
-    logger.info(f"Réponse par défaut à {phone_number} pour: '{original_message}'")
-    # TODO: Implémenter l'envoi via l'API WhatsApp Business
+    logger.debug("Réponse par défaut à %s pour: '%s'", phone_number, original_message)
+    await send_whatsapp_text(phone_number, bot_text("bot.search.no_results", "Désolé, nous n'avons rien trouvé pour « {query} ». Essayez un autre plat ou tapez « aide ».", query=original_message))
+
+# Textes par défaut, surchargés par les clés `bot.order_status.<statut>` de la table translations
+ORDER_STATUS_MESSAGES = {
+    "confirmed": "Votre commande n°{id} est confirmée par le restaurant.",
+    "preparing": "Votre commande n°{id} est en préparation.",
+    "ready_for_pickup": "Votre commande n°{id} est prête, le livreur arrive au restaurant.",
+    "out_for_delivery": "Votre commande n°{id} est en route.",
+    "delivered": "Votre commande n°{id} a été livrée. Bon appétit !",
+    "cancelled": "Votre commande n°{id} a été annulée.",
+    "refunded": "Votre commande n°{id} a été remboursée.",
+}
+
+async def notify_order_status(order: Dict[str, Any]):
+    # Notification transactionnelle : passe devant les réponses du bot et le marketing
+    template = ORDER_STATUS_MESSAGES.get(order.get("status"))
+    if not template or not whatsapp_sender:
+        return
+    try:
+        user_db = await db.select_one("users", "phone_number", id=order["customer_id"])
+        if user_db:
+            body = bot_text(f"bot.order_status.{order['status']}", template, id=order["id"])
+            await send_whatsapp_text(user_db["phone_number"], body, PRIORITY_TRANSACTIONAL)
+    except Exception as e:
+        logger.error("Notification de statut impossible pour la commande %s: %s", order.get('id'), e, exc_info=True)
+
+# File de travail du webhook : traitement hors de la requête HTTP, dans l'ordre pour chaque numéro
+if WEBHOOK_QUEUE_BACKEND == "supabase" and db:
+    webhook_queue_backend = SupabaseQueueBackend(db)
+else:
+    if WEBHOOK_QUEUE_BACKEND == "supabase":
+        logger.error("WEBHOOK_QUEUE_BACKEND=supabase sans client Supabase : utilisation de la file en mémoire.")
+    webhook_queue_backend = InMemoryQueueBackend(maxsize=WEBHOOK_QUEUE_MAXSIZE)
+webhook_workers = WebhookWorkerPool(webhook_queue_backend, process_whatsapp_message, concurrency=WEBHOOK_WORKERS,
+                                    max_pending=WEBHOOK_QUEUE_MAXSIZE)
+
+# Jauges lues à chaque scrape de /metrics
+if isinstance(webhook_queue_backend, InMemoryQueueBackend):
+    gauge_callback("chopexpress_webhook_queue_depth", "Messages WhatsApp reçus en attente de traitement", webhook_queue_backend.qsize)
+gauge_callback("chopexpress_webhook_active_phone_numbers", "Numéros dont les messages sont en cours de traitement", lambda: webhook_workers.stats()["active_phone_numbers"])
+gauge_callback("chopexpress_whatsapp_outbound_pending", "Messages WhatsApp sortants en file", lambda: whatsapp_sender.stats()["pending"] if whatsapp_sender else 0)
+gauge_callback("chopexpress_order_stream_subscribers", "Tableaux de bord abonnés au flux des commandes", lambda: order_events.stats()["subscribers"])
+gauge_callback("chopexpress_dispatch_unassigned_orders", "Commandes prêtes restées sans livreur au dernier tour de répartition", lambda: (dispatch.last_round or {}).get("unassigned_orders", 0))
+gauge_callback("chopexpress_event_loop_lag_last_seconds", "Dernier retard mesuré de la boucle d'événements", lambda: event_loop_lag.last_lag)
+
+# --- Recherche dans les menus ---
+async def rebuild_menu_search_index():
+    global menu_search_index, menu_search_built_at, menu_search_pending_writes
+    started = time.perf_counter()
+    menu_search_pending_writes = []
+    try:
+        restaurants_db = await db.select_all("restaurants", "id, name, cuisine_type", is_active=True)
+        menu_items_db = await db.select_all("menu_items", is_available=True)
+        # ~2 s de CPU pour 100k articles : hors de la boucle d'événements, l'ancien index sert pendant ce temps
+        index = MenuSearchIndex()
+        await asyncio.to_thread(index.rebuild, restaurants_db, menu_items_db)
+        # Écritures arrivées depuis la lecture : rejouées dans l'ordre, puis remplacement sans await intermédiaire
+        for apply, data in menu_search_pending_writes:
+            apply(index, data)
+        menu_search_index = index
+        menu_search_built_at = time.monotonic()
+        logger.info("Index de recherche des menus construit: %s articles en %.2f s", len(index), time.perf_counter() - started)
+    except Exception as e:
+        logger.error("Échec de la construction de l'index de recherche des menus: %s", e, exc_info=True)
+        if menu_search_built_at is None:
+            raise  # aucun index à servir : l'appelant reçoit l'erreur
+    finally:
+        menu_search_pending_writes = None
+
+async def get_menu_search_index() -> MenuSearchIndex:
+    global menu_search_rebuild
+    # Reconstruction périodique : rattrape les écritures faites par les autres workers uvicorn
+    stale = menu_search_built_at is None or time.monotonic() - menu_search_built_at > MENU_SEARCH_REBUILD_SECONDS
+    if stale and (menu_search_rebuild is None or menu_search_rebuild.done()):
+        menu_search_rebuild = asyncio.create_task(rebuild_menu_search_index())
+    if menu_search_built_at is None:
+        # Premier usage : rien à servir avant la fin de la construction
+        await asyncio.shield(menu_search_rebuild)
+    return menu_search_index
+
+async def search_menu(query: str, limit: int = DEFAULT_SEARCH_LIMIT, restaurant_id: Optional[int] = None) -> List[schemas.MenuItemSearchResult]:
+    index = await get_menu_search_index()
+    return validate_models(schemas.MenuItemSearchResult, (
+        {**item, "score": round(score, 4)}
+        for score, item in index.search(query, limit=limit, restaurant_id=restaurant_id)
+    ))
+
+def _apply_menu_search_write(apply, data: Dict[str, Any]):
+    if menu_search_built_at is not None:
+        apply(menu_search_index, data)
+    if menu_search_pending_writes is not None:
+        menu_search_pending_writes.append((apply, data))
+
+def sync_menu_search_item(item_data: Dict[str, Any]):
+    _apply_menu_search_write(MenuSearchIndex.upsert_item, item_data)
+
+def sync_menu_search_items(items_data: List[Dict[str, Any]]):
+    for item_data in items_data:
+        sync_menu_search_item(item_data)
+
+def sync_menu_search_restaurant(restaurant_data: Dict[str, Any]):
+    eta.set_restaurant(restaurant_data)
+    _apply_menu_search_write(MenuSearchIndex.upsert_restaurant, restaurant_data)
+
+async def reindex_menu_search_restaurant(restaurant_id: int):
+    # Restaurant réactivé : ses articles avaient été retirés de l'index, on les remet sans attendre la reconstruction
+    if menu_search_built_at is None and menu_search_pending_writes is None:
+        return
+    sync_menu_search_items(await db.select_all("menu_items", restaurant_id=restaurant_id, is_available=True))
+
+@app.get("/api/search", response_model=schemas.MenuSearchResponse)
+async def search_menu_api(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    restaurant_id: Optional[int] = None,
+):
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    try:
+        results = await search_menu(q, limit=limit, restaurant_id=restaurant_id)
+        return schemas.MenuSearchResponse(query=q, results=results)
+    except Exception as e:
+        logger.error("Erreur API - Recherche '%s': %s", q, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+# --- Traductions (frontend i18next-http-backend) ---
+@app.get("/api/translations")
+async def translations_index():
+    return {"version": translations.version, "default_locale": translations.default_locale, "locales": translations.locales}
+
+@app.get("/api/translations/{locale}")
+async def translations_bundle(request: Request, locale: str, v: Optional[str] = None):
+    # Toutes les clés de la locale (avec repli), imbriquées comme les fichiers locales/*.json du frontend.
+    # Avec ?v=<version courante>, l'URL ne changera jamais de contenu : cache navigateur / CDN d'un an.
+    # Clé de cache sur la locale résolue : une locale inconnue partage l'entrée de sa locale de repli
+    # au lieu d'ajouter un bundle au cache du catalogue.
+    locale = translations.resolve_locale(locale)
+    version = translations.version
+    bundle = await catalogue_cache.get_or_load(("translations", locale, version), lambda: _build_translations_bundle(locale))
+    cache_control = IMMUTABLE_CACHE_CONTROL if v == version else "no-cache"
+    return conditional_json_response(request, bundle, cache_control=cache_control)
+
+async def _build_translations_bundle(locale: str):
+    return build_cached_json(translations.bundle(locale))
+
+@app.get("/api/webhook/stats")
+async def webhook_stats():
+    return {
+        "workers": webhook_workers.stats(),
+        "dedup": message_dedup.stats(),
+        "sessions": conversation_sessions.stats(),
+        "sender": whatsapp_sender.stats() if whatsapp_sender else None,
+    }
+
+@app.get("/api/cache/stats")
+async def catalogue_cache_stats():
+    # Compteurs hits/misses pour dimensionner les caches (CATALOGUE_CACHE_*, USER_CACHE_*)
+    return {"catalogue": catalogue_cache.stats(), "users": user_cache.stats(), "translations": translations.stats()}
 
 # --- Endpoints pour Restaurants (Tableau de bord Admin) ---
 @app.get("/api/restaurants", response_model=schemas.RestaurantListResponse)
-async def get_restaurants_api(): # Renommé pour éviter conflit avec variable globale
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+async def get_restaurants_api( # Renommé pour éviter conflit avec variable globale
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    cuisine_type: Optional[str] = None,
+):
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        response = supabase.table("restaurants").select("*").eq("is_active", True).execute()
-        restaurant_list = [schemas.Restaurant.model_validate(r_data) for r_data in response.data] if response.data else []
-        return schemas.RestaurantListResponse(restaurants=restaurant_list)
+        async def load_page():
+            restaurants_db, next_cursor = await db.select_page(
+                "restaurants", limit=limit, cursor=cursor, is_active=True, cuisine_type=cuisine_type
+            )
+            restaurant_list = validate_models(schemas.Restaurant, restaurants_db)
+            return build_cached_json(schemas.RestaurantListResponse(restaurants=restaurant_list, next_cursor=next_cursor))
+
+        page = await catalogue_cache.get_or_load(("restaurants", limit, cursor, cuisine_type), load_page)
+        return conditional_json_response(request, page)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erreur API - Récupération des restaurants: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Récupération des restaurants: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.post("/api/restaurants", response_model=schemas.Restaurant, status_code=201)
 async def create_restaurant_api(restaurant_data: schemas.RestaurantCreate): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
         restaurant_dict = restaurant_data.model_dump()
-        response = supabase.table("restaurants").insert(restaurant_dict).execute()
-        if response.data:
-            return schemas.Restaurant.model_validate(response.data[0])
+        inserted = await db.insert("restaurants", restaurant_dict)
+        if inserted:
+            catalogue_cache.invalidate_namespace("restaurants")
+            sync_menu_search_restaurant(inserted[0])
+            return validate_model(schemas.Restaurant, inserted[0])
         else:
-            logger.error(f"API Erreur - Insertion restaurant n'a pas retourné de données. Supabase response: {response}")
+            logger.error("API Erreur - Insertion restaurant n'a pas retourné de données.")
             raise HTTPException(status_code=400, detail="Impossible de créer le restaurant.")
+    except HTTPException:
+        raise
     except Exception as e: # Attraper une exception plus générique au cas où la réponse Supabase n'est pas comme attendue
-        logger.error(f"Erreur API - Création restaurant: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Création restaurant: %s", e, exc_info=True)
         if "duplicate key value violates unique constraint" in str(e).lower():
             raise HTTPException(status_code=409, detail="Un restaurant avec des informations similaires (ex: numéro WhatsApp) existe déjà.")
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
+nearby_rpc_available = True
+
+async def load_restaurant_geo_index() -> GeoIndex:
+    # Catalogue des restaurants actifs géolocalisés, conservé dans le cache catalogue (invalidé avec la liste)
+    restaurants_db = await db.select_all("restaurants", is_active=True)
+    return GeoIndex(
+        (r["latitude"], r["longitude"], r) for r in restaurants_db
+        if r.get("latitude") is not None and r.get("longitude") is not None
+    )
+
+# Déclaré avant /api/restaurants/{restaurant_id} pour que "nearby" ne soit pas lu comme un ID
+@app.get("/api/restaurants/nearby", response_model=schemas.NearbyRestaurantListResponse)
+async def get_nearby_restaurants_api(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(DEFAULT_NEARBY_RADIUS_M, gt=0, le=MAX_NEARBY_RADIUS_M), # en mètres
+    limit: int = Query(DEFAULT_NEARBY_LIMIT, ge=1, le=MAX_NEARBY_LIMIT),
+):
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    try:
+        global nearby_rpc_available
+        nearby_rows = None
+        if NEARBY_SEARCH_BACKEND == "database" and nearby_rpc_available:
+            try:
+                nearby_rows = await db.rpc("nearby_restaurants", {"p_latitude": lat, "p_longitude": lng, "p_radius_m": radius, "p_limit": limit})
+            except Exception as rpc_exc:
+                logger.warning("nearby_restaurants indisponible, repli sur l'index en mémoire: %s", rpc_exc)
+                if getattr(rpc_exc, "code", None) == "PGRST202":
+                    # Fonction SQL absente (sql/nearby_restaurants.sql non installé) : inutile de réessayer
+                    nearby_rpc_available = False
+        if nearby_rows is None:
+            geo_index = await catalogue_cache.get_or_load(("restaurants", "geo_index"), load_restaurant_geo_index)
+            nearby_rows = [{**r_data, "distance_m": distance} for distance, r_data in geo_index.nearest(lat, lng, radius, limit)]
+        restaurant_list = validate_models(schemas.NearbyRestaurant, nearby_rows)
+        return schemas.NearbyRestaurantListResponse(restaurants=restaurant_list)
+    except Exception as e:
+        logger.error("Erreur API - Recherche des restaurants proches de (%s, %s): %s", lat, lng, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
 @app.get("/api/restaurants/{restaurant_id}", response_model=schemas.Restaurant)
-async def get_restaurant_by_id_api(restaurant_id: int): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+async def get_restaurant_by_id_api(restaurant_id: int, request: Request): # Renommé
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        response = supabase.table("restaurants").select("*").eq("id", restaurant_id).eq("is_active", True).maybe_single().execute()
-        if response.data:
-            return schemas.Restaurant.model_validate(response.data)
+        async def load_restaurant():
+            restaurant_db = await db.select_one("restaurants", id=restaurant_id, is_active=True)
+            return build_cached_json(validate_model(schemas.Restaurant, restaurant_db)) if restaurant_db else None
+
+        restaurant = await catalogue_cache.get_or_load(("restaurant", restaurant_id), load_restaurant)
+        if restaurant:
+            return conditional_json_response(request, restaurant)
         else:
             raise HTTPException(status_code=404, detail=f"Restaurant ID {restaurant_id} non trouvé ou inactif.")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erreur API - Récupération restaurant ID {restaurant_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Récupération restaurant ID %s: %s", restaurant_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.put("/api/restaurants/{restaurant_id}", response_model=schemas.Restaurant)
 async def update_restaurant_api(restaurant_id: int, restaurant_data: schemas.RestaurantUpdate): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
         update_dict = restaurant_data.model_dump(exclude_unset=True)
         if not update_dict:
             raise HTTPException(status_code=400, detail="Aucune donnée fournie pour la mise à jour.")
         
-        check_exists = supabase.table("restaurants").select("id").eq("id", restaurant_id).maybe_single().execute()
-        if not check_exists.data:
+        # Un seul aller-retour : l'UPDATE renvoie la ligne modifiée, aucune ligne = restaurant introuvable
+        updated = await db.update("restaurants", update_dict, id=restaurant_id)
+        if not updated:
             raise HTTPException(status_code=404, detail=f"Restaurant ID {restaurant_id} non trouvé.")
-
-        response = supabase.table("restaurants").update(update_dict).eq("id", restaurant_id).execute()
-        if response.data:
-            return schemas.Restaurant.model_validate(response.data[0])
-        else:
-            logger.warning(f"API MàJ restaurant ID {restaurant_id} n'a pas retourné de données, mais restaurant existe. Supabase resp: {response}")
-            # Cela peut arriver si RLS empêche de voir le résultat de l'update. Récupérer à nouveau pour confirmer.
-            refetched_data = supabase.table("restaurants").select("*").eq("id", restaurant_id).maybe_single().execute()
-            if refetched_data.data:
-                return schemas.Restaurant.model_validate(refetched_data.data)
-            raise HTTPException(status_code=400, detail="Impossible de mettre à jour ou récupérer le restaurant après MàJ.")
-    except Exception as e:
-        logger.error(f"Erreur API - MàJ restaurant ID {restaurant_id}: {str(e)}", exc_info=True)
+        invalidate_restaurant_cache(restaurant_id)
+        sync_menu_search_restaurant(updated[0])
+        if update_dict.get("is_active"):
+            await reindex_menu_search_restaurant(restaurant_id)
+        return validate_model(schemas.Restaurant, updated[0])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erreur API - MàJ restaurant ID %s: %s", restaurant_id, e, exc_info=True)
         if "duplicate key value violates unique constraint" in str(e).lower():
             raise HTTPException(status_code=409, detail="Conflit de données (ex: numéro WhatsApp).")
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.delete("/api/restaurants/{restaurant_id}", status_code=204)
 async def delete_restaurant_api(restaurant_id: int): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        check_response = supabase.table("restaurants").select("id, is_active").eq("id", restaurant_id).maybe_single().execute()
-        if not check_response.data:
-            raise HTTPException(status_code=404, detail=f"Restaurant ID {restaurant_id} non trouvé.")
-        if not check_response.data["is_active"]:
-            return 
-            
-        response = supabase.table("restaurants").update({"is_active": False}).eq("id", restaurant_id).execute()
-        if not response.data: 
-            logger.error(f"API Échec désactivation restaurant ID {restaurant_id}. Supabase resp: {response}")
-            raise HTTPException(status_code=500, detail="Impossible de désactiver le restaurant.")
+        # Désactivation conditionnelle : ne touche que si le restaurant est encore actif
+        updated = await db.update("restaurants", {"is_active": False}, id=restaurant_id, is_active=True)
+        if not updated:
+            # Chemin d'échec seulement : restaurant absent, ou déjà inactif (suppression idempotente)
+            if not await db.select_one("restaurants", "id", id=restaurant_id):
+                raise HTTPException(status_code=404, detail=f"Restaurant ID {restaurant_id} non trouvé.")
+            return
+        invalidate_restaurant_cache(restaurant_id)
+        sync_menu_search_restaurant(updated[0])
         return
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erreur API - Suppression logique restaurant ID {restaurant_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Suppression logique restaurant ID %s: %s", restaurant_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 # --- Endpoints pour MenuItems (Tableau de bord Admin) ---
 @app.post("/api/restaurants/{restaurant_id}/menu-items", response_model=schemas.MenuItem, status_code=201)
 async def create_menu_item_for_restaurant_api(restaurant_id: int, menu_item_data: schemas.MenuItemCreate): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        r_response = supabase.table("restaurants").select("id").eq("id", restaurant_id).eq("is_active", True).maybe_single().execute()
-        if not r_response.data:
+        r_response = await db.select_one("restaurants", "id", id=restaurant_id, is_active=True)
+        if not r_response:
             raise HTTPException(status_code=404, detail=f"Restaurant parent ID {restaurant_id} non trouvé ou inactif.")
 
         menu_item_dict = menu_item_data.model_dump()
         menu_item_dict["restaurant_id"] = restaurant_id
         
-        response = supabase.table("menu_items").insert(menu_item_dict).execute()
-        if response.data:
-            return schemas.MenuItem.model_validate(response.data[0])
+        inserted = await db.insert("menu_items", menu_item_dict)
+        invalidate_menu_cache(restaurant_id)
+        if inserted:
+            sync_menu_search_item(inserted[0])
+            return validate_model(schemas.MenuItem, inserted[0])
         else:
-            logger.error(f"API Erreur - Insertion menu item n'a pas retourné de données. Supabase resp: {response}")
+            logger.error("API Erreur - Insertion menu item n'a pas retourné de données.")
             raise HTTPException(status_code=400, detail="Impossible de créer l'article de menu.")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erreur API - Création menu item pour restaurant ID {restaurant_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Création menu item pour restaurant ID %s: %s", restaurant_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.get("/api/restaurants/{restaurant_id}/menu-items", response_model=schemas.MenuItemListResponse)
-async def list_menu_items_for_restaurant_api(restaurant_id: int): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+async def list_menu_items_for_restaurant_api(restaurant_id: int, request: Request): # Renommé
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    try:
+        async def load_menu():
+            r_response = await db.select_one("restaurants", "id", id=restaurant_id, is_active=True)
+            if not r_response:
+                return None
+            menu_items_db = await db.select_many("menu_items", restaurant_id=restaurant_id, is_available=True)
+            menu_item_list = validate_models(schemas.MenuItem, menu_items_db)
+            return build_cached_json(schemas.MenuItemListResponse(menu_items=menu_item_list))
+
+        menu = await catalogue_cache.get_or_load(("menu", restaurant_id), load_menu)
+        if not menu:
+            raise HTTPException(status_code=404, detail=f"Restaurant parent ID {restaurant_id} non trouvé ou inactif.")
+        return conditional_json_response(request, menu)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Erreur API - Listage menu items pour restaurant ID %s: %s", restaurant_id, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.post("/api/restaurants/{restaurant_id}/menu-items/import", response_model=schemas.MenuImportReport)
+async def import_menu_items_api(restaurant_id: int, request: Request, format: Optional[str] = None):
+    # Corps CSV (en-tête obligatoire) ou NDJSON, lu en flux ; les plats existants (même nom) sont mis à jour.
+    # Les lignes invalides sont rapportées sans bloquer les autres (voir menu_import.py).
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    importer = MenuImporter(db, restaurant_id, chunk_size=MENU_IMPORT_CHUNK_SIZE, max_rows=MENU_IMPORT_MAX_ROWS, on_written=sync_menu_search_items)
     try:
-        r_response = supabase.table("restaurants").select("id").eq("id", restaurant_id).eq("is_active", True).maybe_single().execute()
-        if not r_response.data:
+        import_format = detect_format(request.headers.get("content-type"), format)
+        r_response = await db.select_one("restaurants", "id", id=restaurant_id, is_active=True)
+        if not r_response:
             raise HTTPException(status_code=404, detail=f"Restaurant parent ID {restaurant_id} non trouvé ou inactif.")
 
-        response = supabase.table("menu_items").select("*").eq("restaurant_id", restaurant_id).eq("is_available", True).execute()
-        menu_item_list = [schemas.MenuItem.model_validate(item) for item in response.data] if response.data else []
-        return schemas.MenuItemListResponse(menu_items=menu_item_list)
+        report = await importer.run(iter_records(request.stream(), import_format))
+        logger.info("Import menu restaurant ID %s: %s lignes, %s importées, %s en erreur", restaurant_id, report.rows, report.imported, report.failed)
+        return report
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except MenuImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException as http_exc:
+        raise http_exc
+    except Exception as e:
+        logger.error("Erreur API - Import menu pour restaurant ID %s: %s", restaurant_id, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+    finally:
+        # Lots déjà écrits avant une erreur compris
+        if importer.imported:
+            invalidate_menu_cache(restaurant_id)
+
+@app.get("/api/restaurants/{restaurant_id}/menu-items/export")
+async def export_menu_items_api(restaurant_id: int, format: str = "csv"):
+    # Tous les plats, disponibles ou non, au format réimportable par /menu-items/import
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if format not in CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Format inconnu: {format} (csv ou ndjson).")
+    try:
+        r_response = await db.select_one("restaurants", "id", id=restaurant_id)
     except Exception as e:
-        logger.error(f"Erreur API - Listage menu items pour restaurant ID {restaurant_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Export menu pour restaurant ID %s: %s", restaurant_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+    if not r_response:
+        raise HTTPException(status_code=404, detail=f"Restaurant ID {restaurant_id} non trouvé.")
+    return StreamingResponse(
+        _menu_export_stream(restaurant_id, format),
+        media_type=CONTENT_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="menu-restaurant-{restaurant_id}.{format}"'},
+    )
+
+async def _menu_export_stream(restaurant_id: int, export_format: str):
+    # Les en-têtes sont déjà partis : une erreur en cours de route ne peut que tronquer la réponse
+    try:
+        async for chunk in export_menu_items(db, restaurant_id, export_format):
+            yield chunk
+    except Exception as e:
+        logger.error("Erreur API - Export menu interrompu pour restaurant ID %s: %s", restaurant_id, e, exc_info=True)
+        raise
 
 @app.get("/api/menu-items/{item_id}", response_model=schemas.MenuItem)
-async def get_menu_item_by_id_api(item_id: int): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+async def get_menu_item_by_id_api(item_id: int, request: Request): # Renommé
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        response = supabase.table("menu_items").select("*, restaurants(is_active)").eq("id", item_id).eq("is_available", True).maybe_single().execute()
+        item_db = await db.select_one("menu_items", "*, restaurants(is_active)", id=item_id, is_available=True)
         
-        if response.data:
+        if item_db:
             # Vérifier si le restaurant parent est actif via la jointure (restaurants(is_active))
-            # La structure de response.data avec jointure : response.data['restaurants']['is_active']
-            if not response.data.get("restaurants") or not response.data["restaurants"]["is_active"]:
+            # La structure de item_db avec jointure : item_db['restaurants']['is_active']
+            if not item_db.get("restaurants") or not item_db["restaurants"]["is_active"]:
                  raise HTTPException(status_code=403, detail=f"L'article de menu ID {item_id} appartient à un restaurant inactif.")
             
             # Retirer la donnée de jointure 'restaurants' avant validation si elle n'est pas dans le schéma MenuItem
-            item_data_for_validation = {k: v for k, v in response.data.items() if k != 'restaurants'}
-            return schemas.MenuItem.model_validate(item_data_for_validation)
+            item_data_for_validation = {k: v for k, v in item_db.items() if k != 'restaurants'}
+            item = validate_model(schemas.MenuItem, item_data_for_validation)
+            return conditional_json_response(request, build_cached_json(item))
         else:
             raise HTTPException(status_code=404, detail=f"Article de menu ID {item_id} non trouvé ou indisponible.")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erreur API - Récupération menu item ID {item_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Récupération menu item ID %s: %s", item_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.put("/api/menu-items/{item_id}", response_model=schemas.MenuItem)
 async def update_menu_item_api(item_id: int, item_data: schemas.MenuItemUpdate): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
         update_dict = item_data.model_dump(exclude_unset=True)
         if not update_dict:
             raise HTTPException(status_code=400, detail="Aucune donnée fournie pour la mise à jour.")
         
-        check_exists = supabase.table("menu_items").select("id, restaurant_id").eq("id", item_id).maybe_single().execute()
-        if not check_exists.data:
-            raise HTTPException(status_code=404, detail=f"Article de menu ID {item_id} non trouvé.")
-        
-        # Vérifier si le restaurant parent est actif avant de permettre la MàJ de l'item
-        parent_restaurant_id = check_exists.data["restaurant_id"]
-        parent_r_active = supabase.table("restaurants").select("id").eq("id", parent_restaurant_id).eq("is_active", True).maybe_single().execute()
-        if not parent_r_active.data:
-            raise HTTPException(status_code=403, detail=f"Impossible de mettre à jour l'article car son restaurant (ID: {parent_restaurant_id}) est inactif.")
-
-        response = supabase.table("menu_items").update(update_dict).eq("id", item_id).execute()
-        if response.data:
-            return schemas.MenuItem.model_validate(response.data[0])
-        else:
-            logger.warning(f"API MàJ menu item ID {item_id} n'a pas retourné de données. Supabase resp: {response}")
-            refetched_data = supabase.table("menu_items").select("*").eq("id", item_id).maybe_single().execute()
-            if refetched_data.data:
-                return schemas.MenuItem.model_validate(refetched_data.data)
-            raise HTTPException(status_code=400, detail="Impossible de mettre à jour ou récupérer l'article après MàJ.")
+        # Existence de l'article, restaurant parent actif et mise à jour dans le même UPDATE
+        # (backend/sql/update_menu_item.sql)
+        updated = await db.rpc("update_menu_item", {"p_item_id": item_id, "p_values": update_dict})
+        invalidate_menu_cache(updated["restaurant_id"])
+        sync_menu_search_item(updated)
+        return validate_model(schemas.MenuItem, updated)
+    except DatabaseFunctionError as e:
+        # Article introuvable (404) ou restaurant parent inactif (403)
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erreur API - MàJ menu item ID {item_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - MàJ menu item ID %s: %s", item_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.delete("/api/menu-items/{item_id}", status_code=204)
 async def delete_menu_item_api(item_id: int): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        check_response = supabase.table("menu_items").select("id, is_available").eq("id", item_id).maybe_single().execute()
-        if not check_response.data:
-            raise HTTPException(status_code=404, detail=f"Article de menu ID {item_id} non trouvé.")
-        if not check_response.data["is_available"]:
-            return 
-            
-        response = supabase.table("menu_items").update({"is_available": False}).eq("id", item_id).execute()
-        if not response.data:
-            logger.error(f"API Échec désactivation menu item ID {item_id}. Supabase resp: {response}")
-            raise HTTPException(status_code=500, detail="Impossible de désactiver l'article de menu.")
+        updated = await db.update("menu_items", {"is_available": False}, id=item_id, is_available=True)
+        if not updated:
+            # Chemin d'échec seulement : article absent, ou déjà indisponible
+            if not await db.select_one("menu_items", "id", id=item_id):
+                raise HTTPException(status_code=404, detail=f"Article de menu ID {item_id} non trouvé.")
+            return
+        invalidate_menu_cache(updated[0]["restaurant_id"])
+        sync_menu_search_item(updated[0])
         return
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erreur API - Suppression logique menu item ID {item_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Suppression logique menu item ID %s: %s", item_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 # --- Endpoints pour Users (Tableau de bord Admin) ---
 @app.get("/api/users", response_model=schemas.UserListResponse)
-async def list_users_api(): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+async def list_users_api( # Renommé
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        response = supabase.table("users").select("*").execute()
-        user_list = [schemas.User.model_validate(u_data) for u_data in response.data] if response.data else []
-        return schemas.UserListResponse(users=user_list)
+        users_db, next_cursor = await db.select_page("users", limit=limit, cursor=cursor)
+        user_list = validate_models(schemas.User, users_db)
+        return schemas.UserListResponse(users=user_list, next_cursor=next_cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erreur API - Listage utilisateurs: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Listage utilisateurs: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.get("/api/users/{user_id}", response_model=schemas.User)
 async def get_user_by_id_api(user_id: int): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        response = supabase.table("users").select("*").eq("id", user_id).maybe_single().execute()
-        if response.data:
-            return schemas.User.model_validate(response.data)
+        user_db = await db.select_one("users", id=user_id)
+        if user_db:
+            return validate_model(schemas.User, user_db)
         else:
             raise HTTPException(status_code=404, detail=f"Utilisateur ID {user_id} non trouvé.")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erreur API - Récupération utilisateur ID {user_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Récupération utilisateur ID %s: %s", user_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.post("/api/users", response_model=schemas.User, status_code=201)
 async def create_user_api(user_data: schemas.UserCreate): # Renommé
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        existing_user_check = supabase.table("users").select("id").eq("phone_number", user_data.phone_number).maybe_single().execute()
-        if existing_user_check.data:
+        existing_user_check = await db.select_one("users", "id", phone_number=user_data.phone_number)
+        if existing_user_check:
             raise HTTPException(status_code=409, detail=f"Un utilisateur avec le numéro de téléphone {user_data.phone_number} existe déjà.")
 
         new_user_dict = user_data.model_dump()
-        response = supabase.table("users").insert(new_user_dict).execute()
-        if response.data:
-            return schemas.User.model_validate(response.data[0])
+        inserted = await db.insert("users", new_user_dict)
+        if inserted:
+            failed_user_cache.invalidate(user_data.phone_number)
+            return validate_model(schemas.User, inserted[0])
         else:
-            logger.error(f"API Erreur - Insertion utilisateur via endpoint n'a pas retourné de données. Supabase resp: {response}")
+            logger.error("API Erreur - Insertion utilisateur via endpoint n'a pas retourné de données.")
             raise HTTPException(status_code=400, detail="Impossible de créer l'utilisateur.")
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        logger.error(f"Erreur API - Création utilisateur via endpoint: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Création utilisateur via endpoint: %s", e, exc_info=True)
         if "duplicate key value violates unique constraint" in str(e).lower(): # Devrait être intercepté par la vérification ci-dessus
             raise HTTPException(status_code=409, detail=f"Un utilisateur avec le numéro de téléphone {user_data.phone_number} existe déjà (contrainte DB).")
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
@@ -456,275 +1245,301 @@ async def create_user_api(user_data: schemas.UserCreate): # Renommé
 # --- Endpoints pour Orders (Tableau de bord Admin & Bot) ---
 @app.post("/api/orders", response_model=schemas.Order, status_code=201)
 async def create_order_api(order_data: schemas.OrderCreate, current_user_id: int): # current_user_id à remplacer par auth
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     
     try:
-        # 1. Valider l'existence et l'activité du client (utilisateur)
-        user_response = supabase.table("users").select("id").eq("id", current_user_id).maybe_single().execute()
-        if not user_response.data:
-            raise HTTPException(status_code=404, detail=f"Client avec ID {current_user_id} non trouvé.")
-
-        # 2. Valider l'existence et l'activité du restaurant
-        restaurant_response = supabase.table("restaurants").select("id, is_active").eq("id", order_data.restaurant_id).maybe_single().execute()
-        if not restaurant_response.data:
-            raise HTTPException(status_code=404, detail=f"Restaurant ID {order_data.restaurant_id} non trouvé.")
-        if not restaurant_response.data["is_active"]:
-            raise HTTPException(status_code=400, detail=f"Le restaurant ID {order_data.restaurant_id} est actuellement inactif.")
-
-        if not order_data.items:
-            raise HTTPException(status_code=400, detail="Une commande doit contenir au moins un article.")
-
-        order_items_to_create_db = []
-        calculated_total_amount = 0.0
-
-        # 3. Valider chaque article de la commande et calculer le prix
-        for item_in_payload in order_data.items:
-            menu_item_response = supabase.table("menu_items") \
-                .select("id, name, price, is_available, restaurant_id") \
-                .eq("id", item_in_payload.menu_item_id) \
-                .maybe_single().execute()
-            
-            if not menu_item_response.data:
-                raise HTTPException(status_code=404, detail=f"Article de menu ID {item_in_payload.menu_item_id} non trouvé.")
-            
-            menu_item_db = menu_item_response.data
-            if not menu_item_db["is_available"]:
-                raise HTTPException(status_code=400, detail=f"L'article '{menu_item_db['name']}' (ID: {menu_item_db['id']}) n'est plus disponible.")
-            if menu_item_db["restaurant_id"] != order_data.restaurant_id:
-                 raise HTTPException(status_code=400, detail=f"L'article '{menu_item_db['name']}' (ID: {menu_item_db['id']}) n'appartient pas au restaurant ID {order_data.restaurant_id}.")
-
-            price_at_order = menu_item_db["price"]
-            calculated_total_amount += price_at_order * item_in_payload.quantity
-            
-            order_items_to_create_db.append({
-                "menu_item_id": item_in_payload.menu_item_id,
-                "quantity": item_in_payload.quantity,
-                "price_at_order": price_at_order, # Prix au moment de la commande
-                "notes": item_in_payload.notes
-            })
-        
-        # 4. Créer l'enregistrement Order principal
+        # Validation (client, restaurant, articles), calcul du total et insertion de l'en-tête
+        # et des articles sont faits par la fonction SQL `place_order` (backend/sql/place_order.sql) :
+        # un seul aller-retour, dans une seule transaction, donc jamais d'en-tête orphelin.
         # Note: customer_id est current_user_id pour l'instant
-        order_header_payload = {
-            "customer_id": current_user_id, 
-            "restaurant_id": order_data.restaurant_id,
-            "total_amount": calculated_total_amount,
-            "status": "pending", # Statut initial par défaut
-            "payment_status": "pending", # Statut de paiement initial par défaut
-            "delivery_address": order_data.delivery_address,
-            "delivery_latitude": order_data.delivery_latitude,
-            "delivery_longitude": order_data.delivery_longitude,
-            "notes": order_data.notes
-        }
-        order_header_insert_response = supabase.table("orders").insert(order_header_payload).execute()
-
-        if not order_header_insert_response.data or not order_header_insert_response.data[0]:
-            logger.error(f"Échec création en-tête commande pour client {current_user_id}. Supabase: {order_header_insert_response}")
-            raise HTTPException(status_code=500, detail="Impossible de créer l'en-tête de la commande.")
-        
-        created_order_header_db = order_header_insert_response.data[0]
-        new_order_id = created_order_header_db["id"]
-
-        # 5. Créer les OrderItems associés
-        for item_db_payload in order_items_to_create_db:
-            item_db_payload["order_id"] = new_order_id
-        
-        order_items_insert_response = supabase.table("order_items").insert(order_items_to_create_db).execute()
-
-        if not order_items_insert_response.data or len(order_items_insert_response.data) != len(order_items_to_create_db):
-            logger.error(f"Échec insertion articles pour commande ID {new_order_id}. Supabase: {order_items_insert_response}. Tentative d'annulation de l'en-tête.")
-            # Tentative de compensation : supprimer l'en-tête de commande créé
-            supabase.table("orders").delete().eq("id", new_order_id).execute()
-            raise HTTPException(status_code=500, detail="Impossible de créer tous les articles de la commande. La commande a été annulée.")
-
-        # 6. Préparer la réponse : combiner l'en-tête de commande et les articles créés
-        # Les données des articles créés sont dans order_items_insert_response.data
-        created_order_items_for_response = [schemas.OrderItem.model_validate(item) for item in order_items_insert_response.data]
-        
-        # Construire l'objet Order Pydantic complet pour la réponse
-        final_order_response_data = {**created_order_header_db, "items": created_order_items_for_response}
-        
-        return schemas.Order.model_validate(final_order_response_data)
-
+        # Plan d'estimation conservé avec la commande : update_order recalcule l'heure estimée
+        # à chaque changement de statut sans relire le restaurant
+        eta_plan = eta.plan(order_data.restaurant_id, order_data.delivery_latitude, order_data.delivery_longitude)
+        estimated_delivery_time = datetime.now(timezone.utc) + timedelta(seconds=eta_plan["pending"])
+        created_order_db = await db.rpc("place_order", {
+            "p_customer_id": current_user_id,
+            "p_restaurant_id": order_data.restaurant_id,
+            "p_items": [item.model_dump() for item in order_data.items],
+            "p_delivery_address": order_data.delivery_address,
+            "p_delivery_latitude": order_data.delivery_latitude,
+            "p_delivery_longitude": order_data.delivery_longitude,
+            "p_notes": order_data.notes,
+            "p_estimated_delivery_time": estimated_delivery_time.isoformat(),
+            "p_eta_plan": eta_plan,
+        })
+
+        if not created_order_db:
+            logger.error("Échec création commande pour client %s: place_order n'a pas retourné de données.", current_user_id)
+            raise HTTPException(status_code=500, detail="Impossible de créer la commande.")
+
+        created_order = validate_model(schemas.Order, created_order_db)
+        analytics.record_order(created_order_db)
+        order_events.publish(EVENT_ORDER_CREATED, created_order.restaurant_id, created_order.model_dump_json())
+        return created_order
+
+    except DatabaseFunctionError as e:
+        # Erreurs métier levées par place_order (client/article introuvable, restaurant inactif, ...)
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except HTTPException as http_exc:
         raise http_exc # Repropager les erreurs HTTP déjà formatées
     except Exception as e:
-        logger.error(f"Erreur majeure API - Création commande pour client {current_user_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur majeure API - Création commande pour client %s: %s", current_user_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erreur interne du serveur lors de la création de la commande.")
 
 @app.get("/api/orders", response_model=schemas.OrderListResponse)
-async def list_orders_api(): # Renommé pour clarté
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+async def list_orders_api( # Renommé pour clarté
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    restaurant_id: Optional[int] = None,
+    customer_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        # Récupérer tous les en-têtes de commande, triés par date de création (plus récent d'abord)
-        orders_header_response = supabase.table("orders").select("*").order("created_at", desc=True).execute()
-        
-        if not orders_header_response.data:
-            return schemas.OrderListResponse(orders=[]) # Retourner une liste vide si aucune commande
-
-        orders_for_response = []
-        for order_header_db in orders_header_response.data:
-            order_id = order_header_db["id"]
-            
-            # Récupérer les articles pour cette commande spécifique
-            # Idéalement, cela devrait être fait avec une jointure Supabase `select("*, order_items(*)")`
-            # Mais pour la clarté et pour s'assurer de la compatibilité avec Pydantic, faisons-le séparément pour l'instant.
-            items_response = supabase.table("order_items").select("*").eq("order_id", order_id).execute()
-            
-            order_items_list_for_response = []
-            if items_response.data:
-                order_items_list_for_response = [schemas.OrderItem.model_validate(item) for item in items_response.data]
-            
-            # Combiner l'en-tête de commande et ses articles
-            # S'assurer que tous les champs requis par schemas.Order sont présents dans order_header_db
-            # ou sont ajoutés/transformés ici.
-            full_order_data_for_validation = {**order_header_db, "items": order_items_list_for_response}
-            orders_for_response.append(schemas.Order.model_validate(full_order_data_for_validation))
-            
-        return schemas.OrderListResponse(orders=orders_for_response)
-
+        # En-têtes et articles récupérés ensemble (jointure embarquée), triés par date de création (plus récent d'abord)
+        orders_db, next_cursor = await db.select_orders_page(
+            limit=limit,
+            cursor=cursor,
+            created_from=created_from,
+            created_to=created_to,
+            status=status,
+            restaurant_id=restaurant_id,
+            customer_id=customer_id,
+        )
+        orders_for_response = validate_models(schemas.Order, orders_db)
+        return schemas.OrderListResponse(orders=orders_for_response, next_cursor=next_cursor)
+
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Erreur API - Listage de toutes les commandes: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Listage de toutes les commandes: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erreur interne du serveur lors du listage des commandes.")
 
+@app.get("/api/orders/stream")
+async def stream_orders_api(request: Request, restaurant_id: Optional[int] = None):
+    # Server-Sent Events : `order_created` / `order_updated` (commande complète en JSON) pour un
+    # restaurant, ou toutes les commandes sans restaurant_id. À la reconnexion, EventSource renvoie
+    # Last-Event-ID : les événements manqués sont rejoués, ou `resync` demande de recharger /api/orders.
+    try:
+        subscription, replay = order_events.subscribe(restaurant_id, request.headers.get("last-event-id"))
+    except TooManySubscribersError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return StreamingResponse(
+        _order_event_stream(request, subscription, replay),
+        media_type="text/event-stream",
+        # Content-Encoding posé : GZipMiddleware garderait les trames dans son tampon
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
+
+async def _order_event_stream(request: Request, subscription: OrderSubscription, replay: Optional[List[bytes]]):
+    try:
+        yield RETRY_FRAME
+        for frame in replay if replay is not None else [RESYNC_FRAME]:
+            yield frame
+        while True:
+            frame = await subscription.next_frame(ORDER_STREAM_HEARTBEAT_SECONDS)
+            if frame is not None:
+                yield frame
+            elif subscription.lagged:
+                # Client trop lent, événements perdus : il se reconnectera et rechargera la liste
+                yield RESYNC_FRAME
+                return
+            elif subscription.closed or await request.is_disconnected():
+                return
+            else:
+                yield HEARTBEAT_FRAME
+    finally:
+        order_events.unsubscribe(subscription)
+
+@app.get("/api/orders/stream/stats")
+async def order_stream_stats():
+    return order_events.stats()
+
 @app.get("/api/orders/{order_id}", response_model=schemas.Order)
 async def get_order_by_id_api(order_id: int):
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        # Récupérer l'en-tête de la commande
-        # Idéalement, utiliser Supabase select("*, order_items(*)") pour une seule requête
-        order_header_response = supabase.table("orders").select("*").eq("id", order_id).maybe_single().execute()
+        # En-tête de la commande et articles associés en une seule requête
+        order_db = await db.select_order_with_items(order_id)
 
-        if not order_header_response.data:
+        if not order_db:
             raise HTTPException(status_code=404, detail=f"Commande avec ID {order_id} non trouvée.")
 
-        order_header_db = order_header_response.data
-
-        # Récupérer les articles associés à cette commande
-        items_response = supabase.table("order_items").select("*").eq("order_id", order_id).execute()
-        
-        order_items_list_for_response = []
-        if items_response.data:
-            order_items_list_for_response = [schemas.OrderItem.model_validate(item) for item in items_response.data]
-        
-        # Combiner l'en-tête et les articles pour la réponse
-        full_order_data_for_validation = {**order_header_db, "items": order_items_list_for_response}
-        
-        return schemas.Order.model_validate(full_order_data_for_validation)
+        return validate_model(schemas.Order, order_db)
 
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        logger.error(f"Erreur API - Récupération de la commande ID {order_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Récupération de la commande ID %s: %s", order_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erreur interne du serveur lors de la récupération de la commande.")
 
 @app.put("/api/orders/{order_id}", response_model=schemas.Order)
 async def update_order_api(order_id: int, order_update_data: schemas.OrderUpdate):
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        update_dict = order_update_data.model_dump(exclude_unset=True) # Ne met à jour que les champs fournis
+        update_dict = order_update_data.model_dump(mode="json", exclude_unset=True) # Ne met à jour que les champs fournis
 
         if not update_dict:
             raise HTTPException(status_code=400, detail="Aucune donnée fournie pour la mise à jour.")
 
-        # Vérifier d'abord si la commande existe
-        check_order_exists = supabase.table("orders").select("id").eq("id", order_id).maybe_single().execute()
-        if not check_order_exists.data:
-            raise HTTPException(status_code=404, detail=f"Commande avec ID {order_id} non trouvée.")
-
-        # Appliquer la mise à jour
-        # La colonne updated_at devrait être gérée automatiquement par le trigger `moddatetime` dans la DB
-        update_response = supabase.table("orders").update(update_dict).eq("id", order_id).execute()
-
-        if not update_response.data or not update_response.data[0]:
-            logger.error(f"API Erreur - Mise à jour commande ID {order_id} n'a pas retourné de données. Supabase: {update_response}")
-            # Tenter de récupérer la commande pour voir si la mise à jour a eu lieu malgré tout (RLS, etc.)
-            refetched_order = supabase.table("orders").select("*").eq("id", order_id).maybe_single().execute()
-            if refetched_order.data:
-                # Si elle est récupérée, il faut aussi récupérer ses items pour la réponse complète
-                items_response = supabase.table("order_items").select("*").eq("order_id", order_id).execute()
-                order_items_list = [schemas.OrderItem.model_validate(item) for item in items_response.data] if items_response.data else []
-                full_order_data = {**refetched_order.data, "items": order_items_list}
-                return schemas.Order.model_validate(full_order_data)
-            raise HTTPException(status_code=500, detail="Impossible de mettre à jour la commande ou de récupérer ses données après tentative.")
-
-        updated_order_header_db = update_response.data[0]
-
-        # Récupérer les articles pour la réponse complète (car ils ne sont pas dans updated_order_header_db)
-        items_response = supabase.table("order_items").select("*").eq("order_id", order_id).execute()
-        order_items_list_for_response = []
-        if items_response.data:
-            order_items_list_for_response = [schemas.OrderItem.model_validate(item) for item in items_response.data]
-        
-        full_updated_order_data = {**updated_order_header_db, "items": order_items_list_for_response}
-        
-        return schemas.Order.model_validate(full_updated_order_data)
-
+        # Transition vérifiée (machine à états), horodatage, heure estimée et mise à jour en une
+        # seule requête ; la réponse contient les articles, le statut précédent et si la commande
+        # a été écrite (backend/sql/update_order.sql)
+        updated_order_db = await db.rpc("update_order", {"p_order_id": order_id, "p_changes": update_dict})
+        previous_status = updated_order_db.pop("previous_status")
+        changed = updated_order_db.pop("changed")
+        if updated_order_db["status"] != previous_status:
+            eta.record_transition(updated_order_db)
+            analytics.record_status_change(updated_order_db, previous_status)
+            await notify_order_status(updated_order_db)
+
+        updated_order = validate_model(schemas.Order, updated_order_db)
+        if changed:
+            # PUT répété (rien d'écrit) : pas d'événement pour les tableaux de bord
+            order_events.publish(EVENT_ORDER_UPDATED, updated_order.restaurant_id, updated_order.model_dump_json())
+        return updated_order
+
+    except DatabaseFunctionError as e:
+        # Commande introuvable (404), transition interdite (409), statut inconnu (400)
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        logger.error(f"Erreur API - Mise à jour de la commande ID {order_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Mise à jour de la commande ID %s: %s", order_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erreur interne du serveur lors de la mise à jour de la commande.")
 
 @app.delete("/api/orders/{order_id}", response_model=schemas.Order)
 async def cancel_order_api(order_id: int):
-    if not supabase: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
     try:
-        # Vérifier d'abord si la commande existe
-        check_order_response = supabase.table("orders").select("id, status").eq("id", order_id).maybe_single().execute()
-        if not check_order_response.data:
-            raise HTTPException(status_code=404, detail=f"Commande avec ID {order_id} non trouvée.")
-
-        current_status = check_order_response.data["status"]
-        # Idéalement, vérifier si la commande peut être annulée (par exemple, pas si elle est déjà "delivered" ou "cancelled")
-        if current_status in ["delivered", "cancelled"]:
-            # Retourner la commande actuelle sans la modifier si elle ne peut être annulée
-            # Pour cela, il faut récupérer tous les détails, y compris les items
-            items_response = supabase.table("order_items").select("*").eq("order_id", order_id).execute()
-            order_items = [schemas.OrderItem.model_validate(item) for item in items_response.data] if items_response.data else []
-            full_order_data = {**check_order_response.data, "items": order_items} 
-            # Il faut s'assurer que check_order_response.data contient tous les champs de OrderBase
-            # Pour être sûr, on pourrait refaire un select("*") ici.
-            complete_order_data_resp = supabase.table("orders").select("*").eq("id", order_id).maybe_single().execute()
-            if complete_order_data_resp.data:
-                 full_order_data = {**complete_order_data_resp.data, "items": order_items}
-                 validated_order = schemas.Order.model_validate(full_order_data)
-                 raise HTTPException(status_code=400, 
-                                   detail=f"Impossible d'annuler la commande ID {order_id} car son statut est déjà '{current_status}'.",
-                                   headers={"X-Current-Order-State": validated_order.model_dump_json()})
-            else: # Ne devrait pas arriver si le premier check a fonctionné
-                 raise HTTPException(status_code=404, detail=f"Commande ID {order_id} trouvée puis perdue.")
-
-        # Mettre à jour le statut à "cancelled"
-        update_data = {"status": "cancelled"}
-        # updated_at sera géré par le trigger moddatetime
-        update_response = supabase.table("orders").update(update_data).eq("id", order_id).execute()
-
-        if not update_response.data or not update_response.data[0]:
-            logger.error(f"API Erreur - Annulation commande ID {order_id} n'a pas retourné de données. Supabase: {update_response}")
-            raise HTTPException(status_code=500, detail="Impossible d'annuler la commande ou de récupérer ses données après tentative.")
-
-        cancelled_order_header_db = update_response.data[0]
-
-        # Récupérer les articles pour la réponse complète
-        items_response = supabase.table("order_items").select("*").eq("order_id", order_id).execute()
-        order_items_list_for_response = [schemas.OrderItem.model_validate(item) for item in items_response.data] if items_response.data else []
-        
-        full_cancelled_order_data = {**cancelled_order_header_db, "items": order_items_list_for_response}
-        
-        return schemas.Order.model_validate(full_cancelled_order_data)
+        # Annulation conditionnelle : update_order refuse la transition si la commande est déjà
+        # livrée, annulée ou remboursée, dans la même requête que l'écriture
+        try:
+            full_cancelled_order_data = await db.rpc("update_order", {"p_order_id": order_id, "p_changes": {"status": "cancelled"}})
+        except DatabaseFunctionError as e:
+            if e.status_code != 409:
+                raise HTTPException(status_code=e.status_code, detail=e.message)
+            full_cancelled_order_data = None
+        current_status = full_cancelled_order_data.pop("previous_status") if full_cancelled_order_data else None
+        if full_cancelled_order_data:
+            full_cancelled_order_data.pop("changed")
+        if current_status is None or current_status == "cancelled":
+            # Déjà annulée : update_order n'a rien écrit et renvoie la commande ; sinon (livrée,
+            # remboursée) relecture, sur le chemin d'échec seulement
+            order_db = full_cancelled_order_data or await db.select_order_with_items(order_id)
+            if not order_db:
+                raise HTTPException(status_code=404, detail=f"Commande avec ID {order_id} non trouvée.")
+            validated_order = validate_model(schemas.Order, order_db)
+            raise HTTPException(status_code=400,
+                                detail=f"Impossible d'annuler la commande ID {order_id} car son statut est déjà '{order_db['status']}'.",
+                                headers={"X-Current-Order-State": validated_order.model_dump_json()})
+
+        analytics.record_status_change(full_cancelled_order_data, current_status)
+        await notify_order_status(full_cancelled_order_data)
+
+        cancelled_order = validate_model(schemas.Order, full_cancelled_order_data)
+        order_events.publish(EVENT_ORDER_UPDATED, cancelled_order.restaurant_id, cancelled_order.model_dump_json())
+        return cancelled_order
 
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        logger.error(f"Erreur API - Annulation de la commande ID {order_id}: {str(e)}", exc_info=True)
+        logger.error("Erreur API - Annulation de la commande ID %s: %s", order_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Erreur interne du serveur lors de l'annulation de la commande.")
 
+# --- Répartition des livraisons ---
+@app.post("/api/dispatch/run")
+async def run_dispatch_api():
+    # Tour de répartition immédiat, en plus de la boucle DISPATCH_INTERVAL_SECONDS
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    try:
+        return await dispatch.run_once()
+    except Exception as e:
+        logger.error("Erreur API - Tour de répartition: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.get("/api/dispatch/stats")
+async def dispatch_stats():
+    return dispatch.stats()
+
+@app.get("/api/eta/stats")
+async def eta_stats():
+    return eta.stats()
+
+# --- Statistiques de ventes (tableau de bord) ---
+def analytics_period(granularity: str, date_from: Optional[datetime], date_to: Optional[datetime]):
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"Granularité inconnue: {granularity} (hour ou day).")
+    # Sans fuseau : UTC ; par défaut les dernières 24 h (hour) ou les 30 derniers jours (day)
+    date_to = date_to or datetime.now(timezone.utc)
+    date_to = date_to if date_to.tzinfo else date_to.replace(tzinfo=timezone.utc)
+    date_from = date_from or date_to - timedelta(days=1 if granularity == "hour" else 30)
+    date_from = date_from if date_from.tzinfo else date_from.replace(tzinfo=timezone.utc)
+    if date_from >= date_to:
+        raise HTTPException(status_code=400, detail="date_from doit précéder date_to.")
+    if (date_to - date_from).total_seconds() > MAX_BUCKETS[granularity] * GRANULARITIES[granularity]:
+        raise HTTPException(status_code=400, detail=f"Période trop longue : {MAX_BUCKETS[granularity]} tranches '{granularity}' au maximum.")
+    return date_from, date_to
+
+@app.get("/api/analytics/sales", response_model=schemas.SalesResponse)
+async def analytics_sales_api(
+    granularity: str = "day",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    restaurant_id: Optional[int] = None,
+):
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    date_from, date_to = analytics_period(granularity, date_from, date_to)
+    try:
+        buckets = validate_models(schemas.SalesBucket, await analytics.sales(granularity, date_from, date_to, restaurant_id))
+        return schemas.SalesResponse(
+            restaurant_id=restaurant_id, granularity=granularity, date_from=date_from, date_to=date_to,
+            order_count=sum(bucket.order_count for bucket in buckets), revenue=sum(bucket.revenue for bucket in buckets),
+            buckets=buckets,
+        )
+    except Exception as e:
+        logger.error("Erreur API - Statistiques de ventes: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.get("/api/analytics/top-items", response_model=schemas.TopMenuItemsResponse)
+async def analytics_top_items_api(
+    granularity: str = "day",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    restaurant_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_TOP_ITEMS_LIMIT, ge=1, le=MAX_TOP_ITEMS_LIMIT),
+):
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    date_from, date_to = analytics_period(granularity, date_from, date_to)
+    try:
+        items = validate_models(schemas.TopMenuItem, await analytics.top_items(granularity, date_from, date_to, restaurant_id, limit))
+        return schemas.TopMenuItemsResponse(restaurant_id=restaurant_id, granularity=granularity, date_from=date_from, date_to=date_to, items=items)
+    except Exception as e:
+        logger.error("Erreur API - Plats les plus vendus: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.post("/api/analytics/rebuild")
+async def analytics_rebuild_api():
+    # Recalcul complet des cumuls depuis les commandes (réparation, initialisation)
+    if not db: raise HTTPException(status_code=503, detail="Service Supabase non disponible.")
+    try:
+        await analytics.flush()
+        return await analytics.rebuild()
+    except Exception as e:
+        logger.error("Erreur API - Reconstruction des statistiques de ventes: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.get("/api/analytics/stats")
+async def analytics_stats():
+    return analytics.stats()
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
-    if supabase is None:
+    if db is None:
         logger.critical("CRITIQUE: SUPABASE_URL et SUPABASE_KEY doivent être configurés dans les variables d'environnement pour démarrer le serveur.")
         # Ne pas démarrer uvicorn si supabase n'est pas configuré
     else:
-        logger.info(f"Démarrage du serveur FastAPI sur le port {port}")
-        uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True, log_level="info")
\ No newline at end of file
+        logger.info("Démarrage du serveur FastAPI sur le port %s", port)
+        uvicorn.run("ChopExpress.backend.main:app", host="0.0.0.0", port=port, reload=True, log_level="info")
\ No newline at end of file
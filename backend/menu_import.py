@@ -0,0 +1,257 @@
+"""Import et export en masse du menu d'un restaurant, en CSV ou NDJSON, au fil de l'eau.
+
+Import (`POST /api/restaurants/{id}/menu-items/import`) : le corps de la requête est lu
+par morceaux, chaque ligne est validée par `schemas.MenuItemCreate` dès qu'elle est
+complète, et les lignes valides sont écrites par lots de `chunk_size` en un seul upsert
+PostgREST sur (restaurant_id, name) (voir sql/menu_items_import.sql) : réimporter le même
+fichier met les plats à jour au lieu de les dupliquer. Une ligne invalide, ou un lot
+refusé par la base, est rapportée avec son numéro de ligne sans interrompre l'import.
+
+Export (`GET /api/restaurants/{id}/menu-items/export`) : pages keyset de
+`Repository.iter_pages` converties et envoyées une à une, le menu n'est jamais entier en
+mémoire. Le CSV exporté se réimporte tel quel (les colonnes id et updated_at sont ignorées).
+"""
+import codecs
+import csv
+import io
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+import ChopExpress.backend.schemas as schemas
+from ChopExpress.backend.metrics import validate_model
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MENU_IMPORT_CHUNK_SIZE = 500
+DEFAULT_MENU_IMPORT_MAX_ROWS = 10000
+DEFAULT_MENU_EXPORT_PAGE_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+CONTENT_TYPES = {FORMAT_CSV: "text/csv", FORMAT_NDJSON: "application/x-ndjson"}
+_FORMATS_BY_MEDIA_TYPE = {
+    "text/csv": FORMAT_CSV,
+    "application/csv": FORMAT_CSV,
+    "application/x-ndjson": FORMAT_NDJSON,
+    "application/ndjson": FORMAT_NDJSON,
+    "application/jsonl": FORMAT_NDJSON,
+    "application/x-jsonlines": FORMAT_NDJSON,
+}
+
+IMPORT_COLUMNS = list(schemas.MenuItemCreate.model_fields)
+REQUIRED_COLUMNS = [name for name, field in schemas.MenuItemCreate.model_fields.items() if field.is_required()]
+EXPORT_COLUMNS = ["id", *IMPORT_COLUMNS, "updated_at"]
+CONFLICT_COLUMNS = "restaurant_id,name"
+# Valeurs booléennes acceptées en plus de celles de Pydantic (true/false, 1/0, yes/no...)
+_FRENCH_BOOLEANS = {"oui": "true", "non": "false", "vrai": "true", "faux": "false"}
+
+# (numéro de ligne dans le fichier, données, erreur) : données None si erreur
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+class MenuImportFormatError(ValueError):
+    # Fichier inutilisable dans son ensemble (en-tête CSV incomplet, encodage...)
+    pass
+
+
+class UnsupportedFormatError(MenuImportFormatError):
+    pass
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str] = None) -> str:
+    # `?format=` prioritaire sur le Content-Type
+    if requested:
+        if requested not in CONTENT_TYPES:
+            raise UnsupportedFormatError(f"Format inconnu: {requested} (csv ou ndjson).")
+        return requested
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in _FORMATS_BY_MEDIA_TYPE:
+        raise UnsupportedFormatError(f"Type de contenu non supporté: {media_type or 'absent'} (text/csv ou application/x-ndjson).")
+    return _FORMATS_BY_MEDIA_TYPE[media_type]
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Lignes décodées avec leur "\n", quel que soit le découpage des morceaux (BOM des exports Excel ignoré)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise MenuImportFormatError(f"Fichier non encodé en UTF-8: {e}") from e
+    if pending:
+        yield pending
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    # Un champ entre guillemets peut contenir des retours à la ligne : un enregistrement
+    # est complet quand il contient un nombre pair de guillemets
+    header: Optional[List[str]] = None
+    line_number, record_line, record = 0, 0, ""
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not record:
+            record_line = line_number
+        record += line
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [column.strip().lower() for column in values]
+            missing = [column for column in REQUIRED_COLUMNS if column not in header]
+            if missing:
+                raise MenuImportFormatError(f"En-tête CSV sans colonne(s) obligatoire(s): {', '.join(missing)}.")
+            continue
+        if len(values) > len(header):
+            yield record_line, None, f"{len(values)} valeurs pour {len(header)} colonnes"
+            continue
+        # Cellule vide = valeur par défaut du schéma (ou champ manquant s'il est obligatoire)
+        data = {column: value.strip() for column, value in zip(header, values) if value.strip()}
+        if "is_available" in data:
+            data["is_available"] = _FRENCH_BOOLEANS.get(data["is_available"].lower(), data["is_available"])
+        yield record_line, data, None
+    if record.strip():
+        yield record_line, None, "guillemet non fermé"
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"JSON invalide: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield line_number, None, "un objet JSON par ligne attendu"
+            continue
+        yield line_number, data, None
+
+
+def iter_records(chunks: AsyncIterator[bytes], import_format: str) -> AsyncIterator[Record]:
+    return iter_csv_records(chunks) if import_format == FORMAT_CSV else iter_ndjson_records(chunks)
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors())
+
+
+class MenuImporter:
+    """Valide les lignes d'un import au fil de l'eau et les écrit par lots d'au plus `chunk_size`.
+
+    `on_written` reçoit les lignes renvoyées par chaque upsert (index de recherche...).
+    """
+
+    def __init__(
+        self,
+        db,
+        restaurant_id: int,
+        chunk_size: int = DEFAULT_MENU_IMPORT_CHUNK_SIZE,
+        max_rows: int = DEFAULT_MENU_IMPORT_MAX_ROWS,
+        on_written: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ):
+        self.db = db
+        self.restaurant_id = restaurant_id
+        self.chunk_size = max(1, chunk_size)
+        self.max_rows = max_rows
+        self.on_written = on_written
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[schemas.MenuImportRowError] = []
+        self._batch: List[Tuple[int, Dict[str, Any]]] = []
+        self._names: Dict[str, int] = {}  # nom -> première ligne, un upsert ne peut viser deux fois la même ligne
+
+    def _fail(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(schemas.MenuImportRowError(line=line, error=error))
+
+    async def run(self, records: AsyncIterator[Record]) -> schemas.MenuImportReport:
+        truncated = False
+        async for line, data, error in records:
+            if self.rows >= self.max_rows:
+                truncated = True
+                break
+            self.rows += 1
+            if error:
+                self._fail(line, error)
+                continue
+            try:
+                item = validate_model(schemas.MenuItemCreate, data)
+            except ValidationError as e:
+                self._fail(line, _describe(e))
+                continue
+            if item.name in self._names:
+                self._fail(line, f"plat « {item.name} » déjà présent ligne {self._names[item.name]}")
+                continue
+            self._names[item.name] = line
+            self._batch.append((line, {**item.model_dump(), "restaurant_id": self.restaurant_id}))
+            if len(self._batch) >= self.chunk_size:
+                await self._flush()
+        await self._flush()
+        return schemas.MenuImportReport(
+            restaurant_id=self.restaurant_id,
+            rows=self.rows,
+            imported=self.imported,
+            failed=self.failed,
+            truncated=truncated,
+            errors=self.errors,
+        )
+
+    async def _flush(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        try:
+            written = await self.db.upsert("menu_items", [row for _, row in batch], on_conflict=CONFLICT_COLUMNS)
+        except Exception as e:
+            # Le lot entier est annulé par la base : ses lignes sont en erreur, les lots suivants continuent
+            logger.error("Import menu du restaurant %s: lot de %d lignes refusé: %s", self.restaurant_id, len(batch), e)
+            message = getattr(e, "message", None) or str(e)
+            for line, _ in batch:
+                self._fail(line, f"lot refusé par la base: {message}")
+            return
+        self.imported += len(written)
+        if self.on_written:
+            self.on_written(written)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+async def export_menu_items(db, restaurant_id: int, export_format: str, page_size: int = DEFAULT_MENU_EXPORT_PAGE_SIZE) -> AsyncIterator[bytes]:
+    """Menu complet du restaurant (plats indisponibles compris), une page à la fois."""
+    columns = ", ".join(EXPORT_COLUMNS)
+    if export_format == FORMAT_CSV:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue().encode()
+    async for page in db.iter_pages("menu_items", columns, page_size, restaurant_id=restaurant_id):
+        if export_format == FORMAT_CSV:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_value(row.get(column)) for column in EXPORT_COLUMNS] for row in page)
+            yield buffer.getvalue().encode()
+        else:
+            yield "".join(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in page).encode()
@@ -0,0 +1,103 @@
+"""Déduplication des messages WhatsApp par identifiant (`message["id"]`, wamid).
+
+WhatsApp livre « au moins une fois » : le même message peut revenir plusieurs fois.
+`process_whatsapp_message` demande au store si l'identifiant a déjà été vu dans la
+fenêtre `ttl` avant tout appel à la base ; les doublons sont ignorés et comptés. Si le
+traitement échoue, `release` retire l'identifiant : la nouvelle livraison sera traitée.
+
+- `InMemoryDedupStore` : LRU + TTL dans le processus. Seule une empreinte de 8 octets
+  de l'identifiant est conservée (un wamid fait ~60 caractères).
+- `SupabaseDedupStore` : table `processed_messages` (voir sql/processed_messages.sql),
+  partagée entre les workers uvicorn ; une seule requête RPC par message.
+"""
+import hashlib
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEDUP_TTL_SECONDS = 24 * 3600
+DEFAULT_DEDUP_MAX_ENTRIES = 100_000
+
+
+class DedupStore(ABC):
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.duplicates_dropped = 0
+
+    @abstractmethod
+    async def _register(self, message_id: str) -> bool:
+        """Enregistre l'identifiant ; False s'il était déjà présent dans la fenêtre."""
+
+    @abstractmethod
+    async def _unregister(self, message_id: str) -> None:
+        """Retire l'identifiant : la prochaine livraison sera traitée."""
+
+    async def is_duplicate(self, message_id: str) -> bool:
+        if not message_id:
+            return False
+        if await self._register(message_id):
+            return False
+        self.duplicates_dropped += 1
+        return True
+
+    async def release(self, message_id: str) -> None:
+        if not message_id:
+            return
+        try:
+            await self._unregister(message_id)
+        except Exception as e:
+            # L'identifiant reste enregistré : une nouvelle livraison sera ignorée jusqu'à expiration
+            logger.error("Impossible de libérer le message %s après un échec: %s", message_id, e, exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "ttl_seconds": self.ttl, "duplicates_dropped": self.duplicates_dropped}
+
+
+class InMemoryDedupStore(DedupStore):
+    def __init__(self, ttl: float = DEFAULT_DEDUP_TTL_SECONDS, max_entries: int = DEFAULT_DEDUP_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._clock = clock
+        # empreinte -> instant d'expiration ; l'ordre d'insertion est aussi l'ordre d'expiration (TTL fixe)
+        self._seen: "OrderedDict[bytes, float]" = OrderedDict()
+
+    async def _register(self, message_id: str) -> bool:
+        now = self._clock()
+        while self._seen:
+            oldest_key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now:
+                break
+            del self._seen[oldest_key]
+        key = self._key(message_id)
+        if key in self._seen:
+            return False
+        self._seen[key] = now + self.ttl
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return True
+
+    async def _unregister(self, message_id: str) -> None:
+        self._seen.pop(self._key(message_id), None)
+
+    @staticmethod
+    def _key(message_id: str) -> bytes:
+        return hashlib.blake2b(message_id.encode(), digest_size=8).digest()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "entries": len(self._seen), "max_entries": self.max_entries}
+
+
+class SupabaseDedupStore(DedupStore):
+    def __init__(self, repository, ttl: float = DEFAULT_DEDUP_TTL_SECONDS):
+        super().__init__(ttl)
+        self.db = repository
+
+    async def _register(self, message_id: str) -> bool:
+        return bool(await self.db.rpc("register_message", {"p_message_id": message_id, "p_ttl_seconds": int(self.ttl)}))
+
+    async def _unregister(self, message_id: str) -> None:
+        await self.db.delete("processed_messages", message_id=message_id)
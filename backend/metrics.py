@@ -0,0 +1,153 @@
+"""Métriques Prometheus de l'API (exposées sur GET /metrics).
+
+- Latence de chaque requête HTTP par route (gabarit `/api/orders/{order_id}`, pas l'URL,
+  pour borner le nombre de séries), méthode et code de statut : middleware ASGI pur,
+  sans `BaseHTTPMiddleware` qui recopie chaque réponse.
+- Durée de chaque appel Supabase par table, opération et résultat, mesurée dans
+  `Repository._execute` par lequel passent toutes les requêtes.
+- Durée des validations Pydantic faites par les endpoints (`validate_model`, `validate_models`).
+- Retard de la boucle d'événements : une tâche qui dort `interval` secondes et mesure
+  de combien elle se réveille en retard (code bloquant, CPU saturé).
+- Jauges lues au moment du scrape (`gauge_callback`) : profondeur des files, abonnés...
+
+Coût : quelques microsecondes par observation, négligeable devant un aller-retour réseau.
+Avec plusieurs workers uvicorn, définir PROMETHEUS_MULTIPROC_DIR (mode multiprocessus de
+prometheus_client) ; les jauges à callback ne sont alors pas agrégées entre workers.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Type, TypeVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from pydantic import BaseModel
+
+DEFAULT_EVENT_LOOP_LAG_INTERVAL_SECONDS = 0.5
+UNMATCHED_ROUTE = "unmatched"
+
+# Seaux en secondes : de la milliseconde (cache, mémoire) à la dizaine de secondes (Supabase à la peine)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "chopexpress_http_request_duration_seconds",
+    "Durée des requêtes HTTP",
+    ("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+SUPABASE_QUERY_SECONDS = Histogram(
+    "chopexpress_supabase_query_duration_seconds",
+    "Durée des appels PostgREST (Supabase)",
+    ("table", "operation", "outcome"),
+    buckets=LATENCY_BUCKETS,
+)
+VALIDATION_SECONDS = Histogram(
+    "chopexpress_pydantic_validation_duration_seconds",
+    "Durée des validations Pydantic des endpoints",
+    ("model",),
+    buckets=FAST_BUCKETS,
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "chopexpress_event_loop_lag_seconds",
+    "Retard de réveil de la boucle d'événements",
+    buckets=LATENCY_BUCKETS,
+)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def observe_supabase_query(table: str, operation: str, outcome: str, seconds: float) -> None:
+    SUPABASE_QUERY_SECONDS.labels(table, operation, outcome).observe(seconds)
+
+
+def validate_model(model: Type[ModelT], data: Any) -> ModelT:
+    # `model.model_validate(data)` chronométré par modèle
+    started = time.perf_counter()
+    try:
+        return model.model_validate(data)
+    finally:
+        VALIDATION_SECONDS.labels(model.__name__).observe(time.perf_counter() - started)
+
+
+def validate_models(model: Type[ModelT], rows: Iterable[Any]) -> List[ModelT]:
+    # Une liste validée = une seule observation, pas une par ligne
+    started = time.perf_counter()
+    try:
+        return [model.model_validate(row) for row in rows]
+    finally:
+        VALIDATION_SECONDS.labels(model.__name__).observe(time.perf_counter() - started)
+
+
+def gauge_callback(name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+    # Valeur lue à chaque scrape, rien à mettre à jour dans le code applicatif
+    gauge = Gauge(name, documentation)
+    gauge.set_function(callback)
+    return gauge
+
+
+class PrometheusMiddleware:
+    """Middleware ASGI : durée de chaque requête HTTP par (méthode, route, statut).
+
+    La route est connue après le routage (`scope["route"]`, posé par FastAPI). Les routes
+    de `excluded_routes` (flux SSE, dont la « durée » est celle de la connexion) sont ignorées.
+    """
+
+    def __init__(self, app, excluded_routes: Iterable[str] = ()):
+        self.app = app
+        self.excluded_routes = frozenset(excluded_routes)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500  # exception non gérée avant tout envoi
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else UNMATCHED_ROUTE
+            if path not in self.excluded_routes:
+                HTTP_REQUEST_SECONDS.labels(scope["method"], path, str(status)).observe(time.perf_counter() - started)
+
+
+class EventLoopLagMonitor:
+    def __init__(self, interval: float = DEFAULT_EVENT_LOOP_LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - started - self.interval)
+            EVENT_LOOP_LAG_SECONDS.observe(self.last_lag)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    # Corps et Content-Type de GET /metrics
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 import os
@@ -19,12 +20,24 @@ DB_NAME = os.getenv("DB_NAME", "postgres")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Moteur créé au premier usage (get_engine) : importer les modèles ne charge pas le pilote
+# PostgreSQL et ne dépend pas de DB_HOST
+engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
+def get_engine():
+    global engine
+    if engine is None:
+        engine = create_engine(DATABASE_URL)
+    SessionLocal.configure(bind=engine)
+    return engine
+
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"), # Pagination par curseur
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     phone_number = Column(String, unique=True, index=True, nullable=False)
@@ -38,6 +51,10 @@ class User(Base):
 
 class Restaurant(Base):
     __tablename__ = "restaurants"
+    __table_args__ = (
+        Index("ix_restaurants_active_created_at_id", "is_active", "created_at", "id"),
+        Index("ix_restaurants_cuisine_created_at_id", "cuisine_type", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -59,6 +76,9 @@ class Restaurant(Base):
 
 class MenuItem(Base):
     __tablename__ = "menu_items"
+    __table_args__ = (
+        Index("ux_menu_items_restaurant_name", "restaurant_id", "name", unique=True), # Upsert de l'import en masse
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
@@ -77,11 +97,18 @@ class MenuItem(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Pagination par curseur (created_at, id), globale et par filtre usuel du tableau de bord
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_orders_restaurant_created_at_id", "restaurant_id", "created_at", "id"),
+        Index("ix_orders_customer_created_at_id", "customer_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
-    status = Column(String, default="pending") # pending, confirmed, preparing, ready_for_pickup, out_for_delivery, delivered, cancelled, refunded
+    status = Column(String, default="pending") # pending, confirmed, preparing, ready_for_pickup, out_for_delivery, delivered, cancelled, refunded ; transitions : sql/update_order.sql
     total_amount = Column(Float, nullable=False)
     delivery_address = Column(String, nullable=True)
     delivery_latitude = Column(Float, nullable=True)
@@ -91,19 +118,43 @@ class Order(Base):
     transaction_id = Column(String, nullable=True) # Pour CinetPay
     notes = Column(Text, nullable=True)
     estimated_delivery_time = Column(DateTime, nullable=True)
+    rider_id = Column(Integer, ForeignKey("riders.id"), nullable=True) # Affecté par la répartition (dispatch.py)
+    assigned_at = Column(DateTime, nullable=True)
+    # Horodatages des changements de statut, mesurés pour l'heure de livraison estimée (eta.py)
+    confirmed_at = Column(DateTime, nullable=True)
+    ready_at = Column(DateTime, nullable=True)
+    picked_up_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+    eta_plan = Column(JSONB, nullable=True) # Secondes restantes à l'entrée dans chaque statut (jsonb : opérateur ? de sql/update_order.sql)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     customer = relationship("User", back_populates="orders")
     restaurant = relationship("Restaurant", back_populates="orders")
+    rider = relationship("Rider", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
 
+class Rider(Base):
+    __tablename__ = "riders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    phone_number = Column(String, unique=True, nullable=False)
+    is_on_duty = Column(Boolean, default=False)
+    latitude = Column(Float, nullable=True) # Position envoyée par l'application livreur
+    longitude = Column(Float, nullable=True)
+    location_updated_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    orders = relationship("Order", back_populates="rider")
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True) # Jointure embarquée orders -> order_items
     menu_item_id = Column(Integer, ForeignKey("menu_items.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     price_at_order = Column(Float, nullable=False) # Prix au moment de la commande
@@ -123,15 +174,81 @@ class Translation(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class EtaStatistic(Base):
+    # Statistiques des durées de livraison par phase et par restaurant / zone (eta.py)
+    __tablename__ = "eta_statistics"
+    __table_args__ = (
+        Index("ux_eta_statistics_phase_key", "phase", "key", unique=True), # Upsert des sauvegardes
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    phase = Column(String, nullable=False) # confirm, prep, pickup, travel
+    key = Column(String, nullable=False) # ID du restaurant, zone, ou * (global)
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    variance = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SalesRollup(Base):
+    # Ventes pré-agrégées par restaurant et par tranche horaire / journalière (analytics.py)
+    __tablename__ = "sales_rollups"
+    __table_args__ = (
+        Index("ux_sales_rollups_restaurant_granularity_bucket", "restaurant_id", "granularity", "bucket", unique=True),
+        Index("ix_sales_rollups_granularity_bucket", "granularity", "bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    restaurant_id = Column(Integer, nullable=False)
+    granularity = Column(String, nullable=False) # hour, day
+    bucket = Column(DateTime, nullable=False) # Début de la tranche (heure locale, stocké en UTC)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+    delivered_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ItemSalesRollup(Base):
+    __tablename__ = "item_sales_rollups"
+    __table_args__ = (
+        Index("ux_item_sales_rollups_key", "restaurant_id", "granularity", "bucket", "menu_item_id", unique=True),
+        Index("ix_item_sales_rollups_granularity_bucket", "granularity", "bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    restaurant_id = Column(Integer, nullable=False)
+    granularity = Column(String, nullable=False)
+    bucket = Column(DateTime, nullable=False)
+    menu_item_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # Fonction pour créer les tables dans la base de données
 def create_db_tables():
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
+
+# Fonctions SQL appelées via Supabase RPC (ex: place_order), définies dans backend/sql/
+SQL_FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql")
+
+def create_db_functions(*file_names: str):
+    # Sans argument : tous les fichiers (nearby_restaurants.sql nécessite les extensions cube et earthdistance)
+    raw_connection = get_engine().raw_connection()
+    try:
+        with raw_connection.cursor() as cursor:
+            for file_name in file_names or sorted(os.listdir(SQL_FUNCTIONS_DIR)):
+                if file_name.endswith(".sql"):
+                    with open(os.path.join(SQL_FUNCTIONS_DIR, file_name), encoding="utf-8") as sql_file:
+                        cursor.execute(sql_file.read())
+        raw_connection.commit()
+    finally:
+        raw_connection.close()
 
 if __name__ == "__main__":
     # Ceci est pour la création initiale des tables.
     # En production, vous utiliseriez Alembic pour les migrations.
     print("Création des tables de la base de données...")
     # create_db_tables() # Décommentez pour créer les tables si elles n'existent pas.
+    # create_db_functions() # Puis les fonctions SQL (place_order, ...).
     # print("Tables créées (si elles n'existaient pas).")
     print("DATABASE_URL utilisée:", DATABASE_URL)
     print("Assurez-vous que les variables d'environnement DB_USER, DB_PASSWORD, DB_HOST sont correctement configurées.")
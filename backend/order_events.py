@@ -0,0 +1,172 @@
+"""Diffusion en temps réel des commandes (Server-Sent Events) pour les tableaux de bord.
+
+Les endpoints de commandes publient chaque création, changement de statut et
+annulation dans `OrderEventBroker` ; `GET /api/orders/stream?restaurant_id=` garde une
+connexion ouverte par tableau de bord au lieu d'un `GET /api/orders` toutes les
+quelques secondes.
+
+- Chaque événement est sérialisé une seule fois (trame SSE en octets) puis remis à
+  tous les abonnés du restaurant et aux abonnés « tous restaurants ».
+- Chaque abonné a une file bornée : un client trop lent n'est jamais attendu. Quand
+  sa file déborde, il est marqué `lagged` et reçoit un événement `resync` avant
+  fermeture ; il se reconnecte (EventSource le fait seul) et recharge la liste.
+- Les derniers événements sont gardés pour la reprise : à la reconnexion, l'en-tête
+  `Last-Event-ID` permet de rejouer ce qui a été manqué, sinon `resync`.
+
+Les abonnés sont propres au processus : avec plusieurs workers uvicorn, un tableau de
+bord ne voit que les commandes passées par son worker.
+"""
+import asyncio
+import itertools
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+DEFAULT_ORDER_STREAM_QUEUE_SIZE = 256
+DEFAULT_ORDER_STREAM_HISTORY = 1000
+DEFAULT_ORDER_STREAM_MAX_SUBSCRIBERS = 2000
+DEFAULT_ORDER_STREAM_HEARTBEAT_SECONDS = 15.0
+ORDER_STREAM_RETRY_MS = 3000
+
+EVENT_ORDER_CREATED = "order_created"
+EVENT_ORDER_UPDATED = "order_updated"
+EVENT_RESYNC = "resync"
+
+HEARTBEAT_FRAME = b": ping\n\n"
+RETRY_FRAME = f"retry: {ORDER_STREAM_RETRY_MS}\n\n".encode()
+RESYNC_FRAME = f"event: {EVENT_RESYNC}\ndata: {{}}\n\n".encode()
+
+
+class TooManySubscribersError(Exception):
+    pass
+
+
+def sse_frame(event_id: str, event: str, data: str) -> bytes:
+    # `data` est du JSON compact, donc sur une seule ligne
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+class OrderSubscription:
+    __slots__ = ("restaurant_id", "maxsize", "_frames", "_ready", "lagged", "closed")
+
+    def __init__(self, restaurant_id: Optional[int], maxsize: int):
+        self.restaurant_id = restaurant_id  # None : toutes les commandes (admin)
+        self.maxsize = maxsize
+        self._frames: Deque[bytes] = deque()
+        self._ready = asyncio.Event()
+        self.lagged = False
+        self.closed = False
+
+    def push(self, frame: bytes) -> bool:
+        if self.closed:
+            return False
+        if len(self._frames) >= self.maxsize:
+            # Client trop lent : on arrête de lui écrire plutôt que de bufferiser sans fin
+            self.lagged = True
+            self.close()
+            return False
+        self._frames.append(frame)
+        self._ready.set()
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def next_frame(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        # Prochaine trame ; None si rien pendant `timeout` secondes ou si l'abonnement est fermé
+        if not self._frames and not self.closed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.lagged or not self._frames:
+            return None
+        return self._frames.popleft()
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+class OrderEventBroker:
+    def __init__(
+        self,
+        queue_size: int = DEFAULT_ORDER_STREAM_QUEUE_SIZE,
+        history_size: int = DEFAULT_ORDER_STREAM_HISTORY,
+        max_subscribers: int = DEFAULT_ORDER_STREAM_MAX_SUBSCRIBERS,
+    ):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        # restaurant_id (None = tous) -> abonnés
+        self._subscribers: Dict[Optional[int], Set[OrderSubscription]] = {}
+        self._subscriber_count = 0
+        # Identifiants « époque-séquence » : un Last-Event-ID d'un autre processus déclenche un resync
+        self._epoch = os.urandom(4).hex()
+        self._sequence = itertools.count(1)
+        self._history: Deque[Tuple[int, Optional[int], bytes]] = deque(maxlen=history_size)
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+
+    def subscribe(self, restaurant_id: Optional[int] = None, last_event_id: Optional[str] = None) -> Tuple[OrderSubscription, Optional[List[bytes]]]:
+        """Nouvel abonné et trames à rejouer depuis `last_event_id` (None : resync nécessaire)."""
+        if self._subscriber_count >= self.max_subscribers:
+            raise TooManySubscribersError(f"Trop d'abonnés au flux des commandes ({self.max_subscribers})")
+        subscription = OrderSubscription(restaurant_id, self.queue_size)
+        self._subscribers.setdefault(restaurant_id, set()).add(subscription)
+        self._subscriber_count += 1
+        return subscription, self._replay(restaurant_id, last_event_id)
+
+    def _replay(self, restaurant_id: Optional[int], last_event_id: Optional[str]) -> Optional[List[bytes]]:
+        if not last_event_id:
+            return []
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self._epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if self._history and sequence < self._history[0][0] - 1:
+            return None  # événements manqués déjà sortis de l'historique
+        return [frame for event_sequence, event_restaurant_id, frame in self._history
+                if event_sequence > sequence and (restaurant_id is None or event_restaurant_id == restaurant_id)]
+
+    def unsubscribe(self, subscription: OrderSubscription) -> None:
+        subscription.close()
+        subscribers = self._subscribers.get(subscription.restaurant_id)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self._subscriber_count -= 1
+            if not subscribers:
+                del self._subscribers[subscription.restaurant_id]
+
+    def publish(self, event: str, restaurant_id: Optional[int], data: str) -> int:
+        # Appelé depuis la boucle d'événements, jamais bloquant : renvoie le nombre d'abonnés servis
+        sequence = next(self._sequence)
+        frame = sse_frame(f"{self._epoch}-{sequence}", event, data)
+        self._history.append((sequence, restaurant_id, frame))
+        self.published += 1
+        delivered = 0
+        for key in (restaurant_id, None) if restaurant_id is not None else (None,):
+            for subscription in list(self._subscribers.get(key, ())):
+                if subscription.push(frame):
+                    delivered += 1
+                elif subscription.lagged:
+                    self.dropped_subscribers += 1
+                    self.unsubscribe(subscription)
+        self.delivered += delivered
+        return delivered
+
+    def close(self) -> None:
+        # Arrêt du serveur : termine tous les flux ouverts
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": self._subscriber_count,
+            "restaurants": sum(1 for key in self._subscribers if key is not None),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
@@ -0,0 +1,324 @@
+"""Couche d'accès aux données asynchrone pour ChopExpress.
+
+Tous les endpoints et le bot WhatsApp passent par ce module plutôt que par le
+client Supabase synchrone : chaque requête PostgREST est faite avec un
+`httpx.AsyncClient` partagé (pool de connexions keep-alive), donc un aller-retour
+réseau ne bloque plus la boucle d'événements d'uvicorn.
+"""
+import asyncio
+import base64
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from postgrest.exceptions import APIError
+
+from ChopExpress.backend.metrics import observe_supabase_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 50
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+DEFAULT_TIMEOUT_SECONDS = 10.0
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# En-tête de commande + ses articles en une seule requête (jointure PostgREST embarquée)
+ORDER_WITH_ITEMS_COLUMNS = "*, order_items(*)"
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class DatabaseFunctionError(Exception):
+    # Erreur métier levée par une fonction SQL avec un code SQLSTATE `PTxxx` (xxx = statut HTTP)
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    # Curseur opaque = position (created_at, id) de la dernière ligne de la page
+    payload = json.dumps([row["created_at"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        return created_at, int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Curseur de pagination invalide: {cursor}") from e
+
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    # AsyncPostgrestClient ne permet pas de régler le pool httpx : on surcharge
+    # la création de session pour fixer les limites (et un transport de test).
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        headers: Dict[str, str],
+        timeout: float,
+        limits: httpx.Limits,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self._limits = limits
+        self._transport = transport
+        super().__init__(base_url, headers=headers, timeout=timeout)
+
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout: Union[int, float, httpx.Timeout]) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=self._limits,
+            transport=self._transport,
+        )
+
+
+class Repository:
+    """Accès aux tables Supabase via PostgREST, entièrement asynchrone.
+
+    Les filtres passés en mots-clés sont des égalités (`.eq(colonne, valeur)`).
+    Avec `client_factory`, le client (et son contexte TLS) n'est créé qu'au premier usage.
+    """
+
+    def __init__(self, client: Optional[AsyncPostgrestClient] = None, *, client_factory: Optional[Callable[[], AsyncPostgrestClient]] = None):
+        self._client = client
+        self._client_factory = client_factory
+
+    @property
+    def client(self) -> AsyncPostgrestClient:
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    async def warm_up(self, connections: int, table: str = "restaurants") -> int:
+        # Ouvre `connections` connexions du pool en parallèle (requêtes minimales), avant le trafic
+        results = await asyncio.gather(
+            *(self._execute(table, "warm_up", self.client.table(table).select("id").limit(1)) for _ in range(connections)),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            raise failures[0]
+        return len(results)
+
+    async def _execute(self, table: str, operation: str, query) -> Any:
+        # Point de passage unique de toutes les requêtes vers Supabase, chronométrées par table et opération
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await query.execute()
+            outcome = "ok"
+        finally:
+            observe_supabase_query(table, operation, outcome, time.perf_counter() - started)
+        return response.data or []
+
+    @staticmethod
+    def _apply_filters(query, filters: Dict[str, Any]):
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        return query
+
+    async def select_one(self, table: str, columns: str = "*", **filters: Any) -> Optional[Dict[str, Any]]:
+        query = self._apply_filters(self.client.table(table).select(columns), filters).limit(1)
+        rows = await self._execute(table, "select", query)
+        return rows[0] if rows else None
+
+    async def select_many(
+        self,
+        table: str,
+        columns: str = "*",
+        order_by: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+        **filters: Any,
+    ) -> List[Dict[str, Any]]:
+        query = self._apply_filters(self.client.table(table).select(columns), filters)
+        if order_by:
+            query = query.order(order_by, desc=desc)
+        if limit is not None:
+            query = query.limit(limit)
+        return await self._execute(table, "select", query)
+
+    async def select_in(self, table: str, column: str, values: List[Any], columns: str = "*", **filters: Any) -> List[Dict[str, Any]]:
+        # Un seul `in.(...)` au lieu d'une requête par valeur ; les doublons sont fusionnés
+        unique_values = list(dict.fromkeys(values))
+        if not unique_values:
+            return []
+        query = self._apply_filters(self.client.table(table).select(columns).in_(column, unique_values), filters)
+        return await self._execute(table, "select", query)
+
+    async def select_page(
+        self,
+        table: str,
+        columns: str = "*",
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        **filters: Any,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Pagination par curseur (keyset) sur (created_at, id), du plus récent au plus ancien.
+
+        Chaque page coûte le même prix quelle que soit sa profondeur (index
+        `(created_at, id)`), contrairement à un OFFSET. Les filtres à None sont ignorés.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = self.client.table(table).select(columns)
+        query = self._apply_filters(query, {column: value for column, value in filters.items() if value is not None})
+        if created_from:
+            query = query.gte("created_at", created_from.isoformat())
+        if created_to:
+            query = query.lt("created_at", created_to.isoformat())
+        if cursor:
+            # (created_at, id) < (X, Y) écrit sous une forme où `created_at <= X` reste une borne d'index
+            last_created_at, last_id = decode_cursor(cursor)
+            query = query.lte("created_at", last_created_at)
+            query.params = query.params.add("or", f'(created_at.lt."{last_created_at}",id.lt.{last_id})')
+        # Une ligne de plus que demandé pour savoir s'il existe une page suivante
+        query.params = query.params.add("order", "created_at.desc,id.desc")
+        query = query.limit(limit + 1)
+        rows = await self._execute(table, "select", query)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor(rows[-1])
+        return rows, None
+
+    async def iter_pages(self, table: str, columns: str = "*", page_size: int = 1000, **filters: Any) -> AsyncIterator[List[Dict[str, Any]]]:
+        # Table entière par pages keyset sur id (PostgREST plafonne le nombre de lignes par réponse),
+        # une page en mémoire à la fois. `columns` doit contenir `id`.
+        last_id = None
+        while True:
+            query = self._apply_filters(self.client.table(table).select(columns), filters)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = await self._execute(table, "select", query.order("id").limit(page_size))
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            last_id = page[-1]["id"]
+
+    async def select_all(self, table: str, columns: str = "*", page_size: int = 1000, **filters: Any) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        async for page in self.iter_pages(table, columns, page_size, **filters):
+            rows.extend(page)
+        return rows
+
+    async def select_changed_since(
+        self,
+        table: str,
+        since: Optional[str],
+        columns: str = "*",
+        column: str = "updated_at",
+        page_size: int = 1000,
+        after_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        # Lignes modifiées depuis `since` (inclus ; avec `after_id` : strictement après (since, after_id)),
+        # par pages keyset sur (column, id) ; sans `since` : toute la table. `columns` doit contenir `column` et `id`.
+        rows: List[Dict[str, Any]] = []
+        last: Optional[Tuple[Any, int]] = (since, after_id) if since is not None and after_id is not None else None
+        while True:
+            query = self.client.table(table).select(columns)
+            if last is not None:
+                last_value, last_id = last
+                query = query.gte(column, last_value)
+                query.params = query.params.add("or", f'({column}.gt."{last_value}",id.gt.{last_id})')
+            elif since is not None:
+                query = query.gte(column, since)
+            query.params = query.params.add("order", f"{column}.asc,id.asc")
+            page = await self._execute(table, "select", query.limit(page_size))
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            last = (page[-1][column], page[-1]["id"])
+
+    async def insert(self, table: str, rows: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return await self._execute(table, "insert", self.client.table(table).insert(rows))
+
+    async def upsert(
+        self,
+        table: str,
+        rows: Union[Dict[str, Any], List[Dict[str, Any]]],
+        on_conflict: str,
+        ignore_duplicates: bool = False,
+    ) -> List[Dict[str, Any]]:
+        # INSERT ... ON CONFLICT : avec ignore_duplicates, seules les lignes réellement insérées sont renvoyées
+        query = self.client.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+        return await self._execute(table, "upsert", query)
+
+    async def update(self, table: str, values: Dict[str, Any], **filters: Any) -> List[Dict[str, Any]]:
+        query = self._apply_filters(self.client.table(table).update(values), filters)
+        return await self._execute(table, "update", query)
+
+    async def delete(self, table: str, **filters: Any) -> List[Dict[str, Any]]:
+        query = self._apply_filters(self.client.table(table).delete(), filters)
+        return await self._execute(table, "delete", query)
+
+    async def rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        try:
+            return await self._execute(function, "rpc", self.client.rpc(function, params))
+        except APIError as e:
+            if e.code and str(e.code).startswith("PT"):
+                raise DatabaseFunctionError(int(str(e.code)[2:]), e.message or "") from e
+            raise
+
+    # --- Commandes ---
+    @staticmethod
+    def _with_items(order_row: Dict[str, Any]) -> Dict[str, Any]:
+        order_row["items"] = order_row.pop("order_items", None) or []
+        return order_row
+
+    async def select_orders_page(self, **page_args: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # Une seule requête par page quel que soit le nombre de commandes (pas de N+1 sur order_items)
+        rows, next_cursor = await self.select_page("orders", ORDER_WITH_ITEMS_COLUMNS, **page_args)
+        return [self._with_items(row) for row in rows], next_cursor
+
+    async def select_order_with_items(self, order_id: int) -> Optional[Dict[str, Any]]:
+        row = await self.select_one("orders", ORDER_WITH_ITEMS_COLUMNS, id=order_id)
+        return self._with_items(row) if row else None
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+
+
+def create_repository(
+    supabase_url: str,
+    supabase_key: str,
+    *,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Repository:
+    headers = {
+        **DEFAULT_POSTGREST_CLIENT_HEADERS,
+        "apikey": supabase_key,
+        "Authorization": f"Bearer {supabase_key}",
+    }
+
+    def client_factory() -> AsyncPostgrestClient:
+        logger.info("Client Supabase créé (pool: %s connexions max)", max_connections)
+        return _PooledPostgrestClient(
+            f"{supabase_url.rstrip('/')}/rest/v1",
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections),
+            transport=transport,
+        )
+
+    return Repository(client_factory=client_factory)
@@ -29,6 +29,13 @@ class Restaurant(RestaurantBase):
 
 class RestaurantListResponse(BaseModel):
     restaurants: List[Restaurant]
+    next_cursor: Optional[str] = None # Curseur à renvoyer pour obtenir la page suivante (None = dernière page)
+
+class NearbyRestaurant(Restaurant):
+    distance_m: float # Distance en mètres depuis la position demandée
+
+class NearbyRestaurantListResponse(BaseModel):
+    restaurants: List[NearbyRestaurant] # Du plus proche au plus éloigné
 
 class RestaurantUpdate(BaseModel):
     name: Optional[str] = None
@@ -67,6 +74,26 @@ class MenuItem(MenuItemBase):
 class MenuItemListResponse(BaseModel):
     menu_items: List[MenuItem]
 
+class MenuItemSearchResult(MenuItem):
+    restaurant_name: Optional[str] = None
+    score: float # Pertinence, décroissante dans la liste
+
+class MenuSearchResponse(BaseModel):
+    query: str
+    results: List[MenuItemSearchResult]
+
+class MenuImportRowError(BaseModel):
+    line: int # Numéro de ligne dans le fichier importé (en-tête CSV = ligne 1)
+    error: str
+
+class MenuImportReport(BaseModel):
+    restaurant_id: int
+    rows: int # Lignes lues (hors en-tête et lignes vides)
+    imported: int # Plats créés ou mis à jour
+    failed: int
+    truncated: bool = False # Limite MENU_IMPORT_MAX_ROWS atteinte, la suite du fichier n'a pas été lue
+    errors: List[MenuImportRowError] # Les 100 premières erreurs
+
 class MenuItemUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
@@ -96,6 +123,7 @@ class User(UserBase):
 
 class UserListResponse(BaseModel):
     users: List[User]
+    next_cursor: Optional[str] = None
 
 class UserUpdate(BaseModel):
     name: Optional[str] = None
@@ -141,6 +169,11 @@ class Order(OrderBase):
     payment_status: str
     transaction_id: Optional[str] = None
     estimated_delivery_time: Optional[datetime] = None
+    rider_id: Optional[int] = None # Livreur affecté par la répartition
+    confirmed_at: Optional[datetime] = None
+    ready_at: Optional[datetime] = None
+    picked_up_at: Optional[datetime] = None
+    delivered_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     items: List[OrderItem] # Liste des articles de la commande avec tous les détails
@@ -150,8 +183,40 @@ class Order(OrderBase):
 
 class OrderListResponse(BaseModel):
     orders: List[Order]
+    next_cursor: Optional[str] = None
 
 class OrderUpdate(BaseModel):
     status: Optional[str] = None # Principalement pour l'admin ou le restaurant
     estimated_delivery_time: Optional[datetime] = None
-    # D'autres champs pourraient être ajoutés si nécessaire pour la mise à jour 
\ No newline at end of file
+    # D'autres champs pourraient être ajoutés si nécessaire pour la mise à jour 
+
+# --- Statistiques de ventes (/api/analytics) ---
+class SalesBucket(BaseModel):
+    bucket: datetime # Début de la tranche
+    order_count: int # Commandes hors annulées / remboursées
+    revenue: float
+    cancelled_count: int
+    delivered_count: int
+
+class SalesResponse(BaseModel):
+    restaurant_id: Optional[int] = None # Absent : tous les restaurants
+    granularity: str
+    date_from: datetime
+    date_to: datetime
+    order_count: int
+    revenue: float
+    buckets: List[SalesBucket] # Tranches sans commande omises
+
+class TopMenuItem(BaseModel):
+    menu_item_id: int
+    restaurant_id: int
+    name: Optional[str] = None
+    quantity: int
+    revenue: float
+
+class TopMenuItemsResponse(BaseModel):
+    restaurant_id: Optional[int] = None
+    granularity: str
+    date_from: datetime
+    date_to: datetime
+    items: List[TopMenuItem]
@@ -0,0 +1,181 @@
+"""Index de recherche en mémoire sur les menus (nom, description, catégorie, cuisine du restaurant).
+
+Index inversé mot -> articles, plus un index de trigrammes sur le vocabulaire pour
+tolérer les fautes de frappe et les variantes d'orthographe (« ndole », « ndolé »,
+« ndolle »). Le texte est normalisé sans accents ni majuscules. L'index est construit
+une fois depuis Supabase puis mis à jour article par article par les endpoints
+d'écriture du menu ; une reconstruction périodique rattrape les écritures des autres workers.
+"""
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Poids de chaque champ dans le score d'un article
+FIELD_WEIGHTS = {"name": 3.0, "category": 1.5, "cuisine_type": 1.0, "description": 1.0}
+MIN_TRIGRAM_SIMILARITY = 0.35
+MAX_FUZZY_CANDIDATES = 8
+PREFIX_SIMILARITY = 0.8
+MIN_PREFIX_LENGTH = 3
+# Mots courts (« soja » / « soya ») : les trigrammes sont trop peu nombreux, on accepte une faute de frappe
+MAX_SHORT_TOKEN_LENGTH = 6
+SHORT_TOKEN_TYPO_SIMILARITY = 0.6
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: Optional[str]) -> str:
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD_RE.findall(normalize(text))
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    # Une insertion, suppression, substitution ou transposition au plus
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+    longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+    return longer[i + 1:] == shorter[i:]
+
+
+def trigrams(token: str) -> Set[str]:
+    # Même découpage que pg_trgm : deux espaces avant, un après
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MenuSearchIndex:
+    def __init__(self):
+        self.documents: Dict[int, Dict[str, Any]] = {}  # id article -> ligne menu_items (+ restaurant_name)
+        self.restaurants: Dict[int, Dict[str, Any]] = {}  # restaurants actifs : id -> {name, cuisine_type}
+        self._item_terms: Dict[int, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._vocabulary: List[str] = []  # trié, pour les recherches par préfixe
+        self._trigram_tokens: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    # --- Construction et mises à jour ---
+    def rebuild(self, restaurants: Iterable[Dict[str, Any]], menu_items: Iterable[Dict[str, Any]]) -> None:
+        self.__init__()
+        for restaurant in restaurants:
+            self.restaurants[restaurant["id"]] = {"name": restaurant.get("name"), "cuisine_type": restaurant.get("cuisine_type")}
+        for item in menu_items:
+            self.upsert_item(item)
+
+    def upsert_item(self, item: Dict[str, Any]) -> None:
+        self.remove_item(item["id"])
+        restaurant = self.restaurants.get(item.get("restaurant_id"))
+        if not item.get("is_available", True) or restaurant is None:
+            return
+        terms: Dict[str, float] = {}
+        fields = {"name": item.get("name"), "category": item.get("category"), "description": item.get("description"), "cuisine_type": restaurant["cuisine_type"]}
+        for field, text in fields.items():
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0.0) + FIELD_WEIGHTS[field]
+        self.documents[item["id"]] = {**item, "restaurant_name": restaurant["name"]}
+        self._item_terms[item["id"]] = terms
+        for token, weight in terms.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+                for trigram in trigrams(token):
+                    self._trigram_tokens.setdefault(trigram, set()).add(token)
+            postings[item["id"]] = weight
+
+    def remove_item(self, item_id: int) -> None:
+        terms = self._item_terms.pop(item_id, None)
+        self.documents.pop(item_id, None)
+        for token in terms or ():
+            postings = self._postings[token]
+            postings.pop(item_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+                for trigram in trigrams(token):
+                    self._trigram_tokens[trigram].discard(token)
+
+    def upsert_restaurant(self, restaurant: Dict[str, Any]) -> None:
+        # Nom, cuisine ou statut modifiés : réindexation des articles du restaurant
+        items = [doc for doc in self.documents.values() if doc["restaurant_id"] == restaurant["id"]]
+        if restaurant.get("is_active", True):
+            self.restaurants[restaurant["id"]] = {"name": restaurant.get("name"), "cuisine_type": restaurant.get("cuisine_type")}
+        else:
+            self.restaurants.pop(restaurant["id"], None)
+        for doc in items:
+            self.upsert_item({k: v for k, v in doc.items() if k != "restaurant_name"})
+
+    # --- Recherche ---
+    def _matching_tokens(self, term: str) -> List[Tuple[str, float]]:
+        # Mots du vocabulaire correspondant à un terme de la requête, avec leur similarité
+        matches: Dict[str, float] = {}
+        if term in self._postings:
+            # Mot exact présent : les variantes approchées (« boisson » pour « poisson ») ne feraient que du bruit
+            return [(term, 1.0)]
+        if len(term) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self._vocabulary, term)
+            for token in self._vocabulary[start:start + MAX_FUZZY_CANDIDATES]:
+                if not token.startswith(term):
+                    break
+                matches.setdefault(token, PREFIX_SIMILARITY)
+        term_trigrams = trigrams(term)
+        shared: Dict[str, int] = {}
+        for trigram in term_trigrams:
+            for token in self._trigram_tokens.get(trigram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        fuzzy = []
+        for token, count in shared.items():
+            if token in matches:
+                continue
+            similarity = count / (len(term_trigrams) + len(trigrams(token)) - count)
+            if similarity < MIN_TRIGRAM_SIMILARITY and count >= 2 and len(term) <= MAX_SHORT_TOKEN_LENGTH and within_one_edit(term, token):
+                similarity = SHORT_TOKEN_TYPO_SIMILARITY
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                fuzzy.append((similarity, token))
+        for similarity, token in sorted(fuzzy, reverse=True)[:MAX_FUZZY_CANDIDATES]:
+            matches[token] = similarity
+        return list(matches.items())
+
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT, restaurant_id: Optional[int] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """Articles classés par score décroissant : (score, article)."""
+        scores: Dict[int, float] = {}
+        total_documents = len(self.documents) or 1
+        for term in dict.fromkeys(tokenize(query)):
+            # Pour chaque terme, seule la meilleure correspondance d'un article compte
+            term_scores: Dict[int, float] = {}
+            for token, similarity in self._matching_tokens(term):
+                postings = self._postings[token]
+                factor = similarity * similarity * math.log(1 + total_documents / len(postings))
+                if not term_scores:
+                    term_scores = {item_id: weight * factor for item_id, weight in postings.items()}
+                    continue
+                for item_id, weight in postings.items():
+                    score = weight * factor
+                    if score > term_scores.get(item_id, 0.0):
+                        term_scores[item_id] = score
+            if not scores:
+                scores = term_scores
+                continue
+            for item_id, score in term_scores.items():
+                scores[item_id] = scores.get(item_id, 0.0) + score
+        if restaurant_id is not None:
+            scores = {item_id: score for item_id, score in scores.items() if self.documents[item_id]["restaurant_id"] == restaurant_id}
+        best = heapq.nsmallest(limit, scores.items(), key=lambda entry: (-entry[1], entry[0]))
+        return [(score, self.documents[item_id]) for item_id, score in best]
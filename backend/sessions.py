@@ -0,0 +1,171 @@
+"""Sessions de conversation du bot WhatsApp : étape en cours et panier, par numéro de téléphone.
+
+Le bot lit et réécrit la session à chaque message ; la commande n'est créée
+(`create_order_api`) qu'à la validation du panier. Aucune requête à la base pour
+suivre la conversation avec le backend mémoire.
+
+- `InMemorySessionStore` : LRU + TTL glissant dans le processus. Une session est un
+  objet à `__slots__`, les derniers résultats affichés un tableau d'entiers 32 bits et
+  le panier un petit dict {article: quantité} créé au premier article : quelques
+  centaines d'octets par numéro, borné par `max_entries`.
+- `SupabaseSessionStore` : table `conversation_sessions` (voir sql/conversation_sessions.sql),
+  partagée entre les workers uvicorn.
+"""
+import random
+import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Optional
+
+DEFAULT_SESSION_TTL_SECONDS = 2 * 3600
+DEFAULT_SESSION_MAX_ENTRIES = 500_000
+
+# Étapes de la conversation
+STEP_IDLE = "idle"
+STEP_CHOOSING_ITEM = "choosing_item"  # résultats de recherche affichés, on attend un numéro
+STEP_CART = "cart"  # panier non vide
+STEP_AWAITING_ADDRESS = "awaiting_address"  # panier validé, on attend l'adresse de livraison
+STEPS = (STEP_IDLE, STEP_CHOOSING_ITEM, STEP_CART, STEP_AWAITING_ADDRESS)
+
+
+class ConversationSession:
+    __slots__ = ("phone_number", "step", "restaurant_id", "cart", "choices", "expires_at")
+
+    def __init__(
+        self,
+        phone_number: str,
+        step: str = STEP_IDLE,
+        restaurant_id: Optional[int] = None,
+        cart: Optional[Dict[int, int]] = None,
+        choices: Optional[Iterable[int]] = None,
+    ):
+        self.phone_number = phone_number
+        self.step = step
+        self.restaurant_id = restaurant_id  # une commande = un restaurant
+        self.cart = cart  # id article -> quantité, None tant que le panier est vide
+        self.choices = array("i", choices) if choices else None  # ids des derniers résultats affichés, dans l'ordre de leur numéro
+        self.expires_at = 0.0
+
+    def show_results(self, menu_item_ids: Iterable[int]) -> None:
+        self.choices = array("i", menu_item_ids)
+        if not self.cart:
+            self.step = STEP_CHOOSING_ITEM
+
+    def add_item(self, menu_item_id: int, restaurant_id: int, quantity: int = 1) -> None:
+        if self.cart is None:
+            self.cart = {}
+        self.restaurant_id = restaurant_id
+        self.cart[menu_item_id] = self.cart.get(menu_item_id, 0) + quantity
+        self.step = STEP_CART
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "step": self.step,
+            "restaurant_id": self.restaurant_id,
+            "cart": [[item_id, quantity] for item_id, quantity in (self.cart or {}).items()],
+            "choices": list(self.choices or ()),
+        }
+
+    @classmethod
+    def from_state(cls, phone_number: str, state: Dict[str, Any]) -> "ConversationSession":
+        step = state.get("step")
+        return cls(
+            phone_number,
+            step=step if step in STEPS else STEP_IDLE,
+            restaurant_id=state.get("restaurant_id"),
+            cart={int(item_id): int(quantity) for item_id, quantity in state.get("cart") or []} or None,
+            choices=state.get("choices"),
+        )
+
+
+class SessionStore(ABC):
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def get(self, phone_number: str) -> Optional[ConversationSession]:
+        """Session en cours du numéro, None si absente ou expirée."""
+
+    @abstractmethod
+    async def save(self, session: ConversationSession) -> None:
+        """Enregistre la session et prolonge sa durée de vie."""
+
+    @abstractmethod
+    async def delete(self, phone_number: str) -> None:
+        """Oublie la session du numéro."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__, "ttl_seconds": self.ttl}
+
+
+class InMemorySessionStore(SessionStore):
+    def __init__(self, ttl: float = DEFAULT_SESSION_TTL_SECONDS, max_entries: int = DEFAULT_SESSION_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._clock = clock
+        # Ordre = dernière sauvegarde, donc aussi ordre d'expiration (TTL fixe) et ordre LRU
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    def _purge_expired(self, now: float) -> None:
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    async def get(self, phone_number: str) -> Optional[ConversationSession]:
+        session = self._sessions.get(phone_number)
+        if session is None:
+            return None
+        if session.expires_at <= self._clock():
+            del self._sessions[phone_number]
+            self.expired += 1
+            return None
+        return session
+
+    async def save(self, session: ConversationSession) -> None:
+        now = self._clock()
+        self._purge_expired(now)
+        session.expires_at = now + self.ttl
+        self._sessions[session.phone_number] = session
+        self._sessions.move_to_end(session.phone_number)
+        if len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    async def delete(self, phone_number: str) -> None:
+        self._sessions.pop(phone_number, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "sessions": len(self._sessions), "max_entries": self.max_entries, "expired": self.expired, "evicted": self.evicted}
+
+
+class SupabaseSessionStore(SessionStore):
+    def __init__(self, repository, ttl: float = DEFAULT_SESSION_TTL_SECONDS):
+        super().__init__(ttl)
+        self.db = repository
+
+    async def get(self, phone_number: str) -> Optional[ConversationSession]:
+        row = await self.db.select_one("conversation_sessions", "state, expires_at", phone_number=phone_number)
+        if not row or datetime.fromisoformat(row["expires_at"].replace("Z", "+00:00")) <= datetime.now(timezone.utc):
+            return None
+        return ConversationSession.from_state(phone_number, row["state"])
+
+    async def save(self, session: ConversationSession) -> None:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        row = {"phone_number": session.phone_number, "state": session.to_state(), "expires_at": expires_at.isoformat()}
+        await self.db.upsert("conversation_sessions", row, on_conflict="phone_number")
+        # Purge occasionnelle des sessions expirées (~1 sauvegarde sur 100)
+        if random.random() < 0.01:
+            await self.db.rpc("purge_conversation_sessions", {})
+
+    async def delete(self, phone_number: str) -> None:
+        await self.db.delete("conversation_sessions", phone_number=phone_number)
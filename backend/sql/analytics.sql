@@ -0,0 +1,134 @@
+-- Statistiques de ventes pré-agrégées (analytics.py, /api/analytics/...)
+--
+-- Une ligne par restaurant, granularité ('hour' | 'day') et début de tranche (heure locale
+-- convertie en UTC). apply_sales_deltas additionne les deltas envoyés par chaque worker
+-- (création de commande, changement de statut) : les compteurs ne sont jamais écrasés par
+-- une mise à jour concurrente. Les lectures (analytics_sales, analytics_top_items) ne touchent
+-- que les tranches de la période demandée, par l'index unique (restaurant_id, granularity, bucket).
+
+create table if not exists sales_rollups (
+    id bigserial primary key,
+    restaurant_id bigint not null,
+    granularity text not null check (granularity in ('hour', 'day')),
+    bucket timestamptz not null,
+    order_count integer not null default 0,
+    revenue double precision not null default 0,
+    cancelled_count integer not null default 0,
+    delivered_count integer not null default 0,
+    updated_at timestamptz not null default now(),
+    unique (restaurant_id, granularity, bucket)
+);
+-- Totaux tous restaurants confondus
+create index if not exists ix_sales_rollups_granularity_bucket on sales_rollups (granularity, bucket);
+
+create table if not exists item_sales_rollups (
+    id bigserial primary key,
+    restaurant_id bigint not null,
+    granularity text not null check (granularity in ('hour', 'day')),
+    bucket timestamptz not null,
+    menu_item_id bigint not null,
+    quantity integer not null default 0,
+    revenue double precision not null default 0,
+    updated_at timestamptz not null default now(),
+    unique (restaurant_id, granularity, bucket, menu_item_id)
+);
+create index if not exists ix_item_sales_rollups_granularity_bucket on item_sales_rollups (granularity, bucket);
+
+create or replace function public.apply_sales_deltas(p_sales jsonb, p_items jsonb)
+returns void
+language sql
+as $$
+    -- Lignes déjà agrégées et triées par l'API : une seule ligne par clé, verrous pris dans le même ordre
+    insert into sales_rollups as s (restaurant_id, granularity, bucket, order_count, revenue, cancelled_count, delivered_count)
+    select d.restaurant_id, d.granularity, d.bucket, d.order_count, d.revenue, d.cancelled_count, d.delivered_count
+    from jsonb_to_recordset(coalesce(p_sales, '[]'::jsonb)) as d(
+        restaurant_id bigint, granularity text, bucket timestamptz,
+        order_count integer, revenue double precision, cancelled_count integer, delivered_count integer
+    )
+    order by d.restaurant_id, d.granularity, d.bucket
+    on conflict (restaurant_id, granularity, bucket) do update set
+        order_count = s.order_count + excluded.order_count,
+        revenue = s.revenue + excluded.revenue,
+        cancelled_count = s.cancelled_count + excluded.cancelled_count,
+        delivered_count = s.delivered_count + excluded.delivered_count,
+        updated_at = now();
+
+    insert into item_sales_rollups as s (restaurant_id, granularity, bucket, menu_item_id, quantity, revenue)
+    select d.restaurant_id, d.granularity, d.bucket, d.menu_item_id, d.quantity, d.revenue
+    from jsonb_to_recordset(coalesce(p_items, '[]'::jsonb)) as d(
+        restaurant_id bigint, granularity text, bucket timestamptz, menu_item_id bigint, quantity integer, revenue double precision
+    )
+    order by d.restaurant_id, d.granularity, d.bucket, d.menu_item_id
+    on conflict (restaurant_id, granularity, bucket, menu_item_id) do update set
+        quantity = s.quantity + excluded.quantity,
+        revenue = s.revenue + excluded.revenue,
+        updated_at = now();
+$$;
+
+create or replace function public.analytics_sales(
+    p_restaurant_id bigint,
+    p_granularity text,
+    p_from timestamptz,
+    p_to timestamptz
+) returns jsonb
+language sql
+stable
+as $$
+    -- Tranches [p_from, p_to) d'un restaurant, ou sommées sur tous les restaurants (p_restaurant_id null)
+    select coalesce(jsonb_agg(jsonb_build_object(
+               'bucket', t.bucket, 'order_count', t.order_count, 'revenue', t.revenue,
+               'cancelled_count', t.cancelled_count, 'delivered_count', t.delivered_count
+           ) order by t.bucket), '[]'::jsonb)
+    from (
+        select bucket, sum(order_count) as order_count, sum(revenue) as revenue,
+               sum(cancelled_count) as cancelled_count, sum(delivered_count) as delivered_count
+        from sales_rollups
+        where granularity = p_granularity and bucket >= p_from and bucket < p_to
+          and (p_restaurant_id is null or restaurant_id = p_restaurant_id)
+        group by bucket
+    ) t;
+$$;
+
+create or replace function public.analytics_top_items(
+    p_restaurant_id bigint,
+    p_granularity text,
+    p_from timestamptz,
+    p_to timestamptz,
+    p_limit integer default 10
+) returns jsonb
+language sql
+stable
+as $$
+    select coalesce(jsonb_agg(jsonb_build_object(
+               'menu_item_id', t.menu_item_id, 'restaurant_id', t.restaurant_id, 'name', m.name,
+               'quantity', t.quantity, 'revenue', t.revenue
+           ) order by t.quantity desc, t.revenue desc, t.menu_item_id), '[]'::jsonb)
+    from (
+        select menu_item_id, min(restaurant_id) as restaurant_id, sum(quantity) as quantity, sum(revenue) as revenue
+        from item_sales_rollups
+        where granularity = p_granularity and bucket >= p_from and bucket < p_to
+          and (p_restaurant_id is null or restaurant_id = p_restaurant_id)
+        group by menu_item_id
+        having sum(quantity) > 0
+        order by sum(quantity) desc, sum(revenue) desc, menu_item_id
+        limit p_limit
+    ) t
+    left join menu_items m on m.id = t.menu_item_id;
+$$;
+
+create or replace function public.prune_sales_rollups(p_before timestamptz)
+returns integer
+language plpgsql
+as $$
+declare
+    v_sales integer;
+    v_items integer;
+begin
+    -- Après une reconstruction : tranches non réécrites, qui ne correspondent plus à aucune commande
+    delete from sales_rollups where updated_at < p_before;
+    get diagnostics v_sales = row_count;
+    delete from item_sales_rollups where updated_at < p_before;
+    get diagnostics v_items = row_count;
+    return v_sales + v_items;
+end;
+$$;
@@ -0,0 +1,23 @@
+-- Sessions de conversation du bot WhatsApp (backend `supabase` de sessions.py)
+--
+-- Une ligne par numéro : étape de la conversation et panier en cours (jsonb), lue et
+-- réécrite à chaque message. purge_conversation_sessions (POST /rest/v1/rpc/purge_conversation_sessions)
+-- supprime les sessions expirées ; elle est appelée de temps en temps par le backend.
+
+create table if not exists conversation_sessions (
+    phone_number text primary key,
+    state jsonb not null default '{}'::jsonb,
+    expires_at timestamptz not null
+);
+
+create index if not exists ix_conversation_sessions_expires_at on conversation_sessions (expires_at);
+
+create or replace function public.purge_conversation_sessions()
+returns integer
+language sql
+as $$
+    with purged as (
+        delete from conversation_sessions where expires_at < now() returning 1
+    )
+    select count(*)::integer from purged;
+$$;
@@ -0,0 +1,106 @@
+-- Répartition des livraisons (dispatch.py) : livreurs, affectation des commandes prêtes
+--
+-- dispatch_pool (POST /rest/v1/rpc/dispatch_pool) renvoie en une requête les commandes
+-- `ready_for_pickup` sans livreur (avec la position du restaurant) et les livreurs libres :
+-- en service, position récente, aucune commande en cours. assign_deliveries applique le plan
+-- calculé par l'API dans une seule transaction ; un lot dont le livreur ou une commande n'est
+-- plus libre (autre worker, annulation entre-temps) est ignoré, les autres sont appliqués.
+-- L'application livreur met à jour latitude, longitude et location_updated_at.
+
+create table if not exists riders (
+    id bigserial primary key,
+    name text not null,
+    phone_number text not null unique,
+    is_on_duty boolean not null default false,
+    latitude double precision,
+    longitude double precision,
+    location_updated_at timestamptz,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+alter table orders add column if not exists rider_id bigint references riders (id);
+alter table orders add column if not exists assigned_at timestamptz;
+
+create index if not exists ix_orders_dispatch_pool on orders (created_at)
+where status = 'ready_for_pickup' and rider_id is null;
+create index if not exists ix_orders_rider_active on orders (rider_id)
+where status in ('ready_for_pickup', 'out_for_delivery');
+
+create or replace function public.dispatch_pool(
+    p_max_orders integer default 5000,
+    p_location_max_age_s integer default 600
+) returns jsonb
+language sql
+stable
+as $$
+    select jsonb_build_object(
+        'orders', coalesce((
+            select jsonb_agg(jsonb_build_object(
+                       'id', o.id, 'restaurant_id', o.restaurant_id,
+                       'pickup_latitude', r.latitude, 'pickup_longitude', r.longitude,
+                       'latitude', o.delivery_latitude, 'longitude', o.delivery_longitude
+                   ) order by o.created_at, o.id)
+            from (
+                select id, restaurant_id, delivery_latitude, delivery_longitude, created_at
+                from orders
+                where status = 'ready_for_pickup' and rider_id is null
+                  and delivery_latitude is not null and delivery_longitude is not null
+                order by created_at, id
+                limit p_max_orders
+            ) o
+            join restaurants r on r.id = o.restaurant_id
+            where r.latitude is not null and r.longitude is not null
+        ), '[]'::jsonb),
+        'riders', coalesce((
+            select jsonb_agg(jsonb_build_object('id', d.id, 'latitude', d.latitude, 'longitude', d.longitude))
+            from riders d
+            where d.is_on_duty and d.latitude is not null and d.longitude is not null
+              and d.location_updated_at > now() - make_interval(secs => p_location_max_age_s)
+              and not exists (
+                  select 1 from orders a
+                  where a.rider_id = d.id and a.status in ('ready_for_pickup', 'out_for_delivery')
+              )
+        ), '[]'::jsonb)
+    );
+$$;
+
+create or replace function public.assign_deliveries(p_assignments jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_assignment jsonb;
+    v_rider_id bigint;
+    v_order_ids bigint[];
+    v_locked integer;
+    v_applied jsonb := '[]'::jsonb;
+begin
+    -- p_assignments : [{"rider_id": 7, "order_ids": [102, 98]}, ...] ; renvoie les lots appliqués
+    for v_assignment in select value from jsonb_array_elements(p_assignments) loop
+        v_rider_id := (v_assignment ->> 'rider_id')::bigint;
+        v_order_ids := array(select jsonb_array_elements_text(v_assignment -> 'order_ids')::bigint);
+
+        -- Verrou sur le livreur : deux tours concurrents ne peuvent pas lui confier deux lots
+        perform 1 from riders where id = v_rider_id and is_on_duty for update;
+        if not found then
+            continue;
+        end if;
+        perform 1 from orders where rider_id = v_rider_id and status in ('ready_for_pickup', 'out_for_delivery');
+        if found then
+            continue;
+        end if;
+
+        perform 1 from orders where id = any(v_order_ids) and status = 'ready_for_pickup' and rider_id is null for update;
+        get diagnostics v_locked = row_count;
+        if v_locked <> cardinality(v_order_ids) then
+            continue;
+        end if;
+
+        update orders set rider_id = v_rider_id, assigned_at = now(), updated_at = now()
+        where id = any(v_order_ids);
+        v_applied := v_applied || jsonb_build_array(v_assignment);
+    end loop;
+    return v_applied;
+end;
+$$;
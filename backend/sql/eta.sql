@@ -0,0 +1,41 @@
+-- Heure de livraison estimée (eta.py) : horodatages des changements de statut et statistiques
+--
+-- PUT /api/orders/{id} renseigne la colonne du statut atteint (confirmed_at, ready_at,
+-- picked_up_at, delivered_at) dans la même requête que le statut ; l'API en déduit la durée
+-- de la phase terminée et met à jour ses moyennes en mémoire. eta_statistics n'en est que
+-- la sauvegarde (une ligne par phase et par restaurant / zone, « * » pour la moyenne globale),
+-- relue au démarrage : l'historique des commandes n'est jamais reparcouru.
+
+alter table orders add column if not exists confirmed_at timestamptz;
+alter table orders add column if not exists ready_at timestamptz;
+alter table orders add column if not exists picked_up_at timestamptz;
+alter table orders add column if not exists delivered_at timestamptz;
+
+create table if not exists eta_statistics (
+    id bigserial primary key,
+    phase text not null,
+    key text not null,
+    count integer not null default 0,
+    mean double precision not null default 0,
+    variance double precision not null default 0,
+    updated_at timestamptz not null default now(),
+    unique (phase, key)  -- cible de l'upsert des sauvegardes
+);
+
+-- Plan d'estimation calculé à la création (place_order) : secondes restantes à l'entrée dans
+-- chaque statut, {"confirmed": 2400, "ready_for_pickup": 1300, ...}. update_order en déduit la
+-- nouvelle heure de livraison estimée dans la même requête que le changement de statut.
+alter table orders add column if not exists eta_plan jsonb;
+
+-- Colonne déjà créée en json (create_db_tables d'une version précédente) : l'opérateur ?
+-- d'update_order n'existe que pour jsonb
+do $$
+begin
+    if exists (
+        select 1 from information_schema.columns
+        where table_schema = current_schema() and table_name = 'orders' and column_name = 'eta_plan' and data_type = 'json'
+    ) then
+        alter table orders alter column eta_plan type jsonb using eta_plan::jsonb;
+    end if;
+end;
+$$;
@@ -0,0 +1,10 @@
+-- Clé naturelle des plats pour l'import de menus en masse (menu_import.py)
+--
+-- POST /api/restaurants/{id}/menu-items/import envoie des upserts PostgREST
+-- (on_conflict=restaurant_id,name) : un plat de même nom dans le même restaurant est mis à
+-- jour au lieu d'être dupliqué. PostgREST exige un index unique sur ces colonnes.
+--
+-- Les doublons existants empêchent la création de l'index ; les lister avant :
+--     select restaurant_id, name, array_agg(id) from menu_items group by 1, 2 having count(*) > 1;
+
+create unique index if not exists ux_menu_items_restaurant_name on menu_items (restaurant_id, name);
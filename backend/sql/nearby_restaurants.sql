@@ -0,0 +1,33 @@
+-- Recherche des restaurants les plus proches (GET /api/restaurants/nearby, via POST /rest/v1/rpc/nearby_restaurants)
+--
+-- Index GiST earthdistance sur la position des restaurants actifs : le filtre de rayon
+-- (earth_box) et le tri par distance (<->, plus proches voisins) utilisent l'index,
+-- sans parcourir toute la table. Sur Supabase, cube et earthdistance sont disponibles
+-- dans Database > Extensions.
+
+create extension if not exists cube;
+create extension if not exists earthdistance;
+
+create index if not exists ix_restaurants_earth_active on restaurants
+using gist (ll_to_earth(latitude, longitude))
+where is_active and latitude is not null and longitude is not null;
+
+create or replace function public.nearby_restaurants(
+    p_latitude double precision,
+    p_longitude double precision,
+    p_radius_m double precision default 5000,
+    p_limit integer default 20
+) returns setof jsonb
+language sql
+stable
+as $$
+    select to_jsonb(r) || jsonb_build_object(
+        'distance_m', earth_distance(ll_to_earth(p_latitude, p_longitude), ll_to_earth(r.latitude, r.longitude))
+    )
+    from restaurants r
+    where r.is_active and r.latitude is not null and r.longitude is not null
+      and earth_box(ll_to_earth(p_latitude, p_longitude), p_radius_m) @> ll_to_earth(r.latitude, r.longitude)
+      and earth_distance(ll_to_earth(p_latitude, p_longitude), ll_to_earth(r.latitude, r.longitude)) <= p_radius_m
+    order by ll_to_earth(r.latitude, r.longitude) <-> ll_to_earth(p_latitude, p_longitude)
+    limit p_limit;
+$$;
@@ -0,0 +1,100 @@
+-- Création atomique d'une commande ChopExpress (appelée via Supabase RPC : POST /rest/v1/rpc/place_order)
+--
+-- Valide le client, le restaurant et les articles, calcule total_amount à partir des prix
+-- en base, puis insère `orders` et `order_items` dans la même transaction : un échec à
+-- n'importe quelle étape annule tout, il ne peut plus rester d'en-tête de commande orphelin.
+--
+-- Les erreurs métier utilisent les codes SQLSTATE PT404 / PT400, que PostgREST renvoie
+-- avec le statut HTTP correspondant ; les messages sont ceux de l'API.
+--
+-- p_estimated_delivery_time et p_eta_plan sont calculés par l'API (eta.py) avant l'appel.
+
+-- Anciennes signatures (sans p_estimated_delivery_time / p_eta_plan) : un appel serait ambigu
+drop function if exists public.place_order(bigint, bigint, jsonb, text, double precision, double precision, text);
+drop function if exists public.place_order(bigint, bigint, jsonb, text, double precision, double precision, text, timestamptz);
+
+create or replace function public.place_order(
+    p_customer_id bigint,
+    p_restaurant_id bigint,
+    p_items jsonb,
+    p_delivery_address text default null,
+    p_delivery_latitude double precision default null,
+    p_delivery_longitude double precision default null,
+    p_notes text default null,
+    p_estimated_delivery_time timestamptz default null,
+    p_eta_plan jsonb default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_restaurant_active boolean;
+    v_line record;
+    v_total double precision := 0;
+    v_order orders%rowtype;
+begin
+    perform 1 from users where id = p_customer_id;
+    if not found then
+        raise exception using errcode = 'PT404', message = format('Client avec ID %s non trouvé.', p_customer_id);
+    end if;
+
+    -- Verrou partagé : le restaurant ne peut pas être désactivé pendant la création de la commande
+    select is_active into v_restaurant_active from restaurants where id = p_restaurant_id for share;
+    if not found then
+        raise exception using errcode = 'PT404', message = format('Restaurant ID %s non trouvé.', p_restaurant_id);
+    end if;
+    if not v_restaurant_active then
+        raise exception using errcode = 'PT400', message = format('Le restaurant ID %s est actuellement inactif.', p_restaurant_id);
+    end if;
+
+    if p_items is null or jsonb_typeof(p_items) <> 'array' or jsonb_array_length(p_items) = 0 then
+        raise exception using errcode = 'PT400', message = 'Une commande doit contenir au moins un article.';
+    end if;
+
+    -- Verrou partagé sur les articles : le prix lu pour le total est celui inséré dans order_items
+    perform 1 from menu_items
+    where id in (select (e.item ->> 'menu_item_id')::bigint from jsonb_array_elements(p_items) as e(item))
+    for share;
+
+    -- Lignes dans l'ordre du panier, jointes aux articles de menu (une seule lecture, doublons fusionnés par la jointure)
+    for v_line in
+        select (e.item ->> 'menu_item_id')::bigint as menu_item_id,
+               (e.item ->> 'quantity')::integer as quantity,
+               m.id as found_id, m.name, m.price, m.is_available, m.restaurant_id
+        from jsonb_array_elements(p_items) with ordinality as e(item, ord)
+        left join menu_items m on m.id = (e.item ->> 'menu_item_id')::bigint
+        order by e.ord
+    loop
+        if v_line.found_id is null then
+            raise exception using errcode = 'PT404', message = format('Article de menu ID %s non trouvé.', v_line.menu_item_id);
+        end if;
+        if not v_line.is_available then
+            raise exception using errcode = 'PT400', message = format('L''article ''%s'' (ID: %s) n''est plus disponible.', v_line.name, v_line.found_id);
+        end if;
+        if v_line.restaurant_id <> p_restaurant_id then
+            raise exception using errcode = 'PT400', message = format('L''article ''%s'' (ID: %s) n''appartient pas au restaurant ID %s.', v_line.name, v_line.found_id, p_restaurant_id);
+        end if;
+
+        v_total := v_total + v_line.price * v_line.quantity;
+    end loop;
+
+    insert into orders (
+        customer_id, restaurant_id, total_amount, status, payment_status,
+        delivery_address, delivery_latitude, delivery_longitude, notes, estimated_delivery_time, eta_plan, created_at, updated_at
+    ) values (
+        p_customer_id, p_restaurant_id, v_total, 'pending', 'pending',
+        p_delivery_address, p_delivery_latitude, p_delivery_longitude, p_notes, p_estimated_delivery_time, p_eta_plan, now(), now()
+    )
+    returning * into v_order;
+
+    insert into order_items (order_id, menu_item_id, quantity, price_at_order, notes)
+    select v_order.id, m.id, (e.item ->> 'quantity')::integer, m.price, e.item ->> 'notes'
+    from jsonb_array_elements(p_items) with ordinality as e(item, ord)
+    join menu_items m on m.id = (e.item ->> 'menu_item_id')::bigint
+    order by e.ord;
+
+    return to_jsonb(v_order) || jsonb_build_object(
+        'items',
+        coalesce((select jsonb_agg(to_jsonb(oi) order by oi.id) from order_items oi where oi.order_id = v_order.id), '[]'::jsonb)
+    );
+end;
+$$;
@@ -0,0 +1,35 @@
+-- Identifiants des messages WhatsApp déjà traités (backend `supabase` de message_dedup.py)
+--
+-- register_message (POST /rest/v1/rpc/register_message) enregistre un identifiant et
+-- renvoie false s'il a déjà été vu depuis moins de p_ttl_seconds.
+
+create table if not exists processed_messages (
+    message_id text primary key,
+    received_at timestamptz not null default now()
+);
+
+create index if not exists ix_processed_messages_received_at on processed_messages (received_at);
+
+create or replace function public.register_message(p_message_id text, p_ttl_seconds integer default 86400)
+returns boolean
+language plpgsql
+as $$
+declare
+    v_inserted integer;
+begin
+    -- Un identifiant expiré est réenregistré comme nouveau
+    delete from processed_messages
+    where message_id = p_message_id and received_at < now() - make_interval(secs => p_ttl_seconds);
+
+    insert into processed_messages (message_id) values (p_message_id)
+    on conflict (message_id) do nothing;
+    get diagnostics v_inserted = row_count;
+
+    -- Purge occasionnelle de la fenêtre expirée (~1 appel sur 100), sans coût pour les autres appels
+    if random() < 0.01 then
+        delete from processed_messages where received_at < now() - make_interval(secs => p_ttl_seconds);
+    end if;
+
+    return v_inserted = 1;
+end;
+$$;
@@ -0,0 +1,25 @@
+-- Rafraîchissement incrémental du catalogue des traductions (translations.py)
+--
+-- Le backend relit toutes les 60 s les lignes dont updated_at dépasse son dernier
+-- filigrane, par pages keyset sur (updated_at, id). updated_at n'est mis à jour que
+-- par SQLAlchemy (onupdate) : le trigger le fait aussi pour les modifications faites
+-- depuis Supabase / PostgREST, sinon elles ne seraient vues qu'au rechargement complet.
+
+create index if not exists ix_translations_updated_at_id on translations (updated_at, id);
+
+create unique index if not exists ux_translations_lang_code_key on translations (lang_code, key);
+
+create or replace function public.touch_translations_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists trg_translations_updated_at on translations;
+create trigger trg_translations_updated_at
+    before insert or update on translations
+    for each row execute function public.touch_translations_updated_at();
@@ -0,0 +1,45 @@
+-- Mise à jour d'un article de menu en une requête (PUT /api/menu-items/{id})
+--
+-- La condition « restaurant parent actif » fait partie de l'UPDATE (jointure sur restaurants,
+-- verrouillé en partage) : pas de lecture préalable de l'article puis du restaurant, et le
+-- restaurant ne peut pas être désactivé entre la vérification et l'écriture. Seules les
+-- colonnes présentes dans p_values sont modifiées (une valeur null efface la colonne).
+--
+-- Erreurs : PT404 article introuvable, PT403 restaurant parent inactif.
+
+create or replace function public.update_menu_item(p_item_id bigint, p_values jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_item jsonb;
+    v_restaurant_id bigint;
+begin
+    update menu_items m set
+        name = case when p_values ? 'name' then p_values ->> 'name' else m.name end,
+        description = case when p_values ? 'description' then p_values ->> 'description' else m.description end,
+        price = case when p_values ? 'price' then (p_values ->> 'price')::double precision else m.price end,
+        category = case when p_values ? 'category' then p_values ->> 'category' else m.category end,
+        image_url = case when p_values ? 'image_url' then p_values ->> 'image_url' else m.image_url end,
+        is_available = case when p_values ? 'is_available' then (p_values ->> 'is_available')::boolean else m.is_available end,
+        updated_at = now()
+    from (
+        select id from restaurants
+        where id = (select restaurant_id from menu_items where id = p_item_id) and is_active
+        for share
+    ) r
+    where m.id = p_item_id and r.id = m.restaurant_id
+    returning to_jsonb(m.*) into v_item;
+
+    if v_item is null then
+        select restaurant_id into v_restaurant_id from menu_items where id = p_item_id;
+        if not found then
+            raise exception using errcode = 'PT404', message = format('Article de menu ID %s non trouvé.', p_item_id);
+        end if;
+        raise exception using errcode = 'PT403', message = format(
+            'Impossible de mettre à jour l''article car son restaurant (ID: %s) est inactif.', v_restaurant_id
+        );
+    end if;
+    return v_item;
+end;
+$$;
@@ -0,0 +1,97 @@
+-- Changement de statut / d'heure de livraison d'une commande en une requête (PUT et DELETE /api/orders/{id})
+--
+-- Un seul UPDATE vérifie la transition et écrit : la ligne est verrouillée par la sous-requête
+-- FOR UPDATE, la condition de transition porte sur son statut courant, et RETURNING renvoie la
+-- commande modifiée avec son statut précédent. Aucune fenêtre entre la vérification et
+-- l'écriture, et plus de relecture : les articles sont joints à la réponse.
+--
+-- L'entrée dans un statut horodate la colonne correspondante (eta.py) et, si la commande a un
+-- plan d'estimation (eta_plan jsonb, calculé à la création, voir sql/eta.sql), recalcule
+-- estimated_delivery_time ; une heure fournie explicitement l'emporte. Redemander le statut
+-- courant (deuxième annulation...) n'écrit rien : la commande est renvoyée telle quelle, avec
+-- previous_status égal à son statut et changed à false.
+--
+-- Erreurs : PT404 commande introuvable, PT409 transition interdite (message avec les statuts
+-- autorisés), PT400 statut inconnu.
+
+create or replace function public.order_status_transitions(p_from text)
+returns text[]
+language sql
+immutable
+as $$
+    -- Machine à états des commandes : statuts atteignables depuis p_from
+    select case p_from
+        when 'pending' then array['confirmed', 'preparing', 'cancelled']
+        when 'confirmed' then array['preparing', 'ready_for_pickup', 'cancelled']
+        when 'preparing' then array['ready_for_pickup', 'cancelled']
+        when 'ready_for_pickup' then array['out_for_delivery', 'cancelled']
+        when 'out_for_delivery' then array['delivered', 'cancelled']
+        when 'delivered' then array['refunded']
+        when 'cancelled' then array['refunded']
+        else array[]::text[]
+    end;
+$$;
+
+create or replace function public.update_order(p_order_id bigint, p_changes jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_status text := p_changes ->> 'status';
+    v_order jsonb;
+    v_previous_status text;
+    v_current_status text;
+    v_changed boolean;
+begin
+    if v_status is not null and v_status not in (
+        'pending', 'confirmed', 'preparing', 'ready_for_pickup', 'out_for_delivery', 'delivered', 'cancelled', 'refunded'
+    ) then
+        raise exception using errcode = 'PT400', message = format('Statut de commande inconnu: %s.', v_status);
+    end if;
+
+    update orders o set
+        status = coalesce(v_status, o.status),
+        confirmed_at = case when v_status = 'confirmed' and previous.status <> v_status then now() else o.confirmed_at end,
+        ready_at = case when v_status = 'ready_for_pickup' and previous.status <> v_status then now() else o.ready_at end,
+        picked_up_at = case when v_status = 'out_for_delivery' and previous.status <> v_status then now() else o.picked_up_at end,
+        delivered_at = case when v_status = 'delivered' and previous.status <> v_status then now() else o.delivered_at end,
+        estimated_delivery_time = case
+            when p_changes ? 'estimated_delivery_time' then (p_changes ->> 'estimated_delivery_time')::timestamptz
+            when v_status <> previous.status and o.eta_plan ? v_status
+                then now() + make_interval(secs => (o.eta_plan ->> v_status)::double precision)
+            else o.estimated_delivery_time
+        end,
+        updated_at = now()
+    from (select id, status from orders where id = p_order_id for update) previous
+    where o.id = previous.id
+      and (v_status is null
+           or v_status = any(order_status_transitions(previous.status))
+           -- Statut inchangé : écriture seulement si l'heure estimée est fournie
+           or (v_status = previous.status and p_changes ? 'estimated_delivery_time'))
+    returning to_jsonb(o.*), previous.status into v_order, v_previous_status;
+    v_changed := found;
+
+    if not v_changed then
+        -- Pas d'écriture : commande absente, statut déjà atteint ou transition interdite
+        select to_jsonb(o.*), o.status into v_order, v_current_status from orders o where o.id = p_order_id;
+        if not found then
+            raise exception using errcode = 'PT404', message = format('Commande avec ID %s non trouvée.', p_order_id);
+        end if;
+        if v_current_status is distinct from v_status then
+            raise exception using errcode = 'PT409', message = format(
+                'Transition de statut interdite pour la commande ID %s : %s -> %s (autorisés : %s).',
+                p_order_id, v_current_status, v_status,
+                coalesce(nullif(array_to_string(order_status_transitions(v_current_status), ', '), ''), 'aucun')
+            );
+        end if;
+        v_previous_status := v_current_status;
+    end if;
+
+    return v_order || jsonb_build_object(
+        'previous_status', v_previous_status,
+        'changed', v_changed,
+        'items',
+        coalesce((select jsonb_agg(to_jsonb(oi) order by oi.id) from order_items oi where oi.order_id = p_order_id), '[]'::jsonb)
+    );
+end;
+$$;
@@ -0,0 +1,47 @@
+-- File durable des messages WhatsApp reçus par le webhook (backend `supabase` de webhook_queue.py)
+--
+-- Le webhook insère un job par message ; les workers les réclament via claim_webhook_jobs
+-- (POST /rest/v1/rpc/claim_webhook_jobs) puis suppriment le job une fois traité.
+
+create table if not exists webhook_jobs (
+    id bigserial primary key,
+    partition_key text not null,
+    payload jsonb not null,
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    last_error text,
+    claimed_at timestamptz,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists ix_webhook_jobs_partition_key_id on webhook_jobs (partition_key, id);
+create index if not exists ix_webhook_jobs_pending on webhook_jobs (id) where status in ('pending', 'processing');
+
+-- Réclame jusqu'à p_limit jobs, au plus un par numéro (partition_key) : le plus ancien,
+-- et seulement si aucun autre job de ce numéro n'est en cours ailleurs. Un job « processing »
+-- dont le worker a disparu (réclamé il y a plus de p_visibility_seconds) redevient réclamable.
+create or replace function public.claim_webhook_jobs(p_limit integer default 20, p_visibility_seconds integer default 300)
+returns setof webhook_jobs
+language sql
+as $$
+    with heads as (
+        select j.id
+        from webhook_jobs j
+        where (j.status = 'pending'
+               or (j.status = 'processing' and j.claimed_at < now() - make_interval(secs => p_visibility_seconds)))
+          and not exists (
+                select 1 from webhook_jobs earlier
+                where earlier.partition_key = j.partition_key
+                  and earlier.id < j.id
+                  and earlier.status in ('pending', 'processing')
+            )
+        order by j.id
+        limit p_limit
+        for update of j skip locked
+    )
+    update webhook_jobs w
+    set status = 'processing', claimed_at = now(), attempts = w.attempts + 1
+    from heads
+    where w.id = heads.id
+    returning w.*;
+$$;
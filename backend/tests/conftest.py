@@ -0,0 +1,104 @@
+"""Configuration pytest commune (lancée depuis backend/, comme le CI).
+
+Le code importe ses modules par `ChopExpress.backend.*` : le paquet est enregistré ici
+quel que soit le nom du répertoire cloné. Supabase pointe vers le faux serveur PostgREST
+des benchmarks (benchmarks/fake_postgrest.py) : fixtures `fake_db` et `fake_repository`.
+"""
+import os
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test-key")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if "ChopExpress" not in sys.modules:
+    package = types.ModuleType("ChopExpress")
+    package.__path__ = [str(REPO_ROOT)]
+    sys.modules["ChopExpress"] = package
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Faux PostgREST vide, servi à l'application par main.db ; les tests le remplissent avec seed().
+
+    Le cache du catalogue est vidé avant et après : aucune entrée d'un autre test.
+    """
+    import ChopExpress.backend.main as main
+    from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest
+    from ChopExpress.backend.repository import create_repository
+
+    fake = FakePostgrest()
+    monkeypatch.setattr(main, "db", create_repository("http://fake-supabase.local", "test-key", transport=fake.async_transport()))
+    main.catalogue_cache.clear()
+    yield fake
+    main.catalogue_cache.clear()
+
+
+@pytest.fixture
+def fake_repository(fake_db):
+    """Dépôt async (repository.py) sur le faux PostgREST de `fake_db`, pour les services construits hors de main."""
+    import ChopExpress.backend.main as main
+
+    return main.db
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    """Moteur SQLAlchemy sur un schéma jetable de DATABASE_URL, tables créées depuis models.py.
+
+    Ignoré sans DATABASE_URL ou si le serveur est injoignable (le job CI fournit un PostgreSQL).
+    """
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+
+    import ChopExpress.backend.models as models
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        pytest.skip("DATABASE_URL non défini : tests PostgreSQL ignorés")
+    schema = f"test_{os.getpid()}"
+    admin = create_engine(database_url)
+    try:
+        with admin.begin() as conn:
+            conn.execute(text(f"create schema {schema}"))
+    except OperationalError as e:
+        admin.dispose()
+        pytest.skip(f"PostgreSQL injoignable : {e}")
+    # Tables et appels dans le schéma de test ; les fonctions SQL (public.*) résolvent les tables par search_path
+    engine = create_engine(database_url, connect_args={"options": f"-csearch_path={schema},public"})
+    previous_engine, models.engine = models.engine, engine
+    try:
+        models.create_db_tables()
+        yield engine
+    finally:
+        models.engine = previous_engine
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"drop schema {schema} cascade"))
+        admin.dispose()
+
+
+@pytest.fixture
+def pg_conn(pg_engine):
+    """Connexion sur un catalogue neuf : 1 client, 1 restaurant actif, 3 articles (2500, 4000, 3000 FCFA)."""
+    from sqlalchemy import text
+
+    import ChopExpress.backend.models as models
+
+    models.create_db_functions("eta.sql", "place_order.sql", "update_order.sql")
+    with pg_engine.connect() as conn:
+        conn.execute(text("truncate order_items, orders, menu_items, restaurants, users restart identity cascade"))
+        conn.execute(text("insert into users (phone_number, created_at, updated_at) values ('237690000000', now(), now())"))
+        conn.execute(text("insert into restaurants (name, is_active, created_at, updated_at) values ('Chez Mama', true, now(), now())"))
+        for name, price in (("Ndolé", 2500), ("Poulet DG", 4000), ("Eru", 3000)):
+            conn.execute(
+                text("insert into menu_items (restaurant_id, name, price, is_available, created_at, updated_at) values (1, :n, :p, true, now(), now())"),
+                {"n": name, "p": price},
+            )
+        conn.commit()
+        yield conn
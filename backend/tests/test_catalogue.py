@@ -0,0 +1,51 @@
+"""Endpoints du catalogue : un restaurant ou un plat introuvable reste un 404, cache compris."""
+import httpx
+import pytest
+
+import ChopExpress.backend.main as main
+
+
+@pytest.fixture(autouse=True)
+def catalogue(fake_db):
+    fake_db.seed("restaurants", [{"name": "Chez Mama", "is_active": True}])
+    fake_db.seed("menu_items", [{"restaurant_id": 1, "name": "Ndolé", "price": 2500.0, "is_available": True}])
+    return fake_db
+
+
+async def _get(url: str) -> httpx.Response:
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        return await client.get(url)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", ["/api/restaurants/999", "/api/restaurants/999/menu-items"])
+async def test_missing_restaurant_is_404(fake_db, url):
+    response = await _get(url)
+    assert response.status_code == 404
+    # Réponse négative servie depuis le cache : toujours un 404
+    assert (await _get(url)).status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", ["/api/restaurants/1", "/api/restaurants/1/menu-items"])
+async def test_existing_restaurant_is_200(fake_db, url):
+    assert (await _get(url)).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_missing_menu_item_is_404(fake_db):
+    assert (await _get("/api/menu-items/999")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_menu_item_of_inactive_restaurant_is_403(fake_db):
+    fake_db.seed("restaurants", [{"name": "Fermé", "is_active": False}])
+    fake_db.seed("menu_items", [{"restaurant_id": 2, "name": "Eru", "price": 3000.0, "is_available": True}])
+    assert (await _get("/api/menu-items/2")).status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_create_menu_item_for_missing_restaurant_is_404(fake_db):
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        response = await client.post("/api/restaurants/999/menu-items", json={"name": "Eru", "price": 3000.0})
+    assert response.status_code == 404
@@ -0,0 +1,66 @@
+"""Index de recherche des menus dans l'application : reconstruction en arrière-plan et réactivation."""
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+import ChopExpress.backend.main as main
+from ChopExpress.backend.search import MenuSearchIndex
+
+
+@pytest.fixture(autouse=True)
+def catalogue(fake_db, monkeypatch):
+    fake_db.seed("restaurants", [{"name": "Chez Mama", "cuisine_type": "Camerounaise", "is_active": True}])
+    fake_db.seed("menu_items", [
+        {"restaurant_id": 1, "name": "Ndolé crevettes", "price": 3000.0, "category": "Plats", "is_available": True},
+        {"restaurant_id": 1, "name": "Poulet DG", "price": 4000.0, "category": "Plats", "is_available": True},
+    ])
+    monkeypatch.setattr(main, "menu_search_index", MenuSearchIndex())
+    monkeypatch.setattr(main, "menu_search_built_at", None)
+    monkeypatch.setattr(main, "menu_search_rebuild", None)
+    monkeypatch.setattr(main, "menu_search_pending_writes", None)
+    return fake_db
+
+
+def _names(results) -> list:
+    return [result.name for result in results]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_serves_old_index_and_keeps_concurrent_writes(fake_db, monkeypatch):
+    assert _names(await main.search_menu("ndole")) == ["Ndolé crevettes"]
+
+    release = threading.Event()
+    original_rebuild = MenuSearchIndex.rebuild
+
+    def slow_rebuild(index, restaurants, menu_items):
+        release.wait(5)
+        original_rebuild(index, restaurants, menu_items)
+
+    monkeypatch.setattr(MenuSearchIndex, "rebuild", slow_rebuild)
+    monkeypatch.setattr(main, "menu_search_built_at", main.menu_search_built_at - main.MENU_SEARCH_REBUILD_SECONDS - 1)
+
+    # Index périmé : la recherche répond tout de suite avec l'ancien index
+    assert _names(await asyncio.wait_for(main.search_menu("ndole"), 1)) == ["Ndolé crevettes"]
+    rebuild = main.menu_search_rebuild
+    while main.menu_search_pending_writes is None or rebuild.done():
+        await asyncio.sleep(0)
+    main.sync_menu_search_item({**await main.db.select_one("menu_items", id=2), "name": "Poulet braisé"})
+    assert _names(await main.search_menu("braise")) == ["Poulet braisé"]
+
+    release.set()
+    await rebuild
+    # La mise à jour faite pendant la construction n'est pas écrasée par la lecture plus ancienne
+    assert _names(await main.search_menu("braise")) == ["Poulet braisé"]
+    assert main.menu_search_pending_writes is None
+
+
+@pytest.mark.asyncio
+async def test_reactivated_restaurant_items_are_searchable(fake_db):
+    await main.get_menu_search_index()
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        assert (await client.delete("/api/restaurants/1")).status_code == 204
+        assert await main.search_menu("poulet") == []
+        (await client.put("/api/restaurants/1", json={"is_active": True})).raise_for_status()
+    assert _names(await main.search_menu("poulet")) == ["Poulet DG"]
@@ -0,0 +1,73 @@
+"""Endpoints de commandes : nombre de requêtes PostgREST constant, quel que soit le volume."""
+import httpx
+import pytest
+
+import ChopExpress.backend.main as main
+from ChopExpress.backend.benchmarks.fake_postgrest import FakePostgrest
+
+ITEMS_PER_ORDER = 3
+
+
+def _seed(fake: FakePostgrest, order_count: int) -> None:
+    fake.seed("users", [{"phone_number": "237690000000"}])
+    fake.seed("restaurants", [{"name": "Chez Mama"}])
+    fake.seed("menu_items", [{"restaurant_id": 1, "name": f"Plat {i}", "price": 1500.0} for i in range(ITEMS_PER_ORDER)])
+    orders = fake.seed("orders", [{"customer_id": 1, "restaurant_id": 1, "total_amount": 4500.0} for _ in range(order_count)])
+    fake.seed("order_items", [
+        {"order_id": order["id"], "menu_item_id": i + 1, "quantity": 1, "price_at_order": 1500.0}
+        for order in orders for i in range(ITEMS_PER_ORDER)
+    ])
+
+
+async def _queries(fake: FakePostgrest, method: str, url: str, **kwargs) -> tuple:
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        fake.reset_counters()
+        response = await client.request(method, url, **kwargs)
+    return response, fake.query_count
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("order_count", [5, 150])
+async def test_list_orders_single_query(fake_db, order_count):
+    _seed(fake_db, order_count)
+    response, queries = await _queries(fake_db, "GET", "/api/orders", params={"limit": 200})
+    assert response.status_code == 200
+    orders = response.json()["orders"]
+    assert len(orders) == order_count
+    assert all(len(order["items"]) == ITEMS_PER_ORDER for order in orders)
+    assert queries == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("order_count", [5, 150])
+async def test_get_order_single_query(fake_db, order_count):
+    _seed(fake_db, order_count)
+    response, queries = await _queries(fake_db, "GET", f"/api/orders/{order_count}")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == ITEMS_PER_ORDER
+    assert queries == 1
+
+
+@pytest.mark.asyncio
+async def test_get_missing_order_single_query(fake_db):
+    _seed(fake_db, 5)
+    response, queries = await _queries(fake_db, "GET", "/api/orders/999")
+    assert response.status_code == 404
+    assert queries == 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_status_update_publishes_once(fake_db, monkeypatch):
+    _seed(fake_db, 1)
+    published = []
+    monkeypatch.setattr(main.order_events, "publish", lambda event, restaurant_id, data: published.append(event))
+
+    async def no_notification(order):
+        return None
+
+    monkeypatch.setattr(main, "notify_order_status", no_notification)
+    for _ in range(2):
+        response, queries = await _queries(fake_db, "PUT", "/api/orders/1", json={"status": "confirmed"})
+        assert response.status_code == 200
+        assert queries == 1
+    assert published == [main.EVENT_ORDER_UPDATED]
@@ -0,0 +1,95 @@
+"""Fonction SQL place_order (sql/place_order.sql) sur PostgreSQL : total, atomicité, articles retirés."""
+import json
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+CART = [{"menu_item_id": 1, "quantity": 2}, {"menu_item_id": 2, "quantity": 1, "notes": "bien pimenté"}, {"menu_item_id": 3, "quantity": 3}]
+
+INJECT_FAILURE_SQL = """
+create or replace function _test_fail_order_items() returns trigger language plpgsql as $$
+begin
+    raise exception 'panne injectée pendant l''insertion des articles';
+end;
+$$;
+create trigger _test_fail_order_items before insert on order_items
+for each row execute function _test_fail_order_items();
+"""
+REMOVE_FAILURE_SQL = """
+drop trigger if exists _test_fail_order_items on order_items;
+drop function if exists _test_fail_order_items();
+"""
+
+
+def _place_order(conn, items=CART) -> dict:
+    row = conn.execute(
+        text("select place_order(1, 1, cast(:items as jsonb))"), {"items": json.dumps(items)}
+    ).scalar_one()
+    conn.commit()
+    return row
+
+
+def _counts(conn) -> tuple:
+    return conn.execute(text("select (select count(*) from orders), (select count(*) from order_items)")).one()
+
+
+def test_total_computed_from_database_prices(pg_conn):
+    created = _place_order(pg_conn, [{**line, "price": 1} for line in CART])
+    assert created["total_amount"] == 2 * 2500 + 4000 + 3 * 3000
+    assert [item["price_at_order"] for item in created["items"]] == [2500, 4000, 3000]
+    assert _counts(pg_conn) == (1, 3)
+
+
+def test_failure_leaves_no_orphan_header(pg_conn):
+    pg_conn.exec_driver_sql(INJECT_FAILURE_SQL)
+    pg_conn.commit()
+    try:
+        with pytest.raises(DBAPIError, match="panne injectée"):
+            _place_order(pg_conn)
+        pg_conn.rollback()
+        assert _counts(pg_conn) == (0, 0)
+    finally:
+        pg_conn.rollback()
+        pg_conn.exec_driver_sql(REMOVE_FAILURE_SQL)
+        pg_conn.commit()
+
+
+@pytest.mark.parametrize("setup_sql, message", [
+    ("update menu_items set is_available = false where id = 3", "n'est plus disponible"),
+    ("update restaurants set is_active = false where id = 1", "inactif"),
+])
+def test_rejected_cart_writes_nothing(pg_conn, setup_sql, message):
+    pg_conn.execute(text(setup_sql))
+    pg_conn.commit()
+    with pytest.raises(DBAPIError, match=message):
+        _place_order(pg_conn)
+    pg_conn.rollback()
+    assert _counts(pg_conn) == (0, 0)
+
+
+def test_item_withdrawn_concurrently_is_not_sold(pg_conn, pg_engine):
+    # Un admin retire l'article dans une transaction encore ouverte : place_order attend son verrou
+    # puis voit l'article indisponible, au lieu de vendre sur la base d'une lecture périmée
+    outcome = {}
+
+    def place():
+        with pg_engine.connect() as other:
+            try:
+                outcome["order"] = _place_order(other)
+            except DBAPIError as e:
+                outcome["error"] = str(e)
+
+    with pg_engine.connect() as admin:
+        admin.execute(text("update menu_items set is_available = false where id = 2"))
+        worker = threading.Thread(target=place)
+        worker.start()
+        time.sleep(0.3)
+        assert worker.is_alive(), "place_order aurait dû attendre le verrou de l'article"
+        admin.commit()
+    worker.join(10)
+    assert "order" not in outcome
+    assert "n'est plus disponible" in outcome["error"]
+    assert _counts(pg_conn) == (0, 0)
@@ -0,0 +1,39 @@
+"""Catalogue de traductions : les locales demandées se résolvent vers une locale existante."""
+import httpx
+import pytest
+
+import ChopExpress.backend.main as main
+from ChopExpress.backend.translations import TranslationService
+
+
+async def _service(fake_db, repository) -> TranslationService:
+    fake_db.seed("translations", [
+        {"lang_code": lang, "key": "cart.title", "value": value, "updated_at": "2024-01-01T00:00:00+00:00"}
+        for lang, value in (("fr_CM", "Panier"), ("en_CM", "Cart"), ("fr", "Panier"))
+    ])
+    translation_service = TranslationService(repository)
+    await translation_service.load()
+    return translation_service
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("requested, resolved", [
+    ("en-cm", "en_CM"),
+    ("EN", "en_CM"),
+    ("fr", "fr"),
+    ("aa1", "fr_CM"),
+    ("", "fr_CM"),
+])
+async def test_resolve_locale(fake_db, fake_repository, requested, resolved):
+    service = await _service(fake_db, fake_repository)
+    assert service.resolve_locale(requested) == resolved
+
+
+@pytest.mark.asyncio
+async def test_unknown_locales_share_the_default_bundle(fake_db, fake_repository, monkeypatch):
+    monkeypatch.setattr(main, "translations", await _service(fake_db, fake_repository))
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        for locale in ("aa1", "aa2", "aa3", "fr-CM"):
+            response = await client.get(f"/api/translations/{locale}")
+            assert response.json() == {"cart": {"title": "Panier"}}
+    assert main.catalogue_cache.stats()["entries"] == 1
@@ -0,0 +1,93 @@
+"""Fonction SQL update_order (sql/update_order.sql) sur le schéma créé par models.py."""
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+import ChopExpress.backend.models as models
+
+
+@pytest.fixture
+def order_id(pg_conn) -> int:
+    created = pg_conn.execute(text("""select place_order(1, 1, '[{"menu_item_id": 1, "quantity": 2}]'::jsonb)""")).scalar_one()
+    pg_conn.commit()
+    return created["id"]
+
+
+def _update(conn, order_id: int, changes: dict) -> dict:
+    row = conn.execute(
+        text("select update_order(:id, cast(:changes as jsonb))"), {"id": order_id, "changes": json.dumps(changes)}
+    ).scalar_one()
+    conn.commit()
+    return row
+
+
+def test_transition_stamps_status_column(pg_conn, order_id):
+    updated = _update(pg_conn, order_id, {"status": "confirmed"})
+    assert (updated["status"], updated["previous_status"], updated["changed"]) == ("confirmed", "pending", True)
+    assert updated["confirmed_at"] is not None
+    assert [item["quantity"] for item in updated["items"]] == [2]
+
+
+def test_cancelling_twice_writes_nothing(pg_conn, order_id):
+    cancelled = _update(pg_conn, order_id, {"status": "cancelled"})
+    assert cancelled["previous_status"] == "pending"
+    again = _update(pg_conn, order_id, {"status": "cancelled"})
+    assert (again["previous_status"], again["changed"]) == ("cancelled", False)
+    assert again["updated_at"] == cancelled["updated_at"]
+
+
+def test_explicit_delivery_time_without_status_change(pg_conn, order_id):
+    updated = _update(pg_conn, order_id, {"status": "pending", "estimated_delivery_time": "2026-01-01T12:30:00+00:00"})
+    assert updated["previous_status"] == "pending"
+    assert updated["estimated_delivery_time"].startswith("2026-01-01T12:30:00")
+
+
+@pytest.mark.parametrize("changes, order_offset, message", [
+    ({"status": "pending"}, 0, "Transition de statut interdite"),
+    ({"status": "delivered"}, 0, "Transition de statut interdite"),
+    ({"status": "livrée"}, 0, "Statut de commande inconnu"),
+    ({"status": "cancelled"}, 1000, "non trouvée"),
+])
+def test_rejected_changes_leave_order_untouched(pg_conn, order_id, changes, order_offset, message):
+    confirmed = _update(pg_conn, order_id, {"status": "confirmed"})
+    with pytest.raises(DBAPIError, match=message):
+        _update(pg_conn, order_id + order_offset, changes)
+    pg_conn.rollback()
+    row = pg_conn.execute(text("select status, updated_at from orders where id = :id"), {"id": order_id}).one()
+    assert row.status == "confirmed"
+    assert row.updated_at == datetime.fromisoformat(confirmed["updated_at"])
+
+
+def _order_with_plan(conn, plan: dict) -> int:
+    created = conn.execute(
+        text("""select place_order(1, 1, '[{"menu_item_id": 2, "quantity": 1}]'::jsonb, p_eta_plan => cast(:plan as jsonb))"""),
+        {"plan": json.dumps(plan)},
+    ).scalar_one()
+    conn.commit()
+    return created["id"]
+
+
+def test_status_change_recomputes_delivery_time_from_plan(pg_conn):
+    order_id = _order_with_plan(pg_conn, {"pending": 3000, "confirmed": 2400, "ready_for_pickup": 900})
+    updated = _update(pg_conn, order_id, {"status": "confirmed"})
+    remaining = datetime.fromisoformat(updated["estimated_delivery_time"]) - datetime.fromisoformat(updated["confirmed_at"])
+    assert round(remaining.total_seconds()) == 2400
+    # Statut absent du plan (preparing) : heure estimée inchangée
+    assert _update(pg_conn, order_id, {"status": "preparing"})["estimated_delivery_time"] == updated["estimated_delivery_time"]
+
+
+def test_json_eta_plan_column_is_migrated_to_jsonb(pg_conn):
+    # Schéma créé par une version précédente de models.py (colonne json)
+    pg_conn.execute(text("alter table orders alter column eta_plan type json using eta_plan::json"))
+    pg_conn.commit()
+    models.create_db_functions("eta.sql")
+    column_type = pg_conn.execute(text(
+        "select data_type from information_schema.columns "
+        "where table_schema = current_schema() and table_name = 'orders' and column_name = 'eta_plan'"
+    )).scalar_one()
+    assert column_type == "jsonb"
+    order_id = _order_with_plan(pg_conn, {"pending": 3000, "confirmed": 2400})
+    assert _update(pg_conn, order_id, {"status": "confirmed"})["status"] == "confirmed"
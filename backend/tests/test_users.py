@@ -0,0 +1,17 @@
+"""Endpoints des utilisateurs : un utilisateur introuvable reste un 404."""
+import httpx
+import pytest
+
+import ChopExpress.backend.main as main
+
+
+async def _get(url: str) -> httpx.Response:
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        return await client.get(url)
+
+
+@pytest.mark.asyncio
+async def test_missing_user_is_404(fake_db):
+    fake_db.seed("users", [{"phone_number": "237690000000"}])
+    assert (await _get("/api/users/999")).status_code == 404
+    assert (await _get("/api/users/1")).status_code == 200
@@ -0,0 +1,76 @@
+"""Traitement des messages WhatsApp (process_whatsapp_message) : déduplication et reprise après échec."""
+import pytest
+
+import ChopExpress.backend.main as main
+from ChopExpress.backend.message_dedup import InMemoryDedupStore, SupabaseDedupStore
+
+PHONE = "237690000001"
+
+
+@pytest.fixture(autouse=True)
+def user_caches(fake_db):
+    # Utilisateur absent du faux PostgREST : il ne doit pas être servi par le cache d'un autre test
+    main.user_cache.invalidate(PHONE)
+    main.failed_user_cache.invalidate(PHONE)
+
+
+def _message(n: int) -> dict:
+    return {"messages": [{"id": f"wamid.test{n}", "from": PHONE, "type": "text", "text": {"body": "aide"}}]}
+
+
+@pytest.fixture
+def flaky_handler(monkeypatch):
+    calls = []
+
+    async def handler(user, phone_number, text):
+        calls.append(text)
+        if len(calls) == 1:
+            raise RuntimeError("envoi WhatsApp impossible")
+
+    monkeypatch.setattr(main, "handle_text_message", handler)
+    return calls
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("store_factory", [InMemoryDedupStore, lambda: SupabaseDedupStore(main.db)], ids=["memory", "supabase"])
+async def test_failed_message_is_processed_on_redelivery(fake_db, flaky_handler, monkeypatch, store_factory):
+    store = store_factory()
+    monkeypatch.setattr(main, "message_dedup", store)
+
+    with pytest.raises(RuntimeError):
+        await main.process_whatsapp_message(_message(1))
+    await main.process_whatsapp_message(_message(1))  # nouvelle livraison : traitée, pas ignorée
+    await main.process_whatsapp_message(_message(1))  # traitée avec succès : doublon ignoré
+
+    assert len(flaky_handler) == 2
+    assert store.duplicates_dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_lookup_error_skips_only_its_message_and_is_not_cached(fake_db, monkeypatch):
+    other_phone = "237690000002"
+    main.user_cache.invalidate(other_phone)
+    monkeypatch.setattr(main, "message_dedup", InMemoryDedupStore())
+    handled = []
+
+    async def handler(user, phone_number, text):
+        handled.append(phone_number)
+
+    monkeypatch.setattr(main, "handle_text_message", handler)
+    select_one = main.db.select_one
+
+    async def flaky_select_one(table, **filters):
+        if filters.get("phone_number") == PHONE:
+            raise ConnectionError("Supabase injoignable")
+        return await select_one(table, **filters)
+
+    monkeypatch.setattr(main.db, "select_one", flaky_select_one)
+    batch = {"messages": [_message(1)["messages"][0], {**_message(2)["messages"][0], "from": other_phone}]}
+
+    with pytest.raises(ConnectionError):
+        await main.process_whatsapp_message(batch)
+    assert handled == [other_phone]  # le message suivant du lot a été traité
+
+    monkeypatch.setattr(main.db, "select_one", select_one)
+    await main.process_whatsapp_message(_message(1))  # nouvel essai immédiat, sans échec mis en cache
+    assert handled == [other_phone, PHONE]
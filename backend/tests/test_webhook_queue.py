@@ -0,0 +1,64 @@
+"""Pool de workers du webhook (webhook_queue.py) : bornes des files locales et jobs en échec."""
+import asyncio
+
+import pytest
+
+from ChopExpress.backend.webhook_queue import InMemoryQueueBackend, QueueFullError, WebhookJob, WebhookWorkerPool
+
+
+def _job(key: str, n: int) -> WebhookJob:
+    return WebhookJob(key, {"n": n})
+
+
+@pytest.mark.asyncio
+async def test_burst_from_one_number_fills_backend_not_lane():
+    release = asyncio.Event()
+    handled = []
+
+    async def handler(payload):
+        await release.wait()
+        handled.append(payload["n"])
+
+    backend = InMemoryQueueBackend(maxsize=2)
+    pool = WebhookWorkerPool(backend, handler, concurrency=1, max_pending=2)
+    pool.start()
+    try:
+        for n in range(4):
+            await pool.enqueue([_job("237690000000", n)])
+            await asyncio.sleep(0)
+        # 2 jobs dans la file locale du numéro, 2 encore dans le backend, puis refus
+        assert pool.stats()["pending_jobs"] == 2
+        assert backend.qsize() == 2
+        with pytest.raises(QueueFullError):
+            await pool.enqueue([_job("237690000000", 4)])
+
+        release.set()
+        await asyncio.wait_for(pool.join(), 1)
+        assert handled == [0, 1, 2, 3]
+        assert pool.stats()["pending_jobs"] == 0
+    finally:
+        await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_handler_failure_marks_job_failed():
+    failed = []
+
+    class RecordingBackend(InMemoryQueueBackend):
+        async def fail(self, job, error):
+            failed.append((job.payload["n"], str(error)))
+            await super().fail(job, error)
+
+    async def handler(payload):
+        if payload["n"] == 1:
+            raise RuntimeError("Supabase indisponible")
+
+    pool = WebhookWorkerPool(RecordingBackend(), handler, concurrency=2)
+    pool.start()
+    try:
+        await pool.enqueue([_job("237690000000", n) for n in range(3)])
+        await asyncio.wait_for(pool.join(), 1)
+    finally:
+        await pool.stop()
+    assert failed == [(1, "Supabase indisponible")]
+    assert (pool.processed, pool.failed) == (2, 1)
@@ -0,0 +1,199 @@
+"""Catalogue des traductions (table `translations`) gardé en mémoire pour le bot et le frontend.
+
+Tout le catalogue est chargé au démarrage, une langue = un dict figé (`MappingProxyType`)
+remplacé d'un bloc à chaque mise à jour : une lecture ne voit jamais un catalogue à
+moitié rafraîchi et ne coûte aucune requête. Le rafraîchissement est incrémental : seules
+les lignes après le filigrane (updated_at, id) de la dernière ligne chargée sont relues.
+Les suppressions, et une ligne validée en retard avec un updated_at plus ancien que le
+filigrane, ne sont vues qu'au rechargement complet, plus espacé.
+
+Repli entre locales : `en-CM` -> `en_CM` -> `en` -> locale par défaut (`fr_CM`) -> `fr`.
+"""
+import asyncio
+import hashlib
+import logging
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCALE = "fr_CM"
+DEFAULT_REGION = "CM"
+DEFAULT_TRANSLATIONS_REFRESH_SECONDS = 60.0
+DEFAULT_TRANSLATIONS_FULL_RELOAD_SECONDS = 3600.0
+
+TRANSLATION_COLUMNS = "id, lang_code, key, value, updated_at"
+
+
+def normalize_locale(locale: Optional[str]) -> str:
+    # « en-cm », « EN_CM » -> « en_CM » ; « FR » -> « fr »
+    language, _, region = (locale or "").strip().replace("-", "_").partition("_")
+    return f"{language.lower()}_{region.upper()}" if region else language.lower()
+
+
+@lru_cache(maxsize=256)
+def fallback_chain(locale: Optional[str], default_locale: str = DEFAULT_LOCALE) -> Tuple[str, ...]:
+    chain: List[str] = []
+    for candidate in (normalize_locale(locale), normalize_locale(default_locale)):
+        if not candidate:
+            continue
+        language = candidate.partition("_")[0]
+        # « en » seul : la variante camerounaise est la plus probable dans la table
+        variants = [candidate, language] if "_" in candidate else [candidate, f"{language}_{DEFAULT_REGION}"]
+        chain.extend(variant for variant in variants if variant not in chain)
+    return tuple(chain)
+
+
+def _nest(flat: Mapping[str, str]) -> Dict[str, Any]:
+    # « cart.title » -> {"cart": {"title": ...}}, format des fichiers i18next (keySeparator « . »)
+    nested: Dict[str, Any] = {}
+    for key in sorted(flat):
+        node = nested
+        *parents, leaf = key.split(".")
+        for part in parents:
+            child = node.setdefault(part, {})
+            if not isinstance(child, dict):
+                node = None
+                break
+            node = child
+        if node is None or isinstance(node.get(leaf), dict):
+            nested[key] = flat[key]  # conflit entre une valeur et un groupe : clé gardée à plat
+        else:
+            node[leaf] = flat[key]
+    return nested
+
+
+class TranslationService:
+    def __init__(self, repository, default_locale: str = DEFAULT_LOCALE):
+        self.db = repository
+        self.default_locale = normalize_locale(default_locale)
+        self._catalogues: Mapping[str, Mapping[str, str]] = MappingProxyType({})
+        self._row_keys: Dict[int, Tuple[str, str]] = {}  # id -> (langue, clé), pour suivre les renommages
+        self.watermark: Optional[str] = None  # (updated_at, id) de la dernière ligne chargée
+        self._watermark_id: Optional[int] = None
+        self.version = self._compute_version()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.rows_applied = 0
+
+    # --- Chargement ---
+    async def load(self) -> int:
+        rows = await self.db.select_changed_since("translations", None, TRANSLATION_COLUMNS)
+        self._row_keys = {}
+        self.watermark = self._watermark_id = None
+        self._apply(rows, {})
+        logger.info("Traductions chargées: %s lignes, %s langue(s), version %s", len(rows), len(self._catalogues), self.version)
+        return len(rows)
+
+    async def refresh(self) -> int:
+        if self.watermark is None:
+            return await self.load()
+        rows = await self.db.select_changed_since("translations", self.watermark, TRANSLATION_COLUMNS, after_id=self._watermark_id)
+        self.refreshes += 1
+        if rows:
+            self._apply(rows, self._catalogues)
+            logger.info("Traductions rafraîchies: %s ligne(s), version %s", len(rows), self.version)
+        return len(rows)
+
+    def _apply(self, rows: Iterable[Dict[str, Any]], base: Mapping[str, Mapping[str, str]]) -> None:
+        # Copie des seules langues modifiées, puis remplacement d'un bloc
+        changed: Dict[str, Dict[str, str]] = {}
+
+        def editable(language: str) -> Dict[str, str]:
+            if language not in changed:
+                changed[language] = dict(base.get(language, {}))
+            return changed[language]
+
+        for row in rows:
+            previous = self._row_keys.get(row["id"])
+            if previous and previous != (row["lang_code"], row["key"]):
+                editable(previous[0]).pop(previous[1], None)
+            editable(row["lang_code"])[row["key"]] = row["value"]
+            self._row_keys[row["id"]] = (row["lang_code"], row["key"])
+            self.rows_applied += 1
+            if self.watermark is None or (row["updated_at"], row["id"]) > (self.watermark, self._watermark_id):
+                self.watermark, self._watermark_id = row["updated_at"], row["id"]
+        catalogues = dict(base)
+        catalogues.update((language, MappingProxyType(values)) for language, values in changed.items())
+        self._catalogues = MappingProxyType(catalogues)
+        self.version = self._compute_version()
+
+    def _compute_version(self) -> str:
+        digest = hashlib.blake2b(digest_size=8)
+        for language in sorted(self._catalogues):
+            for key, value in sorted(self._catalogues[language].items()):
+                digest.update(f"{language}\0{key}\0{value}\0".encode())
+        return digest.hexdigest()
+
+    # --- Lecture ---
+    @property
+    def locales(self) -> List[str]:
+        return sorted(self._catalogues)
+
+    def resolve_locale(self, locale: Optional[str]) -> str:
+        """Première locale de la chaîne de repli présente dans le catalogue (locale par défaut sinon)."""
+        catalogues = self._catalogues
+        for candidate in fallback_chain(locale or self.default_locale, self.default_locale):
+            if candidate in catalogues:
+                return candidate
+        return self.default_locale
+
+    def translate(self, key: str, locale: Optional[str] = None, default: Optional[str] = None, **params: Any) -> str:
+        """Texte de `key` dans la première locale de la chaîne de repli qui le définit, sinon `default` (ou la clé)."""
+        catalogues = self._catalogues
+        template = None
+        for candidate in fallback_chain(locale or self.default_locale, self.default_locale):
+            template = catalogues.get(candidate, {}).get(key)
+            if template is not None:
+                break
+        if template is None:
+            template = default if default is not None else key
+        if not params:
+            return template
+        try:
+            return template.format(**params)
+        except (KeyError, IndexError, ValueError):
+            logger.warning("Traduction '%s' mal formée pour les paramètres %s", key, sorted(params))
+            return template
+
+    def bundle(self, locale: str) -> Dict[str, Any]:
+        # Toutes les clés connues, résolues avec la chaîne de repli, pour i18next-http-backend
+        merged: Dict[str, str] = {}
+        for candidate in reversed(fallback_chain(locale, self.default_locale)):
+            merged.update(self._catalogues.get(candidate, {}))
+        return _nest(merged)
+
+    # --- Rafraîchissement en tâche de fond ---
+    def start(self, refresh_interval: float = DEFAULT_TRANSLATIONS_REFRESH_SECONDS, full_reload_interval: float = DEFAULT_TRANSLATIONS_FULL_RELOAD_SECONDS) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop(refresh_interval, full_reload_interval))
+
+    async def _refresh_loop(self, refresh_interval: float, full_reload_interval: float) -> None:
+        since_full_reload = 0.0
+        while True:
+            await asyncio.sleep(refresh_interval)
+            since_full_reload += refresh_interval
+            try:
+                if since_full_reload >= full_reload_interval:
+                    since_full_reload = 0.0
+                    await self.load()  # rattrape les suppressions
+                else:
+                    await self.refresh()
+            except Exception as e:
+                logger.error("Échec du rafraîchissement des traductions: %s", e, exc_info=True)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "watermark": self.watermark,
+            "keys": {language: len(values) for language, values in self._catalogues.items()},
+            "refreshes": self.refreshes,
+            "rows_applied": self.rows_applied,
+        }
@@ -0,0 +1,240 @@
+"""File de travail asynchrone pour les messages WhatsApp reçus par le webhook.
+
+Le webhook valide la notification, met un job par message dans la file et répond
+200 immédiatement : Meta ne réessaie plus parce que Supabase est lent. Un pool de
+workers vide la file avec une concurrence bornée, en traitant les messages d'un
+même numéro de téléphone l'un après l'autre, dans leur ordre d'arrivée.
+
+Deux backends :
+- `InMemoryQueueBackend` : asyncio.Queue bornée, pour le développement et les tests ;
+- `SupabaseQueueBackend` : table `webhook_jobs` (voir sql/webhook_jobs.sql), les jobs
+  survivent à un redémarrage et peuvent être consommés par plusieurs workers uvicorn.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEBHOOK_WORKERS = 10
+DEFAULT_WEBHOOK_QUEUE_MAXSIZE = 1000
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class WebhookJob:
+    __slots__ = ("key", "payload", "job_id")
+
+    def __init__(self, key: str, payload: Dict[str, Any], job_id: Optional[int] = None):
+        self.key = key  # numéro de téléphone : les jobs d'une même clé sont traités dans l'ordre
+        self.payload = payload
+        self.job_id = job_id
+
+
+def jobs_from_webhook(body: Dict[str, Any]) -> List[WebhookJob]:
+    # Un job par message, avec le reste de `value` (contacts, metadata) pour le handler
+    jobs = []
+    for entry in body.get("entry") or []:
+        for change in entry.get("changes") or []:
+            if change.get("field") != "messages":
+                continue
+            value = change.get("value") or {}
+            for message in value.get("messages") or []:
+                jobs.append(WebhookJob(message["from"], {**value, "messages": [message]}))
+    return jobs
+
+
+class QueueBackend(ABC):
+    @abstractmethod
+    async def put_many(self, jobs: List[WebhookJob]) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self) -> WebhookJob:
+        ...
+
+    @abstractmethod
+    async def ack(self, job: WebhookJob) -> None:
+        ...
+
+    async def fail(self, job: WebhookJob, error: Exception) -> None:
+        await self.ack(job)
+
+    @abstractmethod
+    async def join(self) -> None:
+        """Attend que tous les jobs déposés soient acquittés ou en échec."""
+
+
+class InMemoryQueueBackend(QueueBackend):
+    def __init__(self, maxsize: int = DEFAULT_WEBHOOK_QUEUE_MAXSIZE):
+        self._queue: "asyncio.Queue[WebhookJob]" = asyncio.Queue(maxsize)
+
+    async def put_many(self, jobs: List[WebhookJob]) -> None:
+        if self._queue.maxsize and self._queue.qsize() + len(jobs) > self._queue.maxsize:
+            raise QueueFullError(f"File webhook pleine ({self._queue.maxsize} jobs)")
+        for job in jobs:
+            self._queue.put_nowait(job)
+
+    async def get(self) -> WebhookJob:
+        return await self._queue.get()
+
+    async def ack(self, job: WebhookJob) -> None:
+        self._queue.task_done()
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+
+class SupabaseQueueBackend(QueueBackend):
+    """Jobs stockés dans la table `webhook_jobs`, réclamés par lots via la fonction SQL
+    `claim_webhook_jobs` (un seul job en cours par numéro, tous workers confondus)."""
+
+    def __init__(self, repository, batch_size: int = 20, poll_interval: float = 1.0, visibility_timeout: int = 300):
+        self.db = repository
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._claimed: Deque[WebhookJob] = deque()
+
+    async def put_many(self, jobs: List[WebhookJob]) -> None:
+        if jobs:
+            await self.db.insert("webhook_jobs", [{"partition_key": job.key, "payload": job.payload} for job in jobs])
+
+    async def get(self) -> WebhookJob:
+        while not self._claimed:
+            rows = await self.db.rpc("claim_webhook_jobs", {"p_limit": self.batch_size, "p_visibility_seconds": self.visibility_timeout})
+            self._claimed.extend(WebhookJob(row["partition_key"], row["payload"], row["id"]) for row in rows)
+            if not self._claimed:
+                await asyncio.sleep(self.poll_interval)
+        return self._claimed.popleft()
+
+    async def ack(self, job: WebhookJob) -> None:
+        await self.db.delete("webhook_jobs", id=job.job_id)
+
+    async def fail(self, job: WebhookJob, error: Exception) -> None:
+        # Conservé en base pour inspection, n'est plus réclamé
+        await self.db.update("webhook_jobs", {"status": "failed", "last_error": str(error)[:1000]}, id=job.job_id)
+
+    async def join(self) -> None:
+        # Table partagée : attend aussi les jobs des autres workers uvicorn
+        while (
+            await self.db.select_one("webhook_jobs", "id", status="pending")
+            or await self.db.select_one("webhook_jobs", "id", status="processing")
+        ):
+            await asyncio.sleep(self.poll_interval)
+
+
+class WebhookWorkerPool:
+    """Consomme un `QueueBackend` avec au plus `concurrency` numéros traités en parallèle.
+
+    Chaque numéro a sa file locale (`lane`) : un seul worker la vide, dans l'ordre.
+    Au plus `max_pending` jobs sont retirés du backend sans être acquittés : au-delà, le
+    pool cesse de consommer et la file du backend se remplit (`QueueFullError`) au lieu
+    des files locales.
+    """
+
+    def __init__(self, backend: QueueBackend, handler: Callable[[Dict[str, Any]], Awaitable[None]], concurrency: int = DEFAULT_WEBHOOK_WORKERS,
+                 max_pending: int = DEFAULT_WEBHOOK_QUEUE_MAXSIZE):
+        self.backend = backend
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._lanes: Dict[str, Deque[WebhookJob]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._consumer: Optional[asyncio.Task] = None
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._consumer is not None and not self._consumer.done()
+
+    async def enqueue(self, jobs: List[WebhookJob]) -> None:
+        await self.backend.put_many(jobs)
+
+    def start(self) -> None:
+        if not self.running:
+            self._consumer = asyncio.create_task(self._consume())
+            logger.info("Workers webhook démarrés (%s, concurrence %s)", type(self.backend).__name__, self.concurrency)
+
+    async def _consume(self) -> None:
+        while True:
+            await self._pending.acquire()  # files locales pleines : les jobs restent dans le backend
+            try:
+                job = await self.backend.get()
+            except asyncio.CancelledError:
+                self._pending.release()
+                raise
+            except Exception as e:
+                self._pending.release()
+                logger.error("Erreur de lecture de la file webhook: %s", e, exc_info=True)
+                await asyncio.sleep(1)
+                continue
+            lane = self._lanes.get(job.key)
+            if lane is not None:
+                lane.append(job)  # un worker traite déjà ce numéro, il prendra ce job ensuite
+                continue
+            self._lanes[job.key] = deque([job])
+            await self._slots.acquire()  # tous les workers occupés : on arrête de consommer la file
+            task = asyncio.create_task(self._drain_lane(job.key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _drain_lane(self, key: str) -> None:
+        lane = self._lanes[key]
+        try:
+            while lane:
+                job = lane[0]
+                try:
+                    await self.handler(job.payload)
+                except Exception as e:
+                    self.failed += 1
+                    logger.error("Échec du traitement du message webhook de %s: %s", key, e, exc_info=True)
+                    await self._settle(self.backend.fail(job, e))
+                else:
+                    self.processed += 1
+                    await self._settle(self.backend.ack(job))
+                lane.popleft()
+                self._pending.release()
+        finally:
+            del self._lanes[key]
+            self._slots.release()
+
+    @staticmethod
+    async def _settle(acknowledgement: Awaitable[None]) -> None:
+        # Une erreur d'acquittement ne doit pas bloquer les messages suivants du numéro
+        try:
+            await acknowledgement
+        except Exception as e:
+            logger.error("Impossible d'acquitter le job webhook: %s", e, exc_info=True)
+
+    async def join(self) -> None:
+        await self.backend.join()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._consumer:
+            self._consumer.cancel()
+            await asyncio.gather(self._consumer, return_exceptions=True)
+            self._consumer = None
+        if self._tasks:
+            # Laisse les messages en cours se terminer avant l'arrêt du processus
+            await asyncio.wait(self._tasks, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "concurrency": self.concurrency,
+            "active_phone_numbers": len(self._lanes),
+            "pending_jobs": sum(len(lane) for lane in self._lanes.values()),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,352 @@
+"""Envoi des messages WhatsApp sortants via l'API Cloud (Graph API de Meta).
+
+Un seul `httpx.AsyncClient` partagé (keep-alive, HTTP/2 si le paquet `h2` est installé)
+et un pool de workers qui vident une file de priorité : les notifications de commande
+passent avant les réponses du bot, elles-mêmes avant le marketing. Les limites de Meta
+sont respectées côté client par deux seaux à jetons :
+- débit du numéro d'envoi (80 messages/s par défaut sur l'API Cloud) ;
+- limite par paire expéditeur/destinataire (rafale courte, puis un message toutes les 6 s).
+Les réponses 429 et 5xx (et les erreurs réseau) sont réessayées avec un backoff
+exponentiel à gigue complète, en respectant `Retry-After` ; un message en attente
+ne bloque pas de worker.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRAPH_API_URL = "https://graph.facebook.com"
+DEFAULT_GRAPH_API_VERSION = "v18.0"
+DEFAULT_SENDER_WORKERS = 20
+DEFAULT_SENDER_QUEUE_MAXSIZE = 10_000
+DEFAULT_MESSAGES_PER_SECOND = 80.0
+DEFAULT_PAIR_BURST = 45
+DEFAULT_PAIR_INTERVAL_SECONDS = 6.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE_SECONDS = 0.5
+DEFAULT_BACKOFF_MAX_SECONDS = 30.0
+DEFAULT_TIMEOUT_SECONDS = 10.0
+
+# Plus petit = envoyé en premier
+PRIORITY_TRANSACTIONAL = 0  # statut de commande, paiement
+PRIORITY_CONVERSATION = 1  # réponses du bot
+PRIORITY_MARKETING = 2
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+PAIR_RATE_LIMIT_ERROR_CODE = 131056  # trop de messages vers le même destinataire
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class OutboundQueueFullError(Exception):
+    pass
+
+
+class WhatsAppSendError(Exception):
+    def __init__(self, status_code: Optional[int], message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.code = code  # code d'erreur Graph API (130429, 131056...)
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` jetons par seconde, au plus `capacity` accumulés.
+
+    `reserve()` prend un jeton tout de suite, quitte à passer en négatif, et renvoie
+    l'attente avant de pouvoir l'utiliser : les réservations successives sont servies
+    dans l'ordre, sans verrou (boucle asyncio unique).
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        self._refill()
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def penalize(self, seconds: float) -> None:
+        # 429 reçu malgré tout : plus aucun envoi pendant `seconds`
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+
+def text_message(to: str, body: str) -> Dict[str, Any]:
+    return {"messaging_product": "whatsapp", "recipient_type": "individual", "to": to, "type": "text", "text": {"preview_url": False, "body": body}}
+
+
+class OutboundMessage:
+    __slots__ = ("to", "payload", "priority", "sequence", "attempts", "pair_reserved", "result", "enqueued_at")
+
+    def __init__(self, to: str, payload: Dict[str, Any], priority: int, sequence: int):
+        self.to = to
+        self.payload = payload
+        self.priority = priority
+        self.sequence = sequence  # ordre d'arrivée, conservé lors des réessais
+        self.attempts = 0
+        self.pair_reserved = False
+        self.result: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class WhatsAppSender:
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        *,
+        client_factory: Optional[Callable[[], httpx.AsyncClient]] = None,
+        http2: bool = False,
+        concurrency: int = DEFAULT_SENDER_WORKERS,
+        maxsize: int = DEFAULT_SENDER_QUEUE_MAXSIZE,
+        messages_per_second: float = DEFAULT_MESSAGES_PER_SECOND,
+        pair_burst: int = DEFAULT_PAIR_BURST,
+        pair_interval: float = DEFAULT_PAIR_INTERVAL_SECONDS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE_SECONDS,
+        backoff_max: float = DEFAULT_BACKOFF_MAX_SECONDS,
+    ):
+        # Client créé au premier envoi : pas de contexte TLS à l'import
+        self._client = client
+        self._client_factory = client_factory
+        self.http2 = http2
+        self.concurrency = concurrency
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pair_burst = pair_burst
+        self.pair_interval = pair_interval
+        self._throughput = TokenBucket(messages_per_second, messages_per_second)
+        self._pairs: Dict[str, TokenBucket] = {}
+        self._heap: List[Any] = []  # (priorité, ordre d'arrivée, message)
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending = 0  # en file, en attente de réessai ou en cours d'envoi
+        self._workers: List[asyncio.Task] = []
+        self._timers: Set[asyncio.TimerHandle] = set()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.throttled = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    @property
+    def running(self) -> bool:
+        return any(not worker.done() for worker in self._workers)
+
+    def start(self) -> None:
+        if not self.running:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+            logger.info("Envoi WhatsApp démarré (%s workers, %g messages/s, HTTP/2: %s)", self.concurrency, self._throughput.rate, self.http2)
+
+    def enqueue(self, to: str, payload: Dict[str, Any], priority: int = PRIORITY_CONVERSATION) -> OutboundMessage:
+        if self._pending >= self.maxsize:
+            raise OutboundQueueFullError(f"File d'envoi WhatsApp pleine ({self.maxsize} messages)")
+        message = OutboundMessage(to, payload, priority, next(self._sequence))
+        self._pending += 1
+        self._idle.clear()
+        self._push(message)
+        return message
+
+    async def send(self, to: str, payload: Dict[str, Any], priority: int = PRIORITY_CONVERSATION) -> Dict[str, Any]:
+        # Attend l'envoi effectif (réponse de la Graph API)
+        return await self.enqueue(to, payload, priority).result
+
+    def _push(self, message: OutboundMessage) -> None:
+        heapq.heappush(self._heap, (message.priority, message.sequence, message))
+        self._ready.set()
+
+    def _push_later(self, delay: float, message: OutboundMessage) -> None:
+        def push() -> None:
+            self._timers.discard(timer)
+            self._push(message)
+
+        timer = asyncio.get_running_loop().call_later(delay, push)
+        self._timers.add(timer)
+
+    def _pair_bucket(self, to: str) -> TokenBucket:
+        bucket = self._pairs.get(to)
+        if bucket is None:
+            if len(self._pairs) > 10 * self.maxsize:
+                # Les seaux pleins n'apportent rien : on les oublie plutôt que de grossir sans fin
+                self._pairs = {key: b for key, b in self._pairs.items() if not b.full}
+            bucket = self._pairs[to] = TokenBucket(1 / self.pair_interval, self.pair_burst)
+        return bucket
+
+    async def _next(self) -> OutboundMessage:
+        while not self._heap:
+            self._ready.clear()
+            await self._ready.wait()
+        return heapq.heappop(self._heap)[2]
+
+    async def _work(self) -> None:
+        while True:
+            message = await self._next()
+            if not message.pair_reserved:
+                message.pair_reserved = True
+                delay = self._pair_bucket(message.to).reserve()
+                if delay > 0:
+                    # Rafale épuisée pour ce destinataire : retour en file plus tard, le worker continue
+                    self._push_later(delay, message)
+                    continue
+            delay = self._throughput.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._deliver(message)
+
+    async def _deliver(self, message: OutboundMessage) -> None:
+        message.attempts += 1
+        error: Optional[WhatsAppSendError] = None
+        retry_after: Optional[float] = None
+        try:
+            response = await self.client.post("/messages", json=message.payload)
+            if response.status_code < 300:
+                self.sent += 1
+                self._finish(message, response.json())
+                return
+            error = _send_error(response)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                retry_after = _retry_after(response)
+            if response.status_code == 429:
+                self.throttled += 1
+                bucket = self._pair_bucket(message.to) if error.code == PAIR_RATE_LIMIT_ERROR_CODE else self._throughput
+                bucket.penalize(retry_after or self.backoff_base)
+        except httpx.TransportError as e:
+            error = WhatsAppSendError(None, f"{type(e).__name__}: {str(e)}")
+            retry_after = 0.0
+        except Exception as e:
+            error = WhatsAppSendError(None, str(e))
+
+        if retry_after is not None and message.attempts <= self.max_retries:
+            self.retried += 1
+            backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (message.attempts - 1)))
+            self._push_later(max(retry_after, backoff), message)
+            return
+        self.failed += 1
+        logger.error("Échec de l'envoi WhatsApp à %s après %s tentative(s): %s", message.to, message.attempts, error.message)
+        self._finish(message, error)
+
+    def _finish(self, message: OutboundMessage, outcome: Any) -> None:
+        if not message.result.done():
+            if isinstance(outcome, Exception):
+                message.result.set_exception(outcome)
+                message.result.exception()  # personne n'attend forcément le résultat : pas d'avertissement asyncio
+            else:
+                message.result.set_result(outcome)
+        self._pending -= 1
+        if self._pending == 0:
+            self._idle.set()
+
+    async def join(self) -> None:
+        await self._idle.wait()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        # Laisse partir les messages déjà en file (notifications de commande) avant l'arrêt
+        if self.running and self._pending:
+            try:
+                await asyncio.wait_for(self.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("%s message(s) WhatsApp non envoyé(s) à l'arrêt", self._pending)
+        for timer in self._timers:
+            timer.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.concurrency,
+            "pending": self._pending,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "throttled": self.throttled,
+        }
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", 0)))
+    except ValueError:
+        return 0.0
+
+
+def _send_error(response: httpx.Response) -> WhatsAppSendError:
+    try:
+        error = response.json().get("error") or {}
+    except ValueError:
+        return WhatsAppSendError(response.status_code, f"{response.status_code}: {response.text[:200]}")
+    code = error.get("code")
+    return WhatsAppSendError(response.status_code, f"{response.status_code} (code {code}): {error.get('message')}", code)
+
+
+def create_whatsapp_sender(
+    access_token: str,
+    phone_number_id: str,
+    *,
+    api_url: str = DEFAULT_GRAPH_API_URL,
+    api_version: str = DEFAULT_GRAPH_API_VERSION,
+    http2: bool = True,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    **options: Any,
+) -> WhatsAppSender:
+    concurrency = options.get("concurrency", DEFAULT_SENDER_WORKERS)
+    if http2 and not HTTP2_AVAILABLE:
+        logger.warning("Paquet h2 absent (pip install 'httpx[http2]') : envoi WhatsApp en HTTP/1.1.")
+    http2 = http2 and HTTP2_AVAILABLE
+
+    def client_factory() -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=f"{api_url.rstrip('/')}/{api_version}/{phone_number_id}",
+            headers={"Authorization": f"Bearer {access_token}"},
+            http2=http2,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=transport,
+        )
+
+    return WhatsAppSender(client_factory=client_factory, http2=http2, **options)
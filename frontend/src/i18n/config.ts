@@ -17,6 +17,26 @@ const resources = {
   },
 };
 
+// Version courante du catalogue serveur, lue une fois : l'URL versionnée (?v=) est servie avec
+// un cache immuable d'un an, une nouvelle version change l'URL
+let catalogueVersion: Promise<string | null> | null = null;
+
+const getCatalogueVersion = () => {
+  if (!catalogueVersion) {
+    catalogueVersion = fetch('/api/translations')
+      .then((response) => (response.ok ? response.json() : null))
+      .then((index) => (index && index.version ? String(index.version) : null))
+      .catch(() => null);
+  }
+  return catalogueVersion;
+};
+
+const translationsLoadPath = async () => {
+  const version = await getCatalogueVersion();
+  // Sans version (serveur injoignable), URL non versionnée revalidée par ETag
+  return version ? `/api/translations/{{lng}}?v=${encodeURIComponent(version)}` : '/api/translations/{{lng}}';
+};
+
 // Configuration i18next
 i18n
   // Détection automatique de la langue
@@ -27,8 +47,9 @@ i18n
   .use(initReactI18next)
   // Initialisation
   .init({
-    // Ressources de traduction
+    // Ressources de traduction (embarquées, complétées par le catalogue du serveur)
     resources,
+    partialBundledLanguages: true,
     
     // Langue par défaut
     fallbackLng: 'fr', // Français par défaut pour le Cameroun
@@ -59,8 +80,8 @@ i18n
     
     // Configuration du backend
     backend: {
-      // Chemin vers les fichiers de traduction
-      loadPath: '/locales/{{lng}}.json',
+      // Catalogue servi par le backend (table translations), à l'URL de la version courante
+      loadPath: translationsLoadPath,
       
       // Ajouter un timestamp pour éviter le cache
       addPath: '/locales/add/{{lng}}/{{ns}}',